@@ -35,4 +35,23 @@ tasks.withType<KotlinCompile> {
 
 application {
     mainClass.set("CacheCowKt")
-}
\ No newline at end of file
+}
+
+/*
+ * Self-contained jar of the cache node and all of its dependencies, so deployed nodes
+ * can start with `java -jar` instead of compiling the sources on boot.
+ */
+tasks.register<Jar>("fatJar") {
+    group = "build"
+    description = "Assembles a jar of the cache node with its runtime dependencies."
+    archiveFileName.set("cachecow.jar")
+    manifest {
+        attributes["Main-Class"] = "CacheCowKt"
+    }
+    duplicatesStrategy = DuplicatesStrategy.EXCLUDE
+    exclude("META-INF/*.SF", "META-INF/*.DSA", "META-INF/*.RSA")
+
+    dependsOn(configurations.runtimeClasspath)
+    from(sourceSets.main.get().output)
+    from({ configurations.runtimeClasspath.get().filter { it.name.endsWith(".jar") }.map { zipTree(it) } })
+}
@@ -0,0 +1,81 @@
+import java.io.DataInputStream
+import java.io.EOFException
+import java.io.InputStream
+import java.nio.ByteBuffer
+
+/**
+ * Encodes the key-value pairs copied between nodes while scaling as a stream of
+ * length-prefixed binary records, so values are sent as raw bytes rather than base64.
+ * Each record is laid out as
+ *
+ *     [key length: int][key: UTF-8][version: int][value length: int][value]
+ *
+ * with integers in big-endian order.
+ */
+object BulkCopyCodec {
+
+    /**
+     * Media type of an encoded bulk copy body.
+     */
+    const val contentType = "application/octet-stream"
+
+    /**
+     * Returns the number of bytes the pair takes up once encoded.
+     */
+    fun recordSize(kvPair: KeyValuePair): Int {
+        return 12 + kvPair.key.toByteArray(Charsets.UTF_8).size + kvPair.value.size
+    }
+
+    /**
+     * Encodes the key-value pairs into a single request body.
+     */
+    fun encode(kvPairs: List<KeyValuePair>): ByteArray {
+        val keys = kvPairs.map { it.key.toByteArray(Charsets.UTF_8) }
+        val size = kvPairs.indices.sumOf { 12 + keys[it].size + kvPairs[it].value.size }
+        val buffer = ByteBuffer.allocate(size)
+        for (i in kvPairs.indices) {
+            buffer.putInt(keys[i].size)
+            buffer.put(keys[i])
+            buffer.putInt(kvPairs[i].version)
+            buffer.putInt(kvPairs[i].value.size)
+            buffer.put(kvPairs[i].value)
+        }
+        return buffer.array()
+    }
+
+    /**
+     * Decodes the records read from the stream until it ends.
+     *
+     * @throws IllegalArgumentException if the stream ends partway through a record or a
+     * length is negative
+     */
+    fun decode(input: InputStream): MutableList<KeyValuePair> {
+        val data = DataInputStream(input)
+        val kvPairs = mutableListOf<KeyValuePair>()
+        try {
+            while (true) {
+                val keyLength = data.read().let { first ->
+                    if (first < 0) {
+                        return kvPairs
+                    }
+                    (first shl 24) or (data.readUnsignedByte() shl 16) or data.readUnsignedShort()
+                }
+                val key = String(readBytes(data, keyLength), Charsets.UTF_8)
+                val version = data.readInt()
+                val value = readBytes(data, data.readInt())
+                kvPairs.add(KeyValuePair(key, version, value))
+            }
+        } catch (e: EOFException) {
+            throw IllegalArgumentException("Bulk copy body ends partway through a record")
+        }
+    }
+
+    private fun readBytes(data: DataInputStream, length: Int): ByteArray {
+        if (length < 0) {
+            throw IllegalArgumentException("Bulk copy record has negative length $length")
+        }
+        val bytes = ByteArray(length)
+        data.readFully(bytes)
+        return bytes
+    }
+}
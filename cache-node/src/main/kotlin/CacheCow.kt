@@ -1,6 +1,14 @@
 import cache.distributed.DistributedCache
 import cache.distributed.IDistributedCache
+import cache.local.ILocalCache
 import cache.local.LocalCache
+import cache.local.defaultMaxBytes
+import cache.local.multitable.MultiTableCacheMonitor
+import cache.local.slab.SlabCache
+import cache.local.tinylfu.WTinyLfuCache
+import logging.LogLevel
+import logging.LogManager
+import sender.SenderConfig
 import java.io.File
 
 const val nodeListPath = "nodes.txt"
@@ -16,33 +24,85 @@ fun main(args: Array<String>) {
     var isAWS = false
     var scalable = false
     var isNewNode = false
+    var senderConfig = SenderConfig()
+    var maxBytes = defaultMaxBytes
+    var engine = "heap"
+    var replicationFactor = 1
+    val logger = LogManager.getLogger(LogManager.CACHE_COW)
 
     if (args.size >= 2) {
         try {
             isAWS = args[0] == "aws"
             nodeId = Integer.parseInt(args[1])
             port = Integer.parseInt(args[2])
-            if (args.size >= 4) {
-                scalable = args[3] == "-s"
-                if (args.size >= 5 && scalable) {
-                    isNewNode = args[4] == "-n"
-                }
-            }
-        } catch (e: NumberFormatException) {
-            System.err.println("Invalid node ID or port.")
+            val flags = args.drop(3)
+            scalable = "-s" in flags
+            isNewNode = scalable && "-n" in flags
+            senderConfig = SenderConfig(
+                requestTimeoutMillis = flagValue(flags, "-t")?.toLong() ?: senderConfig.requestTimeoutMillis,
+                maxConnectionsPerNode = flagValue(flags, "-c")?.toInt() ?: senderConfig.maxConnectionsPerNode
+            )
+            maxBytes = flagValue(flags, "-m")?.let { parseBytes(it) } ?: maxBytes
+            engine = flagValue(flags, "-e") ?: engine
+            replicationFactor = flagValue(flags, "-r")?.toInt() ?: replicationFactor
+            require(replicationFactor >= 1)
+            flagValue(flags, "-l")?.let { LogManager.configure(null, LogLevel.valueOf(it.uppercase()), null) }
+        } catch (e: IllegalArgumentException) {
+            System.err.println("Invalid node ID, port or flag value.")
             return
         }
     }
 
     val nodeList = File(nodeListPath).bufferedReader().readLines().toMutableList()
 
-    print("CACHE COW: node list is $nodeList\n")
+    logger.info { "Node list is $nodeList" }
+
+    if (scalable && engine != "heap") {
+        System.err.println("Scalable mode only supports the heap storage engine.")
+        return
+    }
 
     val distributedCache: IDistributedCache = if (scalable) {
-        ScalableDistributedCache(nodeId, nodeList, isAWS, isNewNode)
+        ScalableDistributedCache(nodeId, nodeList, isAWS, isNewNode, senderConfig, maxBytes, replicationFactor)
     } else {
-        DistributedCache(nodeId, nodeList, LocalCache())
+        val localCache: ILocalCache = when (engine) {
+            "heap" -> LocalCache(maxBytes)
+            "slab" -> SlabCache(maxBytes)
+            "multitable" -> MultiTableCacheMonitor(maxBytes = maxBytes)
+            "tinylfu" -> WTinyLfuCache(maxBytes)
+            else -> {
+                System.err.println("Unknown storage engine $engine, expected heap, slab, multitable or tinylfu.")
+                return
+            }
+        }
+        DistributedCache(nodeId, nodeList, localCache, senderConfig, replicationFactor)
     }
 
     distributedCache.start(port)
-}
\ No newline at end of file
+}
+
+/**
+ * Returns the value following a flag such as "-t 500", or null if the flag is absent.
+ */
+fun flagValue(flags: List<String>, flag: String): String? {
+    val index = flags.indexOf(flag)
+    return if (index >= 0 && index + 1 < flags.size) flags[index + 1] else null
+}
+
+/**
+ * Parses a byte count such as "1048576", "512m" or "2g". Suffixes are powers of 1024.
+ */
+fun parseBytes(value: String): Long {
+    val multiplier = when (value.lastOrNull()?.lowercaseChar()) {
+        'k' -> 1L shl 10
+        'm' -> 1L shl 20
+        'g' -> 1L shl 30
+        else -> 1L
+    }
+    val digits = if (multiplier == 1L) value else value.dropLast(1)
+    val bytes = digits.toLong() * multiplier
+    if (bytes <= 0) {
+        throw NumberFormatException("Byte budget must be positive")
+    }
+    return bytes
+}
@@ -1,3 +1,5 @@
+import com.fasterxml.jackson.annotation.JsonProperty
+
 /**
  * Representation for different machine nodes.
  */
@@ -6,13 +8,20 @@ typealias NodeId = Int
 /**
  * Represents a key-version pair, where the key is a string and the version is an integer.
  */
-data class KeyVersionPair(val key: String, val version: Int)
+data class KeyVersionPair(
+    @JsonProperty("key") val key: String,
+    @JsonProperty("version") val version: Int
+)
 
 /**
  * Represents a key-version-value group, where the key is a string, the version is an integer,
  * and the value is a byte array.
  */
-data class KeyValuePair(val key: String, val version: Int, val value: ByteArray)
+data class KeyValuePair(
+    @JsonProperty("key") val key: String,
+    @JsonProperty("version") val version: Int,
+    @JsonProperty("value") val value: ByteArray
+)
 
 
 /**
@@ -28,6 +37,16 @@ enum class ScalableMessageType {
 data class ScalableMessage(val nodeId: NodeId, val hostName: String, val type: ScalableMessageType)
 
 /**
- * Data packet containing map of key-value pairs to be stored locally.
+ * Data packet containing key-version pairs to be fetched in bulk.
+ */
+data class BulkFetchRequest(@JsonProperty("pairs") val pairs: MutableList<KeyVersionPair>)
+
+/**
+ * Data packet containing the key-value pairs found by a bulk fetch, misses are omitted.
+ */
+data class BulkFetchResponse(@JsonProperty("values") val values: MutableList<KeyValuePair>)
+
+/**
+ * Data packet containing key-value pairs to be stored in bulk.
  */
-data class BulkCopyRequest(val nodeId: NodeId, val values: MutableList<KeyValuePair>)
\ No newline at end of file
+data class BulkStoreRequest(@JsonProperty("values") val values: MutableList<KeyValuePair>)
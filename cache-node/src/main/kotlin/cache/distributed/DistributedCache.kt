@@ -1,5 +1,6 @@
 package cache.distributed
 
+import KeyValuePair
 import KeyVersionPair
 import NodeId
 import cache.distributed.IDistributedCache.SystemInfo
@@ -7,17 +8,27 @@ import cache.distributed.hasher.INodeHasher
 import cache.distributed.hasher.NodeHasher
 import cache.local.ILocalCache
 import io.javalin.Javalin
+import logging.LogManager
 import receiver.Receiver
 import sender.ISender
 import sender.Sender
+import sender.SenderConfig
+import java.util.concurrent.CompletableFuture
 
 /**
- * A concrete distributed cache that assigns keys to nodes using a NodeHasher.
+ * A concrete distributed cache that assigns keys to nodes using a NodeHasher. Each key
+ * is stored on its primary node and the next replicationFactor - 1 nodes.
  */
 class DistributedCache(private val nodeId: NodeId, private var nodeList: List<String>,
-                       private var cache: ILocalCache): IDistributedCache,
+                       private var cache: ILocalCache, senderConfig: SenderConfig = SenderConfig(),
+                       private val replicationFactor: Int = 1): IDistributedCache,
     ITestableDistributedCache<ISender> {
 
+    /**
+     * Logger for routing requests to nodes
+     */
+    private val logger = LogManager.getLogger(LogManager.DISTRIBUTED_CACHE)
+
     /**
      * The node hasher used to map keys to nodes
      */
@@ -31,36 +42,86 @@ class DistributedCache(private val nodeId: NodeId, private var nodeList: List<St
     /**
      * Module used to send all out-going messages (public for testing)
      */
-    private var sender: ISender = Sender(nodeId, nodeList)
+    private var sender: ISender = Sender(nodeId, nodeList, senderConfig)
 
     override fun start(port: Int) {
         receiver.start(port)
     }
 
     override fun fetch(kvPair: KeyVersionPair): ByteArray? {
+        return awaitReplicas(fetchAsync(kvPair))
+    }
+
+    override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+        awaitReplicas(storeAsync(kvPair, value))
+    }
+
+    override fun fetchAsync(kvPair: KeyVersionPair): CompletableFuture<ByteArray?> {
+        val replicas = replicasOf(kvPair)
+
+        logger.debug { "Replicas of key ${kvPair.key} are $replicas" }
+
+        return fetchFromReplicas(nodeId, replicas, kvPair, sender) { cache.fetch(kvPair) }
+    }
+
+    override fun storeAsync(kvPair: KeyVersionPair, value: ByteArray): CompletableFuture<Unit> {
         val primaryNodeId = nodeHasher.primaryHashNode(kvPair)
 
-        print("DISTRIBUTED CACHE: Hash value of key ${kvPair.key} is ${primaryNodeId}\n")
+        logger.debug { "Hash value of key ${kvPair.key} is ${primaryNodeId}" }
 
         return if (nodeId == primaryNodeId) {
-            cache.fetch(kvPair)
+            cache.store(kvPair, value)
+            replicateMany(nodeId, listOf(KeyValuePair(kvPair.key, kvPair.version, value)), this::replicasOf, sender)
         } else {
-            sender.fetchFromNode(kvPair, primaryNodeId)
+            sender.storeToNodeAsync(kvPair, value, primaryNodeId)
         }
     }
 
-    override fun store(kvPair: KeyVersionPair, value: ByteArray) {
-        val primaryNodeId = nodeHasher.primaryHashNode(kvPair)
+    override fun fetchMany(kvPairs: List<KeyVersionPair>, isClientRequest: Boolean): MutableList<KeyValuePair> {
+        if (!isClientRequest) {
+            return fetchReplicas(kvPairs)
+        }
+        return fetchManyFromReplicas(nodeId, kvPairs, this::replicasOf, sender) { batch -> fetchReplicas(batch) }
+    }
 
-        print("DISTRIBUTED CACHE: Hash value of key ${kvPair.key} is ${primaryNodeId}\n")
+    override fun storeMany(kvPairs: List<KeyValuePair>, isClientRequest: Boolean) {
+        if (!isClientRequest) {
+            storeManyLocal(kvPairs)
+            return
+        }
+        fanOutByNode(
+            nodeId,
+            kvPairs.groupBy { nodeHasher.primaryHashNode(KeyVersionPair(it.key, it.version)) },
+            { batch -> storeManyLocal(batch) },
+            { batch, destNodeId -> sender.storeManyToNode(batch, destNodeId); listOf<Unit>() }
+        )
+    }
 
-        if (nodeId == primaryNodeId) {
-            cache.store(kvPair, value)
-        } else {
-            sender.storeToNode(kvPair, value, primaryNodeId)
+    override fun fetchReplicas(kvPairs: List<KeyVersionPair>): MutableList<KeyValuePair> {
+        return kvPairs.mapNotNullTo(mutableListOf()) { kvPair ->
+            cache.fetch(kvPair)?.let { KeyValuePair(kvPair.key, kvPair.version, it) }
+        }
+    }
+
+    override fun storeReplicas(kvPairs: List<KeyValuePair>) {
+        for (kvPair in kvPairs) {
+            cache.store(KeyVersionPair(kvPair.key, kvPair.version), kvPair.value)
         }
     }
 
+    /**
+     * Stores pairs this node is the primary for, then copies them to their replicas.
+     */
+    private fun storeManyLocal(kvPairs: List<KeyValuePair>): List<Unit> {
+        storeReplicas(kvPairs)
+        awaitReplicas(replicateMany(nodeId, kvPairs, this::replicasOf, sender))
+        return listOf()
+    }
+
+    private fun replicasOf(kvPair: KeyVersionPair): List<NodeId> {
+        return nodeHasher.replicaHashNodes(kvPair, replicationFactor)
+    }
+
     override fun clearAll(isClientRequest: Boolean) {
         cache.clearAll(isClientRequest)
         if (isClientRequest) {
@@ -81,7 +142,8 @@ class DistributedCache(private val nodeId: NodeId, private var nodeList: List<St
             receiver.getReceiverUsageInfo(),
             sender.getSenderUsageInfo(),
             receiver.getClientRequestTiming(),
-            receiver.getServerRequestTiming()
+            receiver.getServerRequestTiming(),
+            latencies = receiver.getRequestLatencies()
         )
     }
 
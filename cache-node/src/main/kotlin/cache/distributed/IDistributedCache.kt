@@ -1,11 +1,18 @@
 package cache.distributed
 
+import KeyValuePair
+import KeyVersionPair
+import NodeId
 import cache.ICache
 import cache.local.CacheInfo
 import com.fasterxml.jackson.annotation.JsonProperty
+import exception.base.CacheNodeException
+import receiver.HistogramSnapshot
 import receiver.ReceiverUsageInfo
 import receiver.TotalRequestTiming
 import sender.SenderUsageInfo
+import java.util.concurrent.CompletableFuture
+import java.util.concurrent.CompletionException
 
 /**
  * An interface specifying the behavior of a distributed data cache.
@@ -19,6 +26,59 @@ interface IDistributedCache: ICache {
      */
     fun start(port: Int)
 
+    /**
+     * Fetches a value without blocking the calling thread while a remote node is queried.
+     *
+     * @param kvPair The key-version pair to look up
+     * @return A future of the value, or of null if a local lookup misses
+     */
+    fun fetchAsync(kvPair: KeyVersionPair): CompletableFuture<ByteArray?>
+
+    /**
+     * Stores a value without blocking the calling thread while a remote node stores it.
+     *
+     * @param kvPair The key-version pair to store
+     * @param value The value to store
+     * @return A future completed once the value is stored
+     */
+    fun storeAsync(kvPair: KeyVersionPair, value: ByteArray): CompletableFuture<Unit>
+
+    /**
+     * Fetches many values at once. Client requests are split by the node that owns each
+     * key, and the per-node batches are fetched in parallel. Requests from other nodes
+     * are served key by key from this node.
+     *
+     * @param kvPairs The key-version pairs to look up
+     * @param isClientRequest Whether the request came from a client rather than a node
+     * @return The key-value pairs that were found, misses are omitted
+     */
+    fun fetchMany(kvPairs: List<KeyVersionPair>, isClientRequest: Boolean): MutableList<KeyValuePair>
+
+    /**
+     * Stores many values at once. Client requests are split by the node that owns each
+     * key, and the per-node batches are stored in parallel. Requests from other nodes
+     * are stored key by key from this node.
+     *
+     * @param kvPairs The key-value pairs to store
+     * @param isClientRequest Whether the request came from a client rather than a node
+     */
+    fun storeMany(kvPairs: List<KeyValuePair>, isClientRequest: Boolean)
+
+    /**
+     * Fetches values held by this node as a replica, only looking in the local cache.
+     *
+     * @param kvPairs The key-version pairs to look up
+     * @return The key-value pairs that were found, misses are omitted
+     */
+    fun fetchReplicas(kvPairs: List<KeyVersionPair>): MutableList<KeyValuePair>
+
+    /**
+     * Stores values replicated by their primary node, only storing to the local cache.
+     *
+     * @param kvPairs The key-value pairs to store
+     */
+    fun storeReplicas(kvPairs: List<KeyValuePair>)
+
     /**
      * Gets all information about the usage of this node.
      */
@@ -60,6 +120,63 @@ interface IDistributedCache: ICache {
         @JsonProperty("receiverUsageInfo") var receiverUsageInfo: ReceiverUsageInfo,
         @JsonProperty("senderUsageInfo") val senderUsageInfo: SenderUsageInfo,
         @JsonProperty("clientRequestTiming") val clientRequestTiming: TotalRequestTiming,
-        @JsonProperty("serverRequestTiming") val serverRequestTiming: TotalRequestTiming
+        @JsonProperty("serverRequestTiming") val serverRequestTiming: TotalRequestTiming,
+        @JsonProperty("migrationInfo") val migrationInfo: MigrationInfo? = null,
+        @JsonProperty("latencies") val latencies: Map<String, HistogramSnapshot> = emptyMap()
+    )
+
+    /**
+     * Progress of the keys copied to or from this node during the latest scale, and
+     * whether a scale is still in progress, only reported by scalable nodes.
+     */
+    data class MigrationInfo(
+        @JsonProperty("sent") val sent: TransferInfo,
+        @JsonProperty("received") val received: TransferInfo,
+        @JsonProperty("batchBytes") val batchBytes: Long,
+        @JsonProperty("scaleInProgress") val scaleInProgress: Boolean = false
     )
-}
\ No newline at end of file
+
+    /**
+     * Totals for one direction of a migration. Throughput is in MB/s, where a MB is 2^20
+     * bytes, and is measured over the time since the first batch.
+     */
+    data class TransferInfo(
+        @JsonProperty("inProgress") val inProgress: Boolean,
+        @JsonProperty("bytes") val bytes: Long,
+        @JsonProperty("pairs") val pairs: Long,
+        @JsonProperty("batches") val batches: Long,
+        @JsonProperty("seconds") val seconds: Double,
+        @JsonProperty("throughputMBps") val throughputMBps: Double
+    )
+}
+
+/**
+ * Runs a bulk operation on every node's batch in parallel and combines the results. The
+ * batches of other nodes are sent asynchronously while this node's batch runs on the
+ * calling thread.
+ *
+ * @param nodeId id of this node
+ * @param batches items grouped by the node that should handle them
+ * @param local operation applied to this node's batch
+ * @param remote operation that sends a batch to another node
+ * @return combined results of all batches
+ */
+fun <T, R> fanOutByNode(
+    nodeId: NodeId,
+    batches: Map<NodeId, List<T>>,
+    local: (List<T>) -> List<R>,
+    remote: (List<T>, NodeId) -> List<R>
+): MutableList<R> {
+    val remoteResults = batches.filterKeys { it != nodeId }.map { (destNodeId, batch) ->
+        CompletableFuture.supplyAsync { remote(batch, destNodeId) }
+    }
+    val results = batches[nodeId]?.let { local(it).toMutableList() } ?: mutableListOf()
+    for (remoteResult in remoteResults) {
+        try {
+            results.addAll(remoteResult.join())
+        } catch (e: CompletionException) {
+            throw e.cause as? CacheNodeException ?: e
+        }
+    }
+    return results
+}
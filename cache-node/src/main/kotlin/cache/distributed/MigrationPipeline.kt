@@ -0,0 +1,242 @@
+package cache.distributed
+
+import BulkCopyCodec
+import NodeId
+import cache.distributed.IDistributedCache.TransferInfo
+import cache.local.IScalableLocalCache
+import logging.LogManager
+import sender.IScalableSender
+import java.util.Collections
+import java.util.concurrent.CompletableFuture
+import java.util.concurrent.CompletionException
+import java.util.concurrent.ConcurrentLinkedQueue
+import java.util.concurrent.Executors
+import java.util.concurrent.Semaphore
+import java.util.concurrent.atomic.AtomicLong
+import java.util.concurrent.atomic.AtomicReference
+
+/**
+ * Settings for copying keys to a new node.
+ */
+data class MigrationConfig(
+    val parallelStreams: Int = 4,
+    val maxInFlightBatches: Int = 8,
+    val initialBatchBytes: Long = 256L shl 10,
+    val minBatchBytes: Long = 64L shl 10,
+    val maxBatchBytes: Long = 4L shl 20,
+    val targetBatchMillis: Long = 250,
+    val copyAttempts: Int = 3,
+    val retryDelayMillis: Long = 1000
+)
+
+/**
+ * Totals for one direction of a migration.
+ */
+class MigrationStats {
+
+    private val bytes = AtomicLong(0)
+
+    private val pairs = AtomicLong(0)
+
+    private val batches = AtomicLong(0)
+
+    @Volatile
+    private var startNanos: Long = 0
+
+    @Volatile
+    private var endNanos: Long = 0
+
+    @Volatile
+    private var inProgress = false
+
+    /**
+     * Resets the totals at the start of a migration.
+     */
+    @Synchronized
+    fun start() {
+        bytes.set(0)
+        pairs.set(0)
+        batches.set(0)
+        startNanos = System.nanoTime()
+        endNanos = 0
+        inProgress = true
+    }
+
+    /**
+     * Counts a batch that was copied, starting the migration if this is its first batch.
+     */
+    fun record(pairCount: Int, byteCount: Long) {
+        if (!inProgress) {
+            synchronized(this) {
+                if (!inProgress) {
+                    start()
+                }
+            }
+        }
+        bytes.addAndGet(byteCount)
+        pairs.addAndGet(pairCount.toLong())
+        batches.incrementAndGet()
+    }
+
+    /**
+     * Stops the clock at the end of a migration.
+     */
+    @Synchronized
+    fun finish() {
+        if (inProgress) {
+            endNanos = System.nanoTime()
+            inProgress = false
+        }
+    }
+
+    /**
+     * Gets the totals so far, with throughput measured up to now while in progress.
+     */
+    fun getTransferInfo(): TransferInfo {
+        if (startNanos == 0L) {
+            return TransferInfo(false, 0, 0, 0, 0.0, 0.0)
+        }
+        val end = if (inProgress) System.nanoTime() else endNanos
+        val seconds = (end - startNanos) / 1e9
+        val copiedBytes = bytes.get()
+        val throughput = if (seconds > 0) copiedBytes / (1 shl 20).toDouble() / seconds else 0.0
+        return TransferInfo(inProgress, copiedBytes, pairs.get(), batches.get(), seconds, throughput)
+    }
+}
+
+/**
+ * Copies the keys in a set of hash value ranges to a new node. Several ranges are
+ * streamed in parallel and each batch is sent as soon as it is read. At most
+ * maxInFlightBatches batches may be unacknowledged at once, so a slow destination holds
+ * back the readers rather than letting batches pile up in memory. The batch size grows
+ * while batches are acknowledged well within targetBatchMillis and shrinks when they take
+ * longer.
+ *
+ * @param cache local cache the keys are copied from
+ * @param config settings for the batches and streams
+ */
+class MigrationPipeline(private val cache: IScalableLocalCache, val config: MigrationConfig = MigrationConfig()) {
+
+    /**
+     * Logger for the copying process
+     */
+    private val logger = LogManager.getLogger(LogManager.SCALING)
+
+    /* Number of key and value bytes to read into the next batch */
+    private val batchBytes = AtomicLong(config.initialBatchBytes)
+
+    /* Totals of the keys sent by the latest copy */
+    private val stats = MigrationStats()
+
+    /**
+     * Copies all keys in the ranges to the destination node, blocking until every batch
+     * has been acknowledged and removed from the local cache. Stops reading once a batch
+     * fails, the keys of batches that were not delivered stay in the local cache.
+     *
+     * @param copyRanges integer hash value ranges whose keys must be copied
+     * @param destNodeId node id of the new node
+     * @param sender sender used to copy the batches
+     * @throws Throwable the first error that failed a batch
+     */
+    fun copy(copyRanges: List<Pair<Int, Int>>, destNodeId: NodeId, sender: IScalableSender) {
+        stats.start()
+        val ranges = ConcurrentLinkedQueue(copyRanges)
+        val inFlight = Semaphore(config.maxInFlightBatches)
+        val sends = Collections.synchronizedList(mutableListOf<CompletableFuture<Unit>>())
+        val failure = AtomicReference<Throwable>()
+
+        val streamCount = copyRanges.size.coerceIn(1, config.parallelStreams)
+        val executor = Executors.newFixedThreadPool(streamCount)
+        logger.info { "Copying ${copyRanges.size} ranges to node $destNodeId over $streamCount streams" }
+        try {
+            val readers = (0 until streamCount).map {
+                CompletableFuture.runAsync({
+                    while (failure.get() == null) {
+                        val copyRange = ranges.poll() ?: break
+                        streamRange(copyRange, destNodeId, sender, inFlight, sends, failure)
+                    }
+                }, executor)
+            }
+            CompletableFuture.allOf(*readers.toTypedArray()).join()
+            CompletableFuture.allOf(*sends.toTypedArray()).join()
+        } catch (e: CompletionException) {
+            failure.compareAndSet(null, e.cause ?: e)
+        } finally {
+            executor.shutdown()
+            stats.finish()
+        }
+
+        val info = stats.getTransferInfo()
+        logger.info { "Copied ${info.pairs} pairs in ${info.bytes} bytes at ${"%.2f".format(info.throughputMBps)} MB/s" }
+        failure.get()?.let { throw it }
+    }
+
+    /**
+     * Reads the range in batches, sending each one without waiting for the previous
+     * batches to be acknowledged.
+     */
+    private fun streamRange(
+        copyRange: Pair<Int, Int>,
+        destNodeId: NodeId,
+        sender: IScalableSender,
+        inFlight: Semaphore,
+        sends: MutableList<CompletableFuture<Unit>>,
+        failure: AtomicReference<Throwable>
+    ) {
+        val stream = cache.initializeCopy(copyRange)
+        while (failure.get() == null) {
+            // Wait for a free slot before reading, so unsent batches never build up
+            inFlight.acquire()
+            val kvPairs = stream.next(batchBytes.get())
+            if (kvPairs.isEmpty()) {
+                inFlight.release()
+                return
+            }
+
+            val byteCount = kvPairs.sumOf { BulkCopyCodec.recordSize(it).toLong() }
+            val sentAt = System.nanoTime()
+            sends.add(sender.sendBulkCopyAsync(kvPairs, destNodeId).whenComplete { _, e ->
+                inFlight.release()
+                if (e == null) {
+                    cache.cleanupCopyKeys(kvPairs)
+                    stats.record(kvPairs.size, byteCount)
+                    adaptBatchSize(byteCount, System.nanoTime() - sentAt)
+                } else {
+                    logger.error { "Failed to copy ${kvPairs.size} pairs to node $destNodeId" }
+                    failure.compareAndSet(null, if (e is CompletionException) e.cause ?: e else e)
+                }
+            })
+        }
+    }
+
+    /**
+     * Doubles the batch size if the batch was acknowledged in under half the target time
+     * and halves it if the batch took longer than the target.
+     */
+    private fun adaptBatchSize(byteCount: Long, elapsedNanos: Long) {
+        val elapsedMillis = elapsedNanos / 1_000_000
+        batchBytes.updateAndGet { current ->
+            when {
+                // The last batch of a range is cut short and says little about the link
+                byteCount < current / 2 -> current
+                elapsedMillis < config.targetBatchMillis / 2 -> minOf(current * 2, config.maxBatchBytes)
+                elapsedMillis > config.targetBatchMillis -> maxOf(current / 2, config.minBatchBytes)
+                else -> current
+            }
+        }
+    }
+
+    /**
+     * Number of key and value bytes read into each batch.
+     */
+    fun getBatchBytes(): Long {
+        return batchBytes.get()
+    }
+
+    /**
+     * Totals of the keys sent by the latest copy.
+     */
+    fun getTransferInfo(): TransferInfo {
+        return stats.getTransferInfo()
+    }
+}
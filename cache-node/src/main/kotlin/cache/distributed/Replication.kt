@@ -0,0 +1,163 @@
+package cache.distributed
+
+import KeyValuePair
+import KeyVersionPair
+import NodeId
+import sender.ISender
+import java.util.concurrent.CompletableFuture
+import java.util.concurrent.CompletionException
+import java.util.concurrent.ThreadLocalRandom
+
+/*
+ * Replication keeps each key on its primary node and the next R - 1 nodes. Writes go to
+ * the primary, which copies them to the other replicas over the replica endpoints before
+ * answering. Those endpoints only touch the local cache, so replication never loops.
+ * Reads are spread over all replicas. A replica can miss a key that its primary holds,
+ * for example after an eviction or a scale, so a replica miss is retried on the primary.
+ */
+
+/**
+ * Picks the node that serves a read of a replicated key. This node serves the read if
+ * it holds a copy. Otherwise a random replica does, so reads of a hot key spread over
+ * all of its copies.
+ *
+ * @param nodeId id of this node
+ * @param replicas nodes holding the key, starting with its primary node
+ * @return id of the node that should serve the read
+ */
+fun chooseReplica(nodeId: NodeId, replicas: List<NodeId>): NodeId {
+    return if (nodeId in replicas) nodeId else replicas[ThreadLocalRandom.current().nextInt(replicas.size)]
+}
+
+/**
+ * Fetches a key from the replica picked by chooseReplica. A miss or failure on a replica
+ * other than the primary is retried on the primary.
+ *
+ * @param nodeId id of this node
+ * @param replicas nodes holding the key, starting with its primary node
+ * @param kvPair the key-version pair to look up
+ * @param sender sender used to reach other nodes
+ * @param local looks the key up in this node's cache
+ * @return a future of the value, completed with KeyNotFoundException if the primary
+ * node misses
+ */
+fun fetchFromReplicas(
+    nodeId: NodeId,
+    replicas: List<NodeId>,
+    kvPair: KeyVersionPair,
+    sender: ISender,
+    local: () -> ByteArray?
+): CompletableFuture<ByteArray?> {
+    val primaryNodeId = replicas.first()
+    val readNodeId = chooseReplica(nodeId, replicas)
+
+    val read: CompletableFuture<ByteArray?> = when (readNodeId) {
+        nodeId -> CompletableFuture.completedFuture(local())
+        primaryNodeId -> sender.fetchFromNodeAsync(kvPair, primaryNodeId).thenApply<ByteArray?> { it }
+        else -> sender.fetchManyFromReplicaAsync(listOf(kvPair), readNodeId).thenApply<ByteArray?> {
+            it.firstOrNull()?.value
+        }
+    }
+    if (readNodeId == primaryNodeId) {
+        return read
+    }
+    return read.handle { value, _ -> value }.thenCompose<ByteArray?> { value ->
+        if (value != null) {
+            CompletableFuture.completedFuture<ByteArray?>(value)
+        } else {
+            sender.fetchFromNodeAsync(kvPair, primaryNodeId).thenApply<ByteArray?> { it }
+        }
+    }
+}
+
+/**
+ * Fetches many keys, reading each from the replica picked by chooseReplica. Batches are
+ * fetched in parallel, and keys missed on a replica other than their primary, including
+ * every key of a replica that failed, are then fetched from their primaries.
+ *
+ * @param nodeId id of this node
+ * @param kvPairs the key-version pairs to look up
+ * @param replicasOf finds the nodes holding a key, starting with its primary node
+ * @param sender sender used to reach other nodes
+ * @param local looks keys up in this node's cache
+ * @return the key-value pairs that were found, misses are omitted
+ */
+fun fetchManyFromReplicas(
+    nodeId: NodeId,
+    kvPairs: List<KeyVersionPair>,
+    replicasOf: (KeyVersionPair) -> List<NodeId>,
+    sender: ISender,
+    local: (List<KeyVersionPair>) -> List<KeyValuePair>
+): MutableList<KeyValuePair> {
+    val primaryNodeIds = HashMap<KeyVersionPair, NodeId>()
+    val batches = kvPairs.groupBy { kvPair ->
+        val replicas = replicasOf(kvPair)
+        primaryNodeIds[kvPair] = replicas.first()
+        chooseReplica(nodeId, replicas)
+    }
+
+    val found = fanOutByNode(nodeId, batches, local) { batch, destNodeId ->
+        if (batch.all { primaryNodeIds[it] == destNodeId }) {
+            sender.fetchManyFromNode(batch, destNodeId)
+        } else {
+            // A replica that fails counts as missing the whole batch, so the keys are
+            // fetched from their primaries below
+            sender.fetchManyFromReplicaAsync(batch, destNodeId)
+                .handle<MutableList<KeyValuePair>> { pairs, _ -> pairs ?: mutableListOf() }
+                .join()
+        }
+    }
+
+    val foundPairs = found.mapTo(HashSet()) { KeyVersionPair(it.key, it.version) }
+    val misses = batches.flatMap { (readNodeId, batch) ->
+        batch.filter { it !in foundPairs && primaryNodeIds[it] != readNodeId }
+    }
+    if (misses.isNotEmpty()) {
+        found.addAll(fanOutByNode(nodeId, misses.groupBy { primaryNodeIds[it]!! }, local) { batch, destNodeId ->
+            sender.fetchManyFromNode(batch, destNodeId)
+        })
+    }
+    return found
+}
+
+/**
+ * Copies pairs that this node stored as their primary to their other replicas, sending
+ * one batch to each replica node.
+ *
+ * @param nodeId id of this node
+ * @param kvPairs the key-value pairs stored on this node
+ * @param replicasOf finds the nodes holding a key, starting with its primary node
+ * @param sender sender used to reach other nodes
+ * @return a future completed once every replica has stored its batch
+ */
+fun replicateMany(
+    nodeId: NodeId,
+    kvPairs: List<KeyValuePair>,
+    replicasOf: (KeyVersionPair) -> List<NodeId>,
+    sender: ISender
+): CompletableFuture<Unit> {
+    val batches = HashMap<NodeId, MutableList<KeyValuePair>>()
+    for (kvPair in kvPairs) {
+        for (replicaNodeId in replicasOf(KeyVersionPair(kvPair.key, kvPair.version))) {
+            if (replicaNodeId != nodeId) {
+                batches.getOrPut(replicaNodeId) { mutableListOf() }.add(kvPair)
+            }
+        }
+    }
+    if (batches.isEmpty()) {
+        return CompletableFuture.completedFuture(Unit)
+    }
+    val acks = batches.map { (destNodeId, batch) -> sender.storeManyToReplicaAsync(batch, destNodeId) }
+    return CompletableFuture.allOf(*acks.toTypedArray()).thenApply { }
+}
+
+/**
+ * Waits for a future, rethrowing the CacheNodeException it failed with.
+ */
+fun <T> awaitReplicas(future: CompletableFuture<T>): T {
+    try {
+        return future.join()
+    } catch (e: CompletionException) {
+        throw e.cause ?: e
+    }
+}
@@ -1,6 +1,14 @@
+import cache.distributed.IDistributedCache.MigrationInfo
 import cache.distributed.IDistributedCache.SystemInfo
 import cache.distributed.IScalableDistributedCache
 import cache.distributed.ITestableDistributedCache
+import cache.distributed.MigrationPipeline
+import cache.distributed.MigrationStats
+import cache.distributed.awaitReplicas
+import cache.distributed.fanOutByNode
+import cache.distributed.fetchFromReplicas
+import cache.distributed.fetchManyFromReplicas
+import cache.distributed.replicateMany
 import cache.distributed.hasher.ConsistentKeyDistributor
 import cache.distributed.hasher.IKeyDistributor
 import cache.distributed.hasher.NodeHasher
@@ -9,22 +17,42 @@ import launcher.INodeLauncher
 import launcher.LocalNodeLauncher
 import cache.local.IScalableLocalCache
 import cache.local.ScalableLocalCache
+import cache.local.defaultMaxBytes
+import exception.KeyNotFoundException
+import exception.base.CacheNodeException
 import io.javalin.Javalin
+import logging.LogManager
 import receiver.IScalableReceiver
 import receiver.ScalableReceiver
 import sender.IScalableSender
 import sender.ScalableSender
+import sender.SenderConfig
 import java.util.*
+import java.util.concurrent.CompletableFuture
 import java.util.concurrent.atomic.AtomicInteger
 import java.util.concurrent.locks.ReentrantLock
 import java.util.concurrent.locks.ReentrantReadWriteLock
 
 /**
- * A concrete distributed cache that assigns keys to nodes using a NodeHasher.
+ * A concrete distributed cache that assigns keys to nodes using a NodeHasher. Each key
+ * is stored on the first replicationFactor distinct nodes of the ring, and reads only
+ * use the other replicas while no scale is in progress.
  */
-class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList: MutableList<String>, isAWS: Boolean, private var isNewNode: Boolean):
+class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList: MutableList<String>, isAWS: Boolean, private var isNewNode: Boolean,
+                               senderConfig: SenderConfig = SenderConfig(), cacheMaxBytes: Long = defaultMaxBytes,
+                               private val replicationFactor: Int = 1):
     IScalableDistributedCache, ITestableDistributedCache<IScalableSender> {
 
+    /**
+     * Logger for routing requests to nodes
+     */
+    private val logger = LogManager.getLogger(LogManager.DISTRIBUTED_CACHE)
+
+    /**
+     * Logger for the scaling process
+     */
+    private val scalingLogger = LogManager.getLogger(LogManager.SCALING)
+
     /**
      * Updated immediately once copying starts to support re-routing
      */
@@ -43,12 +71,14 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     /**
      * Supports launching a new node
      */
-    private var nodeLauncher = if (isAWS) AWSNodeLauncher() else LocalNodeLauncher()
+    private var nodeLauncher = if (isAWS) AWSNodeLauncher() else LocalNodeLauncher(
+        listOf("-m", cacheMaxBytes.toString(), "-r", replicationFactor.toString())
+    )
 
     /**
      * Local cache implementation
      */
-    private val cache: IScalableLocalCache = ScalableLocalCache(nodeHasher)
+    private val cache: IScalableLocalCache = ScalableLocalCache(nodeHasher, cacheMaxBytes)
 
     /**
      * Scalable receiver implementation
@@ -58,7 +88,7 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     /**
      * Module used to send all out-going messages
      */
-    private var sender: IScalableSender = ScalableSender(nodeId, nodeList)
+    private var sender: IScalableSender = ScalableSender(nodeId, nodeList, senderConfig)
 
     /**
      * Module used to determine how keys should be distributed across machines
@@ -97,9 +127,14 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     private var copyInProgress = false
 
     /**
-     * Number of key-value pairs copied in a single bulk-copy request
+     * Streams the keys that move to a new node
      */
-    private val copyBatchSize = 5
+    private val migrationPipeline = MigrationPipeline(cache)
+
+    /**
+     * Totals of the keys copied to this node if it was just booted
+     */
+    private val receivedMigration = MigrationStats()
 
     /**
      * Used by a newly booted node to track which other nodes have completed copying, not atomic
@@ -118,7 +153,7 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     private var redistributeLock = ReentrantReadWriteLock()
 
     override fun start(port: Int) {
-        print("SCALABLE CACHE: Started with is new node $isNewNode\n")
+        scalingLogger.info { "Started with is new node $isNewNode" }
         receiver.start(port)
         if (isNewNode) {
             Thread {
@@ -134,32 +169,26 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     }
 
     override fun fetch(kvPair: KeyVersionPair): ByteArray? {
+        return awaitReplicas(fetchAsync(kvPair))
+    }
 
-        val nodeIds = keyDistributor.getPrimaryAndPrevNode(kvPair)
-        val primaryNodeId = nodeIds.first
-        val prevNodeId = nodeIds.second
-
-        print("SCALABLE CACHE: Primary node id is $primaryNodeId\n")
-
-        return if (!copyInProgress || primaryNodeId != nodeCount - 1 || nodeId != prevNodeId) {
-            // Normal case
-            print("SCALABLE CACHE: Fetch entered normal case\n")
-            if (nodeId == primaryNodeId) cache.fetch(kvPair) else sender.fetchFromNode(
-                kvPair,
-                primaryNodeId
-            )
-        } else {
-            // This key is being copied to new node, check both locations
-            print("SCALABLE CACHE: Fetch entered copy case\n")
-            cache.fetch(kvPair) ?: sender.fetchFromNode(kvPair, primaryNodeId)
+    override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+        if (storePrimary(kvPair, value)) {
+            awaitReplicas(replicateMany(nodeId, listOf(KeyValuePair(kvPair.key, kvPair.version, value)), this::replicasOf, sender))
         }
     }
 
-    override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+    /**
+     * Stores a pair to its primary node, holding the redistribution lock while storing
+     * locally so the pair cannot evade copying.
+     *
+     * @return whether the pair was stored on this node
+     */
+    private fun storePrimary(kvPair: KeyVersionPair, value: ByteArray): Boolean {
 
         val initPrimaryNodeId = keyDistributor.getPrimaryNode(kvPair)
 
-        print("SCALABLE CACHE: Primary node id is $initPrimaryNodeId\n")
+        logger.debug { "Primary node id is $initPrimaryNodeId" }
 
         val primaryNodeId: NodeId = if (nodeId == initPrimaryNodeId) {
             // Ensure that this doesn't evade copying and store to previous node
@@ -171,12 +200,12 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
         }
 
         if (nodeId == primaryNodeId) {
-            print("SCALABLE CACHE: Store entered local case\n")
+            logger.debug { "Store entered local case" }
             // Always store to new location, even during copying
             cache.store(kvPair, value)
 
         } else {
-            print("SCALABLE CACHE: Store entered remote case\n")
+            logger.debug { "Store entered remote case" }
             sender.storeToNode(
                 kvPair,
                 value,
@@ -188,6 +217,112 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
             // Release the previously acquired lock
             redistributeLock.readLock().unlock()
         }
+        return nodeId == primaryNodeId
+    }
+
+    override fun fetchAsync(kvPair: KeyVersionPair): CompletableFuture<ByteArray?> {
+        val (primaryNodeId, prevNodeId) = keyDistributor.getPrimaryAndPrevNode(kvPair)
+
+        logger.debug { "Primary node id is $primaryNodeId" }
+
+        if (copyInProgress && primaryNodeId == nodeCount - 1 && nodeId == prevNodeId) {
+            // This key is being copied to new node, check both locations
+            logger.debug { "Fetch entered copy case" }
+            return cache.fetch(kvPair)?.let { CompletableFuture.completedFuture<ByteArray?>(it) }
+                ?: sender.fetchFromNodeAsync(kvPair, primaryNodeId).thenApply { it }
+        }
+
+        // Normal case, replicas may be missing keys while the ring changes
+        logger.debug { "Fetch entered normal case" }
+        val replicas = if (scaleInProgress) listOf(primaryNodeId) else replicasOf(kvPair)
+        return fetchFromReplicas(nodeId, replicas, kvPair, sender) { cache.fetch(kvPair) }
+    }
+
+    override fun storeAsync(kvPair: KeyVersionPair, value: ByteArray): CompletableFuture<Unit> {
+        val primaryNodeId = keyDistributor.getPrimaryNode(kvPair)
+
+        if (nodeId == primaryNodeId) {
+            // Local stores take the redistribute lock, which has to be released by the same
+            // thread, so they stay synchronous
+            store(kvPair, value)
+            return CompletableFuture.completedFuture(Unit)
+        }
+        logger.debug { "Store entered remote case" }
+        return sender.storeToNodeAsync(kvPair, value, primaryNodeId)
+    }
+
+    override fun fetchMany(kvPairs: List<KeyVersionPair>, isClientRequest: Boolean): MutableList<KeyValuePair> {
+        if (!isClientRequest) {
+            return fetchManyLocal(kvPairs)
+        }
+        if (!scaleInProgress && !copyInProgress) {
+            return fetchManyFromReplicas(nodeId, kvPairs, this::replicasOf, sender) { batch -> fetchReplicas(batch) }
+        }
+        return fanOutByNode(
+            nodeId,
+            kvPairs.groupBy { kvPair ->
+                val (primaryNodeId, prevNodeId) = keyDistributor.getPrimaryAndPrevNode(kvPair)
+                // Keys being copied to the new node are fetched here, checking both locations
+                if (copyInProgress && primaryNodeId == nodeCount - 1 && nodeId == prevNodeId) nodeId else primaryNodeId
+            },
+            { batch -> fetchManyLocal(batch) },
+            { batch, destNodeId -> sender.fetchManyFromNode(batch, destNodeId) }
+        )
+    }
+
+    override fun storeMany(kvPairs: List<KeyValuePair>, isClientRequest: Boolean) {
+        if (!isClientRequest) {
+            storeManyLocal(kvPairs)
+            return
+        }
+        fanOutByNode(
+            nodeId,
+            kvPairs.groupBy { keyDistributor.getPrimaryNode(KeyVersionPair(it.key, it.version)) },
+            { batch -> storeManyLocal(batch) },
+            { batch, destNodeId -> sender.storeManyToNode(batch, destNodeId); listOf<Unit>() }
+        )
+    }
+
+    /**
+     * Fetches each pair through the single-key path, which re-routes keys whose primary
+     * node changed and handles keys that are being copied.
+     */
+    private fun fetchManyLocal(kvPairs: List<KeyVersionPair>): MutableList<KeyValuePair> {
+        return kvPairs.mapNotNullTo(mutableListOf()) { kvPair ->
+            try {
+                fetch(kvPair)?.let { KeyValuePair(kvPair.key, kvPair.version, it) }
+            } catch (e: KeyNotFoundException) {
+                null
+            }
+        }
+    }
+
+    /**
+     * Stores each pair through the single-key path, which holds the redistribution lock
+     * while storing locally, then copies the pairs stored here to their replicas.
+     */
+    private fun storeManyLocal(kvPairs: List<KeyValuePair>): List<Unit> {
+        val storedLocally = kvPairs.filter { kvPair ->
+            storePrimary(KeyVersionPair(kvPair.key, kvPair.version), kvPair.value)
+        }
+        awaitReplicas(replicateMany(nodeId, storedLocally, this::replicasOf, sender))
+        return listOf()
+    }
+
+    override fun fetchReplicas(kvPairs: List<KeyVersionPair>): MutableList<KeyValuePair> {
+        return kvPairs.mapNotNullTo(mutableListOf()) { kvPair ->
+            cache.fetch(kvPair)?.let { KeyValuePair(kvPair.key, kvPair.version, it) }
+        }
+    }
+
+    override fun storeReplicas(kvPairs: List<KeyValuePair>) {
+        for (kvPair in kvPairs) {
+            cache.store(KeyVersionPair(kvPair.key, kvPair.version), kvPair.value)
+        }
+    }
+
+    private fun replicasOf(kvPair: KeyVersionPair): List<NodeId> {
+        return keyDistributor.getReplicaNodes(kvPair, replicationFactor)
     }
 
     override fun clearAll(isClientRequest: Boolean) {
@@ -214,7 +349,14 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
             receiver.getReceiverUsageInfo(),
             sender.getSenderUsageInfo(),
             receiver.getClientRequestTiming(),
-            receiver.getServerRequestTiming()
+            receiver.getServerRequestTiming(),
+            MigrationInfo(
+                migrationPipeline.getTransferInfo(),
+                receivedMigration.getTransferInfo(),
+                migrationPipeline.getBatchBytes(),
+                scaleInProgress
+            ),
+            receiver.getRequestLatencies()
         )
     }
 
@@ -258,7 +400,7 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     }
 
     override fun initiateLaunch() {
-        print("SCALABLE CACHE: Received request to initiate node launch\n")
+        scalingLogger.info { "Received request to initiate node launch" }
         launchNodeLock.lock()
         if (minLaunchingNode != nodeCount) {
             launchNodeLock.unlock()
@@ -277,7 +419,7 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
         desireToLaunch = true
         launchNodeLock.unlock()
 
-        print("SCALABLE CACHE: Node list is $nodeList\n")
+        scalingLogger.info { "Node list is $nodeList" }
         // Broadcast launch intentions to all other nodes (should be async)
         Thread {
             sender.broadcastScalableMessageAsync(
@@ -288,24 +430,25 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
                 )
             )
         }.start()
-        print("SCALABLE CACHE: Created and running broadcast thread\n")
+        scalingLogger.info { "Created and running broadcast thread" }
 
         // If this node has minimum node id, launch new node
         launchTimer.schedule(object : TimerTask() {
             override fun run() {
-                print("SCALABLE SENDER: Launching new node\n")
+                scalingLogger.info { "Launching new node" }
                 nodeLauncher.launchNode(nodeCount)
             }
         }, 2 * 1000)
     }
 
     override fun markCopyComplete(senderId: NodeId): Boolean {
-        print("SCALABLE CACHE: Marking that node $senderId has completed copying\n")
+        scalingLogger.info { "Marking that node $senderId has completed copying" }
         if (!copyComplete[senderId]) {
             copyComplete[senderId] = true
 
             if (copyCompleteCount.incrementAndGet() == prevNodeCount) {
-                print("SCALABLE CACHE: Going to broadcast SCALE_COMPLETE message\n")
+                receivedMigration.finish()
+                scalingLogger.info { "Going to broadcast SCALE_COMPLETE message" }
                 Thread {
                     sender.broadcastScalableMessageAsync(
                         ScalableMessage(
@@ -323,14 +466,15 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     }
 
     override fun bulkLocalStore(kvPairs: MutableList<KeyValuePair>) {
-        print("SCALABLE CACHE: Completing bulk local store with ${kvPairs.size} pairs\n")
+        scalingLogger.debug { "Completing bulk local store with ${kvPairs.size} pairs" }
         for (kvPair in kvPairs) {
             cache.store(KeyVersionPair(kvPair.key, kvPair.version), kvPair.value)
         }
+        receivedMigration.record(kvPairs.size, kvPairs.sumOf { BulkCopyCodec.recordSize(it).toLong() })
     }
 
     override fun initiateCopy(newHostName: String) {
-        print("SCALABLE CACHE: Beginning copying process\n")
+        scalingLogger.info { "Beginning copying process" }
         if (!copyInProgress) {
 
             // Update state to reflect new node
@@ -349,24 +493,39 @@ class ScalableDistributedCache(private val nodeId: NodeId, private var nodeList:
     }
 
     private fun copyKeysByHashValues(copyRanges: MutableList<Pair<Int, Int>>) {
-        cache.initializeCopy(copyRanges)
-        var kvPairs: MutableList<KeyValuePair>
-        do {
-            kvPairs = cache.streamCopyKeys(copyBatchSize)
-            print("SCALABLE CACHE: Got ${kvPairs.size} key value pairs from stream\n")
-            if (kvPairs.size > 0) {
-                sender.sendBulkCopy(BulkCopyRequest(nodeId, kvPairs), nodeCount - 1)
-                cache.cleanupCopyKeys()
+        val newNodeId = nodeCount - 1
+        val config = migrationPipeline.config
+        var delayMillis = config.retryDelayMillis
+        for (attempt in 1..config.copyAttempts) {
+            try {
+                // Delivered keys were removed from this node, so a retry only sends the rest
+                migrationPipeline.copy(copyRanges, newNodeId, sender)
+                break
+            } catch (e: Exception) {
+                scalingLogger.error { "Copying to node $newNodeId failed (attempt $attempt/${config.copyAttempts}): ${e.message}" }
+                if (attempt < config.copyAttempts) {
+                    Thread.sleep(delayMillis)
+                    delayMillis *= 2
+                }
             }
-        } while (kvPairs.size == copyBatchSize)
-        sender.sendScalableMessage(
-            ScalableMessage(
-                nodeId,
-                "",
-                ScalableMessageType.COPY_COMPLETE
-            ), nodeCount - 1
-        )
-        copyInProgress = false
+        }
+
+        // Report completion even if the copy gave up, the keys left here then miss on the
+        // new node, but it finishes joining and the cluster leaves the scaling state
+        try {
+            sender.sendScalableMessage(
+                ScalableMessage(
+                    nodeId,
+                    "",
+                    ScalableMessageType.COPY_COMPLETE
+                ), newNodeId
+            )
+        } catch (e: CacheNodeException) {
+            scalingLogger.error { "Node $newNodeId did not accept COPY_COMPLETE: ${e.message}" }
+            handleScaleCompleteRequest()
+        } finally {
+            copyInProgress = false
+        }
     }
 
     override fun mockSender(mockSender: IScalableSender) {
@@ -2,6 +2,7 @@ package cache.distributed.hasher
 
 import KeyVersionPair
 import NodeId
+import logging.LogManager
 import java.util.*
 
 /**
@@ -13,6 +14,11 @@ class ConsistentKeyDistributor(
     private val pointsPerNode: Int = 25
 ): IKeyDistributor {
 
+    /**
+     * Logger for changes to the key distribution
+     */
+    private val logger = LogManager.getLogger(LogManager.SCALING)
+
     private var sortedNodes: SortedMap<Int, Int> = Collections.synchronizedSortedMap(
         TreeMap()
     )
@@ -55,8 +61,28 @@ class ConsistentKeyDistributor(
        return Pair(primaryNodeId, prevNodeId)
     }
 
+    override fun getReplicaNodes(kvPair: KeyVersionPair, count: Int): List<NodeId> {
+        val hashValue = nodeHasher.primaryHashValue(kvPair)
+        val replicas = mutableListOf<NodeId>()
+
+        // Iterating over the views of a synchronized map must hold its lock
+        synchronized(sortedNodes) {
+            val ring = sortedNodes.tailMap(hashValue).values.asSequence() +
+                    sortedNodes.headMap(hashValue).values.asSequence()
+            for (nodeId in ring) {
+                if (replicas.size == count) {
+                    break
+                }
+                if (nodeId !in replicas) {
+                    replicas.add(nodeId)
+                }
+            }
+        }
+        return replicas
+    }
+
     override fun addNode(): MutableList<Pair<Int, Int>> {
-        print("CONSISTENT DISTRIBUTOR: Beginning copying process\n")
+        logger.info { "Beginning copying process" }
 
         // Add hash values of new node to the circle
         var hashValue: Int
@@ -76,7 +102,7 @@ class ConsistentKeyDistributor(
         // Update the node count
         nodeCount++
 
-        print("CONSISTENT DISTRIBUTOR: Added points for new node\n");
+        logger.info { "Added points for new node" }
         printSortedNodes()
 
         // Return range of hash values to be copied
@@ -91,9 +117,9 @@ class ConsistentKeyDistributor(
     }
 
     private fun printSortedNodes() {
-        print("There are ${sortedNodes.size} sorted nodes\n")
+        logger.debug { "There are ${sortedNodes.size} sorted nodes" }
         for (pair in sortedNodes.asIterable()) {
-            print("Hash value ${pair.key} and node id ${pair.value}\n")
+            logger.debug { "Hash value ${pair.key} and node id ${pair.value}" }
         }
     }
 }
\ No newline at end of file
@@ -25,6 +25,16 @@ interface IKeyDistributor {
      */
     fun getPrimaryAndPrevNode(kvPair: KeyVersionPair): Pair<NodeId, NodeId>
 
+    /**
+     * Gets the nodes that store copies of the given key-value pair, which are the first
+     * distinct nodes found walking the ring from the primary node.
+     *
+     * @param kvPair key-value pair
+     * @param count number of copies, capped at the number of nodes
+     * @return the node ids storing the pair, starting with the primary node
+     */
+    fun getReplicaNodes(kvPair: KeyVersionPair, count: Int): List<NodeId>
+
     /**
      * Updates key distribution following node addition and returns the ranges of
      * hash values that must be copied.
@@ -42,4 +42,14 @@ interface INodeHasher {
      */
     fun primaryHashNode(kvPair: KeyVersionPair): NodeId
 
+    /**
+     * Finds the nodes that hold copies of a given key-version pair, which are the
+     * designated node followed by the next node ids, wrapping around.
+     *
+     * @param kvPair The key version pair
+     * @param count The number of copies, capped at the number of nodes
+     * @return The IDs of the nodes holding the pair, starting with the designated node
+     */
+    fun replicaHashNodes(kvPair: KeyVersionPair, count: Int): List<NodeId>
+
 }
\ No newline at end of file
@@ -27,4 +27,9 @@ class NodeHasher(private val nodeCount: Int, private val seed: Int = 0) : INodeH
         return ((primaryHashValue(kvPair) % nodeCount) + nodeCount) % nodeCount
     }
 
+    override fun replicaHashNodes(kvPair: KeyVersionPair, count: Int): List<NodeId> {
+        val primaryNodeId = primaryHashNode(kvPair)
+        return (0 until minOf(count, nodeCount)).map { (primaryNodeId + it) % nodeCount }
+    }
+
 }
\ No newline at end of file
@@ -0,0 +1,69 @@
+package cache.local
+
+import KeyVersionPair
+import java.util.concurrent.ConcurrentSkipListSet
+
+/**
+ * Index of the cached keys ordered by hash value, used to find the keys that move to a
+ * new node. Entries are ordered by (hash, key, version), so keys with the same hash value
+ * and different versions of a key are all kept. Range scans take O(log n + k) and do not
+ * block concurrent stores.
+ */
+class HashRangeIndex {
+
+    /**
+     * A key and its hash value. A null key stands for the position after every key with
+     * the hash value, and is only used as a bound for range scans.
+     */
+    private class Entry(val hash: Int, val kvPair: KeyVersionPair?) : Comparable<Entry> {
+        override fun compareTo(other: Entry): Int {
+            if (hash != other.hash) {
+                return hash.compareTo(other.hash)
+            }
+            if (kvPair == null || other.kvPair == null) {
+                return (if (kvPair == null) 1 else 0) - (if (other.kvPair == null) 1 else 0)
+            }
+            val keyOrder = kvPair.key.compareTo(other.kvPair.key)
+            return if (keyOrder != 0) keyOrder else kvPair.version.compareTo(other.kvPair.version)
+        }
+    }
+
+    private val entries = ConcurrentSkipListSet<Entry>()
+
+    fun add(hash: Int, kvPair: KeyVersionPair) {
+        entries.add(Entry(hash, kvPair))
+    }
+
+    fun remove(hash: Int, kvPair: KeyVersionPair) {
+        entries.remove(Entry(hash, kvPair))
+    }
+
+    /**
+     * Finds the keys with hash values in (first, second], the hash values a ring point at
+     * second takes over from the point at first. The range wraps around if first is not
+     * less than second, so equal bounds cover every key.
+     */
+    fun range(first: Int, second: Int): MutableList<KeyVersionPair> {
+        val lower = Entry(first, null)
+        val upper = Entry(second, null)
+        val kvPairs = mutableListOf<KeyVersionPair>()
+        if (first < second) {
+            entries.subSet(lower, false, upper, false).mapTo(kvPairs) { it.kvPair!! }
+        } else {
+            entries.tailSet(lower, false).mapTo(kvPairs) { it.kvPair!! }
+            entries.headSet(upper, false).mapTo(kvPairs) { it.kvPair!! }
+        }
+        return kvPairs
+    }
+
+    /**
+     * Counts the indexed keys, which takes O(n).
+     */
+    fun size(): Int {
+        return entries.size
+    }
+
+    fun clear() {
+        entries.clear()
+    }
+}
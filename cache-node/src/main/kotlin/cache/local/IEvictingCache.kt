@@ -8,12 +8,12 @@ import cache.distributed.IDistributedCache
 interface IEvictingCache : ILocalCache {
 
     /**
-     * Returns JVM memory usage and updates respective LocalEvictingCache attributes
+     * Returns the bytes used by the cache out of its byte budget
      */
     fun fetchJVMUsage(): IDistributedCache.MemoryUsageInfo
 
     /**
-     * Monitors the current JVM memory usage and considers eviction accordingly.
+     * Checks the bytes used by the cache and evicts entries until it is within its byte budget.
      */
     fun monitorMemoryUsage()
 
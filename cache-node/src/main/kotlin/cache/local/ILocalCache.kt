@@ -1,5 +1,6 @@
 package cache.local
 
+import KeyVersionPair
 import cache.ICache
 import com.fasterxml.jackson.annotation.JsonProperty
 
@@ -15,6 +16,28 @@ interface ILocalCache: ICache {
 
 }
 
+/**
+ * Estimated JVM bytes used by a cached entry besides its key and value: the map entry,
+ * the KeyVersionPair and String objects and the array headers.
+ */
+const val entryOverheadBytes = 96
+
+/**
+ * Default byte budget of a local cache, half of the JVM's maximum heap.
+ */
+val defaultMaxBytes: Long = Runtime.getRuntime().maxMemory() / 2
+
+/**
+ * Returns the bytes an entry counts against the byte budget of a local cache.
+ *
+ * @param kvPair key-version pair of the entry
+ * @param value value of the entry
+ * @return accounted size of the entry, including its per-entry overhead
+ */
+fun accountedSize(kvPair: KeyVersionPair, value: ByteArray): Long {
+    return (kvPair.key.length + 4 + value.size + entryOverheadBytes).toLong()
+}
+
 /**
  * Given the cache info of two different caches, returns the combined cache info.
  *
@@ -24,10 +47,21 @@ interface ILocalCache: ICache {
  */
 fun aggregateTableInfo(info1: CacheInfo, info2: CacheInfo): CacheInfo {
     return CacheInfo(info1.totalKeys + info2.totalKeys,
-        info1.memorySize + info2.memorySize)
+        info1.memorySize + info2.memorySize,
+        info1.usedBytes + info2.usedBytes,
+        info1.maxBytes + info2.maxBytes,
+        info1.evictions + info2.evictions)
 }
 
+/**
+ * Size of a local cache. memorySize counts key and value bytes, while usedBytes also
+ * counts the per-entry overhead and is what is held under the maxBytes budget.
+ * evictions counts the keys evicted to stay within the budget so far.
+ */
 data class CacheInfo(
     @JsonProperty("totalKeys") val totalKeys: Int,
-    @JsonProperty("memorySize") val memorySize: Int
+    @JsonProperty("memorySize") val memorySize: Int,
+    @JsonProperty("usedBytes") val usedBytes: Long = 0,
+    @JsonProperty("maxBytes") val maxBytes: Long = 0,
+    @JsonProperty("evictions") val evictions: Long = 0
 )
\ No newline at end of file
@@ -8,24 +8,37 @@ import KeyValuePair
 interface IScalableLocalCache: IEvictingCache {
 
     /**
-     * Initializes the set of keys that must be copied as all locally stored keys having
-     * hash values in one of the given integer ranges.
+     * Initializes a stream over all locally stored keys having hash values in the given
+     * integer range (first, second], which wraps around if first is not less than second,
+     * matching the hash values a new ring point at second takes over. Streams over
+     * different ranges may be read in parallel, but each stream must only be read by one
+     * thread at a time.
      *
-     * @param copyRanges integer hash value ranges specifying which keys must be copied
+     * @param copyRange integer hash value range specifying which keys must be copied
+     * @return stream of the key-value pairs to be copied
      */
-    fun initializeCopy(copyRanges: MutableList<Pair<Int, Int>>)
+    fun initializeCopy(copyRange: Pair<Int, Int>): ICopyStream
 
     /**
-     * Streams the next count key-value pairs to be copied from the local cache. The
-     * copying process must first have been initialized.
+     * Removes key-value pairs that have been copied to another node.
      *
-     * @param count number of keys to send in next copy request
-     * @return list of key-value pairs to be copied with size count or less.
+     * @param kvPairs key-value pairs the other node has stored
      */
-    fun streamCopyKeys(count: Int): MutableList<KeyValuePair>
+    fun cleanupCopyKeys(kvPairs: List<KeyValuePair>)
 
     /**
-     * Cleans up the copying process.
+     * A stream of the key-value pairs in one hash value range that must be copied.
      */
-    fun cleanupCopyKeys()
-}
\ No newline at end of file
+    interface ICopyStream {
+
+        /**
+         * Streams the next key-value pairs to be copied, stopping once the keys and
+         * values streamed reach the given number of bytes. A batch holds at least one
+         * pair, so it may go over the limit by up to one pair.
+         *
+         * @param maxBytes number of key and value bytes to stream in the batch
+         * @return list of key-value pairs to be copied, empty once the range is exhausted
+         */
+        fun next(maxBytes: Long): MutableList<KeyValuePair>
+    }
+}
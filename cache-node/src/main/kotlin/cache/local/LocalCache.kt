@@ -3,44 +3,62 @@ package cache.local
 import KeyVersionPair
 import exception.CacheFullException
 import exception.KeyNotFoundException
+import logging.LogManager
 import java.util.concurrent.ConcurrentHashMap
 import java.util.concurrent.atomic.AtomicInteger
+import java.util.concurrent.atomic.AtomicLong
 
 /**
- * A concrete local cache that stores data in a ConcurrentHashMap.
+ * A concrete local cache that stores data in a ConcurrentHashMap. It does not evict,
+ * so stores that would take it over its byte budget are rejected.
+ *
+ * @param maxBytes byte budget of the cache, including the per-entry overhead
  */
-class LocalCache(private var maxCapacity: Int = 100) : ILocalCache {
+class LocalCache(private val maxBytes: Long = defaultMaxBytes) : ILocalCache {
 
-    private val cache: ConcurrentHashMap<KeyVersionPair, ByteArray> = ConcurrentHashMap<KeyVersionPair, ByteArray>(maxCapacity)
+    /**
+     * Logger for local cache operations
+     */
+    private val logger = LogManager.getLogger(LogManager.LOCAL_CACHE)
+
+    private val cache: ConcurrentHashMap<KeyVersionPair, ByteArray> = ConcurrentHashMap<KeyVersionPair, ByteArray>()
 
     /* Store the total size of key and value bytes. Note that HashMap's auxiliary objects are not counted */
     private var kvByteSize = AtomicInteger(0)
 
+    /* The bytes counted against the budget, including the per-entry overhead */
+    private var usedBytes = AtomicLong(0)
+
     override fun fetch(kvPair: KeyVersionPair): ByteArray? {
-        print("LOCAL CACHE: Attempting to fetch ${kvPair.key}\n")
+        logger.debug { "Attempting to fetch ${kvPair.key}" }
         return cache[kvPair]
     }
     override fun store(kvPair: KeyVersionPair, value: ByteArray) {
-        print("LOCAL CACHE: Attempting to store (${kvPair.key}, $value)\n")
-        if (cache.size >= maxCapacity) {
-            print("CACHE: Full\n")
-            throw CacheFullException()
+        logger.trace { "Attempting to store ${kvPair.key} with ${value.size} bytes" }
+        val size = accountedSize(kvPair, value)
+
+        // The budget is checked while holding the key's bin, so an overwrite is accounted once
+        cache.compute(kvPair) { _, prevVal ->
+            val sizeChange = size - (if (prevVal == null) 0 else accountedSize(kvPair, prevVal))
+            if (usedBytes.addAndGet(sizeChange) > maxBytes) {
+                usedBytes.addAndGet(-sizeChange)
+                logger.debug { "Cache full" }
+                throw CacheFullException()
+            }
+            kvByteSize.addAndGet((sizeChange - if (prevVal == null) entryOverheadBytes else 0).toInt())
+            value
         }
-        print("LOCAL CACHE: Success\n")
-        val prevVal = cache[kvPair]
-        val prevKvByteSize = if (prevVal == null) 0 else (prevVal.size + kvPair.key.length + 4)
-        kvByteSize.set(
-            kvByteSize.addAndGet((value.size + kvPair.key.length + 4) - prevKvByteSize))
-        cache[kvPair] = value
+        logger.debug { "Stored ${kvPair.key}" }
     }
 
     override fun clearAll(isClientRequest: Boolean) {
         cache.clear()
         kvByteSize = AtomicInteger(0)
+        usedBytes = AtomicLong(0)
     }
 
     override fun getCacheInfo(): CacheInfo {
-        return CacheInfo(cache.size, kvByteSize.get())
+        return CacheInfo(cache.size, kvByteSize.get(), usedBytes.get(), maxBytes)
     }
 }
 
@@ -5,256 +5,227 @@ import KeyVersionPair
 import cache.distributed.IDistributedCache
 import cache.distributed.hasher.INodeHasher
 import exception.CacheFullException
+import logging.LogManager
 import java.util.*
-import java.util.concurrent.ConcurrentHashMap
-import java.util.concurrent.ConcurrentLinkedQueue
-import java.util.concurrent.Executors
-import java.util.concurrent.TimeUnit
+import java.util.concurrent.atomic.AtomicInteger
+import java.util.concurrent.atomic.AtomicLong
 
 /**
- * A concrete local cache that stores data in a ConcurrentHashMap.
+ * A concrete local cache that stores data in lock-striped LinkedHashMaps and evicts the
+ * least recently used keys whenever a store takes it over its byte budget.
+ *
+ * @param maxBytes byte budget of the cache, including the per-entry overhead
  */
-class ScalableLocalCache(private var nodeHasher: INodeHasher, private var maxCapacity: Int = 100) : IScalableLocalCache {
+class ScalableLocalCache(
+    private var nodeHasher: INodeHasher,
+    private val maxBytes: Long = defaultMaxBytes
+) : IScalableLocalCache {
 
-    /* A process-safe concurrent hash map that is used to store LRU payload-containing node references */
-    private var cache: ConcurrentHashMap<KeyVersionPair, LRUNode> = ConcurrentHashMap<KeyVersionPair, LRUNode>(maxCapacity)
-
-    /* The LRU queue */
-    private var lruCache: ConcurrentLinkedQueue<LRUNode>
-
-    /* Store the total size of key and value bytes. Note that HashMap's auxiliary objects are not counted */
-    private var kvByteSize: Int = 0
-
-    /* The JVM runtime */
-    private var runtime: Runtime = Runtime.getRuntime()
-
-    /* The current amount of memory (bytes) the cache is storing */
-    private var usedMemory: Long = 0
-
-    /* The maximum memory capacity (bytes) allotted to the JVM */
-    private var maxMemory: Long = runtime.maxMemory()
+    /**
+     * Logger for local cache operations
+     */
+    private val logger = LogManager.getLogger(LogManager.LOCAL_CACHE)
 
-    /* The utilization threshold for the JVM */
-    private var memoryUtilizationLimit: Float = 0.8F
+    /**
+     * Logger for copying keys while scaling
+     */
+    private val scalingLogger = LogManager.getLogger(LogManager.SCALING)
 
-    /* Sorted hash values of all keys in the cache */
-    private var sortedLocalKeys: SortedMap<Int, KeyVersionPair> = Collections.synchronizedSortedMap(
-        TreeMap()
-    )
+    /* The number of independently locked stripes of the LRU index */
+    private val stripeCount = 64
 
-    /* List of hash values to copy */
-    private var copyHashes = mutableListOf<Int>()
+    /**
+     * The LRU index split into stripes, each guarded by its own lock. A stripe's
+     * LinkedHashMap keeps its entries in access order, so a hit moves the entry to the
+     * tail and the stripe's eldest entry is its least recently used, both in O(1).
+     */
+    @Volatile
+    private var lruStripes = newStripes()
 
-    /* Key value pair copy streaming index */
-    private var copyIndex = 0
+    /* Orders accesses across stripes, each store or fetch takes the next tick */
+    private val accessClock = AtomicLong(0)
 
-    /* Previous Key value pair copy streaming index */
-    private var prevCopyIndex = 0
+    /* Store the total size of key and value bytes. Note that HashMap's auxiliary objects are not counted */
+    private val kvByteSize = AtomicInteger(0)
 
+    /* The bytes counted against the budget, including the per-entry overhead */
+    private val usedBytes = AtomicLong(0)
 
-    init {
-        lruCache = ConcurrentLinkedQueue<LRUNode>()
+    /* The number of nodes evicted to stay within the budget */
+    private val evictions = AtomicLong(0)
 
-        Executors.newSingleThreadScheduledExecutor().scheduleAtFixedRate({
-            monitorMemoryUsage()
-        }, 0, 2, TimeUnit.SECONDS)
-    }
+    /* All keys in the cache ordered by hash value, used to find the keys to copy */
+    private val hashIndex = HashRangeIndex()
 
     override fun fetch(kvPair: KeyVersionPair): ByteArray? {
-        print("LOCAL CACHE: Attempting to fetch ${kvPair.key}\n")
-        val nullableNode: LRUNode? = cache[kvPair]
-        if (nullableNode != null) {
-            print("LOCAL CACHE: Found value ${cache[kvPair]}\n")
-            val node: LRUNode = nullableNode
-            remove(node)
-            insert(node)
+        logger.debug { "Attempting to fetch ${kvPair.key}" }
+        val stripe = stripeFor(kvPair)
+        val node = synchronized(stripe) { stripe[kvPair] }
+        if (node != null) {
+            logger.trace { "Found ${kvPair.key}" }
+            node.lastAccess = accessClock.incrementAndGet()
             return node.value
         }
-        print("LOCAL CACHE: Key not found\n")
+        logger.debug { "Key not found" }
         return null
     }
 
     override fun store(kvPair: KeyVersionPair, value: ByteArray) {
-        print("LOCAL CACHE: Attempting to store (${kvPair.key}, $value)\n")
+        logger.trace { "Attempting to store ${kvPair.key} with ${value.size} bytes" }
 
-        if (isFull()) {
-            print("LOCAL CACHE: Cache full, unable to store (${kvPair.key}, $value)\n")
+        val newNode = LRUNode(kvPair, value)
+        if (newNode.size > maxBytes) {
+            logger.debug { "Cache full, unable to store ${kvPair.key}" }
             throw CacheFullException()
         }
-
-        val hashValue = nodeHasher.primaryHashValue(kvPair)
-        val prevVal = cache[kvPair]?.value
-        val prevKvByteSize = if (prevVal == null) 0 else (prevVal.size + kvPair.key.length + 4)
-        kvByteSize += (value.size + kvPair.key.length + 4) - prevKvByteSize
-
-        val nullableOldNode: LRUNode? = cache[kvPair]
-        if (nullableOldNode != null) {
-            remove(nullableOldNode)
+        newNode.lastAccess = accessClock.incrementAndGet()
+        val stripe = stripeFor(kvPair)
+        val oldNode = synchronized(stripe) {
+            val oldNode = stripe.put(kvPair, newNode)
+            hashIndex.add(nodeHasher.primaryHashValue(kvPair), kvPair)
+            oldNode
         }
 
-        val newNode = LRUNode(kvPair, value)
-        cache[kvPair] = newNode
-        insert(newNode)
-        sortedLocalKeys[hashValue] = kvPair
+        kvByteSize.addAndGet((newNode.kvSize - (oldNode?.kvSize ?: 0)).toInt())
+        usedBytes.addAndGet(newNode.size - (oldNode?.size ?: 0))
 
-        usedMemory += newNode.size
+        // Make room for the new node
+        monitorMemoryUsage()
     }
 
     override fun clearAll(isClientRequest: Boolean) {
-        cache = ConcurrentHashMap<KeyVersionPair, LRUNode>(maxCapacity)
-        lruCache = ConcurrentLinkedQueue<LRUNode>()
-        sortedLocalKeys = Collections.synchronizedSortedMap(
-            TreeMap()
-        )
-
-        kvByteSize = 0
-        usedMemory = 0
-
-        copyHashes = mutableListOf()
-        copyIndex = 0
-        prevCopyIndex = 0
-    }
-
-    private fun insert(node: LRUNode) {
-        lruCache.add(node)
-        cache[node.kvPair] = node
-    }
-
-    private fun remove(node: LRUNode) {
-        lruCache.remove(node)
-        cache.remove(node.kvPair)
-    }
+        lruStripes = newStripes()
+        hashIndex.clear()
 
-    private fun removeCopy(node: LRUNode) {
-        remove(node)
-        usedMemory -= node.size
-        kvByteSize -= (node.value.size + node.kvPair.key.length + 4)
-        print("Decreasing kv bytes size by ${node.value.size + node.kvPair.key.length}\n")
+        kvByteSize.set(0)
+        usedBytes.set(0)
     }
 
-    override fun fetchJVMUsage(): IDistributedCache.MemoryUsageInfo {
-        return IDistributedCache.MemoryUsageInfo(usedMemory, maxMemory, usedMemory/(maxMemory * 1.0))
+    private fun newStripes(): Array<LinkedHashMap<KeyVersionPair, LRUNode>> {
+        return Array(stripeCount) { LinkedHashMap<KeyVersionPair, LRUNode>(16, 0.75F, true) }
     }
 
-    private fun isFull(): Boolean {
-        return usedMemory > (maxMemory * memoryUtilizationLimit).toInt()
+    private fun stripeFor(kvPair: KeyVersionPair): LinkedHashMap<KeyVersionPair, LRUNode> {
+        val stripes = lruStripes
+        return stripes[Math.floorMod(kvPair.hashCode(), stripes.size)]
     }
 
-    override fun monitorMemoryUsage() {
-        print("LOCAL CACHE: Monitoring memory usage\n")
-
-        if (isFull()) {
-            print("LOCAL CACHE: Cache is full\n")
-            val estimateToRemove = usedMemory - (maxMemory * (memoryUtilizationLimit - 0.2))
-            print("LOCAL CACHE: Used $usedMemory maximum ${(maxMemory * memoryUtilizationLimit).toInt()} amount to remove $estimateToRemove\n")
-            var removed: Long = 0
-
-            while (removed < estimateToRemove) {
-                removed += removeLRU()
-                print("LOCAL CACHE: Removed $removed\n")
+    /**
+     * Removes the node from its stripe and the hash index if it is still cached,
+     * returning whether it was.
+     */
+    private fun remove(node: LRUNode): Boolean {
+        val stripe = stripeFor(node.kvPair)
+        synchronized(stripe) {
+            if (!stripe.remove(node.kvPair, node)) {
+                return false
             }
+            hashIndex.remove(nodeHasher.primaryHashValue(node.kvPair), node.kvPair)
         }
+        usedBytes.addAndGet(-node.size)
+        kvByteSize.addAndGet(-node.kvSize.toInt())
+        return true
     }
 
-    private fun removeLRU(): Long {
-        val node = lruCache.poll()
-        cache.remove(node.kvPair)
-        usedMemory -= node.size
-
-        // Remove from local key tree
-        val hashValue = nodeHasher.primaryHashValue(node.kvPair)
-        sortedLocalKeys.remove(hashValue)
-
-        return node.size
+    override fun fetchJVMUsage(): IDistributedCache.MemoryUsageInfo {
+        val used = usedBytes.get()
+        return IDistributedCache.MemoryUsageInfo(used, maxBytes, used/(maxBytes * 1.0))
     }
 
     /**
-     * Gets information about the cache at the current moment
+     * Evicts least recently used nodes until the cache is back within its byte budget.
      */
-    override fun getCacheInfo(): CacheInfo {
-        print("LOCAL CACHE: Getting cache info with bytes: $kvByteSize\n")
-        return CacheInfo(cache.size, kvByteSize)
-    }
-
-    override fun initializeCopy(copyRanges: MutableList<Pair<Int, Int>>) {
-        printSortedLocalKeys()
-        copyHashes = mutableListOf()
-        for (copyRange in copyRanges) {
-            print("LOCAL CACHE: Finding keys to copy in range (${copyRange.first}, ${copyRange.second})\n")
-            if (copyRange.first > copyRange.second) {
-                for (e in sortedLocalKeys.headMap(copyRange.second)) {
-                    if (e.key != null) {
-                        copyHashes.add(e.key)
-                    }
-                }
-                for (e in sortedLocalKeys.tailMap(copyRange.first)) {
-                    if (e.key != null) {
-                        copyHashes.add(e.key)
-                    }
-                }
-            } else {
-                for (e in sortedLocalKeys.subMap(copyRange.first, copyRange.second)) {
-                    if (e.key != null) {
-                        copyHashes.add(e.key)
-                    }
-                }
-            }
+    override fun monitorMemoryUsage() {
+        var removed: Long = 0
+        while (usedBytes.get() > maxBytes) {
+            removed += removeLRU() ?: break
         }
-        print("\nLOCAL CACHE: Found ${copyHashes.size} keys to copy\n")
-        for (hashValue in copyHashes) {
-            print("Hash value $hashValue\n")
+        if (removed > 0) {
+            logger.debug { "Evicted $removed bytes, using ${usedBytes.get()} of $maxBytes" }
         }
     }
 
-    override fun streamCopyKeys(count: Int): MutableList<KeyValuePair> {
-        print("LOCAL CACHE: Streaming the next copy keys\n")
-        val topIndex = Integer.min(copyIndex + count, copyHashes.count())
-        val streamKeys = mutableListOf<KeyValuePair>()
-        for (i in copyIndex until topIndex) {
-            val kvPair = sortedLocalKeys[copyHashes[i]]
-            if (kvPair != null) {
-                val node = cache[kvPair]
-                if (node != null) {
-                    streamKeys.add(KeyValuePair(kvPair.key, kvPair.version, node.value))
+    /**
+     * Evicts the least recently used node. Every stripe's eldest node is its least
+     * recently used, so the oldest of those is the least recently used overall.
+     *
+     * @return the size of the evicted node, or null if the cache is empty
+     */
+    private fun removeLRU(): Long? {
+        while (true) {
+            var oldest: LRUNode? = null
+            for (stripe in lruStripes) {
+                val eldest = synchronized(stripe) { stripe.values.firstOrNull() } ?: continue
+                if (oldest == null || eldest.lastAccess < oldest.lastAccess) {
+                    oldest = eldest
                 }
             }
+            if (oldest == null) {
+                return null
+            }
+            // Retry if the node was overwritten or removed since it was found
+            if (remove(oldest)) {
+                evictions.incrementAndGet()
+                return oldest.size
+            }
         }
+    }
 
-        // Update the copy indices
-        prevCopyIndex = copyIndex
-        copyIndex = topIndex
-        return streamKeys
+    /**
+     * Gets information about the cache at the current moment
+     */
+    override fun getCacheInfo(): CacheInfo {
+        logger.debug { "Getting cache info with bytes: ${kvByteSize.get()}" }
+        return CacheInfo(lruStripes.sumOf { synchronized(it) { it.size } }, kvByteSize.get(), usedBytes.get(), maxBytes, evictions.get())
     }
 
-    override fun cleanupCopyKeys() {
-        print("LOCAL CACHE: Cleaning up copied keys\n")
-        for (i in prevCopyIndex until copyIndex) {
-            val hashValue = copyHashes[i]
-            val kvPair = sortedLocalKeys[hashValue]
-            val node = cache[kvPair]
+    override fun initializeCopy(copyRange: Pair<Int, Int>): IScalableLocalCache.ICopyStream {
+        scalingLogger.debug { "There are ${hashIndex.size()} local keys" }
+        scalingLogger.info { "Finding keys to copy in range (${copyRange.first}, ${copyRange.second}]" }
+        val copyKeys = hashIndex.range(copyRange.first, copyRange.second)
+        scalingLogger.info { "Found ${copyKeys.size} keys to copy" }
+        return CopyStream(copyKeys)
+    }
+
+    override fun cleanupCopyKeys(kvPairs: List<KeyValuePair>) {
+        scalingLogger.debug { "Cleaning up ${kvPairs.size} copied keys" }
+        for (kvPair in kvPairs) {
+            val node = lookupCopy(KeyVersionPair(kvPair.key, kvPair.version))
             if (node != null) {
-                removeCopy(node)
-                sortedLocalKeys.remove(hashValue)
+                remove(node)
             }
         }
-        if (copyIndex == copyHashes.count()) {
-            copyHashes = mutableListOf()
-            copyIndex = 0
-            prevCopyIndex = 0
-        }
     }
 
-    private fun printSortedLocalKeys() {
-        print("There are ${sortedLocalKeys.size} local keys\n")
-        for (key in sortedLocalKeys.asIterable()) {
-            print("Hash value ${key.key} and kv pair ${key.value}\n")
-        }
+    /**
+     * Looks up a node that is being copied. This moves it to the tail of its stripe,
+     * which does not matter since the key is about to leave this node.
+     */
+    private fun lookupCopy(kvPair: KeyVersionPair): LRUNode? {
+        val stripe = stripeFor(kvPair)
+        return synchronized(stripe) { stripe[kvPair] }
     }
 
-    private fun printCacheContents() {
-        print("Cache size is ${cache.size}\n")
-        for (node in cache) {
-            print("Node: ${node.key} ${node.value.kvPair} ${node.value.value}\n")
+    /**
+     * Streams the keys found in a copy range, skipping keys evicted since the range was
+     * scanned.
+     */
+    private inner class CopyStream(private val copyKeys: List<KeyVersionPair>) : IScalableLocalCache.ICopyStream {
+
+        /* Index of the next key to stream */
+        private var copyIndex = 0
+
+        override fun next(maxBytes: Long): MutableList<KeyValuePair> {
+            val streamKeys = mutableListOf<KeyValuePair>()
+            var streamBytes: Long = 0
+            while (copyIndex < copyKeys.size && (streamKeys.isEmpty() || streamBytes < maxBytes)) {
+                val kvPair = copyKeys[copyIndex++]
+                val node = lookupCopy(kvPair) ?: continue
+                streamKeys.add(KeyValuePair(kvPair.key, kvPair.version, node.value))
+                streamBytes += node.kvSize
+            }
+            scalingLogger.debug { "Streaming ${streamKeys.size} copy keys with $streamBytes bytes" }
+            return streamKeys
         }
     }
 
@@ -264,7 +235,14 @@ class ScalableLocalCache(private var nodeHasher: INodeHasher, private var maxCap
      */
     class LRUNode(val kvPair: KeyVersionPair=KeyVersionPair("", -1), val value: ByteArray=ByteArray(0)) {
 
-        /* The size of the payload */
-        var size : Long = (value.size + kvPair.key.length + 4).toLong()
+        /* The size of the key and value */
+        val kvSize : Long = (value.size + kvPair.key.length + 4).toLong()
+
+        /* The size counted against the byte budget */
+        val size : Long = accountedSize(kvPair, value)
+
+        /* The tick of the last store or fetch, used to compare nodes of different stripes */
+        @Volatile
+        var lastAccess: Long = 0
     }
 }
\ No newline at end of file
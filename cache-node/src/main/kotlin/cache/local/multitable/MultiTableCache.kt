@@ -3,6 +3,10 @@ package cache.local.multitable
 import KeyVersionPair
 import cache.local.CacheInfo
 import cache.local.ILocalCache
+import cache.local.accountedSize
+import cache.local.aggregateTableInfo
+import cache.local.defaultMaxBytes
+import exception.CacheFullException
 import exception.InvalidInputException
 import java.util.concurrent.locks.ReentrantReadWriteLock
 import kotlin.concurrent.read
@@ -12,8 +16,10 @@ import kotlin.concurrent.write
  * A memory cache implementation with multiple tables of data.
  *
  * This class is thread-safe!
+ *
+ * @param maxBytes byte budget of the cache, split evenly between its tables
  */
-class MultiTableCache(private val numTables: Int = 3) : ILocalCache {
+class MultiTableCache(private val numTables: Int = 3, private val maxBytes: Long = defaultMaxBytes) : ILocalCache {
 
     /** Entire Multi-table-wise Variables **/
 
@@ -33,7 +39,7 @@ class MultiTableCache(private val numTables: Int = 3) : ILocalCache {
     /**
      * List of all tables that comprise the multi-table cache. Protected by tablesLock.
      */
-    private val tables: Array<ITable> = Array(numTables) {Table()}
+    private val tables: Array<ITable> = Array(numTables) {Table(maxBytes / numTables)}
 
     /**
      * Table index of the least popular table. Protected by tablesLock.
@@ -82,6 +88,10 @@ class MultiTableCache(private val numTables: Int = 3) : ILocalCache {
     }
 
     override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+        // A value that cannot fit in an empty table would rotate the tables forever
+        if (accountedSize(kvPair, value) > maxBytes / numTables) {
+            throw CacheFullException()
+        }
         multiTableLock.read() {
             // TODO: Handle invalid
             //if (!isValid) return null // Stall till valid?
@@ -186,11 +196,15 @@ class MultiTableCache(private val numTables: Int = 3) : ILocalCache {
     }
 
     fun isFull(): Boolean {
-        TODO("Not yet implemented")
+        return getCacheInfo().usedBytes >= maxBytes
     }
 
     override fun getCacheInfo(): CacheInfo {
-        TODO("Not yet implemented")
+        var cacheInfo = CacheInfo(0, 0)
+        for (table in tables) {
+            cacheInfo = aggregateTableInfo(cacheInfo, table.getTableInfo())
+        }
+        return cacheInfo
     }
 
 }
\ No newline at end of file
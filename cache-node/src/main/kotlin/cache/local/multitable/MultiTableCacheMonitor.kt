@@ -3,7 +3,10 @@ package cache.local.multitable
 import KeyVersionPair
 import cache.local.CacheInfo
 import cache.local.ILocalCache
+import cache.local.accountedSize
 import cache.local.aggregateTableInfo
+import cache.local.defaultMaxBytes
+import exception.CacheFullException
 import exception.InvalidInputException
 import java.util.concurrent.locks.ReentrantReadWriteLock
 import kotlin.concurrent.read
@@ -14,8 +17,10 @@ import kotlin.concurrent.write
  * All operations are serial. This is a monitor!
  *
  * This class is thread-safe!
+ *
+ * @param maxBytes byte budget of the cache, split evenly between its tables
  */
-class MultiTableCacheMonitor(private val numTables: Int = 3) : ILocalCache {
+class MultiTableCacheMonitor(private val numTables: Int = 3, private val maxBytes: Long = defaultMaxBytes) : ILocalCache {
 
 
     /**
@@ -27,7 +32,7 @@ class MultiTableCacheMonitor(private val numTables: Int = 3) : ILocalCache {
     /**
      * List of all tables that comprise the multi-table cache. Protected by tablesLock.
      */
-    private val tables: Array<ITable> = Array(numTables) {Table()}
+    private val tables: Array<ITable> = Array(numTables) {Table(maxBytes / numTables)}
 
     /**
      * Table index of the least popular table. Protected by tablesLock.
@@ -37,6 +42,11 @@ class MultiTableCacheMonitor(private val numTables: Int = 3) : ILocalCache {
      */
     @Volatile private var baseIndex: Int = 0
 
+    /**
+     * The number of keys dropped with their table by evictions. Protected by multiTableLock.
+     */
+    @Volatile private var evictions: Long = 0
+
     init {
         // Validate all internal tables. Then validate the multi-table cache itself.
         multiTableLock.write {
@@ -93,6 +103,9 @@ class MultiTableCacheMonitor(private val numTables: Int = 3) : ILocalCache {
     }
 
     override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+        if (accountedSize(kvPair, value) > maxBytes / numTables) {
+            throw CacheFullException()
+        }
         multiTableLock.write() {
             //print("MultiTableCacheMonitor: store ${kvPair.key}, ${kvPair.version}, ${value.toString()}\n")
             val base = baseIndex
@@ -132,6 +145,7 @@ class MultiTableCacheMonitor(private val numTables: Int = 3) : ILocalCache {
     private fun rotateEvict() {
         multiTableLock.write {
             //print("MultiTableCacheMonitor: Rotate Evict\n")
+            evictions += tables[baseIndex].getTableInfo().totalKeys
             tables[baseIndex].clearAll() {
                 baseIndex = (baseIndex + 1) % numTables // Shifts the least popular table to the most popular table.
             }
@@ -172,7 +186,7 @@ class MultiTableCacheMonitor(private val numTables: Int = 3) : ILocalCache {
             val tableInfo = tables[infoIndex].getTableInfo()
             cacheInfo = aggregateTableInfo(cacheInfo, tableInfo)
         }
-        return cacheInfo
+        return cacheInfo.copy(evictions = evictions)
     }
 
 }
\ No newline at end of file
@@ -2,6 +2,8 @@ package cache.local.multitable
 
 import KeyVersionPair
 import cache.local.CacheInfo
+import cache.local.accountedSize
+import cache.local.entryOverheadBytes
 import exception.ProgramAssumptionException
 import java.util.concurrent.locks.ReentrantReadWriteLock
 import kotlin.concurrent.read
@@ -15,8 +17,10 @@ import kotlin.concurrent.write
  * like getTableInfo().
  *
  * This is thread-safe!
+ *
+ * @param maxBytes byte budget of the table, including the per-entry overhead
  */
-class Table(private val maxCapacity: Int = 33, private val maxMemorySize: Int = 5000): ITable {
+class Table(private val maxBytes: Long = 5000): ITable {
 
     /** Entire Table-wise Variables **/
 
@@ -38,16 +42,15 @@ class Table(private val maxCapacity: Int = 33, private val maxMemorySize: Int =
      * Hash table cache. Protected by cacheLock.
      */
     // TODO: Make this concurrent for safety?
-    private val cache = HashMap<KeyVersionPair, ByteArray?>(maxCapacity)
+    private val cache = HashMap<KeyVersionPair, ByteArray?>()
 
     /**
-     * Memory usage of user data. Protected by cacheLock.
+     * Memory usage of the table. Protected by cacheLock.
      *
-     * This does not account for the memory usage of internal data structures. Since there
-     * is a max capacity for our hashmap, the internal memory usage should be bounded by
-     * a constant. The user data memory usage is not bounded and should be managed.
+     * Counts user data plus an estimated per-entry overhead for the internal data
+     * structures, so many small entries fill the table as well as a few large ones.
      */
-    private var memorySize = 0
+    private var memorySize: Long = 0
 
     /**
      * Lock for the cache. Valid lock should be held before attempting to hold this.
@@ -83,19 +86,19 @@ class Table(private val maxCapacity: Int = 33, private val maxMemorySize: Int =
                         Status.MUTATION // Already stored with different value
                     }
                 }
-                if (isFull()) {
+                // updated memory = new value size - old value size, or the new entry's accounted size
+                val sizeChange = if (cache.containsKey(kvPair)) {
+                    value.size.toLong()
+                } else {
+                    accountedSize(kvPair, value)
+                }
+                if (memorySize + sizeChange > maxBytes) {
 //                    print("Store Error: Full!\n")
                     return Status.FULL
                 }
 
                 // Update memory usage
-                memorySize += if (cache.containsKey(kvPair)) {
-                    // updated memory = new value size - old value size
-                    value.size - (cache[kvPair]?.size ?: 0)
-                } else {
-                    // updated memory = new key-value pair size + new value size
-                    (kvPair.key.length + 4) + value.size
-                }
+                memorySize += sizeChange
 
                 // Store data
                 cache[kvPair] = value
@@ -126,11 +129,9 @@ class Table(private val maxCapacity: Int = 33, private val maxMemorySize: Int =
 
         // Clear Cache
         cacheLock.write() {
-            if (isFull()) {
-                //print("Table: Full, Cleared!\n")
-                cache.clear()
-                memorySize = 0
-            }
+            //print("Table: Cleared!\n")
+            cache.clear()
+            memorySize = 0
         }
 
         tableLock.read {
@@ -146,27 +147,7 @@ class Table(private val maxCapacity: Int = 33, private val maxMemorySize: Int =
     override fun getTableInfo(): CacheInfo {
         // TODO: Should this perform when table is invalid?
         cacheLock.read() {
-            return CacheInfo(cache.size, memorySize)
-        }
-    }
-
-    /**
-     * Returns true if the table is full either due to capacity or memory. Works when the
-     * table is invalid!
-     *
-     * The capacity size of the table is monotonically increasing, until the table is
-     * marked invalid and cleared.
-     *
-     * Memory size refers to the size of user data. This is not monotonically increasing.
-     * Therefore, one query may think the table is full and a later query may not think
-     * the table is full. ClearAll() checks this before clearing the table.
-     */
-    private fun isFull(): Boolean {
-//        print("Table: checking full!\n")
-        cacheLock.read() {
-//            print("Capacity: ${cache.size}/${maxCapacity}\n")
-//            print("Capacity: ${memorySize}/${maxMemorySize}\n")
-            return cache.size == maxCapacity || memorySize > maxMemorySize
+            return CacheInfo(cache.size, (memorySize - cache.size * entryOverheadBytes).toInt(), memorySize, maxBytes)
         }
     }
 
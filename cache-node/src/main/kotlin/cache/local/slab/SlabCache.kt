@@ -0,0 +1,215 @@
+package cache.local.slab
+
+import KeyVersionPair
+import cache.local.CacheInfo
+import cache.local.ILocalCache
+import cache.local.defaultMaxBytes
+import exception.CacheFullException
+import logging.LogManager
+import java.nio.ByteBuffer
+import java.util.ArrayDeque
+import java.util.concurrent.ConcurrentHashMap
+import java.util.concurrent.atomic.AtomicInteger
+import java.util.concurrent.atomic.AtomicLong
+
+/**
+ * A local cache that keeps values off the JVM heap in slabs of direct memory, so the
+ * heap only holds the key index and GC pauses do not grow with the cached data.
+ *
+ * Slabs are split into chunks of power-of-two size classes, and each value is stored in
+ * the smallest chunk that fits it. A slab is handed to a size class the first time the
+ * class runs out of chunks. Once the byte budget allows no new slabs, a class reuses the
+ * chunk of its least recently used entry.
+ *
+ * @param maxBytes byte budget of the slabs
+ * @param slabSize bytes of each slab, which is also the largest value that can be stored
+ */
+class SlabCache(private val maxBytes: Long = defaultMaxBytes, private val slabSize: Int = 1 shl 20) : ILocalCache {
+
+    /**
+     * Logger for local cache operations
+     */
+    private val logger = LogManager.getLogger(LogManager.LOCAL_CACHE)
+
+    /* The smallest chunk size */
+    private val minChunkSize = 64
+
+    /* The number of slabs the byte budget allows */
+    private val maxSlabs = maxOf(1L, maxBytes / slabSize).toInt()
+
+    /* The number of slabs allocated so far, across all size classes */
+    private val slabCount = AtomicInteger(0)
+
+    /* Size classes from minChunkSize up to slabSize, doubling each time */
+    private val sizeClasses = Array(sizeClassOf(slabSize) + 1) { SizeClass(minChunkSize shl it) }
+
+    /* Maps every cached key to where its value is stored */
+    private val index = ConcurrentHashMap<KeyVersionPair, SlabEntry>()
+
+    /* Store the total size of key and value bytes */
+    private val kvByteSize = AtomicLong(0)
+
+    /* The number of entries evicted to reuse their chunks */
+    private val evictions = AtomicLong(0)
+
+    override fun fetch(kvPair: KeyVersionPair): ByteArray? {
+        logger.debug { "Attempting to fetch ${kvPair.key}" }
+        while (true) {
+            val entry = index[kvPair] ?: return null
+            val sizeClass = sizeClasses[entry.sizeClass]
+            synchronized(sizeClass) {
+                // Touches the entry, unless it was evicted or overwritten since the lookup
+                if (sizeClass.lru[kvPair] === entry) {
+                    return sizeClass.read(entry)
+                }
+            }
+        }
+    }
+
+    override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+        logger.trace { "Attempting to store ${kvPair.key} with ${value.size} bytes" }
+        if (value.size > slabSize) {
+            logger.debug { "Value of ${kvPair.key} is larger than a slab" }
+            throw CacheFullException()
+        }
+
+        val classIndex = sizeClassOf(value.size)
+        val sizeClass = sizeClasses[classIndex]
+        val oldEntry: SlabEntry?
+        synchronized(sizeClass) {
+            val chunk = allocate(sizeClass)
+            if (chunk == null) {
+                logger.debug { "No chunk of ${sizeClass.chunkSize} bytes for ${kvPair.key}" }
+                throw CacheFullException()
+            }
+            sizeClass.write(chunk, value)
+            val entry = SlabEntry(classIndex, chunk, value.size)
+            sizeClass.lru.put(kvPair, entry)?.let { release(sizeClass, kvPair, it) }
+            // Publish while holding the lock, so the index never points to an entry that
+            // a concurrent store or eviction already took out of the LRU order
+            oldEntry = index.put(kvPair, entry)
+            kvByteSize.addAndGet((kvPair.key.length + 4 + value.size).toLong())
+        }
+
+        // Free the chunk of a previous value stored in another size class
+        if (oldEntry != null && oldEntry.sizeClass != classIndex) {
+            val oldClass = sizeClasses[oldEntry.sizeClass]
+            synchronized(oldClass) {
+                if (oldClass.lru.remove(kvPair, oldEntry)) {
+                    release(oldClass, kvPair, oldEntry)
+                }
+            }
+        }
+    }
+
+    override fun clearAll(isClientRequest: Boolean) {
+        // Slabs stay with their size class, only their chunks are freed
+        for (sizeClass in sizeClasses) {
+            synchronized(sizeClass) {
+                for ((kvPair, entry) in sizeClass.lru) {
+                    index.remove(kvPair, entry)
+                    kvByteSize.addAndGet(-(kvPair.key.length + 4 + entry.length).toLong())
+                    sizeClass.freeChunks.push(entry.chunk)
+                }
+                sizeClass.lru.clear()
+            }
+        }
+    }
+
+    override fun getCacheInfo(): CacheInfo {
+        return CacheInfo(index.size, kvByteSize.get().toInt(), slabCount.get().toLong() * slabSize, maxBytes, evictions.get())
+    }
+
+    /**
+     * Returns the index of the smallest size class whose chunks fit the given size.
+     */
+    private fun sizeClassOf(size: Int): Int {
+        if (size <= minChunkSize) {
+            return 0
+        }
+        return (32 - Integer.numberOfLeadingZeros(size - 1)) - (31 - Integer.numberOfLeadingZeros(minChunkSize))
+    }
+
+    /**
+     * Takes a free chunk of the size class, allocating a new slab if the budget allows
+     * and otherwise evicting the class's least recently used entry. Must be called while
+     * holding the size class's lock.
+     *
+     * @return the chunk, or null if the class has no chunk it can use
+     */
+    private fun allocate(sizeClass: SizeClass): Long? {
+        if (sizeClass.freeChunks.isEmpty() && reserveSlab()) {
+            sizeClass.addSlab(ByteBuffer.allocateDirect(slabSize))
+        }
+        if (sizeClass.freeChunks.isNotEmpty()) {
+            return sizeClass.freeChunks.pop()
+        }
+
+        val eldest = sizeClass.lru.entries.firstOrNull() ?: return null
+        logger.trace { "Evicting ${eldest.key.key} from the ${sizeClass.chunkSize} byte class" }
+        sizeClass.lru.remove(eldest.key)
+        index.remove(eldest.key, eldest.value)
+        kvByteSize.addAndGet(-(eldest.key.key.length + 4 + eldest.value.length).toLong())
+        evictions.incrementAndGet()
+        return eldest.value.chunk
+    }
+
+    /**
+     * Returns an entry's chunk to its size class once it is no longer in the class's LRU
+     * order. Must be called while holding the size class's lock.
+     */
+    private fun release(sizeClass: SizeClass, kvPair: KeyVersionPair, entry: SlabEntry) {
+        index.remove(kvPair, entry)
+        kvByteSize.addAndGet(-(kvPair.key.length + 4 + entry.length).toLong())
+        sizeClass.freeChunks.push(entry.chunk)
+    }
+
+    private fun reserveSlab(): Boolean {
+        while (true) {
+            val count = slabCount.get()
+            if (count >= maxSlabs) {
+                return false
+            }
+            if (slabCount.compareAndSet(count, count + 1)) {
+                return true
+            }
+        }
+    }
+
+    /**
+     * Where a value is stored: its size class, its chunk within the class and its length.
+     */
+    private class SlabEntry(val sizeClass: Int, val chunk: Long, val length: Int)
+
+    /**
+     * The slabs, free chunks and LRU order of one chunk size. A chunk is identified by the
+     * index of its slab in the upper 32 bits and its offset in the slab in the lower 32.
+     */
+    private inner class SizeClass(val chunkSize: Int) {
+        private val slabs = mutableListOf<ByteBuffer>()
+        val freeChunks = ArrayDeque<Long>()
+        val lru = LinkedHashMap<KeyVersionPair, SlabEntry>(16, 0.75F, true)
+
+        fun addSlab(slab: ByteBuffer) {
+            val slabIndex = slabs.size.toLong()
+            slabs.add(slab)
+            for (offset in 0 until slabSize / chunkSize) {
+                freeChunks.push((slabIndex shl 32) or (offset.toLong() * chunkSize))
+            }
+        }
+
+        fun write(chunk: Long, value: ByteArray) {
+            val slab = slabs[(chunk ushr 32).toInt()]
+            slab.position(chunk.toInt())
+            slab.put(value)
+        }
+
+        fun read(entry: SlabEntry): ByteArray {
+            val slab = slabs[(entry.chunk ushr 32).toInt()]
+            val value = ByteArray(entry.length)
+            slab.position(entry.chunk.toInt())
+            slab.get(value)
+            return value
+        }
+    }
+}
@@ -0,0 +1,88 @@
+package cache.local.tinylfu
+
+/**
+ * A count-min sketch estimating how often each key was accessed recently. Counters are
+ * 4 bits, packed 16 to a long, in four rows with one counter per row for each key, and
+ * the estimate is the smallest of a key's counters. Once the number of increments
+ * reaches ten times the width, every counter is halved, so old popularity fades.
+ *
+ * This class is not thread-safe.
+ *
+ * @param expectedEntries number of keys the cache is expected to hold, sizing the rows
+ */
+class FrequencySketch(expectedEntries: Int) {
+
+    /* Counters per row, a power of two of at least 16 */
+    private val width = Integer.highestOneBit(expectedEntries.coerceIn(16, maxWidth) - 1) shl 1
+
+    private val table = LongArray(depth * width / 16)
+
+    /* Increments after which all counters are halved */
+    private val sampleSize = 10 * width
+
+    private var additions = 0
+
+    /**
+     * Estimates the number of recent accesses to an item, at most 15.
+     */
+    fun frequency(item: Any): Int {
+        val hash = item.hashCode()
+        var frequency = maxCount
+        for (row in 0 until depth) {
+            frequency = minOf(frequency, counterAt(counterIndex(hash, row)))
+        }
+        return frequency
+    }
+
+    /**
+     * Records an access to an item.
+     */
+    fun increment(item: Any) {
+        val hash = item.hashCode()
+        var added = false
+        for (row in 0 until depth) {
+            val counter = counterIndex(hash, row)
+            val shift = (counter and 15) shl 2
+            val mask = 0xfL shl shift
+            if ((table[counter ushr 4] and mask) != mask) {
+                table[counter ushr 4] += 1L shl shift
+                added = true
+            }
+        }
+        if (added && ++additions >= sampleSize) {
+            reset()
+        }
+    }
+
+    /**
+     * Halves every counter.
+     */
+    fun reset() {
+        for (i in table.indices) {
+            table[i] = (table[i] ushr 1) and 0x7777777777777777L
+        }
+        additions /= 2
+    }
+
+    fun clear() {
+        table.fill(0L)
+        additions = 0
+    }
+
+    private fun counterIndex(hash: Int, row: Int): Int {
+        var h = (hash + seeds[row]) * -0x61c88647
+        h = h xor (h ushr 16)
+        return row * width + (h and (width - 1))
+    }
+
+    private fun counterAt(counter: Int): Int {
+        return ((table[counter ushr 4] ushr ((counter and 15) shl 2)) and 0xfL).toInt()
+    }
+
+    private companion object {
+        const val depth = 4
+        const val maxCount = 15
+        const val maxWidth = 1 shl 24
+        val seeds = intArrayOf(0x5c6b7e1d, -0x3a2f1c87, 0x1d8e4e27, -0x7ed55d17)
+    }
+}
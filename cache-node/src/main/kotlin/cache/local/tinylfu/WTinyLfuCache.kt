@@ -0,0 +1,174 @@
+package cache.local.tinylfu
+
+import KeyVersionPair
+import cache.local.CacheInfo
+import cache.local.ILocalCache
+import cache.local.accountedSize
+import cache.local.defaultMaxBytes
+import cache.local.entryOverheadBytes
+import exception.CacheFullException
+import logging.LogManager
+
+/**
+ * A local cache that evicts with the W-TinyLFU policy, which keeps popular keys cached
+ * through bursts of keys that are only read once.
+ *
+ * New keys enter a small LRU window. Keys pushed out of the window compete to enter the
+ * main region, which is split into a probation and a protected segment. A candidate is
+ * only admitted if a FrequencySketch says it was recently accessed more often than the
+ * probation key it would evict. A probation key that is read again moves to the
+ * protected segment, whose least recently used keys fall back to probation.
+ *
+ * All operations are serial. This is a monitor!
+ *
+ * @param maxBytes byte budget of the cache, including the per-entry overhead
+ * @param windowPercent share of the byte budget given to the window
+ */
+class WTinyLfuCache(private val maxBytes: Long = defaultMaxBytes, windowPercent: Int = 1) : ILocalCache {
+
+    /**
+     * Logger for local cache operations
+     */
+    private val logger = LogManager.getLogger(LogManager.LOCAL_CACHE)
+
+    /**
+     * Entries of one region in least to most recently used order.
+     */
+    private class Segment(val maxBytes: Long) {
+        val entries = LinkedHashMap<KeyVersionPair, ByteArray>(16, 0.75f, true)
+        var usedBytes = 0L
+
+        fun put(kvPair: KeyVersionPair, value: ByteArray) {
+            entries.put(kvPair, value)?.let { usedBytes -= accountedSize(kvPair, it) }
+            usedBytes += accountedSize(kvPair, value)
+        }
+
+        fun remove(kvPair: KeyVersionPair): ByteArray? {
+            val value = entries.remove(kvPair) ?: return null
+            usedBytes -= accountedSize(kvPair, value)
+            return value
+        }
+
+        fun eldest(): KeyVersionPair? {
+            return entries.keys.firstOrNull()
+        }
+    }
+
+    private val window = Segment(maxOf(1L, maxBytes * windowPercent / 100))
+
+    /* Bytes shared by the probation and protected segments */
+    private val mainBytes = maxBytes - window.maxBytes
+
+    private val probation = Segment(mainBytes)
+
+    private val protectedSegment = Segment(mainBytes * 4 / 5)
+
+    /* Sized for entries holding about 32 bytes of key and value */
+    private val sketch = FrequencySketch((maxBytes / (entryOverheadBytes + 32)).coerceAtMost(Int.MAX_VALUE.toLong()).toInt())
+
+    /* Store the total size of key and value bytes */
+    private var kvByteSize = 0L
+
+    /* The number of keys evicted or rejected from the main region */
+    private var evictions = 0L
+
+    @Synchronized
+    override fun fetch(kvPair: KeyVersionPair): ByteArray? {
+        logger.debug { "Attempting to fetch ${kvPair.key}" }
+        sketch.increment(kvPair)
+
+        window.entries[kvPair]?.let { return it }
+        protectedSegment.entries[kvPair]?.let { return it }
+
+        // A second access promotes a probation key to the protected segment
+        val value = probation.remove(kvPair) ?: return null
+        protectedSegment.put(kvPair, value)
+        demoteProtected()
+        return value
+    }
+
+    @Synchronized
+    override fun store(kvPair: KeyVersionPair, value: ByteArray) {
+        logger.trace { "Attempting to store ${kvPair.key} with ${value.size} bytes" }
+        if (accountedSize(kvPair, value) > mainBytes) {
+            logger.debug { "Value of ${kvPair.key} is larger than the cache" }
+            throw CacheFullException()
+        }
+        sketch.increment(kvPair)
+
+        val segment = listOf(window, probation, protectedSegment).firstOrNull { kvPair in it.entries } ?: window
+        val prevValue = segment.entries[kvPair]
+        kvByteSize += value.size - (prevValue?.size ?: -(kvPair.key.length + 4))
+        segment.put(kvPair, value)
+
+        demoteProtected()
+        while (window.usedBytes > window.maxBytes) {
+            val candidate = window.eldest()!!
+            probation.put(candidate, window.remove(candidate)!!)
+            evictFromMain(candidate)
+        }
+        evictFromMain(null)
+        logger.debug { "Stored ${kvPair.key}" }
+    }
+
+    /**
+     * Moves the least recently used protected keys to probation until the protected
+     * segment is within its share of the main region.
+     */
+    private fun demoteProtected() {
+        while (protectedSegment.usedBytes > protectedSegment.maxBytes) {
+            val kvPair = protectedSegment.eldest()!!
+            probation.put(kvPair, protectedSegment.remove(kvPair)!!)
+        }
+    }
+
+    /**
+     * Evicts keys until the main region is within its budget. A candidate that just left
+     * the window is compared with the least recently used probation key, and the less
+     * frequently accessed of the two is evicted.
+     *
+     * @param candidate key moved from the window to probation, or null
+     */
+    private fun evictFromMain(candidate: KeyVersionPair?) {
+        var contender = candidate
+        while (probation.usedBytes + protectedSegment.usedBytes > mainBytes) {
+            val victim = probation.eldest()?.takeIf { it != contender } ?: protectedSegment.eldest()
+            if (victim == null || (contender != null && sketch.frequency(contender) <= sketch.frequency(victim))) {
+                logger.trace { "Rejected ${contender?.key} from the main region" }
+                evict(contender ?: return)
+                contender = null
+            } else {
+                evict(victim)
+            }
+        }
+    }
+
+    private fun evict(kvPair: KeyVersionPair) {
+        val value = probation.remove(kvPair) ?: protectedSegment.remove(kvPair) ?: return
+        kvByteSize -= kvPair.key.length + 4 + value.size
+        evictions++
+        logger.trace { "Evicted ${kvPair.key}" }
+    }
+
+    @Synchronized
+    override fun clearAll(isClientRequest: Boolean) {
+        for (segment in listOf(window, probation, protectedSegment)) {
+            segment.entries.clear()
+            segment.usedBytes = 0
+        }
+        sketch.clear()
+        kvByteSize = 0
+    }
+
+    @Synchronized
+    override fun getCacheInfo(): CacheInfo {
+        val segments = listOf(window, probation, protectedSegment)
+        return CacheInfo(
+            segments.sumOf { it.entries.size },
+            kvByteSize.toInt(),
+            segments.sumOf { it.usedBytes },
+            maxBytes,
+            evictions
+        )
+    }
+}
@@ -0,0 +1,17 @@
+package exception
+import NodeId
+import exception.base.CrossNodeException
+import org.eclipse.jetty.http.HttpStatus
+
+/**
+ * Exception indicating that another node in the cluster did not respond to a request in time.
+ */
+class RequestTimeoutException(destNodeId: NodeId): CrossNodeException(HttpStatus.GATEWAY_TIMEOUT_504, "Gateway timeout", destNodeId) {
+
+    /**
+     * Returns the exception id unique to the exception type.
+     */
+    override fun getExceptionID(): Int {
+        return 7
+    }
+}
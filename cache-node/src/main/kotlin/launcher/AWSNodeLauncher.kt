@@ -1,14 +1,21 @@
 package launcher
 
 import NodeId
+import logging.LogManager
 import java.io.File
 
 /**
  * Concrete node launcher that uses pasture.py to launch another node on ec2.
  */
 class AWSNodeLauncher: INodeLauncher {
+
+    /**
+     * Logger for launched nodes
+     */
+    private val logger = LogManager.getLogger(LogManager.LAUNCHER)
+
     override fun launchNode(nodeId: NodeId) {
-        print("AWS LAUNCHER: Launching new node with node id $nodeId\n")
+        logger.info { "Launching new node with node id $nodeId" }
         val args = arrayOf("/bin/bash", "-c", "python3 pasture.py add 1 -s")
         val pb = ProcessBuilder(*args)
 
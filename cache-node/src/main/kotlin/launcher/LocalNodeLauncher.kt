@@ -1,28 +1,55 @@
 package launcher
 
 import NodeId
+import logging.LogManager
 import java.io.BufferedWriter
 import java.io.File
 import java.io.FileWriter
+import java.lang.management.ManagementFactory
 
 /**
  * Concrete node launcher implementation that launches a new node locally using the
  * appropriate port offset.
+ *
+ * @param nodeFlags extra command line flags passed to the new node, such as its byte budget
  */
-class LocalNodeLauncher: INodeLauncher {
+class LocalNodeLauncher(private val nodeFlags: List<String> = listOf()): INodeLauncher {
+
+    /**
+     * Logger for launched nodes
+     */
+    private val logger = LogManager.getLogger(LogManager.LAUNCHER)
+
     override fun launchNode(nodeId: NodeId) {
 
         val currentDirectory = System.getProperty("user.dir")
         val newPort = 7070 + nodeId
         val writer = BufferedWriter(FileWriter("$currentDirectory/nodes.txt", true))
-        print("LOCAL NODE LAUNCHER: Printing to $currentDirectory/nodes.txt\n")
+        logger.info { "Adding new node to $currentDirectory/nodes.txt" }
         writer.write("localhost:$newPort\n")
         writer.close()
 
-        val args = arrayOf("/bin/bash", "-c", "./gradlew run --args 'local $nodeId $newPort -s -n'")
+        val flags = (listOf("-s", "-n") + nodeFlags).joinToString(" ")
+        val args = arrayOf("/bin/bash", "-c", nodeCommand("local $nodeId $newPort $flags"))
         val pb = ProcessBuilder(*args)
         pb.directory(File(currentDirectory))
         pb.redirectOutput(File("$currentDirectory/out$nodeId.txt"))
         pb.start()
     }
+
+    /**
+     * Builds the command that starts a node with the given arguments. A node running
+     * from the fat jar starts the new node from the same jar with the same JVM flags,
+     * which skips compiling the sources.
+     *
+     * @param nodeArgs command line arguments of the new node
+     */
+    private fun nodeCommand(nodeArgs: String): String {
+        val classPath = System.getProperty("java.class.path")
+        if (classPath.endsWith(".jar") && !classPath.contains(File.pathSeparator)) {
+            val jvmFlags = ManagementFactory.getRuntimeMXBean().inputArguments.joinToString(" ")
+            return "java $jvmFlags -jar $classPath $nodeArgs"
+        }
+        return "./gradlew run --args '$nodeArgs'"
+    }
 }
\ No newline at end of file
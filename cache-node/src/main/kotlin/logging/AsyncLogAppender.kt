@@ -0,0 +1,45 @@
+package logging
+
+import java.io.PrintStream
+import java.util.concurrent.ArrayBlockingQueue
+import java.util.concurrent.atomic.AtomicLong
+
+/**
+ * Concrete appender that writes lines to a stream from a background thread, so request
+ * threads never wait on console I/O. Lines are dropped rather than blocking the caller
+ * when the queue is full.
+ */
+class AsyncLogAppender(private val out: PrintStream = System.out, capacity: Int = 8192): ILogAppender {
+
+    private val queue = ArrayBlockingQueue<String>(capacity)
+
+    private val droppedCount = AtomicLong(0)
+
+    init {
+        val writer = Thread {
+            val batch = ArrayList<String>()
+            while (true) {
+                batch.add(queue.take())
+                queue.drainTo(batch)
+                for (line in batch) {
+                    out.println(line)
+                }
+                out.flush()
+                batch.clear()
+            }
+        }
+        writer.name = "log-appender"
+        writer.isDaemon = true
+        writer.start()
+    }
+
+    override fun append(line: String) {
+        if (!queue.offer(line)) {
+            droppedCount.incrementAndGet()
+        }
+    }
+
+    override fun getDroppedCount(): Long {
+        return droppedCount.get()
+    }
+}
@@ -0,0 +1,19 @@
+package logging
+
+/**
+ * An interface specifying a destination for formatted log lines.
+ */
+interface ILogAppender {
+
+    /**
+     * Queues a formatted line to be written. Must not block the caller.
+     *
+     * @param line The formatted log line
+     */
+    fun append(line: String)
+
+    /**
+     * Gets the number of lines dropped because the appender could not keep up.
+     */
+    fun getDroppedCount(): Long
+}
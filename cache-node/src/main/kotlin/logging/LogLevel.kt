@@ -0,0 +1,14 @@
+package logging
+
+/**
+ * Severity of a log message, ordered from most to least verbose. A logger set to a level
+ * emits messages at that level and above, and OFF emits nothing.
+ */
+enum class LogLevel {
+    TRACE,
+    DEBUG,
+    INFO,
+    WARN,
+    ERROR,
+    OFF
+}
@@ -0,0 +1,94 @@
+package logging
+
+import com.fasterxml.jackson.annotation.JsonProperty
+import java.util.concurrent.ConcurrentHashMap
+
+/**
+ * Creates the loggers of every category and holds their settings, which can be changed
+ * at runtime. Per-request events are logged at DEBUG or TRACE, so they are off under the
+ * default INFO level.
+ */
+object LogManager {
+
+    /**
+     * Categories of the cache node's loggers
+     */
+    const val RECEIVER = "RECEIVER"
+    const val SENDER = "SENDER"
+    const val DISTRIBUTED_CACHE = "DISTRIBUTED CACHE"
+    const val LOCAL_CACHE = "LOCAL CACHE"
+    const val SCALING = "SCALING"
+    const val LAUNCHER = "LAUNCHER"
+    const val CACHE_COW = "CACHE COW"
+
+    private val appender: ILogAppender = AsyncLogAppender()
+
+    private val loggers = ConcurrentHashMap<String, Logger>()
+
+    @Volatile
+    private var defaultLevel = LogLevel.INFO
+
+    @Volatile
+    private var defaultSampleRate = 1.0
+
+    /**
+     * Gets the logger of a category, creating it with the default settings if needed.
+     */
+    fun getLogger(category: String): Logger {
+        return loggers.computeIfAbsent(category) {
+            val logger = Logger(category, appender)
+            logger.level = defaultLevel
+            logger.sampleRate = defaultSampleRate
+            logger
+        }
+    }
+
+    /**
+     * Changes the level and sample rate of one category, or of every category (including
+     * ones created later) when category is null. Null settings are left unchanged.
+     */
+    fun configure(category: String?, level: LogLevel?, sampleRate: Double?) {
+        require(sampleRate == null || sampleRate in 0.0..1.0) { "Sample rate must be in range [0, 1]" }
+        val targets = if (category == null) {
+            level?.let { defaultLevel = it }
+            sampleRate?.let { defaultSampleRate = it }
+            loggers.values
+        } else {
+            listOf(getLogger(category))
+        }
+        for (logger in targets) {
+            level?.let { logger.level = it }
+            sampleRate?.let { logger.sampleRate = it }
+        }
+    }
+
+    /**
+     * Gets the current settings of every category.
+     */
+    fun getLoggingInfo(): LoggingInfo {
+        return LoggingInfo(
+            defaultLevel,
+            defaultSampleRate,
+            loggers.values.associate { it.category to CategoryInfo(it.level, it.sampleRate) }.toSortedMap(),
+            appender.getDroppedCount()
+        )
+    }
+
+    /**
+     * Settings of a single category.
+     */
+    data class CategoryInfo(
+        @JsonProperty("level") val level: LogLevel,
+        @JsonProperty("sampleRate") val sampleRate: Double
+    )
+
+    /**
+     * Settings of every category and the number of lines dropped by the appender.
+     */
+    data class LoggingInfo(
+        @JsonProperty("defaultLevel") val defaultLevel: LogLevel,
+        @JsonProperty("defaultSampleRate") val defaultSampleRate: Double,
+        @JsonProperty("categories") val categories: Map<String, CategoryInfo>,
+        @JsonProperty("droppedLines") val droppedLines: Long
+    )
+}
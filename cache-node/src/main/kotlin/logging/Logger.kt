@@ -0,0 +1,58 @@
+package logging
+
+import java.time.Instant
+import java.util.concurrent.ThreadLocalRandom
+
+/**
+ * Logs messages for one category. Messages are built lazily, so a disabled or sampled
+ * out message costs a volatile read and a comparison. Messages below WARN are kept with
+ * probability sampleRate, while warnings and errors are always kept.
+ */
+class Logger(val category: String, private val appender: ILogAppender) {
+
+    @Volatile
+    var level: LogLevel = LogLevel.INFO
+
+    @Volatile
+    var sampleRate: Double = 1.0
+
+    /**
+     * Returns whether a message at the given level should be logged, drawing the sample
+     * for levels below WARN.
+     */
+    fun isEnabled(messageLevel: LogLevel): Boolean {
+        if (messageLevel < level || messageLevel == LogLevel.OFF) {
+            return false
+        }
+        val rate = sampleRate
+        return messageLevel >= LogLevel.WARN || rate >= 1.0 || ThreadLocalRandom.current().nextDouble() < rate
+    }
+
+    inline fun trace(message: () -> String) {
+        if (isEnabled(LogLevel.TRACE)) write(LogLevel.TRACE, message())
+    }
+
+    inline fun debug(message: () -> String) {
+        if (isEnabled(LogLevel.DEBUG)) write(LogLevel.DEBUG, message())
+    }
+
+    inline fun info(message: () -> String) {
+        if (isEnabled(LogLevel.INFO)) write(LogLevel.INFO, message())
+    }
+
+    inline fun warn(message: () -> String) {
+        if (isEnabled(LogLevel.WARN)) write(LogLevel.WARN, message())
+    }
+
+    inline fun error(message: () -> String) {
+        if (isEnabled(LogLevel.ERROR)) write(LogLevel.ERROR, message())
+    }
+
+    /**
+     * Formats and hands a message to the appender. Callers should use the level methods,
+     * which skip building disabled messages.
+     */
+    fun write(messageLevel: LogLevel, message: String) {
+        appender.append("${Instant.now()} ${messageLevel.name} [${Thread.currentThread().name}] $category: $message")
+    }
+}
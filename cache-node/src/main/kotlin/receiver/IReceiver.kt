@@ -2,8 +2,6 @@ package receiver
 
 import cache.distributed.ITestableJavalinApp
 import com.fasterxml.jackson.annotation.JsonProperty
-import java.util.concurrent.atomic.AtomicInteger
-import java.util.concurrent.atomic.AtomicReference
 
 /**
  * An interface specifying the behavior of a receiver, which receives request from other
@@ -33,28 +31,39 @@ interface IReceiver: ITestableJavalinApp {
      */
     fun getServerRequestTiming(): TotalRequestTiming
 
+    /**
+     * Returns the latency histograms of the requests served so far.
+     */
+    fun getRequestLatencies(): Map<String, HistogramSnapshot>
 
 }
 /**
- * Information about what the receiver has done so far.
+ * Information about what the receiver has done so far. Attempts and successes count
+ * keys, so a bulk request counts once per key, while forwardedRequests counts requests
+ * received from other nodes.
  */
 data class ReceiverUsageInfo(
-    @JsonProperty("storeAttempts") val storeAttempts: AtomicInteger,
-    @JsonProperty("storeSuccesses") val storeSuccesses: AtomicInteger,
-    @JsonProperty("fetchAttempts") val fetchAttempts: AtomicInteger,
-    @JsonProperty("fetchSuccesses") val fetchSuccesses: AtomicInteger,
-    @JsonProperty("clearAttempts") val clearAttempts: AtomicInteger,
-    @JsonProperty("clearSuccesses") val clearSuccesses: AtomicInteger,
-    @JsonProperty("invalidRequests") val invalidRequests: AtomicInteger
+    @JsonProperty("storeAttempts") val storeAttempts: Long,
+    @JsonProperty("storeSuccesses") val storeSuccesses: Long,
+    @JsonProperty("fetchAttempts") val fetchAttempts: Long,
+    @JsonProperty("fetchSuccesses") val fetchSuccesses: Long,
+    @JsonProperty("clearAttempts") val clearAttempts: Long,
+    @JsonProperty("clearSuccesses") val clearSuccesses: Long,
+    @JsonProperty("invalidRequests") val invalidRequests: Long,
+    @JsonProperty("fetchHits") val fetchHits: Long,
+    @JsonProperty("fetchMisses") val fetchMisses: Long,
+    @JsonProperty("forwardedRequests") val forwardedRequests: Long,
+    @JsonProperty("storedBytes") val storedBytes: Long,
+    @JsonProperty("fetchedBytes") val fetchedBytes: Long
 )
 
 /**
  * The total time spent (in seconds) querying requests.
  */
 data class TotalRequestTiming(
-    @JsonProperty("storeTiming") val storeTiming: AtomicReference<Double>,
-    @JsonProperty("fetchTiming") val fetchTiming: AtomicReference<Double>,
-    @JsonProperty("clearTiming") val clearTiming: AtomicReference<Double>
+    @JsonProperty("storeTiming") val storeTiming: Double,
+    @JsonProperty("fetchTiming") val fetchTiming: Double,
+    @JsonProperty("clearTiming") val clearTiming: Double
 )
 
 /**
@@ -0,0 +1,155 @@
+package receiver
+
+import com.fasterxml.jackson.annotation.JsonProperty
+import java.util.concurrent.atomic.AtomicLongArray
+import java.util.concurrent.atomic.LongAccumulator
+import java.util.concurrent.atomic.LongAdder
+
+/**
+ * A latency histogram in nanoseconds with log-linear buckets, like an HDR histogram.
+ * Values below 16 ns have a bucket each, and every power of two above is split into 16
+ * buckets, so a bucket is at most 1/16 of its values wide. Recording increments one
+ * bucket, a sum and a maximum without locking.
+ *
+ * This class is thread-safe!
+ */
+class LatencyHistogram {
+
+    private val counts = AtomicLongArray(BUCKETS)
+
+    private val totalNanos = LongAdder()
+
+    private val maxNanos = LongAccumulator({ a, b -> maxOf(a, b) }, 0)
+
+    /**
+     * Records one latency, clamped to [0, 2^40) ns.
+     */
+    fun record(nanos: Long) {
+        val value = nanos.coerceIn(0, MAX_NANOS)
+        counts.incrementAndGet(bucketIndex(value))
+        totalNanos.add(value)
+        maxNanos.accumulate(value)
+    }
+
+    fun getTotalNanos(): Long {
+        return totalNanos.sum()
+    }
+
+    /**
+     * Returns the non-empty buckets and percentiles recorded so far. Recordings made
+     * while the snapshot is taken may be partially included.
+     */
+    fun snapshot(): HistogramSnapshot {
+        val buckets = mutableListOf<HistogramBucket>()
+        for (index in 0 until BUCKETS) {
+            val count = counts.get(index)
+            if (count > 0) {
+                buckets.add(HistogramBucket(lowerBound(index), upperBound(index), count))
+            }
+        }
+        return HistogramSnapshot.of(buckets, totalNanos.sum(), maxNanos.get())
+    }
+
+    companion object {
+        private const val SUB_BUCKET_BITS = 4
+        private const val SUB_BUCKETS = 1 shl SUB_BUCKET_BITS
+        private const val MAX_MAGNITUDE = 40
+        private const val MAX_NANOS = (1L shl MAX_MAGNITUDE) - 1
+        private const val BUCKETS = SUB_BUCKETS + (MAX_MAGNITUDE - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+        fun bucketIndex(nanos: Long): Int {
+            if (nanos < SUB_BUCKETS) {
+                return nanos.toInt()
+            }
+            val magnitude = 63 - java.lang.Long.numberOfLeadingZeros(nanos)
+            val shift = magnitude - SUB_BUCKET_BITS
+            val subBucket = ((nanos ushr shift) and (SUB_BUCKETS - 1).toLong()).toInt()
+            return SUB_BUCKETS + shift * SUB_BUCKETS + subBucket
+        }
+
+        fun lowerBound(index: Int): Long {
+            if (index < SUB_BUCKETS) {
+                return index.toLong()
+            }
+            val shift = (index - SUB_BUCKETS) / SUB_BUCKETS
+            val subBucket = (index - SUB_BUCKETS) % SUB_BUCKETS
+            return (SUB_BUCKETS + subBucket).toLong() shl shift
+        }
+
+        fun upperBound(index: Int): Long {
+            return if (index + 1 < BUCKETS) lowerBound(index + 1) - 1 else MAX_NANOS
+        }
+    }
+}
+
+/**
+ * Number of latencies recorded in [lowerNanos, upperNanos].
+ */
+data class HistogramBucket(
+    @JsonProperty("lowerNanos") val lowerNanos: Long,
+    @JsonProperty("upperNanos") val upperNanos: Long,
+    @JsonProperty("count") val count: Long
+)
+
+/**
+ * The non-empty buckets of a latency histogram, along with its percentiles. A
+ * percentile is the upper bound of the bucket that holds it, capped at the maximum.
+ */
+data class HistogramSnapshot(
+    @JsonProperty("count") val count: Long,
+    @JsonProperty("totalNanos") val totalNanos: Long,
+    @JsonProperty("maxNanos") val maxNanos: Long,
+    @JsonProperty("p50Nanos") val p50Nanos: Long,
+    @JsonProperty("p99Nanos") val p99Nanos: Long,
+    @JsonProperty("p999Nanos") val p999Nanos: Long,
+    @JsonProperty("buckets") val buckets: List<HistogramBucket>
+) {
+
+    /**
+     * Adds the latencies of another histogram to this one.
+     */
+    fun merge(other: HistogramSnapshot): HistogramSnapshot {
+        val merged = (buckets + other.buckets)
+            .groupBy { it.lowerNanos }
+            .map { (lowerNanos, same) -> HistogramBucket(lowerNanos, same[0].upperNanos, same.sumOf { it.count }) }
+        return of(merged, totalNanos + other.totalNanos, maxOf(maxNanos, other.maxNanos))
+    }
+
+    companion object {
+        fun of(buckets: List<HistogramBucket>, totalNanos: Long, maxNanos: Long): HistogramSnapshot {
+            val sorted = buckets.sortedBy { it.lowerNanos }
+            val count = sorted.sumOf { it.count }
+
+            fun percentile(quantile: Double): Long {
+                val rank = Math.ceil(quantile * count).toLong().coerceAtLeast(1)
+                var seen = 0L
+                for (bucket in sorted) {
+                    seen += bucket.count
+                    if (seen >= rank) {
+                        return minOf(bucket.upperNanos, maxNanos)
+                    }
+                }
+                return 0
+            }
+
+            return HistogramSnapshot(
+                count, totalNanos, maxNanos,
+                percentile(0.5), percentile(0.99), percentile(0.999),
+                sorted
+            )
+        }
+    }
+}
+
+/**
+ * Merges the latency histograms of several nodes by name.
+ */
+fun mergeLatencies(nodeLatencies: List<Map<String, HistogramSnapshot>>): Map<String, HistogramSnapshot> {
+    val merged = sortedMapOf<String, HistogramSnapshot>()
+    for (latencies in nodeLatencies) {
+        for ((name, histogram) in latencies) {
+            merged[name] = merged[name]?.merge(histogram) ?: histogram
+        }
+    }
+    return merged
+}
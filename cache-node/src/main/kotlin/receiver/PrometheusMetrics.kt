@@ -0,0 +1,176 @@
+package receiver
+
+import cache.distributed.IDistributedCache.SystemInfo
+
+/**
+ * Writes metric families in the Prometheus text exposition format, which OpenMetrics
+ * scrapers also accept.
+ */
+class PrometheusMetrics {
+
+    private val builder = StringBuilder()
+
+    /**
+     * Writes a counter with one sample per label set.
+     */
+    fun counter(name: String, help: String, samples: Map<Map<String, String>, Number>) {
+        family(name, "counter", help)
+        for ((labels, value) in samples) {
+            sample(name, labels, value)
+        }
+    }
+
+    fun counter(name: String, help: String, value: Number) {
+        counter(name, help, mapOf(emptyMap<String, String>() to value))
+    }
+
+    /**
+     * Writes a gauge with one sample per label set.
+     */
+    fun gauge(name: String, help: String, samples: Map<Map<String, String>, Number>) {
+        family(name, "gauge", help)
+        for ((labels, value) in samples) {
+            sample(name, labels, value)
+        }
+    }
+
+    fun gauge(name: String, help: String, value: Number) {
+        gauge(name, help, mapOf(emptyMap<String, String>() to value))
+    }
+
+    /**
+     * Writes latency histograms in seconds with one series per label set. The log-linear
+     * buckets of a HistogramSnapshot are summed into one cumulative bucket per power of
+     * two nanoseconds between HISTOGRAM_MIN_MAGNITUDE and HISTOGRAM_MAX_MAGNITUDE, which
+     * line up with its bucket bounds.
+     */
+    fun histogram(name: String, help: String, histograms: Map<Map<String, String>, HistogramSnapshot>) {
+        family(name, "histogram", help)
+        for ((labels, histogram) in histograms) {
+            var cumulative = 0L
+            var index = 0
+            for (magnitude in HISTOGRAM_MIN_MAGNITUDE..HISTOGRAM_MAX_MAGNITUDE) {
+                val bound = 1L shl magnitude
+                while (index < histogram.buckets.size && histogram.buckets[index].upperNanos < bound) {
+                    cumulative += histogram.buckets[index++].count
+                }
+                sample("${name}_bucket", labels + ("le" to (bound / 1e9).toString()), cumulative)
+            }
+            sample("${name}_bucket", labels + ("le" to "+Inf"), histogram.count)
+            sample("${name}_sum", labels, histogram.totalNanos / 1e9)
+            sample("${name}_count", labels, histogram.count)
+        }
+    }
+
+    override fun toString(): String {
+        return builder.toString()
+    }
+
+    private fun family(name: String, type: String, help: String) {
+        builder.append("# HELP ").append(name).append(' ').append(help).append('\n')
+        builder.append("# TYPE ").append(name).append(' ').append(type).append('\n')
+    }
+
+    private fun sample(name: String, labels: Map<String, String>, value: Number) {
+        builder.append(name)
+        if (labels.isNotEmpty()) {
+            builder.append(labels.entries.joinToString(",", "{", "}") { (label, labelValue) ->
+                "$label=\"${escape(labelValue)}\""
+            })
+        }
+        builder.append(' ').append(value).append('\n')
+    }
+
+    private fun escape(labelValue: String): String {
+        return labelValue.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    }
+
+    companion object {
+        /**
+         * Content type of the text exposition format
+         */
+        const val CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+        /* Histogram buckets range from about 1 us to 34 s */
+        private const val HISTOGRAM_MIN_MAGNITUDE = 10
+        private const val HISTOGRAM_MAX_MAGNITUDE = 35
+
+        /**
+         * Formats the counters, cache size and request latencies of one node. Every node
+         * is scraped on its own, so no metric depends on other nodes.
+         */
+        fun format(info: SystemInfo): String {
+            val metrics = PrometheusMetrics()
+            val receiver = info.receiverUsageInfo
+            val sender = info.senderUsageInfo
+
+            metrics.gauge("cachecow_node_info", "Id and host name of the node.",
+                mapOf(mapOf("node_id" to info.nodeId.toString(), "host" to info.hostName) to 1))
+
+            metrics.counter("cachecow_requests_total", "Keys requested by clients and other nodes, by operation.", mapOf(
+                op("fetch") to receiver.fetchAttempts,
+                op("store") to receiver.storeAttempts,
+                op("clear") to receiver.clearAttempts
+            ))
+            metrics.counter("cachecow_request_successes_total", "Keys whose request completed without error, by operation. Only found keys count for fetches.", mapOf(
+                op("fetch") to receiver.fetchSuccesses,
+                op("store") to receiver.storeSuccesses,
+                op("clear") to receiver.clearSuccesses
+            ))
+            metrics.counter("cachecow_invalid_requests_total", "Requests to unknown endpoints.", receiver.invalidRequests)
+            metrics.counter("cachecow_cache_hits_total", "Fetched keys that were found.", receiver.fetchHits)
+            metrics.counter("cachecow_cache_misses_total", "Fetched keys that were not found.", receiver.fetchMisses)
+            metrics.counter("cachecow_value_bytes_total", "Value bytes stored and returned.", mapOf(
+                op("fetch") to receiver.fetchedBytes,
+                op("store") to receiver.storedBytes
+            ))
+            metrics.counter("cachecow_received_forwarded_requests_total", "Requests received from other nodes.",
+                receiver.forwardedRequests)
+
+            metrics.counter("cachecow_forwarded_requests_total", "Keys forwarded to other nodes, by operation.", mapOf(
+                op("fetch") to sender.fetchAttempts,
+                op("store") to sender.storeAttempts,
+                op("remove") to sender.removeAttempts,
+                op("clear") to sender.clearAttempts
+            ))
+            metrics.counter("cachecow_forwarded_request_successes_total", "Forwarded keys the other node answered, by operation.", mapOf(
+                op("fetch") to sender.fetchSuccesses,
+                op("store") to sender.storeSuccesses,
+                op("remove") to sender.removeSuccesses,
+                op("clear") to sender.clearSuccesses
+            ))
+
+            val cache = info.cacheInfo
+            metrics.gauge("cachecow_cache_keys", "Keys in the local cache.", cache.totalKeys)
+            metrics.gauge("cachecow_cache_data_bytes", "Key and value bytes in the local cache.", cache.memorySize)
+            metrics.gauge("cachecow_cache_used_bytes", "Bytes counted against the budget of the local cache.", cache.usedBytes)
+            metrics.gauge("cachecow_cache_max_bytes", "Byte budget of the local cache.", cache.maxBytes)
+            metrics.counter("cachecow_cache_evictions_total", "Keys evicted from the local cache.", cache.evictions)
+
+            metrics.gauge("cachecow_jvm_memory_used_bytes", "Heap bytes allocated by the JVM.", info.memUsage.allocated)
+            metrics.gauge("cachecow_jvm_memory_max_bytes", "Maximum heap bytes of the JVM.", info.memUsage.max)
+
+            metrics.histogram("cachecow_request_duration_seconds",
+                "Latency of the requests served, by operation, origin and outcome.",
+                info.latencies.mapKeys { (name, _) -> latencyLabels(name) })
+
+            return metrics.toString()
+        }
+
+        private fun op(name: String): Map<String, String> {
+            return mapOf("op" to name)
+        }
+
+        /**
+         * Splits a latency name like "fetch.client.hit" or "store.forwarded" into labels.
+         */
+        private fun latencyLabels(name: String): Map<String, String> {
+            val parts = name.split('.')
+            val labels = mutableMapOf("op" to parts[0], "origin" to parts[1])
+            if (parts.size > 2) {
+                labels["outcome"] = parts[2]
+            }
+            return labels
+        }
+    }
+}
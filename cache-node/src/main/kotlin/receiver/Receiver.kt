@@ -1,18 +1,24 @@
 package receiver
 
+import BulkFetchRequest
+import BulkFetchResponse
+import BulkStoreRequest
+import KeyValuePair
 import KeyVersionPair
 import cache.distributed.IDistributedCache
+import exception.KeyNotFoundException
 import exception.base.CacheNodeException
 import io.javalin.Javalin
 import io.javalin.config.JavalinConfig
+import io.javalin.http.Context
 import io.javalin.plugin.bundled.CorsContainer
 import io.javalin.plugin.bundled.CorsPluginConfig
 import io.javalin.validation.ValidationError
 import io.javalin.validation.ValidationException
+import logging.LogLevel
+import logging.LogManager
 import org.eclipse.jetty.http.HttpStatus
-import java.util.concurrent.atomic.AtomicInteger
-import java.util.concurrent.atomic.AtomicReference
-import kotlin.system.measureTimeMillis
+import java.util.concurrent.CompletionException
 
 /**
  * A concrete receiver that accepts requests over HTTP.
@@ -22,6 +28,10 @@ open class Receiver(
     private val distributedCache: IDistributedCache
 ) : IReceiver {
 
+    /**
+     * Logger for incoming requests
+     */
+    protected val logger = LogManager.getLogger(LogManager.RECEIVER)
 
     protected var nodeCount = count
 
@@ -37,28 +47,26 @@ open class Receiver(
     /**
      * Counts the number of requests that are received
      */
-    private var receiverUsageInfo: ReceiverUsageInfo = ReceiverUsageInfo(
-        AtomicInteger(0), AtomicInteger(0), AtomicInteger(0),
-        AtomicInteger(0), AtomicInteger(0), AtomicInteger(0),
-        AtomicInteger(0))
+    private val usageCounters = ReceiverUsageCounters()
+
+    /**
+     * Latency histograms of client and server requests
+     */
+    private val requestLatencies = RequestLatencies()
 
     /**
-     * Time spent (in seconds) to perform client requests.
+     * Ring buffer of recent key accesses, null until tracing is first started
      */
-    private var clientRequestTiming: TotalRequestTiming = TotalRequestTiming(
-        AtomicReference<Double>(0.0), AtomicReference<Double>(0.0),
-        AtomicReference<Double>(0.0))
+    @Volatile private var traceRecorder: TraceRecorder? = null
 
     /**
-     * Time spent (in seconds) to perform server requests.
+     * Whether key accesses are being recorded to traceRecorder
      */
-    private var serverRequestTiming: TotalRequestTiming = TotalRequestTiming(
-        AtomicReference<Double>(0.0), AtomicReference<Double>(0.0),
-        AtomicReference<Double>(0.0))
+    @Volatile private var tracing = false
 
     init {
         /** ENDPOINTS **/
-        print("RECEIVER: Initializing Javalin\n")
+        logger.info { "Initializing Javalin" }
 
         /* Check if receiver is up and running */
         app.get("/v1/hello-world") { ctx ->
@@ -67,138 +75,280 @@ open class Receiver(
 
         /* Handle fetch requests */
         app.get("/v1/blobs/{key}/{version}") { ctx ->
-            print("\n*********FETCH REQUEST*********\n")
-            receiverUsageInfo.fetchAttempts.getAndIncrement()
-
-            // Handle Request
-            var isClientRequest = false
-            val requestTime = 1/1000.0 * measureTimeMillis {
-                // Parse Path
-                val key = ctx.pathParam("key")
-                val version = ctx.pathParamAsClass("version", Int::class.java)
-                    .check({ it >= 0 }, "Version number cannot be negative")
-                    .get()
-                val senderNum = if (ctx.queryParam("senderId") == null) null else
-                    ctx.queryParamAsClass("senderId", Int::class.java)
-                        .check(
-                            { it in 0 until nodeCount },
-                            "Sender id must be in range (0, ${nodeCount - 1})"
-                        )
-                        .get()
-                isClientRequest = senderNum == null
-
-                // Fetch Data
-                val value = distributedCache.fetch(KeyVersionPair(key, version))
-
-                if (value != null) {
-                    ctx.result(value).status(HttpStatus.OK_200)
-                } else {
-                    ctx.status(HttpStatus.NOT_FOUND_404)
+            logger.debug { "Fetch request" }
+            usageCounters.fetchAttempts.increment()
+            val startTime = System.nanoTime()
+
+            // Parse Path
+            val key = ctx.pathParam("key")
+            val version = ctx.pathParamAsClass("version", Int::class.java)
+                .check({ it >= 0 }, "Version number cannot be negative")
+                .get()
+            val isClientRequest = parseSenderId(ctx) == null
+
+            // Fetch Data, a forwarded fetch does not hold this thread while the owner answers
+            val fetch = distributedCache.fetchAsync(KeyVersionPair(key, version))
+            ctx.future {
+                // The owner answers a forwarded miss with KeyNotFoundException, count it as a miss
+                fetch.handle<ByteArray?> { value, e ->
+                    val cause = if (e is CompletionException) e.cause ?: e else e
+                    if (cause != null && cause !is KeyNotFoundException) {
+                        throw cause
+                    }
+                    value
+                }.thenAccept { value ->
+                    if (value != null) {
+                        ctx.result(value).status(HttpStatus.OK_200)
+                    } else {
+                        ctx.status(HttpStatus.NOT_FOUND_404)
+                    }
+
+                    if (tracing) {
+                        traceRecorder?.record(TraceRecorder.FETCH, key, version, value?.size ?: 0, value != null, !isClientRequest)
+                    }
+
+                    // Increment node statistics
+                    countFetches(1, if (value != null) 1 else 0, value?.size?.toLong() ?: 0, !isClientRequest)
+                    requestLatencies.record(RequestOp.FETCH, !isClientRequest, value != null, startTime)
                 }
             }
-
-            // Increment node statistics
-            receiverUsageInfo.fetchSuccesses.getAndIncrement()
-            if (isClientRequest) {
-                clientRequestTiming.fetchTiming.accumulateAndGet(requestTime) { a: Double, b: Double -> a + b }
-            } else {
-                serverRequestTiming.fetchTiming.accumulateAndGet(requestTime) { a: Double, b: Double -> a + b }
-            }
         }
 
         /* Handle Store Requests */
         app.post("/v1/blobs/{key}/{version}") { ctx ->
-            print("\n*********STORE REQUEST*********\n")
-            receiverUsageInfo.storeAttempts.getAndIncrement()
+            logger.debug { "Store request" }
+            usageCounters.storeAttempts.increment()
+            val startTime = System.nanoTime()
+
+            // Parse Path
+            val key = ctx.pathParam("key")
+            val version = ctx.pathParamAsClass("version", Int::class.java)
+                .check({ it >= 0}, "Version number cannot be negative")
+                .get()
+            val isClientRequest = parseSenderId(ctx) == null
+
+            val value = ctx.bodyAsBytes()
+            if (value.isEmpty()) {
+                throw simpleValidationException("Binary blob cannot be empty")
+            }
 
-            // Handle Request
-            var isClientRequest = false
-            val requestTime = 1/1000.0 * measureTimeMillis {
-                val key = ctx.pathParam("key")
-                val version = ctx.pathParamAsClass("version", Int::class.java)
-                    .check({ it >= 0}, "Version number cannot be negative")
-                    .get()
-                val senderNum = if (ctx.queryParam("senderId") == null) null else
-                    ctx.queryParamAsClass("senderId", Int::class.java)
-                        .check({ it in 0 until nodeCount }, "Sender id must be in range (0, ${nodeCount - 1})")
-                        .get()
-                isClientRequest = senderNum == null
-
-                // Store Data
-                val value = ctx.bodyAsBytes()
-                if (value.isEmpty()) {
-                    throw simpleValidationException("Binary blob cannot be empty")
+            // Store Data, a forwarded store does not hold this thread while the owner answers
+            val store = distributedCache.storeAsync(KeyVersionPair(key, version), value)
+            ctx.future {
+                store.thenAccept {
+                    ctx.json(KeyVersionReply(key, version)).status(HttpStatus.CREATED_201)
+                    if (tracing) {
+                        traceRecorder?.record(TraceRecorder.STORE, key, version, value.size, true, !isClientRequest)
+                    }
+
+                    // Increment node statistics
+                    countStores(1, value.size.toLong(), !isClientRequest)
+                    requestLatencies.record(RequestOp.STORE, !isClientRequest, true, startTime)
                 }
-                distributedCache.store(KeyVersionPair(key, version), value)
+            }
+        }
+
+        /* Handle bulk fetch requests */
+        app.post("/v1/blobs/_mget") { ctx ->
+            logger.debug { "Bulk fetch request" }
+            val startTime = System.nanoTime()
 
-                ctx.json(KeyVersionReply(key, version)).status(HttpStatus.CREATED_201)
+            // Handle Request
+            val isClientRequest = parseSenderId(ctx) == null
+            val bulkFetch = ctx.bodyAsClass(BulkFetchRequest::class.java)
+            val pairCount = bulkFetch.pairs.size
+            usageCounters.fetchAttempts.add(pairCount.toLong())
+            if (bulkFetch.pairs.any { it.version < 0 }) {
+                throw simpleValidationException("Version number cannot be negative")
             }
 
+            // Fetch Data
+            val values = distributedCache.fetchMany(bulkFetch.pairs, isClientRequest)
+            ctx.json(BulkFetchResponse(values)).status(HttpStatus.OK_200)
+            traceFetches(bulkFetch.pairs, values, !isClientRequest)
+
             // Increment node statistics
-            receiverUsageInfo.storeSuccesses.getAndIncrement()
-            if (isClientRequest) {
-                clientRequestTiming.storeTiming.accumulateAndGet(requestTime) { a: Double, b: Double -> a + b }
-            } else {
-                serverRequestTiming.storeTiming.accumulateAndGet(requestTime) { a: Double, b: Double -> a + b }
+            countFetches(pairCount, values.size, values.sumOf { it.value.size.toLong() }, !isClientRequest)
+            requestLatencies.record(RequestOp.MGET, !isClientRequest, values.size == pairCount, startTime)
+        }
+
+        /* Handle bulk store requests */
+        app.post("/v1/blobs/_mset") { ctx ->
+            logger.debug { "Bulk store request" }
+            val startTime = System.nanoTime()
+
+            // Handle Request
+            val isClientRequest = parseSenderId(ctx) == null
+            val bulkStore = ctx.bodyAsClass(BulkStoreRequest::class.java)
+            val pairCount = bulkStore.values.size
+            usageCounters.storeAttempts.add(pairCount.toLong())
+            if (bulkStore.values.any { it.version < 0 }) {
+                throw simpleValidationException("Version number cannot be negative")
+            }
+            if (bulkStore.values.any { it.value.isEmpty() }) {
+                throw simpleValidationException("Binary blob cannot be empty")
+            }
+
+            // Store Data
+            distributedCache.storeMany(bulkStore.values, isClientRequest)
+            ctx.status(HttpStatus.NO_CONTENT_204)
+            traceStores(bulkStore.values, !isClientRequest)
+
+            // Increment node statistics
+            countStores(pairCount, bulkStore.values.sumOf { it.value.size.toLong() }, !isClientRequest)
+            requestLatencies.record(RequestOp.MSET, !isClientRequest, true, startTime)
+        }
+
+        /* Handle fetches of replicated keys, which are served from this node's cache only */
+        app.post("/v1/replicas/_mget") { ctx ->
+            logger.debug { "Replica fetch request" }
+            val startTime = System.nanoTime()
+
+            if (parseSenderId(ctx) == null) {
+                throw simpleValidationException("Missing sender id")
+            }
+            val bulkFetch = ctx.bodyAsClass(BulkFetchRequest::class.java)
+            val pairCount = bulkFetch.pairs.size
+            usageCounters.fetchAttempts.add(pairCount.toLong())
+
+            val values = distributedCache.fetchReplicas(bulkFetch.pairs)
+            ctx.json(BulkFetchResponse(values)).status(HttpStatus.OK_200)
+            traceFetches(bulkFetch.pairs, values, true)
+
+            countFetches(pairCount, values.size, values.sumOf { it.value.size.toLong() }, true)
+            requestLatencies.record(RequestOp.MGET, true, values.size == pairCount, startTime)
+        }
+
+        /* Handle stores of replicated keys, which are stored to this node's cache only */
+        app.post("/v1/replicas/_mset") { ctx ->
+            logger.debug { "Replica store request" }
+            val startTime = System.nanoTime()
+
+            if (parseSenderId(ctx) == null) {
+                throw simpleValidationException("Missing sender id")
             }
+            val bulkStore = ctx.bodyAsClass(BulkStoreRequest::class.java)
+            val pairCount = bulkStore.values.size
+            usageCounters.storeAttempts.add(pairCount.toLong())
+
+            distributedCache.storeReplicas(bulkStore.values)
+            ctx.status(HttpStatus.NO_CONTENT_204)
+            traceStores(bulkStore.values, true)
+
+            countStores(pairCount, bulkStore.values.sumOf { it.value.size.toLong() }, true)
+            requestLatencies.record(RequestOp.MSET, true, true, startTime)
         }
 
         /* Handle Clear Requests */
         app.delete("/v1/clear") { ctx ->
-            print("\n*********CLEAR REQUEST*********\n")
-            receiverUsageInfo.clearAttempts.getAndIncrement()
+            logger.debug { "Clear request" }
+            usageCounters.clearAttempts.increment()
+            val startTime = System.nanoTime()
 
             // Handle Request
-            var isClientRequest = false
-            val requestTime = 1/1000.0 * measureTimeMillis {
-                // Parse Path
-                val senderNum = if (ctx.queryParam("senderId") == null) null else
-                    ctx.queryParamAsClass("senderId", Int::class.java)
-                        .check(
-                            { it in 0 until nodeCount },
-                            "Sender id must be in range (0, ${nodeCount - 1})"
-                        )
-                        .get()
-                isClientRequest = senderNum == null
-
-                // Clear Cache
-                distributedCache.clearAll(isClientRequest)
-                ctx.status(HttpStatus.NO_CONTENT_204)
-            }
+            val isClientRequest = parseSenderId(ctx) == null
+            distributedCache.clearAll(isClientRequest)
+            ctx.status(HttpStatus.NO_CONTENT_204)
 
             // Increment node statistics
-            receiverUsageInfo.clearSuccesses.getAndIncrement()
-            if (isClientRequest) {
-                clientRequestTiming.clearTiming.accumulateAndGet(requestTime) { a: Double, b: Double -> a + b }
-            } else {
-                serverRequestTiming.clearTiming.accumulateAndGet(requestTime) { a: Double, b: Double -> a + b }
+            usageCounters.clearSuccesses.increment()
+            if (!isClientRequest) {
+                usageCounters.forwardedRequests.increment()
             }
+            requestLatencies.record(RequestOp.CLEAR, !isClientRequest, true, startTime)
         }
 
         /* Get Local Cache Information */
         app.get("/v1/local-cache-info") { ctx ->
-            print("\n*********NODE INFO REQUEST*********\n")
+            logger.debug { "Node info request" }
             ctx.json(distributedCache.getSystemInfo()).status(HttpStatus.OK_200)
         }
 
         /* Get Global Cache Information */
         app.get("/v1/global-cache-info") { ctx ->
-            print("\n*********NODE INFO REQUEST*********\n")
+            logger.debug { "Node info request" }
             ctx.json(distributedCache.getGlobalSystemInfo()).status(HttpStatus.OK_200)
         }
 
+        /* Get the latency histograms of every node, merged by operation */
+        app.get("/v1/global-latency-info") { ctx ->
+            logger.debug { "Latency info request" }
+            val nodeLatencies = distributedCache.getGlobalSystemInfo().map { it.latencies }
+            ctx.json(mergeLatencies(nodeLatencies)).status(HttpStatus.OK_200)
+        }
+
+        /* Get the metrics of this node in the Prometheus text format */
+        app.get("/metrics") { ctx ->
+            logger.debug { "Metrics request" }
+            ctx.contentType(PrometheusMetrics.CONTENT_TYPE)
+                .result(PrometheusMetrics.format(distributedCache.getSystemInfo()))
+                .status(HttpStatus.OK_200)
+        }
+
+        /* Get Logging Settings */
+        app.get("/v1/admin/logging") { ctx ->
+            ctx.json(LogManager.getLoggingInfo()).status(HttpStatus.OK_200)
+        }
+
+        /* Change Logging Settings, applies to every category if none is given */
+        app.post("/v1/admin/logging") { ctx ->
+            val category = ctx.queryParam("category")
+            val level = ctx.queryParam("level")?.let { name ->
+                LogLevel.values().find { it.name == name.uppercase() }
+                    ?: throw simpleValidationException("Level must be one of ${LogLevel.values().joinToString()}")
+            }
+            val sampleRate = if (ctx.queryParam("sampleRate") == null) null else
+                ctx.queryParamAsClass("sampleRate", Double::class.java)
+                    .check({ it in 0.0..1.0 }, "Sample rate must be in range [0, 1]")
+                    .get()
+
+            LogManager.configure(category, level, sampleRate)
+            ctx.json(LogManager.getLoggingInfo()).status(HttpStatus.OK_200)
+        }
+
+        /* Get Trace Settings */
+        app.get("/v1/admin/trace") { ctx ->
+            ctx.json(getTraceInfo()).status(HttpStatus.OK_200)
+        }
+
+        /* Start or stop recording key accesses, starting discards the previous trace */
+        app.post("/v1/admin/trace") { ctx ->
+            val enabled = ctx.queryParamAsClass("enabled", Boolean::class.java).get()
+            if (enabled) {
+                val capacity = ctx.queryParamAsClass("capacity", Int::class.java)
+                    .getOrDefault(DEFAULT_TRACE_CAPACITY)
+                if (capacity !in 1..TraceRecorder.MAX_CAPACITY) {
+                    throw simpleValidationException("Capacity must be in range [1, ${TraceRecorder.MAX_CAPACITY}]")
+                }
+                traceRecorder = TraceRecorder(capacity)
+            }
+            tracing = enabled && traceRecorder != null
+            logger.info { "Trace recording ${if (tracing) "started" else "stopped"}" }
+            ctx.json(getTraceInfo()).status(HttpStatus.OK_200)
+        }
+
+        /* Download the recorded trace in the binary format of TraceRecorder.snapshot */
+        app.get("/v1/admin/trace/download") { ctx ->
+            val recorder = traceRecorder
+            if (recorder == null) {
+                ctx.result("No trace recorded").status(HttpStatus.NOT_FOUND_404)
+            } else {
+                ctx.contentType("application/octet-stream").result(recorder.snapshot()).status(HttpStatus.OK_200)
+            }
+        }
+
         /** ERROR HANDLING **/
 
         /* Catch and process any internal cache errors */
         app.exception(CacheNodeException::class.java) { e, ctx ->
-            print("RECEIVER: Caught cache node exception with id ${e.getExceptionID()}\n")
+            logger.debug { "Caught cache node exception with id ${e.getExceptionID()}" }
             ctx.result(e.message).status(e.status)
         }
 
         /* Catch and format any errors resulting from request validation */
         app.exception(ValidationException::class.java) { e, ctx ->
             val firstError = e.errors.asIterable().iterator().next()
-            print("RECEIVER: Caught validation exception for field ${firstError.key}: ${firstError.value[0].message}\n")
+            logger.debug { "Caught validation exception for field ${firstError.key}: ${firstError.value[0].message}" }
 
             // TODO: Return message in JSON response body, extract more info from exception
             ctx.result(firstError.value[0].message).status(HttpStatus.BAD_REQUEST_400)
@@ -207,7 +357,7 @@ open class Receiver(
         /* Handle invalid requests */
         app.error(HttpStatus.NOT_FOUND_404) { ctx ->
             if (ctx.result() == "Not found") {
-                receiverUsageInfo.invalidRequests.getAndIncrement()
+                usageCounters.invalidRequests.increment()
                 ctx.result(
               """
                 Invalid Request.
@@ -220,6 +370,62 @@ open class Receiver(
         }
     }
 
+    /**
+     * Parses the optional id of the node that sent the request, which is null for
+     * requests sent by clients.
+     */
+    protected fun parseSenderId(ctx: Context): Int? {
+        return if (ctx.queryParam("senderId") == null) null else
+            ctx.queryParamAsClass("senderId", Int::class.java)
+                .check({ it in 0 until nodeCount }, "Sender id must be in range (0, ${nodeCount - 1})")
+                .get()
+    }
+
+    /**
+     * Counts a fetch of keyCount keys, foundCount of which were found with foundBytes
+     * value bytes in total. Only found keys count as successes, as in the Sender.
+     */
+    private fun countFetches(keyCount: Int, foundCount: Int, foundBytes: Long, forwarded: Boolean) {
+        usageCounters.fetchSuccesses.add(foundCount.toLong())
+        usageCounters.fetchHits.add(foundCount.toLong())
+        usageCounters.fetchMisses.add((keyCount - foundCount).toLong())
+        usageCounters.fetchedBytes.add(foundBytes)
+        if (forwarded) {
+            usageCounters.forwardedRequests.increment()
+        }
+    }
+
+    /**
+     * Counts a successful store of keyCount keys with valueBytes value bytes in total.
+     */
+    private fun countStores(keyCount: Int, valueBytes: Long, forwarded: Boolean) {
+        usageCounters.storeSuccesses.add(keyCount.toLong())
+        usageCounters.storedBytes.add(valueBytes)
+        if (forwarded) {
+            usageCounters.forwardedRequests.increment()
+        }
+    }
+
+    private fun traceFetches(kvPairs: List<KeyVersionPair>, found: List<KeyValuePair>, forwarded: Boolean) {
+        val recorder = traceRecorder?.takeIf { tracing } ?: return
+        val sizes = found.associate { KeyVersionPair(it.key, it.version) to it.value.size }
+        for (kvPair in kvPairs) {
+            val size = sizes[kvPair]
+            recorder.record(TraceRecorder.FETCH, kvPair.key, kvPair.version, size ?: 0, size != null, forwarded)
+        }
+    }
+
+    private fun traceStores(kvPairs: List<KeyValuePair>, forwarded: Boolean) {
+        val recorder = traceRecorder?.takeIf { tracing } ?: return
+        for (kvPair in kvPairs) {
+            recorder.record(TraceRecorder.STORE, kvPair.key, kvPair.version, kvPair.value.size, true, forwarded)
+        }
+    }
+
+    private fun getTraceInfo(): TraceInfo {
+        return traceRecorder?.getTraceInfo(tracing) ?: TraceInfo(false, 0, 0, 0)
+    }
+
     protected fun simpleValidationException(message: String): ValidationException {
         return ValidationException(mapOf("REQUEST_BODY" to listOf(ValidationError(message))))
     }
@@ -236,14 +442,25 @@ open class Receiver(
     }
 
     override fun getReceiverUsageInfo(): ReceiverUsageInfo {
-        return receiverUsageInfo
+        return usageCounters.snapshot()
     }
 
     override fun getClientRequestTiming(): TotalRequestTiming {
-        return clientRequestTiming
+        return requestLatencies.getRequestTiming(false)
     }
 
     override fun getServerRequestTiming(): TotalRequestTiming {
-        return serverRequestTiming
+        return requestLatencies.getRequestTiming(true)
+    }
+
+    override fun getRequestLatencies(): Map<String, HistogramSnapshot> {
+        return requestLatencies.snapshot()
+    }
+
+    companion object {
+        /**
+         * Number of key accesses kept when tracing is started without a capacity
+         */
+        const val DEFAULT_TRACE_CAPACITY = 1_000_000
     }
 }
\ No newline at end of file
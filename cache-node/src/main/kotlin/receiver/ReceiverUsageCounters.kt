@@ -0,0 +1,61 @@
+package receiver
+
+import java.util.concurrent.atomic.LongAdder
+
+/**
+ * Counts the requests a receiver has handled. The counters are striped LongAdders, so
+ * request threads do not contend on a shared counter, and are only summed when a
+ * snapshot is taken.
+ *
+ * This class is thread-safe!
+ */
+class ReceiverUsageCounters {
+
+    val storeAttempts = LongAdder()
+
+    val storeSuccesses = LongAdder()
+
+    val fetchAttempts = LongAdder()
+
+    val fetchSuccesses = LongAdder()
+
+    val clearAttempts = LongAdder()
+
+    val clearSuccesses = LongAdder()
+
+    val invalidRequests = LongAdder()
+
+    /* Keys found and not found by fetches */
+    val fetchHits = LongAdder()
+
+    val fetchMisses = LongAdder()
+
+    /* Requests sent by other nodes rather than clients */
+    val forwardedRequests = LongAdder()
+
+    /* Value bytes stored and returned */
+    val storedBytes = LongAdder()
+
+    val fetchedBytes = LongAdder()
+
+    /**
+     * Returns the current counts. Requests handled while the snapshot is taken may be
+     * partially included.
+     */
+    fun snapshot(): ReceiverUsageInfo {
+        return ReceiverUsageInfo(
+            storeAttempts.sum(),
+            storeSuccesses.sum(),
+            fetchAttempts.sum(),
+            fetchSuccesses.sum(),
+            clearAttempts.sum(),
+            clearSuccesses.sum(),
+            invalidRequests.sum(),
+            fetchHits.sum(),
+            fetchMisses.sum(),
+            forwardedRequests.sum(),
+            storedBytes.sum(),
+            fetchedBytes.sum()
+        )
+    }
+}
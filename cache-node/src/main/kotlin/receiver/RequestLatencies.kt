@@ -0,0 +1,84 @@
+package receiver
+
+/**
+ * Operations whose latency a receiver records. Bulk requests are kept apart from single
+ * key requests, since their latency grows with the batch size.
+ *
+ * @param hasMisses whether requests are split by hit and miss
+ */
+enum class RequestOp(val hasMisses: Boolean) {
+    FETCH(true),
+    STORE(false),
+    MGET(true),
+    MSET(false),
+    CLEAR(false)
+}
+
+/**
+ * Latency histograms of the requests served by a receiver, one per operation, origin
+ * (client or forwarded by another node) and outcome (hit or miss).
+ *
+ * This class is thread-safe!
+ */
+class RequestLatencies {
+
+    /* Four histograms per operation: client hit, client miss, forwarded hit, forwarded miss */
+    private val histograms = Array(RequestOp.values().size * 4) { LatencyHistogram() }
+
+    /**
+     * Records the latency of a request that started at startNanos.
+     *
+     * @param op operation of the request
+     * @param forwarded whether another node sent the request
+     * @param hit whether a fetch found its key, or a bulk fetch all of its keys
+     * @param startNanos System.nanoTime() when the request was received
+     */
+    fun record(op: RequestOp, forwarded: Boolean, hit: Boolean, startNanos: Long) {
+        histograms[index(op, forwarded, hit)].record(System.nanoTime() - startNanos)
+    }
+
+    /**
+     * Returns the non-empty histograms, named like "fetch.client.hit" or "store.forwarded".
+     */
+    fun snapshot(): Map<String, HistogramSnapshot> {
+        val snapshots = sortedMapOf<String, HistogramSnapshot>()
+        for (op in RequestOp.values()) {
+            for (forwarded in listOf(false, true)) {
+                for (hit in if (op.hasMisses) listOf(true, false) else listOf(true)) {
+                    val snapshot = histograms[index(op, forwarded, hit)].snapshot()
+                    if (snapshot.count > 0) {
+                        snapshots[name(op, forwarded, hit)] = snapshot
+                    }
+                }
+            }
+        }
+        return snapshots
+    }
+
+    /**
+     * Returns the total time, in seconds, spent on requests of one origin.
+     */
+    fun getRequestTiming(forwarded: Boolean): TotalRequestTiming {
+        fun seconds(vararg ops: RequestOp): Double {
+            return ops.sumOf { op ->
+                histograms[index(op, forwarded, true)].getTotalNanos() +
+                    if (op.hasMisses) histograms[index(op, forwarded, false)].getTotalNanos() else 0L
+            } / 1e9
+        }
+        return TotalRequestTiming(
+            seconds(RequestOp.STORE, RequestOp.MSET),
+            seconds(RequestOp.FETCH, RequestOp.MGET),
+            seconds(RequestOp.CLEAR)
+        )
+    }
+
+    private fun index(op: RequestOp, forwarded: Boolean, hit: Boolean): Int {
+        return op.ordinal * 4 + (if (forwarded) 2 else 0) + (if (hit || !op.hasMisses) 0 else 1)
+    }
+
+    private fun name(op: RequestOp, forwarded: Boolean, hit: Boolean): String {
+        val origin = if (forwarded) "forwarded" else "client"
+        val outcome = if (!op.hasMisses) "" else if (hit) ".hit" else ".miss"
+        return "${op.name.lowercase()}.$origin$outcome"
+    }
+}
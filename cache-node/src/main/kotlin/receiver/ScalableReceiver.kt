@@ -1,10 +1,11 @@
 package receiver
 
-import BulkCopyRequest
+import BulkCopyCodec
 import NodeId
 import ScalableMessage
 import ScalableMessageType
 import cache.distributed.IScalableDistributedCache
+import logging.LogManager
 import org.eclipse.jetty.http.HttpStatus
 
 /**
@@ -16,13 +17,18 @@ class ScalableReceiver(nodeId: NodeId, count: Int, private val distributedCache:
     distributedCache
 ), IScalableReceiver {
 
+    /**
+     * Logger for scaling messages
+     */
+    private val scalingLogger = LogManager.getLogger(LogManager.SCALING)
+
     init {
         /* Handle simple message passing for coordinating scaling process */
         app.post("/v1/inform") { ctx ->
-            print("\n*********INFORM REQUEST*********\n")
+            logger.debug { "Inform request" }
             val message = ctx.bodyAsClass(ScalableMessage::class.java)
 
-            print("SCALABLE RECEIVER: Deserialized message from node ${message.nodeId} with type ${message.type}\n")
+            scalingLogger.info { "Deserialized message from node ${message.nodeId} with type ${message.type}" }
 
             if (!distributedCache.scaleInProgress() && message.type != ScalableMessageType.LAUNCH_NODE) {
                 throw simpleValidationException("Scaling not currently in progress")
@@ -45,13 +51,13 @@ class ScalableReceiver(nodeId: NodeId, count: Int, private val distributedCache:
             var accepted = true
             when (message.type) {
                 ScalableMessageType.LAUNCH_NODE -> {
-                    print("SCALABLE RECEIVER: Got LAUNCH_NODE request from node ${message.nodeId}\n")
+                    scalingLogger.info { "Got LAUNCH_NODE request from node ${message.nodeId}" }
                     // Sender intends to launch a new node
                     accepted = distributedCache.handleLaunchRequest(message.nodeId)
                 }
 
                 ScalableMessageType.READY -> {
-                    print("SCALABLE RECEIVER: Got READY request from node ${message.nodeId}\n")
+                    scalingLogger.info { "Got READY request from node ${message.nodeId}" }
                     // New node just booted up and is ready to receive copied values
                     if (message.hostName.isBlank()) {
                         throw simpleValidationException("Missing host name")
@@ -60,7 +66,7 @@ class ScalableReceiver(nodeId: NodeId, count: Int, private val distributedCache:
                 }
 
                 ScalableMessageType.COPY_COMPLETE -> {
-                    print("SCALABLE RECEIVER: Got COPY_COMPLETE request from node ${message.nodeId}\n")
+                    scalingLogger.info { "Got COPY_COMPLETE request from node ${message.nodeId}" }
                     // Sender finished copying values to this node
                     if (nodeId != nodeCount) {
                         throw simpleValidationException("Only new node can accept this message type")
@@ -71,7 +77,7 @@ class ScalableReceiver(nodeId: NodeId, count: Int, private val distributedCache:
                 }
 
                 ScalableMessageType.SCALE_COMPLETE -> {
-                    print("SCALABLE RECEIVER: Got SCALE_COMPLETE request from node ${message.nodeId}\n")
+                    scalingLogger.info { "Got SCALE_COMPLETE request from node ${message.nodeId}" }
                     // New node has received all copied values, scaling has completed
                     distributedCache.handleScaleCompleteRequest()
                     nodeCount++
@@ -85,27 +91,27 @@ class ScalableReceiver(nodeId: NodeId, count: Int, private val distributedCache:
             }
         }
 
-        /* Handle bulk copy requests */
+        /* Handle bulk copy requests, the body is read as a stream of binary records */
         app.post("/v1/bulk-copy") { ctx ->
-            print("SCALABLE RECEIVER: Received bulk copy request\n")
-            val bulkCopy: BulkCopyRequest = ctx.bodyAsClass(BulkCopyRequest::class.java)
-
-            for (kvPair in bulkCopy.values) {
-                print("SCALABLE RECEIVER: Received pair ${kvPair.key}, ${kvPair.value.contentToString()}\n")
-            }
+            scalingLogger.debug { "Received bulk copy request" }
+            val senderId = parseSenderId(ctx) ?: throw simpleValidationException("Missing sender id")
 
             if (!distributedCache.scaleInProgress() || nodeId != nodeCount) {
                 throw simpleValidationException("New node can only receive bulk copy requests while scaling is in progress")
             }
-            if (bulkCopy.nodeId < 0 || bulkCopy.nodeId >= nodeCount) {
-                throw simpleValidationException("Invalid node id")
+
+            val kvPairs = try {
+                BulkCopyCodec.decode(ctx.bodyInputStream())
+            } catch (e: IllegalArgumentException) {
+                throw simpleValidationException(e.message ?: "Invalid bulk copy body")
             }
-            distributedCache.bulkLocalStore(bulkCopy.values)
+            scalingLogger.debug { "Received ${kvPairs.size} pairs from node $senderId" }
+            distributedCache.bulkLocalStore(kvPairs)
         }
 
         /* Attempt to launch a new node */
         app.post("/v1/launch-node") { ctx ->
-            print("SCALABLE RECEIVER: Received request to launch new node\n")
+            scalingLogger.info { "Received request to launch new node" }
             distributedCache.initiateLaunch()
             ctx.status(HttpStatus.OK_200)
         }
@@ -0,0 +1,143 @@
+package receiver
+
+import com.fasterxml.jackson.annotation.JsonProperty
+import org.apache.commons.codec.digest.MurmurHash3
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import java.util.concurrent.atomic.AtomicLong
+import java.util.concurrent.atomic.AtomicLongArray
+
+/**
+ * Records the key accesses served by a receiver in a fixed-size ring buffer, keeping the
+ * most recent capacity accesses. Recording never blocks: each access claims the next
+ * slot with a single atomic increment and fills it in. A slot also holds the sequence
+ * number of its access, cleared before the slot is filled and written after, so that a
+ * snapshot can skip slots that are overwritten while it is being taken.
+ *
+ * This class is thread-safe!
+ *
+ * @param capacity number of accesses kept
+ */
+class TraceRecorder(val capacity: Int) {
+
+    init {
+        require(capacity in 1..MAX_CAPACITY) { "Trace capacity must be in range [1, $MAX_CAPACITY]" }
+    }
+
+    /**
+     * Time the recording started at, in milliseconds since the epoch
+     */
+    val startMillis = System.currentTimeMillis()
+
+    private val startNanos = System.nanoTime()
+
+    /* Number of accesses recorded so far, the next access goes to slot next % capacity */
+    private val next = AtomicLong(0)
+
+    /* Sequence number + 1 of the access held by each slot, 0 while it is being filled */
+    private val sequences = AtomicLongArray(capacity)
+
+    /* Three words per slot: timestamp, key hash and version, value size and flags */
+    private val words = AtomicLongArray(capacity * 3)
+
+    /**
+     * Records a key access.
+     *
+     * @param op operation, FETCH or STORE
+     * @param key the key that was accessed
+     * @param version the version that was accessed
+     * @param valueSize size of the value read or written, 0 on a miss
+     * @param hit whether a fetch found the key, always true for stores
+     * @param forwarded whether the request was sent by another node rather than a client
+     */
+    fun record(op: Int, key: String, version: Int, valueSize: Int, hit: Boolean, forwarded: Boolean) {
+        val sequence = next.getAndIncrement()
+        val slot = (sequence % capacity).toInt()
+        val bytes = key.encodeToByteArray()
+
+        val keyHash = MurmurHash3.hash32x86(bytes, 0, bytes.size, 0)
+        val flag = op or (if (hit) HIT else 0) or (if (forwarded) FORWARDED else 0)
+
+        // Ordered writes, a reader that sees the new sequence number sees every word
+        sequences.set(slot, 0)
+        words.lazySet(3 * slot, System.nanoTime() - startNanos)
+        words.lazySet(3 * slot + 1, (keyHash.toLong() shl 32) or (version.toLong() and 0xffffffffL))
+        words.lazySet(3 * slot + 2, (valueSize.toLong() shl 8) or flag.toLong())
+        sequences.lazySet(slot, sequence + 1)
+    }
+
+    /**
+     * Returns the number of accesses recorded so far, including those overwritten.
+     */
+    fun getRecorded(): Long {
+        return next.get()
+    }
+
+    /**
+     * Encodes the accesses held by the buffer, oldest first. The little-endian format is
+     * a header of the magic "CCTR", the format version (int), the start time in epoch
+     * milliseconds (long) and the number of records (int), followed by records of
+     * RECORD_BYTES bytes each: nanoseconds since the start (long), MurmurHash3 of the
+     * key (int), version (int), value size (int) and flags (byte).
+     */
+    fun snapshot(): ByteArray {
+        val end = next.get()
+        val start = maxOf(0L, end - capacity)
+        val records = ByteBuffer.allocate(((end - start) * RECORD_BYTES).toInt()).order(ByteOrder.LITTLE_ENDIAN)
+        var count = 0
+        for (sequence in start until end) {
+            val slot = (sequence % capacity).toInt()
+            if (sequences.get(slot) != sequence + 1) continue
+            val timestamp = words.get(3 * slot)
+            val keyAndVersion = words.get(3 * slot + 1)
+            val sizeAndFlags = words.get(3 * slot + 2)
+            // Skip the slot if a newer access started overwriting it while it was copied
+            if (sequences.get(slot) != sequence + 1) continue
+            records.putLong(timestamp)
+                .putInt((keyAndVersion ushr 32).toInt())
+                .putInt(keyAndVersion.toInt())
+                .putInt((sizeAndFlags ushr 8).toInt())
+                .put(sizeAndFlags.toByte())
+            count++
+        }
+
+        val header = ByteBuffer.allocate(HEADER_BYTES).order(ByteOrder.LITTLE_ENDIAN)
+        header.put(MAGIC).putInt(FORMAT_VERSION).putLong(startMillis).putInt(count)
+        return header.array() + records.array().copyOf(count * RECORD_BYTES)
+    }
+
+    /**
+     * Returns the settings of this recorder.
+     *
+     * @param enabled whether accesses are currently being recorded
+     */
+    fun getTraceInfo(enabled: Boolean): TraceInfo {
+        return TraceInfo(enabled, capacity, getRecorded(), startMillis)
+    }
+
+    companion object {
+        /**
+         * Operations and flags of a record
+         */
+        const val FETCH = 0
+        const val STORE = 1
+        const val HIT = 1 shl 2
+        const val FORWARDED = 1 shl 3
+
+        const val MAX_CAPACITY = 10_000_000
+        const val FORMAT_VERSION = 1
+        const val HEADER_BYTES = 20
+        const val RECORD_BYTES = 21
+        private val MAGIC = "CCTR".encodeToByteArray()
+    }
+}
+
+/**
+ * Settings of the trace recorder of a node.
+ */
+data class TraceInfo(
+    @JsonProperty("enabled") val enabled: Boolean,
+    @JsonProperty("capacity") val capacity: Int,
+    @JsonProperty("recorded") val recorded: Long,
+    @JsonProperty("startMillis") val startMillis: Long
+)
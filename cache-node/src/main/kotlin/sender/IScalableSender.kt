@@ -1,8 +1,9 @@
 package sender
 
-import BulkCopyRequest
+import KeyValuePair
 import NodeId
 import ScalableMessage
+import java.util.concurrent.CompletableFuture
 
 /**
  * An interface providing message passing and broadcasting required to support node scaling.
@@ -10,12 +11,14 @@ import ScalableMessage
 interface IScalableSender: ISender {
 
     /**
-     * Copies a list of key value pairs to the given node.
+     * Copies a list of key value pairs to the given node without blocking, sending them as
+     * a length-prefixed binary body. Failed attempts are retried before the future fails.
      *
      * @param kvPairs list of key value pairs
      * @param destNodeId node id of destination node
+     * @return future completed once the destination node has stored the pairs
      */
-    fun sendBulkCopy(kvPairs: BulkCopyRequest, destNodeId: NodeId)
+    fun sendBulkCopyAsync(kvPairs: List<KeyValuePair>, destNodeId: NodeId): CompletableFuture<Unit>
 
     /**
      * Sends a scalable message to the given node.
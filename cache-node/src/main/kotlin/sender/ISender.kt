@@ -1,10 +1,11 @@
 package sender
 
+import KeyValuePair
 import KeyVersionPair
 import NodeId
 import cache.distributed.IDistributedCache.SystemInfo
 import com.fasterxml.jackson.annotation.JsonProperty
-import java.util.concurrent.atomic.AtomicInteger
+import java.util.concurrent.CompletableFuture
 
 /**
  * An interface specifying the behavior of a sender, which sends requests to other nodes
@@ -31,6 +32,63 @@ interface ISender {
      */
     fun storeToNode(kvPair: KeyVersionPair, value: ByteArray, destNodeId: NodeId)
 
+    /**
+     * Fetches a value from a remote node without blocking the calling thread.
+     *
+     * @param kvPair The key-version pair to look up
+     * @param destNodeId The node from which to retrieve the value
+     * @return A future of the value, completed with KeyNotFoundException on a miss
+     */
+    fun fetchFromNodeAsync(kvPair: KeyVersionPair, destNodeId: NodeId): CompletableFuture<ByteArray>
+
+    /**
+     * Stores a value to a remote node without blocking the calling thread.
+     *
+     * @param kvPair The key-version pair to store
+     * @param value The value to store
+     * @param destNodeId The node to which the value should be stored
+     * @return A future completed once the remote node has stored the value
+     */
+    fun storeToNodeAsync(kvPair: KeyVersionPair, value: ByteArray, destNodeId: NodeId): CompletableFuture<Unit>
+
+    /**
+     * Fetches a batch of values from a remote node in one request.
+     *
+     * @param kvPairs The key-version pairs to look up
+     * @param destNodeId The node from which to retrieve the values
+     * @return The key-value pairs that were found, misses are omitted
+     */
+    fun fetchManyFromNode(kvPairs: List<KeyVersionPair>, destNodeId: NodeId): MutableList<KeyValuePair>
+
+    /**
+     * Stores a batch of values to a remote node in one request.
+     *
+     * @param kvPairs The key-value pairs to store
+     * @param destNodeId The node to which the values should be stored
+     */
+    fun storeManyToNode(kvPairs: List<KeyValuePair>, destNodeId: NodeId)
+
+    /**
+     * Fetches a batch of values from the local cache of a node holding replicas of them.
+     * The node does not forward the request, so a miss is returned even if the primary
+     * node has the value.
+     *
+     * @param kvPairs The key-version pairs to look up
+     * @param destNodeId The replica node from which to retrieve the values
+     * @return A future of the key-value pairs that were found, misses are omitted
+     */
+    fun fetchManyFromReplicaAsync(kvPairs: List<KeyVersionPair>, destNodeId: NodeId): CompletableFuture<MutableList<KeyValuePair>>
+
+    /**
+     * Stores a batch of replicated values to the local cache of another node, which does
+     * not forward them.
+     *
+     * @param kvPairs The key-value pairs to store
+     * @param destNodeId The replica node to which the values should be stored
+     * @return A future completed once the replica has stored the values
+     */
+    fun storeManyToReplicaAsync(kvPairs: List<KeyValuePair>, destNodeId: NodeId): CompletableFuture<Unit>
+
     /**
      * Removes a specified element from the node's local cache.
      * @param kvPair The key-version pair to look up
@@ -62,15 +120,15 @@ interface ISender {
 }
 
 /**
- * Information about what the sender has done so far.
+ * Information about what the sender has done so far. Bulk requests count once per key.
  */
 data class SenderUsageInfo(
-    @JsonProperty("storeAttempts") val storeAttempts: AtomicInteger,
-    @JsonProperty("storeSuccesses") val storeSuccesses: AtomicInteger,
-    @JsonProperty("fetchAttempts") val fetchAttempts: AtomicInteger,
-    @JsonProperty("fetchSuccesses") val fetchSuccesses: AtomicInteger,
-    @JsonProperty("removeAttempts") val removeAttempts: AtomicInteger,
-    @JsonProperty("removeSuccesses") val removeSuccesses: AtomicInteger,
-    @JsonProperty("clearAttempts") val clearAttempts: AtomicInteger,
-    @JsonProperty("clearSuccesses") val clearSuccesses: AtomicInteger
+    @JsonProperty("storeAttempts") val storeAttempts: Long,
+    @JsonProperty("storeSuccesses") val storeSuccesses: Long,
+    @JsonProperty("fetchAttempts") val fetchAttempts: Long,
+    @JsonProperty("fetchSuccesses") val fetchSuccesses: Long,
+    @JsonProperty("removeAttempts") val removeAttempts: Long,
+    @JsonProperty("removeSuccesses") val removeSuccesses: Long,
+    @JsonProperty("clearAttempts") val clearAttempts: Long,
+    @JsonProperty("clearSuccesses") val clearSuccesses: Long
 )
\ No newline at end of file
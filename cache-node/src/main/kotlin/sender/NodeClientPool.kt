@@ -0,0 +1,160 @@
+package sender
+
+import NodeId
+import exception.ConnectionRefusedException
+import exception.CrossServerException
+import exception.RequestTimeoutException
+import exception.base.CacheNodeException
+import logging.LogManager
+import java.net.ConnectException
+import java.net.URI
+import java.net.http.HttpClient
+import java.net.http.HttpRequest
+import java.net.http.HttpResponse
+import java.net.http.HttpTimeoutException
+import java.time.Duration
+import java.util.concurrent.CompletableFuture
+import java.util.concurrent.CompletionException
+import java.util.concurrent.ConcurrentHashMap
+import java.util.concurrent.ConcurrentLinkedQueue
+import java.util.concurrent.Semaphore
+
+/**
+ * Settings for the HTTP clients used to message other nodes.
+ */
+data class SenderConfig(
+    val connectTimeoutMillis: Long = 1000,
+    val requestTimeoutMillis: Long = 5000,
+    val maxConnectionsPerNode: Int = 16
+)
+
+/**
+ * Holds one long-lived HTTP client per destination node. Each client keeps its
+ * HTTP/1.1 connections alive between requests, and at most maxConnectionsPerNode
+ * requests are sent to a node at once, which bounds the connections open to it.
+ * Requests past the limit wait in a queue without holding a thread.
+ */
+class NodeClientPool(private val nodeList: List<String>, private val config: SenderConfig) {
+
+    /**
+     * Logger for failed requests to other nodes
+     */
+    private val logger = LogManager.getLogger(LogManager.SENDER)
+
+    /**
+     * A destination node's client, the permits bounding its open connections and the
+     * requests waiting for a permit.
+     */
+    private class Destination(val client: HttpClient, maxConnections: Int) {
+        private val permits = Semaphore(maxConnections)
+        private val waiting = ConcurrentLinkedQueue<Runnable>()
+
+        /**
+         * Runs the send once a connection is free. The send must call release when its
+         * response arrives.
+         */
+        fun submit(send: Runnable) {
+            waiting.add(send)
+            drain()
+        }
+
+        fun release() {
+            permits.release()
+            drain()
+        }
+
+        private fun drain() {
+            while (waiting.isNotEmpty() && permits.tryAcquire()) {
+                val send = waiting.poll()
+                if (send == null) {
+                    permits.release()
+                    return
+                }
+                send.run()
+            }
+        }
+    }
+
+    private val destinations = ConcurrentHashMap<NodeId, Destination>()
+
+    /**
+     * Creates a request builder for the given path on the destination node.
+     */
+    fun newRequest(destNodeId: NodeId, path: String): HttpRequest.Builder {
+        return HttpRequest.newBuilder()
+            .uri(URI.create("http://${nodeList[destNodeId]}$path"))
+            .timeout(Duration.ofMillis(config.requestTimeoutMillis))
+    }
+
+    /**
+     * Sends a request to the destination node over its pooled client, blocking until the
+     * response arrives.
+     */
+    fun <T> send(destNodeId: NodeId, request: HttpRequest, bodyHandler: HttpResponse.BodyHandler<T>): HttpResponse<T> {
+        try {
+            return sendAsync(destNodeId, request, bodyHandler).join()
+        } catch (e: CompletionException) {
+            throw e.cause ?: e
+        }
+    }
+
+    /**
+     * Sends a request to the destination node over its pooled client without blocking.
+     * Transport failures complete the future with a CacheNodeException.
+     */
+    fun <T> sendAsync(
+        destNodeId: NodeId,
+        request: HttpRequest,
+        bodyHandler: HttpResponse.BodyHandler<T>
+    ): CompletableFuture<HttpResponse<T>> {
+        val destination = destinations.computeIfAbsent(destNodeId) {
+            Destination(
+                HttpClient.newBuilder()
+                    .version(HttpClient.Version.HTTP_1_1)
+                    .connectTimeout(Duration.ofMillis(config.connectTimeoutMillis))
+                    .build(),
+                config.maxConnectionsPerNode
+            )
+        }
+
+        val result = CompletableFuture<HttpResponse<T>>()
+        destination.submit {
+            val future = try {
+                destination.client.sendAsync(request, bodyHandler)
+            } catch (e: Exception) {
+                // The client rejected the request before sending it, so no response will
+                // release the permit
+                destination.release()
+                result.completeExceptionally(translateException(e, destNodeId))
+                return@submit
+            }
+            future.whenComplete { response, e ->
+                destination.release()
+                if (e == null) {
+                    result.complete(response)
+                } else {
+                    result.completeExceptionally(translateException(e, destNodeId))
+                }
+            }
+        }
+        return result
+    }
+
+    private fun translateException(e: Throwable, destNodeId: NodeId): CacheNodeException {
+        return when (val cause = if (e is CompletionException) e.cause ?: e else e) {
+            is CacheNodeException -> cause
+            is ConnectException -> {
+                logger.warn { "Caught connection refused exception" }
+                ConnectionRefusedException(destNodeId)
+            }
+            is HttpTimeoutException -> {
+                logger.warn { "Request to node $destNodeId timed out" }
+                RequestTimeoutException(destNodeId)
+            }
+            else -> {
+                logger.warn { "Request to node $destNodeId failed: ${cause.message}" }
+                CrossServerException(destNodeId)
+            }
+        }
+    }
+}
@@ -1,48 +1,39 @@
 package sender
 
-import BulkCopyRequest
+import BulkCopyCodec
+import KeyValuePair
 import NodeId
 import ScalableMessage
 import exception.ConnectionRefusedException
 import exception.CrossClientException
 import exception.CrossServerException
-import java.net.ConnectException
-import java.net.URI
-import java.net.http.HttpClient
+import exception.RequestTimeoutException
+import exception.base.CacheNodeException
 import java.net.http.HttpRequest
 import java.net.http.HttpResponse
 import java.util.concurrent.CompletableFuture
+import java.util.concurrent.CompletionException
 import kotlin.streams.asStream
 
 /**
  * Concrete implementation of a scalable sender.
  */
-class ScalableSender(private val nodeId: NodeId, private var nodeList: MutableList<String>): Sender(nodeId, nodeList), IScalableSender {
+class ScalableSender(private val nodeId: NodeId, private var nodeList: MutableList<String>, config: SenderConfig = SenderConfig()):
+    Sender(nodeId, nodeList, config), IScalableSender {
 
     /**
      * Default retry count on all scalable requests, used to make communication more robust.
      */
     private val defaultRetryCount = 3
 
-    override fun sendBulkCopy(kvPairs: BulkCopyRequest, destNodeId: NodeId) {
-        val client = HttpClient.newBuilder().build()
-
-        for (kvPair in kvPairs.values) {
-            print("SCALABLE SENDER: Sending pair ${kvPair.key}, ${kvPair.value.contentToString()}\n")
-        }
-        val request = generatePostRequest(kvPairs, "/v1/bulk-copy", destNodeId)
-
-        retryMessage(
-            { client.send(request, HttpResponse.BodyHandlers.ofString()) },
-            { statusCode: Int, nodeId: NodeId, isFinalTry: Boolean ->
-                scalableErrorHandler(
-                    statusCode,
-                    nodeId,
-                    isFinalTry
-                )
-            },
-            destNodeId
-        )
+    override fun sendBulkCopyAsync(kvPairs: List<KeyValuePair>, destNodeId: NodeId): CompletableFuture<Unit> {
+        val requestBody = BulkCopyCodec.encode(kvPairs)
+        logger.debug { "Sending ${kvPairs.size} pairs in ${requestBody.size} bytes to node $destNodeId" }
+        val request = clientPool.newRequest(destNodeId, "/v1/bulk-copy?senderId=$nodeId")
+            .header("Content-Type", BulkCopyCodec.contentType)
+            .POST(HttpRequest.BodyPublishers.ofByteArray(requestBody))
+            .build()
+        return retryMessageAsync(request, destNodeId)
     }
 
     override fun broadcastScalableMessageAsync(message: ScalableMessage) {
@@ -62,11 +53,10 @@ class ScalableSender(private val nodeId: NodeId, private var nodeList: MutableLi
     }
 
     override fun sendScalableMessage(message: ScalableMessage, destNodeId: NodeId) {
-        val client = HttpClient.newBuilder().build()
         val request = generatePostRequest(message, "/v1/inform", destNodeId)
 
         retryMessage(
-            { client.send(request, HttpResponse.BodyHandlers.ofString()) },
+            { clientPool.send(destNodeId, request, HttpResponse.BodyHandlers.ofString()) },
             { statusCode: Int, nodeId: NodeId, isFinalTry: Boolean ->
                 scalableErrorHandler(
                     statusCode,
@@ -114,9 +104,13 @@ class ScalableSender(private val nodeId: NodeId, private var nodeList: MutableLi
                 ) {
                     success = true
                 }
-            } catch (_: ConnectException) {
+            } catch (e: ConnectionRefusedException) {
+                if (retryRemaining == 1) {
+                    throw e
+                }
+            } catch (e: RequestTimeoutException) {
                 if (retryRemaining == 1) {
-                    throw ConnectionRefusedException(destNodeId)
+                    throw e
                 }
             }
             retryRemaining--
@@ -124,14 +118,43 @@ class ScalableSender(private val nodeId: NodeId, private var nodeList: MutableLi
         return response
     }
 
+    /**
+     * Sends the request without blocking, retrying on the same failures as retryMessage.
+     */
+    private fun retryMessageAsync(
+        request: HttpRequest,
+        destNodeId: NodeId,
+        retryRemaining: Int = defaultRetryCount
+    ): CompletableFuture<Unit> {
+        return clientPool.sendAsync(destNodeId, request, HttpResponse.BodyHandlers.discarding())
+            .handle { response, e ->
+                val isFinalTry = retryRemaining == 1
+                try {
+                    when (val cause = if (e is CompletionException) e.cause ?: e else e) {
+                        null -> if (scalableErrorHandler(response.statusCode(), destNodeId, isFinalTry)) {
+                            retryMessageAsync(request, destNodeId, retryRemaining - 1)
+                        } else {
+                            CompletableFuture.completedFuture(Unit)
+                        }
+                        is ConnectionRefusedException, is RequestTimeoutException -> if (isFinalTry) {
+                            CompletableFuture.failedFuture<Unit>(cause)
+                        } else {
+                            retryMessageAsync(request, destNodeId, retryRemaining - 1)
+                        }
+                        else -> CompletableFuture.failedFuture<Unit>(cause)
+                    }
+                } catch (error: CacheNodeException) {
+                    CompletableFuture.failedFuture<Unit>(error)
+                }
+            }
+            .thenCompose { it }
+    }
+
     private fun generatePostRequest(payload: Any, endpoint: String, destNodeId: NodeId): HttpRequest {
-        val destUrl =
-            URI.create("http://${nodeList[destNodeId]}$endpoint")
         val requestBody =
             mapper.writerWithDefaultPrettyPrinter().writeValueAsString(payload)
 
-        return HttpRequest.newBuilder()
-            .uri(destUrl)
+        return clientPool.newRequest(destNodeId, endpoint)
             .POST(HttpRequest.BodyPublishers.ofString(requestBody))
             .build()
     }
@@ -1,186 +1,246 @@
 package sender
 
+import BulkFetchRequest
+import BulkFetchResponse
+import BulkStoreRequest
+import KeyValuePair
 import KeyVersionPair
 import NodeId
 import cache.distributed.IDistributedCache.SystemInfo
 import com.fasterxml.jackson.core.JsonProcessingException
 import com.fasterxml.jackson.databind.ObjectMapper
-import exception.ConnectionRefusedException
 import exception.CrossServerException
 import exception.KeyNotFoundException
+import logging.LogManager
 import org.eclipse.jetty.http.HttpStatus
-import java.net.ConnectException
-import java.net.URI
 import java.net.URLEncoder
-import java.net.http.HttpClient
 import java.net.http.HttpRequest
 import java.net.http.HttpResponse
-import java.util.concurrent.atomic.AtomicInteger
+import java.util.concurrent.CompletableFuture
+import java.util.concurrent.CompletionException
 
 /**
  * A concrete sender that sends HTTP requests.
  */
-open class Sender(private val nodeId: NodeId, private val nodeList: List<String>) : ISender {
+open class Sender(private val nodeId: NodeId, nodeList: List<String>, config: SenderConfig = SenderConfig()) : ISender {
+
+    /**
+     * Logger for requests sent to other nodes
+     */
+    protected val logger = LogManager.getLogger(LogManager.SENDER)
+
+    /**
+     * Long-lived HTTP clients used to reach the other nodes
+     */
+    protected val clientPool = NodeClientPool(nodeList, config)
 
     /**
      * The ObjectMapper used to encode JSON data
      */
     protected val mapper: ObjectMapper = ObjectMapper()
 
-    private var senderUsageInfo: SenderUsageInfo = SenderUsageInfo(
-        AtomicInteger(0), AtomicInteger(0), AtomicInteger(0),
-        AtomicInteger(0), AtomicInteger(0), AtomicInteger(0),
-        AtomicInteger(0), AtomicInteger(0))
+    /**
+     * Counts the requests forwarded to other nodes
+     */
+    private val usageCounters = SenderUsageCounters()
 
     override fun fetchFromNode(kvPair: KeyVersionPair, destNodeId: NodeId): ByteArray {
-        print("SENDER: Delegating fetch key ${kvPair.key} to node $destNodeId\n")
-        senderUsageInfo.fetchAttempts.getAndIncrement()
+        return await(fetchFromNodeAsync(kvPair, destNodeId))
+    }
+
+    override fun fetchFromNodeAsync(kvPair: KeyVersionPair, destNodeId: NodeId): CompletableFuture<ByteArray> {
+        logger.debug { "Delegating fetch key ${kvPair.key} to node $destNodeId" }
+        usageCounters.fetchAttempts.increment()
 
-        val client = HttpClient.newBuilder().build()
         val key = URLEncoder.encode(kvPair.key, "UTF-8")
-        val destUrl = URI.create("http://${nodeList[destNodeId]}/v1/blobs/${key}/${kvPair.version}?senderId=${nodeId}")
-        val request = HttpRequest.newBuilder()
-            .uri(destUrl)
+        val request = clientPool.newRequest(destNodeId, "/v1/blobs/${key}/${kvPair.version}?senderId=${nodeId}")
             .GET()
             .build()
 
-        print("SENDER: Sending fetch request to $destUrl\n")
+        logger.debug { "Sending fetch request to node $destNodeId" }
 
-        val response: HttpResponse<String>
-        try {
-            response = client.send(request, HttpResponse.BodyHandlers.ofString())
-        } catch (e: ConnectException) {
-            print("SENDER: Caught connection refused exception\n")
-            throw ConnectionRefusedException(destNodeId)
-        }
+        return clientPool.sendAsync(destNodeId, request, HttpResponse.BodyHandlers.ofByteArray()).thenApply { response ->
+            logger.debug { "Got fetch response with status code ${response.statusCode()}" }
 
-        print("SENDER: Got fetch response with status code ${response.statusCode()}\n")
+            if (response.statusCode() == HttpStatus.NOT_FOUND_404) {
+                throw KeyNotFoundException(kvPair.key)
+            } else if (response.statusCode() in 400..599) {
+                throw CrossServerException(destNodeId)
+            }
 
-        if (response.statusCode() == HttpStatus.NOT_FOUND_404) {
-            throw KeyNotFoundException(kvPair.key)
-        } else if (response.statusCode() in 400..599) {
-            throw CrossServerException(destNodeId)
+            usageCounters.fetchSuccesses.increment()
+            response.body()
         }
-
-        senderUsageInfo.fetchSuccesses.getAndIncrement()
-        print("SENDER: Got fetch response with body ${response.body()}\n")
-        return response.body().encodeToByteArray()
     }
 
     override fun storeToNode(kvPair: KeyVersionPair, value: ByteArray, destNodeId: NodeId) {
-        print("SENDER: Delegating store key ${kvPair.key} to node $destNodeId\n")
-        senderUsageInfo.storeAttempts.getAndIncrement()
+        await(storeToNodeAsync(kvPair, value, destNodeId))
+    }
+
+    override fun storeToNodeAsync(kvPair: KeyVersionPair, value: ByteArray, destNodeId: NodeId): CompletableFuture<Unit> {
+        logger.debug { "Delegating store key ${kvPair.key} to node $destNodeId" }
+        usageCounters.storeAttempts.increment()
 
-        val client = HttpClient.newBuilder().build()
         val key = URLEncoder.encode(kvPair.key, "UTF-8")
 
-        val destUrl = URI.create("http://${nodeList[destNodeId]}/v1/blobs/${key}/${kvPair.version}?senderId=${nodeId}")
-        val request = HttpRequest.newBuilder()
-            .uri(destUrl)
+        val request = clientPool.newRequest(destNodeId, "/v1/blobs/${key}/${kvPair.version}?senderId=${nodeId}")
             .POST(HttpRequest.BodyPublishers.ofByteArray(value))
             .build()
 
-        print("SENDER: Sending store request to $destUrl with value ${value.contentToString()}\n")
+        logger.debug { "Sending store request to node $destNodeId with ${value.size} bytes" }
+
+        return clientPool.sendAsync(destNodeId, request, HttpResponse.BodyHandlers.discarding()).thenApply<Unit> { response ->
+            logger.debug { "Got store response with status code ${response.statusCode()}" }
+
+            if (response.statusCode() in 400..599) {
+                throw CrossServerException(destNodeId)
+            }
+            usageCounters.storeSuccesses.increment()
+        }
+    }
+
+    override fun fetchManyFromNode(kvPairs: List<KeyVersionPair>, destNodeId: NodeId): MutableList<KeyValuePair> {
+        logger.debug { "Delegating fetch of ${kvPairs.size} keys to node $destNodeId" }
+        usageCounters.fetchAttempts.add(kvPairs.size.toLong())
+
+        val request = clientPool.newRequest(destNodeId, "/v1/blobs/_mget?senderId=${nodeId}")
+            .header("Content-Type", "application/json")
+            .POST(HttpRequest.BodyPublishers.ofByteArray(mapper.writeValueAsBytes(BulkFetchRequest(kvPairs.toMutableList()))))
+            .build()
+
+        val response: HttpResponse<ByteArray> = clientPool.send(destNodeId, request, HttpResponse.BodyHandlers.ofByteArray())
 
-        val response: HttpResponse<String>
+        if (response.statusCode() != HttpStatus.OK_200) {
+            throw CrossServerException(destNodeId)
+        }
+
+        val bulkFetch: BulkFetchResponse
         try {
-            response = client.send(request, HttpResponse.BodyHandlers.ofString())
-        } catch (e: ConnectException) {
-            print("SENDER: Caught connection refused exception\n")
-            throw ConnectionRefusedException(destNodeId)
+            bulkFetch = mapper.readValue(response.body(), BulkFetchResponse::class.java)
+        } catch (e: JsonProcessingException) {
+            logger.warn { "Caught JSON processing exception: ${e.message}" }
+            throw CrossServerException(destNodeId)
         }
+        usageCounters.fetchSuccesses.add(bulkFetch.values.size.toLong())
+        return bulkFetch.values
+    }
+
+    override fun storeManyToNode(kvPairs: List<KeyValuePair>, destNodeId: NodeId) {
+        logger.debug { "Delegating store of ${kvPairs.size} keys to node $destNodeId" }
+        usageCounters.storeAttempts.add(kvPairs.size.toLong())
+
+        val request = clientPool.newRequest(destNodeId, "/v1/blobs/_mset?senderId=${nodeId}")
+            .header("Content-Type", "application/json")
+            .POST(HttpRequest.BodyPublishers.ofByteArray(mapper.writeValueAsBytes(BulkStoreRequest(kvPairs.toMutableList()))))
+            .build()
 
-        print("SENDER: Got store response with status code ${response.statusCode()}\n")
+        val response: HttpResponse<String> = clientPool.send(destNodeId, request, HttpResponse.BodyHandlers.ofString())
 
         if (response.statusCode() in 400..599) {
             throw CrossServerException(destNodeId)
         }
-        senderUsageInfo.storeSuccesses.getAndIncrement()
+        usageCounters.storeSuccesses.add(kvPairs.size.toLong())
+    }
+
+    override fun fetchManyFromReplicaAsync(kvPairs: List<KeyVersionPair>, destNodeId: NodeId): CompletableFuture<MutableList<KeyValuePair>> {
+        logger.debug { "Fetching ${kvPairs.size} replicated keys from node $destNodeId" }
+        usageCounters.fetchAttempts.add(kvPairs.size.toLong())
+
+        val request = clientPool.newRequest(destNodeId, "/v1/replicas/_mget?senderId=${nodeId}")
+            .header("Content-Type", "application/json")
+            .POST(HttpRequest.BodyPublishers.ofByteArray(mapper.writeValueAsBytes(BulkFetchRequest(kvPairs.toMutableList()))))
+            .build()
+
+        return clientPool.sendAsync(destNodeId, request, HttpResponse.BodyHandlers.ofByteArray()).thenApply { response ->
+            if (response.statusCode() != HttpStatus.OK_200) {
+                throw CrossServerException(destNodeId)
+            }
+
+            val bulkFetch: BulkFetchResponse
+            try {
+                bulkFetch = mapper.readValue(response.body(), BulkFetchResponse::class.java)
+            } catch (e: JsonProcessingException) {
+                logger.warn { "Caught JSON processing exception: ${e.message}" }
+                throw CrossServerException(destNodeId)
+            }
+            usageCounters.fetchSuccesses.add(bulkFetch.values.size.toLong())
+            bulkFetch.values
+        }
+    }
+
+    override fun storeManyToReplicaAsync(kvPairs: List<KeyValuePair>, destNodeId: NodeId): CompletableFuture<Unit> {
+        logger.debug { "Replicating ${kvPairs.size} keys to node $destNodeId" }
+        usageCounters.storeAttempts.add(kvPairs.size.toLong())
+
+        val request = clientPool.newRequest(destNodeId, "/v1/replicas/_mset?senderId=${nodeId}")
+            .header("Content-Type", "application/json")
+            .POST(HttpRequest.BodyPublishers.ofByteArray(mapper.writeValueAsBytes(BulkStoreRequest(kvPairs.toMutableList()))))
+            .build()
+
+        return clientPool.sendAsync(destNodeId, request, HttpResponse.BodyHandlers.discarding()).thenApply<Unit> { response ->
+            if (response.statusCode() in 400..599) {
+                throw CrossServerException(destNodeId)
+            }
+            usageCounters.storeSuccesses.add(kvPairs.size.toLong())
+        }
     }
 
     override fun removeFromNode(kvPair: KeyVersionPair, destNodeId: NodeId): ByteArray? {
-        print("SENDER: Delegating remove key ${kvPair.key} to node $destNodeId\n")
-        senderUsageInfo.removeAttempts.getAndIncrement()
+        logger.debug { "Delegating remove key ${kvPair.key} to node $destNodeId" }
+        usageCounters.removeAttempts.increment()
 
-        val client = HttpClient.newBuilder().build()
         val key = URLEncoder.encode(kvPair.key, "UTF-8")
-        val destUrl = URI.create("http://${nodeList[destNodeId]}/v1/blobs/${key}/${kvPair.version}?senderId=${nodeId}")
-        val request = HttpRequest.newBuilder()
-            .uri(destUrl)
+        val request = clientPool.newRequest(destNodeId, "/v1/blobs/${key}/${kvPair.version}?senderId=${nodeId}")
             .DELETE()
             .build()
 
-        print("SENDER: Sending remove request to $destUrl\n")
+        logger.debug { "Sending remove request to node $destNodeId" }
 
-        val response: HttpResponse<String>
-        try {
-            response = client.send(request, HttpResponse.BodyHandlers.ofString())
-        } catch (e: ConnectException) {
-            print("SENDER: Caught connection refused exception\n")
-            throw ConnectionRefusedException(destNodeId)
-        }
+        val response: HttpResponse<String> = clientPool.send(destNodeId, request, HttpResponse.BodyHandlers.ofString())
 
-        print("SENDER: Got remove response with status code ${response.statusCode()}\n")
+        logger.debug { "Got remove response with status code ${response.statusCode()}" }
 
         if (response.statusCode() != 204 && response.statusCode() != 404) {
             throw CrossServerException(destNodeId)
         }
 
-        senderUsageInfo.removeSuccesses.getAndIncrement()
+        usageCounters.removeSuccesses.increment()
         return response.body().encodeToByteArray()
     }
 
     override fun clearNode(destNodeId: NodeId) {
-        print("SENDER: Clearing node $destNodeId\n")
-        senderUsageInfo.clearAttempts.getAndIncrement()
+        logger.debug { "Clearing node $destNodeId" }
+        usageCounters.clearAttempts.increment()
 
-        val client = HttpClient.newBuilder().build()
-        val destUrl = URI.create("http://${nodeList[destNodeId]}/v1/clear?senderId=${nodeId}")
-        val request = HttpRequest.newBuilder()
-            .uri(destUrl)
+        val request = clientPool.newRequest(destNodeId, "/v1/clear?senderId=${nodeId}")
             .DELETE()
             .build()
 
-        print("SENDER: Sending clear request to $destUrl\n")
+        logger.debug { "Sending clear request to node $destNodeId" }
 
-        val response: HttpResponse<String>
-        try {
-            response = client.send(request, HttpResponse.BodyHandlers.ofString())
-        } catch (e: ConnectException) {
-            print("SENDER: Caught connection refused exception\n")
-            throw ConnectionRefusedException(destNodeId)
-        }
+        val response: HttpResponse<String> = clientPool.send(destNodeId, request, HttpResponse.BodyHandlers.ofString())
 
-        print("SENDER: Got clear response with status code ${response.statusCode()}\n")
+        logger.debug { "Got clear response with status code ${response.statusCode()}" }
 
         if (response.statusCode() != 204) {
             throw CrossServerException(destNodeId)
         }
 
-        senderUsageInfo.clearSuccesses.getAndIncrement()
+        usageCounters.clearSuccesses.increment()
     }
 
     override fun getCacheInfo(destNodeId: NodeId): SystemInfo {
-        print("SENDER: Fetching the local cache info from node $destNodeId\n")
+        logger.debug { "Fetching the local cache info from node $destNodeId" }
 
-        val client = HttpClient.newBuilder().build()
-        val destUrl = URI.create("http://${nodeList[destNodeId]}/v1/local-cache-info?senderId=${nodeId}")
-        val request = HttpRequest.newBuilder()
-            .uri(destUrl)
+        val request = clientPool.newRequest(destNodeId, "/v1/local-cache-info?senderId=${nodeId}")
             .GET()
             .build()
 
-        print("SENDER: Sending cache info request to $destUrl\n")
+        logger.debug { "Sending cache info request to node $destNodeId" }
 
-        val response: HttpResponse<String>
-        try {
-            response = client.send(request, HttpResponse.BodyHandlers.ofString())
-        } catch (e: ConnectException) {
-            print("SENDER: Caught connection refused exception\n")
-            throw ConnectionRefusedException(destNodeId)
-        }
+        val response: HttpResponse<String> = clientPool.send(destNodeId, request, HttpResponse.BodyHandlers.ofString())
 
-        print("SENDER: Got cache info response with status code ${response.statusCode()}\n")
+        logger.debug { "Got cache info response with status code ${response.statusCode()}" }
 
         if (response.statusCode() != 200) {
             throw CrossServerException(destNodeId)
@@ -190,13 +250,24 @@ open class Sender(private val nodeId: NodeId, private val nodeList: List<String>
         try {
             systemInfo = mapper.treeToValue(mapper.readTree(response.body()), SystemInfo::class.java)
         } catch (e: JsonProcessingException) {
-            print("SENDER: Caught JSON processing exception: ${e.message}\n")
+            logger.warn { "Caught JSON processing exception: ${e.message}" }
             throw CrossServerException(destNodeId)
         }
         return systemInfo
     }
 
     override fun getSenderUsageInfo(): SenderUsageInfo {
-        return senderUsageInfo
+        return usageCounters.snapshot()
+    }
+
+    /**
+     * Waits for a forwarded request, rethrowing the CacheNodeException it failed with.
+     */
+    private fun <T> await(future: CompletableFuture<T>): T {
+        try {
+            return future.join()
+        } catch (e: CompletionException) {
+            throw e.cause ?: e
+        }
     }
 }
\ No newline at end of file
@@ -0,0 +1,46 @@
+package sender
+
+import java.util.concurrent.atomic.LongAdder
+
+/**
+ * Counts the requests a sender has forwarded to other nodes. The counters are striped
+ * LongAdders, so request threads do not contend on a shared counter, and are only summed
+ * when a snapshot is taken.
+ *
+ * This class is thread-safe!
+ */
+class SenderUsageCounters {
+
+    val storeAttempts = LongAdder()
+
+    val storeSuccesses = LongAdder()
+
+    val fetchAttempts = LongAdder()
+
+    val fetchSuccesses = LongAdder()
+
+    val removeAttempts = LongAdder()
+
+    val removeSuccesses = LongAdder()
+
+    val clearAttempts = LongAdder()
+
+    val clearSuccesses = LongAdder()
+
+    /**
+     * Returns the current counts. Requests sent while the snapshot is taken may be
+     * partially included.
+     */
+    fun snapshot(): SenderUsageInfo {
+        return SenderUsageInfo(
+            storeAttempts.sum(),
+            storeSuccesses.sum(),
+            fetchAttempts.sum(),
+            fetchSuccesses.sum(),
+            removeAttempts.sum(),
+            removeSuccesses.sum(),
+            clearAttempts.sum(),
+            clearSuccesses.sum()
+        )
+    }
+}
@@ -0,0 +1,125 @@
+import cache.distributed.hasher.ConsistentKeyDistributor
+import cache.distributed.hasher.NodeHasher
+import org.junit.jupiter.api.Test
+import kotlin.test.assertEquals
+
+/**
+ * Checks that the Python client places keys on the same nodes as the cache nodes. The
+ * fixtures are generated by performance-testing/generatePlacementFixture.py from the
+ * client's hashing module.
+ */
+class KeyPlacementTest {
+
+    private val maxNodeCount = 5
+
+    /* Replication factor of the replica columns */
+    private val replicas = 3
+
+    private fun readFixture(name: String): List<List<String>> {
+        val stream = javaClass.getResourceAsStream("/$name")
+            ?: throw IllegalStateException("Missing fixture $name")
+        return stream.bufferedReader(Charsets.UTF_8).readLines()
+            .drop(1)
+            .filter { it.isNotEmpty() }
+            .map { it.split("\t") }
+    }
+
+    @Test
+    internal fun `Node hash values match client`() {
+        val nodeHasher = NodeHasher(1)
+        for (row in readFixture("node-points.tsv")) {
+            val nodeId = row[0].toInt()
+            val index = row[1].toInt()
+            val expected = row[2].toInt()
+            if (index < 0) {
+                assertEquals(expected, nodeHasher.nodeHashValue(nodeId), "node $nodeId")
+            } else {
+                assertEquals(expected, nodeHasher.extendedNodeHashValue(nodeId, index), "node $nodeId index $index")
+            }
+        }
+    }
+
+    @Test
+    internal fun `Key hash values match client`() {
+        val nodeHasher = NodeHasher(1)
+        for (row in readFixture("key-placement.tsv")) {
+            assertEquals(row[1].toInt(), nodeHasher.primaryHashValue(KeyVersionPair(row[0], 1)), "key ${row[0]}")
+        }
+    }
+
+    @Test
+    internal fun `Modulo placement matches client`() {
+        val rows = readFixture("key-placement.tsv")
+        for (nodeCount in 1..maxNodeCount) {
+            val nodeHasher = NodeHasher(nodeCount)
+            for (row in rows) {
+                assertEquals(
+                    row[1 + nodeCount].toInt(),
+                    nodeHasher.primaryHashNode(KeyVersionPair(row[0], 1)),
+                    "key ${row[0]} with $nodeCount nodes"
+                )
+            }
+        }
+    }
+
+    @Test
+    internal fun `Consistent placement matches client`() {
+        val rows = readFixture("key-placement.tsv")
+        for (nodeCount in 1..maxNodeCount) {
+            val keyDistributor = ConsistentKeyDistributor(nodeCount)
+            for (row in rows) {
+                assertEquals(
+                    row[1 + maxNodeCount + nodeCount].toInt(),
+                    keyDistributor.getPrimaryNode(KeyVersionPair(row[0], 1)),
+                    "key ${row[0]} with $nodeCount nodes"
+                )
+            }
+        }
+    }
+
+    @Test
+    internal fun `Consistent placement after adding node matches client`() {
+        val rows = readFixture("key-placement.tsv")
+        val keyDistributor = ConsistentKeyDistributor(1)
+        for (nodeCount in 2..maxNodeCount) {
+            keyDistributor.addNode()
+            for (row in rows) {
+                assertEquals(
+                    row[1 + maxNodeCount + nodeCount].toInt(),
+                    keyDistributor.getPrimaryNode(KeyVersionPair(row[0], 1)),
+                    "key ${row[0]} after scaling to $nodeCount nodes"
+                )
+            }
+        }
+    }
+
+    @Test
+    internal fun `Modulo replicas match client`() {
+        val rows = readFixture("key-placement.tsv")
+        for (nodeCount in 1..maxNodeCount) {
+            val nodeHasher = NodeHasher(nodeCount)
+            for (row in rows) {
+                assertEquals(
+                    row[1 + 2 * maxNodeCount + nodeCount],
+                    nodeHasher.replicaHashNodes(KeyVersionPair(row[0], 1), replicas).joinToString(","),
+                    "key ${row[0]} with $nodeCount nodes"
+                )
+            }
+        }
+    }
+
+    @Test
+    internal fun `Consistent replicas match client`() {
+        val rows = readFixture("key-placement.tsv")
+        for (nodeCount in 1..maxNodeCount) {
+            val keyDistributor = ConsistentKeyDistributor(nodeCount)
+            for (row in rows) {
+                assertEquals(
+                    row[1 + 3 * maxNodeCount + nodeCount],
+                    keyDistributor.getReplicaNodes(KeyVersionPair(row[0], 1), replicas).joinToString(","),
+                    "key ${row[0]} with $nodeCount nodes"
+                )
+            }
+        }
+    }
+}
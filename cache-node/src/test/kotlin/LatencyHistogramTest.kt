@@ -0,0 +1,65 @@
+import org.junit.jupiter.api.Test
+import receiver.LatencyHistogram
+import receiver.RequestLatencies
+import receiver.RequestOp
+import kotlin.test.assertEquals
+import kotlin.test.assertTrue
+
+class LatencyHistogramTest {
+
+    @Test
+    internal fun testBucketsCoverValues() {
+        for (nanos in listOf(0L, 1L, 15L, 16L, 17L, 31L, 32L, 1000L, 123456789L, (1L shl 40) - 1)) {
+            val index = LatencyHistogram.bucketIndex(nanos)
+            assertTrue(LatencyHistogram.lowerBound(index) <= nanos)
+            assertTrue(nanos <= LatencyHistogram.upperBound(index))
+            // Buckets are at most 1/16 as wide as their values
+            assertTrue(LatencyHistogram.upperBound(index) - LatencyHistogram.lowerBound(index) <= maxOf(0L, nanos / 16))
+        }
+        assertEquals(LatencyHistogram.upperBound(31) + 1, LatencyHistogram.lowerBound(32))
+    }
+
+    @Test
+    internal fun testPercentiles() {
+        val histogram = LatencyHistogram()
+        for (micros in 1..1000) {
+            histogram.record(micros * 1000L)
+        }
+
+        val snapshot = histogram.snapshot()
+        assertEquals(1000, snapshot.count)
+        assertEquals(1_000_000L, snapshot.maxNanos)
+        assertEquals(500500L * 1000, snapshot.totalNanos)
+        assertTrue(snapshot.p50Nanos in 500_000L..500_000L * 17 / 16)
+        assertTrue(snapshot.p99Nanos in 990_000L..1_000_000L)
+        assertEquals(1_000_000L, snapshot.p999Nanos)
+    }
+
+    @Test
+    internal fun testMerge() {
+        val fast = LatencyHistogram()
+        val slow = LatencyHistogram()
+        repeat(90) { fast.record(1000) }
+        repeat(10) { slow.record(1_000_000) }
+        slow.record(1000)
+
+        val merged = fast.snapshot().merge(slow.snapshot())
+        assertEquals(101, merged.count)
+        assertEquals(91L, merged.buckets.first().count)
+        assertTrue(merged.p50Nanos < 1100)
+        assertEquals(1_000_000L, merged.p99Nanos)
+    }
+
+    @Test
+    internal fun testRequestLatenciesByOutcome() {
+        val latencies = RequestLatencies()
+        val startTime = System.nanoTime() - 1000
+        latencies.record(RequestOp.FETCH, false, true, startTime)
+        latencies.record(RequestOp.FETCH, false, false, startTime)
+        latencies.record(RequestOp.STORE, true, false, startTime)
+
+        assertEquals(setOf("fetch.client.hit", "fetch.client.miss", "store.forwarded"), latencies.snapshot().keys)
+        assertTrue(latencies.getRequestTiming(false).fetchTiming > 0)
+        assertEquals(0.0, latencies.getRequestTiming(false).storeTiming)
+    }
+}
@@ -1,4 +1,5 @@
 import cache.local.LocalCache
+import cache.local.accountedSize
 import exception.CacheFullException
 import org.junit.jupiter.api.Assertions.assertThrows
 import org.junit.jupiter.api.BeforeEach
@@ -14,7 +15,8 @@ class LocalCacheTest {
 
     @BeforeEach
     internal fun beforeEach() {
-        cache = LocalCache(maxCapacity)
+        // Every entry in these tests has the same accounted size
+        cache = LocalCache(maxCapacity * accountedSize(KeyVersionPair("key1", 0), convertToBytes("value1")))
     }
 
     @Test
@@ -54,6 +56,23 @@ class LocalCacheTest {
         assertEquals("value$maxCapacity", convertFromBytes(cache.fetch(maxCapacityKey)))
         assertNull(cache.fetch(overMaxCapacityKey))
     }
+
+    @Test
+    internal fun testOverwriteWithinBudget() {
+        for (i in 1..maxCapacity) {
+            cache.store(KeyVersionPair("key$i", 0), convertToBytes("value$i"))
+        }
+
+        // Overwriting with a value of the same size takes no extra bytes
+        cache.store(KeyVersionPair("key1", 0), convertToBytes("valueX"))
+        assertEquals("valueX", convertFromBytes(cache.fetch(KeyVersionPair("key1", 0))))
+
+        // A larger value does not fit once the budget is used up
+        assertThrows(CacheFullException::class.java) {
+            cache.store(KeyVersionPair("key1", 0), convertToBytes("a larger value"))
+        }
+        assertEquals(cache.getCacheInfo().maxBytes, cache.getCacheInfo().usedBytes)
+    }
 }
 
 fun convertToBytes(value: String): ByteArray {
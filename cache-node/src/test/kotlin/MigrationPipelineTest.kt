@@ -0,0 +1,92 @@
+import cache.distributed.MigrationConfig
+import cache.distributed.MigrationPipeline
+import cache.distributed.hasher.NodeHasher
+import cache.local.ScalableLocalCache
+import exception.CrossServerException
+import io.mockk.every
+import io.mockk.mockkClass
+import org.junit.jupiter.api.Assertions.assertThrows
+import org.junit.jupiter.api.BeforeEach
+import org.junit.jupiter.api.Test
+import sender.ScalableSender
+import java.util.concurrent.CompletableFuture
+import kotlin.test.assertEquals
+import kotlin.test.assertTrue
+
+class MigrationPipelineTest {
+
+    private val value = ByteArray(1000)
+    private lateinit var cache: ScalableLocalCache
+    private lateinit var sender: ScalableSender
+
+    /* Small batches so each range is sent in several */
+    private val config = MigrationConfig(
+        parallelStreams = 2,
+        maxInFlightBatches = 2,
+        initialBatchBytes = 4000,
+        minBatchBytes = 4000,
+        maxBatchBytes = 16000
+    )
+
+    /* Splits the hash values into three ranges, including one that wraps around */
+    private val copyRanges = listOf(
+        Pair(Int.MAX_VALUE / 2, Int.MIN_VALUE / 2),
+        Pair(Int.MIN_VALUE / 2, 0),
+        Pair(0, Int.MAX_VALUE / 2)
+    )
+
+    @BeforeEach
+    internal fun beforeEach() {
+        cache = ScalableLocalCache(NodeHasher(1), 1L shl 24)
+        sender = mockkClass(ScalableSender::class)
+        for (i in 0 until 100) {
+            cache.store(KeyVersionPair("key$i", 0), value)
+        }
+    }
+
+    @Test
+    internal fun testCopyMovesEveryKey() {
+        val copied = mutableListOf<String>()
+        every { sender.sendBulkCopyAsync(any(), 1) } answers {
+            synchronized(copied) { copied.addAll(firstArg<List<KeyValuePair>>().map { it.key }) }
+            CompletableFuture.completedFuture(Unit)
+        }
+
+        val pipeline = MigrationPipeline(cache, config)
+        pipeline.copy(copyRanges, 1, sender)
+
+        assertEquals((0 until 100).map { "key$it" }.toSet(), copied.toSet())
+        assertEquals(100, copied.size)
+        assertEquals(0, cache.getCacheInfo().totalKeys)
+
+        val info = pipeline.getTransferInfo()
+        assertEquals(100, info.pairs)
+        assertTrue(info.batches > copyRanges.size)
+        assertTrue(info.throughputMBps > 0)
+    }
+
+    @Test
+    internal fun testFailedBatchesStayLocal() {
+        every { sender.sendBulkCopyAsync(any(), 1) } returns CompletableFuture.failedFuture(CrossServerException(1))
+
+        assertThrows(CrossServerException::class.java) {
+            MigrationPipeline(cache, config).copy(copyRanges, 1, sender)
+        }
+        assertEquals(100, cache.getCacheInfo().totalKeys)
+    }
+
+    @Test
+    internal fun testBulkCopyCodecRoundTrip() {
+        val kvPairs = listOf(KeyValuePair("ключ", 3, convertToBytes("123")), KeyValuePair("b", 0, value))
+        val body = BulkCopyCodec.encode(kvPairs)
+        assertEquals(kvPairs.sumOf { BulkCopyCodec.recordSize(it) }, body.size)
+
+        val decoded = BulkCopyCodec.decode(body.inputStream())
+        assertEquals(kvPairs.map { Pair(it.key, it.version) }, decoded.map { Pair(it.key, it.version) })
+        assertTrue(kvPairs.indices.all { kvPairs[it].value.contentEquals(decoded[it].value) })
+
+        assertThrows(IllegalArgumentException::class.java) {
+            BulkCopyCodec.decode(body.copyOf(body.size - 1).inputStream())
+        }
+    }
+}
@@ -6,11 +6,16 @@ import io.javalin.Javalin
 import io.javalin.testtools.JavalinTest
 import io.mockk.every
 import io.mockk.mockkClass
+import io.mockk.verify
 import org.assertj.core.api.Assertions.assertThat
 import org.eclipse.jetty.http.HttpStatus
 import org.junit.jupiter.api.BeforeEach
 import org.junit.jupiter.api.Test
+import receiver.TraceRecorder
 import sender.Sender
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import java.util.concurrent.CompletableFuture
 import kotlin.test.BeforeTest
 
 class ReceiverTest {
@@ -93,8 +98,8 @@ class ReceiverTest {
     @Test
     internal fun `Store and fetch key-value pair to node that returns error`() = JavalinTest.test(app) { _, client ->
         val mockSender = this.sender
-        every { mockSender.storeToNode(any(), any(), 1) } throws CrossServerException(1)
-        every { mockSender.fetchFromNode(any(), 1) } throws CrossServerException(1)
+        every { mockSender.storeToNodeAsync(any(), any(), 1) } returns CompletableFuture.failedFuture(CrossServerException(1))
+        every { mockSender.fetchFromNodeAsync(any(), 1) } returns CompletableFuture.failedFuture(CrossServerException(1))
 
         val storeResponse = client.post("/v1/blobs/b/1", "123")
         assertThat(storeResponse.code).isEqualTo(HttpStatus.INTERNAL_SERVER_ERROR_500)
@@ -106,7 +111,7 @@ class ReceiverTest {
     @Test
     internal fun `Not found error if value not stored in destination node`() = JavalinTest.test(app) { _, client ->
         val mockSender = this.sender
-        every { mockSender.fetchFromNode(any(), 1) } throws KeyNotFoundException("b")
+        every { mockSender.fetchFromNodeAsync(any(), 1) } returns CompletableFuture.failedFuture(KeyNotFoundException("b"))
 
         val fetchResponse = client.get("/v1/blobs/b/1")
         assertThat(fetchResponse.code).isEqualTo(HttpStatus.NOT_FOUND_404)
@@ -116,17 +121,157 @@ class ReceiverTest {
     internal fun `Store and fetch key-value pair to different node`() = JavalinTest.test(app) { _, client ->
         val mockSender = this.sender
 
-        every { mockSender.storeToNode(any(), any(), 1) } returns Unit
+        every { mockSender.storeToNodeAsync(any(), any(), 1) } returns CompletableFuture.completedFuture(Unit)
         val storeResponse = client.post("/v1/blobs/b/1", "123")
         assertThat(storeResponse.code).isEqualTo(HttpStatus.CREATED_201)
 
-        every { mockSender.fetchFromNode(any(), 1) } returns convertToBytes("123")
+        every { mockSender.fetchFromNodeAsync(any(), 1) } returns CompletableFuture.completedFuture(convertToBytes("123"))
         val fetchResponse = client.get("/v1/blobs/b/1")
         assertThat(fetchResponse.code).isEqualTo(HttpStatus.OK_200)
         assertThat(fetchResponse.body).isNotNull
         assertThat(fetchResponse.body!!.string()).isEqualTo("123")
     }
 
+    @Test
+    internal fun `Bad request errors on bulk store and fetch`() = JavalinTest.test(app) { _, client ->
+        assertThat(client.post("/v1/blobs/_mget", "{\"pairs\":[{\"key\":\"a\",\"version\":-1}]}").code)
+            .isEqualTo(HttpStatus.BAD_REQUEST_400)
+        assertThat(client.post("/v1/blobs/_mset", "{\"values\":[{\"key\":\"a\",\"version\":1,\"value\":\"\"}]}").code)
+            .isEqualTo(HttpStatus.BAD_REQUEST_400)
+        assertThat(client.post("/v1/blobs/_mget?senderId=5", "{\"pairs\":[]}").code)
+            .isEqualTo(HttpStatus.BAD_REQUEST_400)
+    }
+
+    @Test
+    internal fun `Bulk store and fetch key-value pairs across nodes`() = JavalinTest.test(app) { _, client ->
+        val mockSender = this.sender
+
+        // "a" is owned by this node and "b" by node 1
+        every { mockSender.storeManyToNode(any(), 1) } returns Unit
+        val storeResponse = client.post("/v1/blobs/_mset",
+            "{\"values\":[{\"key\":\"a\",\"version\":1,\"value\":\"MTIz\"}," +
+                "{\"key\":\"b\",\"version\":1,\"value\":\"NDU2\"}]}")
+        assertThat(storeResponse.code).isEqualTo(HttpStatus.NO_CONTENT_204)
+
+        every { mockSender.fetchManyFromNode(any(), 1) } returns
+                mutableListOf(KeyValuePair("b", 1, convertToBytes("456")))
+        val fetchResponse = client.post("/v1/blobs/_mget",
+            "{\"pairs\":[{\"key\":\"a\",\"version\":1},{\"key\":\"b\",\"version\":1}," +
+                "{\"key\":\"a\",\"version\":2}]}")
+        assertThat(fetchResponse.code).isEqualTo(HttpStatus.OK_200)
+        val body = fetchResponse.body!!.string()
+        assertThat(body).contains("MTIz").contains("NDU2").doesNotContain("\"version\":2")
+    }
+
+    @Test
+    internal fun `Replica requests are served from the local cache`() = JavalinTest.test(app) { _, client ->
+        val values = "{\"values\":[{\"key\":\"b\",\"version\":1,\"value\":\"NDU2\"}]}"
+        assertThat(client.post("/v1/replicas/_mset", values).code).isEqualTo(HttpStatus.BAD_REQUEST_400)
+
+        // "b" is owned by node 1, but replica requests never forward
+        assertThat(client.post("/v1/replicas/_mset?senderId=1", values).code).isEqualTo(HttpStatus.NO_CONTENT_204)
+        val fetchResponse = client.post("/v1/replicas/_mget?senderId=1",
+            "{\"pairs\":[{\"key\":\"b\",\"version\":1},{\"key\":\"c\",\"version\":1}]}")
+        assertThat(fetchResponse.code).isEqualTo(HttpStatus.OK_200)
+        assertThat(fetchResponse.body!!.string()).contains("NDU2").doesNotContain("\"c\"")
+    }
+
+    @Test
+    internal fun `Replicated stores are copied and replicas read locally`() {
+        val nodeList = mutableListOf("localhost:7070", "localhost:7071")
+        val replicatedCache = DistributedCache(0, nodeList, LocalCache(), replicationFactor = 2)
+        val mockSender = mockkClass(Sender::class)
+        replicatedCache.mockSender(mockSender)
+        every { mockSender.storeManyToReplicaAsync(any(), 1) } returns CompletableFuture.completedFuture(Unit)
+        every { mockSender.fetchFromNodeAsync(any(), 1) } returns CompletableFuture.completedFuture(convertToBytes("456"))
+
+        JavalinTest.test(replicatedCache.getJavalinApp()) { _, client ->
+            // "a" is owned by this node, which copies it to node 1 before answering
+            assertThat(client.post("/v1/blobs/a/1", "123").code).isEqualTo(HttpStatus.CREATED_201)
+            verify(exactly = 1) { mockSender.storeManyToReplicaAsync(match { it.single().key == "a" }, 1) }
+
+            // "b" is owned by node 1 and replicated here, so it is read here first
+            assertThat(client.get("/v1/blobs/b/1").body!!.string()).isEqualTo("456")
+            verify(exactly = 1) { mockSender.fetchFromNodeAsync(KeyVersionPair("b", 1), 1) }
+
+            client.post("/v1/replicas/_mset?senderId=1", "{\"values\":[{\"key\":\"b\",\"version\":1,\"value\":\"Nzg5\"}]}")
+            assertThat(client.get("/v1/blobs/b/1").body!!.string()).isEqualTo("789")
+            verify(exactly = 1) { mockSender.fetchFromNodeAsync(KeyVersionPair("b", 1), 1) }
+        }
+    }
+
+    @Test
+    internal fun `Change logging settings at runtime`() = JavalinTest.test(app) { _, client ->
+        assertThat(client.post("/v1/admin/logging?level=LOUD").code).isEqualTo(HttpStatus.BAD_REQUEST_400)
+        assertThat(client.post("/v1/admin/logging?sampleRate=2").code).isEqualTo(HttpStatus.BAD_REQUEST_400)
+
+        val setResponse = client.post("/v1/admin/logging?category=RECEIVER&level=debug&sampleRate=0.5")
+        assertThat(setResponse.code).isEqualTo(HttpStatus.OK_200)
+        assertThat(setResponse.body!!.string()).contains("\"RECEIVER\":{\"level\":\"DEBUG\",\"sampleRate\":0.5}")
+
+        client.post("/v1/admin/logging?category=RECEIVER&level=INFO&sampleRate=1")
+        assertThat(client.get("/v1/admin/logging").body!!.string())
+            .contains("\"RECEIVER\":{\"level\":\"INFO\",\"sampleRate\":1.0}")
+    }
+
+    @Test
+    internal fun `Latency histograms in local cache info`() = JavalinTest.test(app) { _, client ->
+        client.post("/v1/blobs/a/1", "123")
+        client.get("/v1/blobs/a/1")
+        client.get("/v1/blobs/a/2")
+
+        val info = client.get("/v1/local-cache-info").body!!.string()
+        assertThat(info).contains("\"fetch.client.hit\":{", "\"fetch.client.miss\":{", "\"store.client\":{")
+        assertThat(info).contains("\"p99Nanos\"").doesNotContain("forwarded")
+    }
+
+    @Test
+    internal fun `Metrics in the Prometheus text format`() = JavalinTest.test(app) { _, client ->
+        client.post("/v1/blobs/a/1", "123")
+        client.get("/v1/blobs/a/1")
+        client.get("/v1/blobs/a/2")
+
+        val response = client.get("/metrics")
+        assertThat(response.code).isEqualTo(HttpStatus.OK_200)
+        assertThat(response.header("Content-Type")).startsWith("text/plain")
+        assertThat(response.body!!.string()).contains(
+            "# TYPE cachecow_requests_total counter",
+            "cachecow_requests_total{op=\"fetch\"} 2",
+            "cachecow_cache_hits_total 1",
+            "cachecow_cache_misses_total 1",
+            "cachecow_value_bytes_total{op=\"store\"} 3",
+            "cachecow_cache_keys 1",
+            "cachecow_request_duration_seconds_bucket{op=\"fetch\",origin=\"client\",outcome=\"hit\",le=\"+Inf\"} 1",
+            "cachecow_request_duration_seconds_count{op=\"store\",origin=\"client\"} 1"
+        )
+    }
+
+    @Test
+    internal fun `Record and download a trace of key accesses`() = JavalinTest.test(app) { _, client ->
+        assertThat(client.get("/v1/admin/trace/download").code).isEqualTo(HttpStatus.NOT_FOUND_404)
+        assertThat(client.post("/v1/admin/trace?enabled=true&capacity=0").code).isEqualTo(HttpStatus.BAD_REQUEST_400)
+
+        val startResponse = client.post("/v1/admin/trace?enabled=true&capacity=10")
+        assertThat(startResponse.code).isEqualTo(HttpStatus.OK_200)
+        assertThat(startResponse.body!!.string()).contains("\"enabled\":true", "\"capacity\":10")
+
+        client.post("/v1/blobs/a/1", "123")
+        client.get("/v1/blobs/a/1")
+        client.get("/v1/blobs/a/2")
+        client.post("/v1/admin/trace?enabled=false")
+        client.get("/v1/blobs/a/1")
+
+        val trace = ByteBuffer.wrap(client.get("/v1/admin/trace/download").body!!.bytes()).order(ByteOrder.LITTLE_ENDIAN)
+        assertThat(trace.getInt(16)).isEqualTo(3)
+        val flags = (0 until 3).map { trace.get(TraceRecorder.HEADER_BYTES + it * TraceRecorder.RECORD_BYTES + 20).toInt() }
+        assertThat(flags).containsExactly(
+            TraceRecorder.STORE or TraceRecorder.HIT,
+            TraceRecorder.FETCH or TraceRecorder.HIT,
+            TraceRecorder.FETCH
+        )
+        assertThat(client.get("/v1/admin/trace").body!!.string()).contains("\"enabled\":false", "\"recorded\":3")
+    }
+
 //    @Test
 //    internal fun `Remove returns 204 if item removed from cache`() = JavalinTest.test(app) { _, client ->
 //        val storeResponse = client.post("/v1/blobs/a/1?requestId=1", "123")
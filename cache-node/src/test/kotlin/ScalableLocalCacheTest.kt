@@ -0,0 +1,128 @@
+import cache.distributed.hasher.INodeHasher
+import cache.distributed.hasher.NodeHasher
+import cache.local.ScalableLocalCache
+import cache.local.accountedSize
+import exception.CacheFullException
+import io.mockk.every
+import io.mockk.mockkClass
+import org.junit.jupiter.api.Assertions.assertThrows
+import org.junit.jupiter.api.BeforeEach
+import org.junit.jupiter.api.Test
+import kotlin.test.assertEquals
+import kotlin.test.assertNotNull
+import kotlin.test.assertNull
+import kotlin.test.assertTrue
+
+class ScalableLocalCacheTest {
+
+    /* The cache holds 8 entries of this value, sized by the longest key used, "key10" */
+    private val value = ByteArray(100)
+    private lateinit var cache: ScalableLocalCache
+
+    @BeforeEach
+    internal fun beforeEach() {
+        cache = ScalableLocalCache(NodeHasher(1), 8 * accountedSize(KeyVersionPair("key10", 0), value))
+    }
+
+    @Test
+    internal fun testOverwrite() {
+        val key = KeyVersionPair("key1", 0)
+
+        cache.store(key, convertToBytes("value1"))
+        cache.store(key, convertToBytes("value2"))
+
+        assertEquals("value2", convertFromBytes(cache.fetch(key)))
+        assertEquals(1, cache.getCacheInfo().totalKeys)
+    }
+
+    @Test
+    internal fun testEvictsLeastRecentlyUsed() {
+        for (i in 0 until 8) {
+            cache.store(KeyVersionPair("key$i", 0), value)
+        }
+
+        // Touch the oldest key so the next three oldest are evicted instead
+        cache.fetch(KeyVersionPair("key0", 0))
+        for (i in 8 until 11) {
+            cache.store(KeyVersionPair("key$i", 0), value)
+        }
+
+        for (i in 1..3) {
+            assertNull(cache.fetch(KeyVersionPair("key$i", 0)))
+        }
+        for (i in listOf(0, 4, 5, 6, 7, 8, 9, 10)) {
+            assertNotNull(cache.fetch(KeyVersionPair("key$i", 0)))
+        }
+        assertEquals(8, cache.getCacheInfo().totalKeys)
+        // One eviction for each of key8, key9 and key10
+        assertEquals(3L, cache.getCacheInfo().evictions)
+    }
+
+    @Test
+    internal fun testValueLargerThanBudget() {
+        assertThrows(CacheFullException::class.java) {
+            cache.store(KeyVersionPair("key0", 0), ByteArray(10 * value.size))
+        }
+    }
+
+    @Test
+    internal fun testEvictedKeysAreNotCopied() {
+        for (i in 0 until 11) {
+            cache.store(KeyVersionPair("key$i", 0), value)
+        }
+
+        val stream = cache.initializeCopy(Pair(Int.MIN_VALUE, Int.MAX_VALUE))
+        val copied = stream.next(Long.MAX_VALUE)
+        assertEquals((3 until 11).map { "key$it" }.toSet(), copied.map { it.key }.toSet())
+        assertTrue(stream.next(Long.MAX_VALUE).isEmpty())
+
+        cache.cleanupCopyKeys(copied)
+        assertEquals(0, cache.getCacheInfo().totalKeys)
+    }
+
+    @Test
+    internal fun testCopyStreamBatchesByBytes() {
+        for (i in 0 until 8) {
+            cache.store(KeyVersionPair("key$i", 0), value)
+        }
+
+        // Each batch stops at the pair that reaches the byte limit
+        val pairBytes = value.size + "key0".length + 4L
+        val stream = cache.initializeCopy(Pair(Int.MIN_VALUE, Int.MAX_VALUE))
+        val batchSizes = generateSequence { stream.next(2 * pairBytes + 1).takeIf { it.isNotEmpty() }?.size }.toList()
+        assertEquals(listOf(3, 3, 2), batchSizes)
+    }
+
+    @Test
+    internal fun testCopyKeepsKeysWithSameHash() {
+        val hasher = mockkClass(INodeHasher::class)
+        every { hasher.primaryHashValue(any()) } answers { if (firstArg<KeyVersionPair>().key == "other") 50 else 7 }
+        val collidingCache = ScalableLocalCache(hasher, 1L shl 20)
+        for (i in 0 until 5) {
+            collidingCache.store(KeyVersionPair("key$i", 0), value)
+            collidingCache.store(KeyVersionPair("key$i", 1), value)
+        }
+        collidingCache.store(KeyVersionPair("other", 0), value)
+
+        val copied = collidingCache.initializeCopy(Pair(0, 10)).next(Long.MAX_VALUE)
+        assertEquals(10, copied.size)
+        assertTrue(copied.none { it.key == "other" })
+    }
+
+    @Test
+    internal fun testCopyRangeExcludesStartAndIncludesEnd() {
+        val hasher = mockkClass(INodeHasher::class)
+        every { hasher.primaryHashValue(any()) } answers { firstArg<KeyVersionPair>().key.toInt() }
+        val ringCache = ScalableLocalCache(hasher, 1L shl 20)
+        for (hash in listOf(Int.MIN_VALUE, -5, 0, 5, 10, Int.MAX_VALUE)) {
+            ringCache.store(KeyVersionPair(hash.toString(), 0), value)
+        }
+
+        fun copiedHashes(first: Int, second: Int): Set<Int> {
+            return ringCache.initializeCopy(Pair(first, second)).next(Long.MAX_VALUE).map { it.key.toInt() }.toSet()
+        }
+        assertEquals(setOf(5, 10), copiedHashes(0, 10))
+        assertEquals(setOf(Int.MAX_VALUE, Int.MIN_VALUE, -5), copiedHashes(10, -5))
+        assertEquals(6, copiedHashes(5, 5).size)
+    }
+}
@@ -5,11 +5,13 @@ import io.javalin.Javalin
 import io.javalin.testtools.JavalinTest
 import io.mockk.every
 import io.mockk.mockkClass
+import okhttp3.RequestBody.Companion.toRequestBody
 import org.assertj.core.api.Assertions.assertThat
 import org.eclipse.jetty.http.HttpStatus
 import org.junit.jupiter.api.BeforeEach
 import org.junit.jupiter.api.Test
 import sender.ScalableSender
+import java.util.concurrent.CompletableFuture
 import kotlin.test.BeforeTest
 
 class ScalableReceiverTest {
@@ -61,8 +63,12 @@ class ScalableReceiverTest {
 
     @Test
     internal fun `Bad request errors for bulk copy`() = JavalinTest.test(app) { _, client ->
-        val bulkCopyResponse = client.post("/v1/bulk-copy", BulkCopyRequest(2, mutableListOf(KeyValuePair("c", 1, convertToBytes("123")))))
+        val body = BulkCopyCodec.encode(listOf(KeyValuePair("c", 1, convertToBytes("123"))))
+        val bulkCopyResponse = client.request("/v1/bulk-copy?senderId=2") { it.post(body.toRequestBody()) }
         assertThat(bulkCopyResponse.code).isEqualTo(HttpStatus.BAD_REQUEST_400)
+
+        val missingSenderResponse = client.request("/v1/bulk-copy") { it.post(body.toRequestBody()) }
+        assertThat(missingSenderResponse.code).isEqualTo(HttpStatus.BAD_REQUEST_400)
     }
 
 
@@ -104,8 +110,8 @@ class ScalableReceiverTest {
 
     @Test
     internal fun `Store and fetch key-value pair to node that returns error`() = JavalinTest.test(app) { _, client ->
-        every { sender.storeToNode(any(), any(), 2) } throws CrossServerException(1)
-        every { sender.fetchFromNode(any(), 2) } throws CrossServerException(1)
+        every { sender.storeToNodeAsync(any(), any(), 2) } returns CompletableFuture.failedFuture(CrossServerException(1))
+        every { sender.fetchFromNodeAsync(any(), 2) } returns CompletableFuture.failedFuture(CrossServerException(1))
 
         val storeResponse = client.post("/v1/blobs/c/1", "123")
         assertThat(storeResponse.code).isEqualTo(HttpStatus.INTERNAL_SERVER_ERROR_500)
@@ -116,7 +122,7 @@ class ScalableReceiverTest {
 
     @Test
     internal fun `Not found error if value not stored in destination node`() = JavalinTest.test(app) { _, client ->
-        every { sender.fetchFromNode(any(), 2) } throws KeyNotFoundException("c")
+        every { sender.fetchFromNodeAsync(any(), 2) } returns CompletableFuture.failedFuture(KeyNotFoundException("c"))
 
         val fetchResponse = client.get("/v1/blobs/c/1")
         assertThat(fetchResponse.code).isEqualTo(HttpStatus.NOT_FOUND_404)
@@ -124,11 +130,11 @@ class ScalableReceiverTest {
 
     @Test
     internal fun `Store and fetch key-value pair to different node`() = JavalinTest.test(app) { _, client ->
-        every { sender.storeToNode(any(), any(), 2) } returns Unit
+        every { sender.storeToNodeAsync(any(), any(), 2) } returns CompletableFuture.completedFuture(Unit)
         val storeResponse = client.post("/v1/blobs/c/1", "123")
         assertThat(storeResponse.code).isEqualTo(HttpStatus.CREATED_201)
 
-        every { sender.fetchFromNode(any(), 2) } returns convertToBytes("123")
+        every { sender.fetchFromNodeAsync(any(), 2) } returns CompletableFuture.completedFuture(convertToBytes("123"))
         val fetchResponse = client.get("/v1/blobs/c/1")
         assertThat(fetchResponse.code).isEqualTo(HttpStatus.OK_200)
         assertThat(fetchResponse.body).isNotNull
@@ -0,0 +1,90 @@
+import cache.local.slab.SlabCache
+import exception.CacheFullException
+import org.junit.jupiter.api.Assertions.assertThrows
+import org.junit.jupiter.api.BeforeEach
+import org.junit.jupiter.api.Test
+import kotlin.test.assertContentEquals
+import kotlin.test.assertEquals
+import kotlin.test.assertNotNull
+import kotlin.test.assertNull
+
+class SlabCacheTest {
+
+    /* A single 1 KB slab, which holds 8 values of 128 bytes */
+    private val slabSize = 1024
+    private lateinit var cache: SlabCache
+
+    @BeforeEach
+    internal fun beforeEach() {
+        cache = SlabCache(slabSize.toLong(), slabSize)
+    }
+
+    @Test
+    internal fun testHit() {
+        val key = KeyVersionPair("key1", 0)
+
+        cache.store(key, convertToBytes("value1"))
+
+        assertEquals("value1", convertFromBytes(cache.fetch(key)))
+        assertNull(cache.fetch(KeyVersionPair("key2", 0)))
+    }
+
+    @Test
+    internal fun testOverwriteWithDifferentSize() {
+        // Each size class needs a slab of its own
+        val cache = SlabCache(4L * slabSize, slabSize)
+        val key = KeyVersionPair("key1", 0)
+        val largeValue = ByteArray(500) { it.toByte() }
+
+        cache.store(key, convertToBytes("value1"))
+        cache.store(key, largeValue)
+        assertContentEquals(largeValue, cache.fetch(key))
+
+        cache.store(key, convertToBytes("value2"))
+        assertEquals("value2", convertFromBytes(cache.fetch(key)))
+        assertEquals(1, cache.getCacheInfo().totalKeys)
+    }
+
+    @Test
+    internal fun testEvictsLeastRecentlyUsedOfSizeClass() {
+        for (i in 0 until 8) {
+            cache.store(KeyVersionPair("key$i", 0), ByteArray(100) { i.toByte() })
+        }
+
+        // Touch the oldest key so the next oldest is evicted instead
+        cache.fetch(KeyVersionPair("key0", 0))
+        cache.store(KeyVersionPair("key8", 0), ByteArray(100) { 8 })
+
+        assertNull(cache.fetch(KeyVersionPair("key1", 0)))
+        for (i in listOf(0, 2, 3, 4, 5, 6, 7, 8)) {
+            assertContentEquals(ByteArray(100) { i.toByte() }, cache.fetch(KeyVersionPair("key$i", 0)))
+        }
+        assertEquals(1L, cache.getCacheInfo().evictions)
+    }
+
+    @Test
+    internal fun testFullWhenNoSlabIsLeft() {
+        cache.store(KeyVersionPair("key0", 0), ByteArray(100))
+
+        // The only slab belongs to the 128 byte class
+        assertThrows(CacheFullException::class.java) {
+            cache.store(KeyVersionPair("key1", 0), ByteArray(10))
+        }
+        assertThrows(CacheFullException::class.java) {
+            cache.store(KeyVersionPair("key2", 0), ByteArray(slabSize + 1))
+        }
+    }
+
+    @Test
+    internal fun testClearFreesChunks() {
+        for (i in 0 until 8) {
+            cache.store(KeyVersionPair("key$i", 0), ByteArray(100))
+        }
+        cache.clearAll(true)
+
+        assertEquals(0, cache.getCacheInfo().totalKeys)
+        assertNull(cache.fetch(KeyVersionPair("key0", 0)))
+        cache.store(KeyVersionPair("key0", 0), ByteArray(100))
+        assertNotNull(cache.fetch(KeyVersionPair("key0", 0)))
+    }
+}
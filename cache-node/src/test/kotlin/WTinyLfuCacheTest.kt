@@ -0,0 +1,105 @@
+import cache.local.tinylfu.FrequencySketch
+import cache.local.tinylfu.WTinyLfuCache
+import exception.CacheFullException
+import org.junit.jupiter.api.Assertions.assertThrows
+import org.junit.jupiter.api.Test
+import kotlin.test.assertEquals
+import kotlin.test.assertNotNull
+import kotlin.test.assertNull
+import kotlin.test.assertTrue
+
+class WTinyLfuCacheTest {
+
+    /* Each test entry takes 114 accounted bytes: a 4 byte key, a 10 byte value and overhead */
+    private val value = ByteArray(10)
+
+    @Test
+    internal fun testHit() {
+        val cache = WTinyLfuCache()
+        val key = KeyVersionPair("key1", 0)
+
+        cache.store(key, convertToBytes("value1"))
+
+        assertEquals("value1", convertFromBytes(cache.fetch(key)))
+        assertNull(cache.fetch(KeyVersionPair("key2", 0)))
+    }
+
+    @Test
+    internal fun testOverwrite() {
+        val cache = WTinyLfuCache()
+        val key = KeyVersionPair("key1", 0)
+
+        cache.store(key, convertToBytes("value1"))
+        cache.fetch(key)
+        cache.store(key, convertToBytes("longer value"))
+
+        assertEquals("longer value", convertFromBytes(cache.fetch(key)))
+        assertEquals(1, cache.getCacheInfo().totalKeys)
+        assertEquals(key.key.length + 4 + "longer value".length, cache.getCacheInfo().memorySize)
+    }
+
+    @Test
+    internal fun testRejectsInfrequentCandidate() {
+        // The window holds one entry and the main region two, one of them protected
+        val cache = WTinyLfuCache(400, 30)
+        val (a, b, c, d) = listOf("keyA", "keyB", "keyC", "keyD").map { KeyVersionPair(it, 0) }
+
+        cache.store(a, value)
+        cache.store(b, value)
+        cache.store(c, value)
+        repeat(3) { cache.fetch(a) }
+        // Promoting b demotes a back to probation
+        repeat(3) { cache.fetch(b) }
+
+        // c leaves the window and loses against a, which was read more often
+        cache.store(d, value)
+
+        assertNotNull(cache.fetch(a))
+        assertNotNull(cache.fetch(b))
+        assertNull(cache.fetch(c))
+        assertNotNull(cache.fetch(d))
+    }
+
+    @Test
+    internal fun testHotKeysSurviveScan() {
+        val cache = WTinyLfuCache(100L * 128)
+        val hotKeys = (0 until 10).map { KeyVersionPair("hot$it", 0) }
+
+        hotKeys.forEach { cache.store(it, value) }
+        // Push the last hot key out of the window, then read every hot key again
+        cache.store(KeyVersionPair("warm", 0), value)
+        hotKeys.forEach { cache.fetch(it) }
+
+        for (i in 0 until 500) {
+            cache.store(KeyVersionPair("scan$i", 0), value)
+        }
+
+        hotKeys.forEach { assertNotNull(cache.fetch(it)) }
+        val info = cache.getCacheInfo()
+        assertTrue(info.usedBytes <= info.maxBytes)
+        assertTrue(info.totalKeys < 500)
+    }
+
+    @Test
+    internal fun testFullWhenLargerThanCache() {
+        val cache = WTinyLfuCache(1024)
+
+        assertThrows(CacheFullException::class.java) {
+            cache.store(KeyVersionPair("key1", 0), ByteArray(1024))
+        }
+    }
+
+    @Test
+    internal fun testSketchSaturatesAndHalves() {
+        val sketch = FrequencySketch(16)
+
+        repeat(20) { sketch.increment("key1") }
+        assertEquals(15, sketch.frequency("key1"))
+
+        sketch.reset()
+        assertEquals(7, sketch.frequency("key1"))
+
+        sketch.clear()
+        assertEquals(0, sketch.frequency("key1"))
+    }
+}
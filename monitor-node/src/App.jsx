@@ -35,30 +35,33 @@ export function App() {
     fetch(nodes)
       .then((row) => row.text())
       .then((text) => {
-        setNodeDnss(text.split('\n'));
+        setNodeDnss(text.split('\n').filter((line) => line.trim() !== ''));
       });
   }, []);
 
   return (
     <div tyle={{ padding: '20%' }}>
-      <DisplayNodeCharts links={nodeDnss} global={true} />
+      <DisplayNodeCharts links={nodeDnss} global={false} />
     </div>
   );
 }
 
+// Polls every node on its own, so no node fans the request out to the others. A node
+// that does not answer keeps its previous info until it answers again.
 function getLocalCacheInfo(links, setNodeInfos) {
-  axios
-    .all(
-      links.map((link) => axios.get('http://' + link + '/v1/local-cache-info'))
-    )
-    .then(
-      axios.spread(function (...res) {
-        setNodeInfos(res.map((sres) => sres.data));
-      })
-    )
-    .catch((error) => {
-      console.error(error);
-    });
+  Promise.allSettled(
+    links.map((link) => axios.get('http://' + link + '/v1/local-cache-info'))
+  ).then((results) => {
+    setNodeInfos((oldInfos) =>
+      results
+        .map((result, i) =>
+          result.status === 'fulfilled' ? result.value.data : oldInfos[i]
+        )
+    );
+    results
+      .filter((result) => result.status === 'rejected')
+      .forEach((result) => console.error(result.reason));
+  });
 }
 
 function getGlobalCacheInfo(link, setNodeInfos, setNodeNames) {
@@ -79,6 +82,9 @@ function DisplayNodeCharts(props) {
 
   // Get the initial cache info
   useEffect(() => {
+    if (!props.global) {
+      setNodeNames(props.links);
+    }
     if (props.links.length > 0) {
       props.global
         ? getGlobalCacheInfo(props.links[0], setNodeInfos, setNodeNames)
@@ -105,7 +111,7 @@ function DisplayNodeCharts(props) {
         backgroundColor: '#98A8F8',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map((nodeInfo) => nodeInfo.memUsage.usage),
+        data: nodeInfos.map((nodeInfo) => nodeInfo?.memUsage.usage),
       },
     ],
   };
@@ -117,7 +123,7 @@ function DisplayNodeCharts(props) {
         backgroundColor: '#98A8F8',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map((nodeInfo) => nodeInfo.cacheInfo.totalKeys),
+        data: nodeInfos.map((nodeInfo) => nodeInfo?.cacheInfo.totalKeys),
       },
     ],
   };
@@ -129,7 +135,7 @@ function DisplayNodeCharts(props) {
         backgroundColor: '#98A8F8',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map((nodeInfo) => nodeInfo.cacheInfo.memorySize),
+        data: nodeInfos.map((nodeInfo) => nodeInfo?.cacheInfo.memorySize),
       },
     ],
   };
@@ -143,7 +149,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.receiverUsageInfo.storeAttempts
+          (nodeInfo) => nodeInfo?.receiverUsageInfo.storeAttempts
         ),
       },
       {
@@ -152,7 +158,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.receiverUsageInfo.storeSuccesses
+          (nodeInfo) => nodeInfo?.receiverUsageInfo.storeSuccesses
         ),
       },
       {
@@ -161,7 +167,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.receiverUsageInfo.fetchAttempts
+          (nodeInfo) => nodeInfo?.receiverUsageInfo.fetchAttempts
         ),
       },
       {
@@ -170,7 +176,16 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.receiverUsageInfo.fetchSuccesses
+          (nodeInfo) => nodeInfo?.receiverUsageInfo.fetchSuccesses
+        ),
+      },
+      {
+        label: 'Fetch Hits',
+        backgroundColor: '#F8E1A8',
+        borderColor: 'rgba(0,0,0,1)',
+        borderWidth: 0,
+        data: nodeInfos.map(
+          (nodeInfo) => nodeInfo?.receiverUsageInfo.fetchHits
         ),
       },
       {
@@ -179,7 +194,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.receiverUsageInfo.invalidRequests
+          (nodeInfo) => nodeInfo?.receiverUsageInfo.invalidRequests
         ),
       },
     ],
@@ -194,7 +209,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.senderUsageInfo.storeAttempts
+          (nodeInfo) => nodeInfo?.senderUsageInfo.storeAttempts
         ),
       },
       {
@@ -203,7 +218,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.senderUsageInfo.storeSuccesses
+          (nodeInfo) => nodeInfo?.senderUsageInfo.storeSuccesses
         ),
       },
       {
@@ -212,7 +227,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.senderUsageInfo.fetchAttempts
+          (nodeInfo) => nodeInfo?.senderUsageInfo.fetchAttempts
         ),
       },
       {
@@ -221,7 +236,7 @@ function DisplayNodeCharts(props) {
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
         data: nodeInfos.map(
-          (nodeInfo) => nodeInfo.senderUsageInfo.fetchSuccesses
+          (nodeInfo) => nodeInfo?.senderUsageInfo.fetchSuccesses
         ),
       },
     ],
@@ -235,28 +250,28 @@ function DisplayNodeCharts(props) {
         backgroundColor: '#98A8F8',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.clientRequestTiming.clearTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.clientRequestTiming.clearTiming)
       },
       {
         label: 'FetchTiming',
         backgroundColor: '#E1FFB1',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.clientRequestTiming.fetchTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.clientRequestTiming.fetchTiming)
       },
       {
         label: 'RemoveTiming',
         backgroundColor: '#CDFCF6',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.clientRequestTiming.removeTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.clientRequestTiming.removeTiming)
       },
       {
         label: 'StoreTiming',
         backgroundColor: '#BCE29E',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.clientRequestTiming.storeTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.clientRequestTiming.storeTiming)
       }
     ]
   };
@@ -269,28 +284,28 @@ function DisplayNodeCharts(props) {
         backgroundColor: '#98A8F8',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.serverRequestTiming.clearTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.serverRequestTiming.clearTiming)
       },
       {
         label: 'FetchTiming',
         backgroundColor: '#E1FFB1',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.serverRequestTiming.fetchTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.serverRequestTiming.fetchTiming)
       },
       {
         label: 'RemoveTiming',
         backgroundColor: '#CDFCF6',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.serverRequestTiming.removeTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.serverRequestTiming.removeTiming)
       },
       {
         label: 'StoreTiming',
         backgroundColor: '#BCE29E',
         borderColor: 'rgba(0,0,0,1)',
         borderWidth: 0,
-        data: nodeInfos.map(nodeInfo => nodeInfo.serverRequestTiming.storeTiming)
+        data: nodeInfos.map(nodeInfo => nodeInfo?.serverRequestTiming.storeTiming)
       }
     ]
   };
@@ -1,13 +1,25 @@
 import sys
 import io
+import os
+import shutil
+import signal
+import subprocess
+import tarfile
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import requests # pip install requests
-import boto3 # pip install "boto3[crt]"
-from fabric import Connection # pip install fabric
-from invoke import Responder
+try:
+    import boto3 # pip install "boto3[crt]"
+    from fabric import Connection # pip install fabric
+    from invoke import Responder
+except ImportError:
+    # Only the AWS modes need these, local clusters run without them
+    boto3 = Connection = Responder = None
 
 # USAGE: python3 pasture.py <mode> <number of nodes> [-s]
+#        python3 pasture.py local <number of nodes> [node flags] [-- benchmark command]
 
 
 # Maximum number of instances that should be running in cluster
@@ -25,6 +37,37 @@ SSH_CREDS = "CacheCow.pem"
 # AWS credentials file needed for autoscaling
 AWS_CREDS = "rootkey.csv"
 
+# Prebuilt cache node jar and monitor bundle, built once and pushed to every node
+ARTIFACT_DIR = "artifacts"
+NODE_JAR = f"{ARTIFACT_DIR}/cachecow.jar"
+MONITOR_BUNDLE = f"{ARTIFACT_DIR}/monitor.tar.gz"
+
+# JVM flags for cache nodes: a fixed 2 GiB heap on the 4 GiB t3.medium, short G1
+# pauses, and exiting rather than limping on after running out of memory
+NODE_JVM_FLAGS = "-Xms2g -Xmx2g -XX:+UseG1GC -XX:MaxGCPauseMillis=50 -XX:+ExitOnOutOfMemoryError"
+
+# JVM flags for local nodes, a fixed heap small enough to run several on one machine
+LOCAL_JVM_FLAGS = "-Xms512m -Xmx512m -XX:+UseG1GC -XX:MaxGCPauseMillis=50 -XX:+ExitOnOutOfMemoryError"
+
+# Jar built by ./gradlew fatJar and the node list local nodes read
+LOCAL_NODE_JAR = "cache-node/build/libs/cachecow.jar"
+LOCAL_NODE_LIST = "cache-node/nodes.txt"
+
+# Seconds to wait for a local node to start answering requests
+LOCAL_READY_TIMEOUT = 120
+
+# Attempts made to reach a new node over ssh, 5 seconds apart
+CONNECT_ATTEMPTS = 60
+
+# Seconds to wait for a node's cache to start answering requests
+READY_TIMEOUT = 900
+
+# Directory holding the remote command output of each node
+LOG_DIR = "pasture_logs"
+
+# Serializes progress lines printed by concurrent node setups
+print_lock = threading.Lock()
+
 """
 Get the vpc and subnet from ec2.
 """
@@ -45,10 +88,10 @@ def get_vpc_and_subnet(ec2, zone):
 
 
 """
-Connect to the given host until successful.
+Connect to the given host, retrying until the node accepts ssh connections.
 """
-def connect_retry(host, user, key):
-    while True:
+def connect_retry(host, user, key, attempts=CONNECT_ATTEMPTS):
+    for attempt in range(1, attempts + 1):
         try:
             c = Connection(
                 host=host,
@@ -63,29 +106,95 @@ def connect_retry(host, user, key):
             c.open()
             return c
         except Exception as e:
-            print(f"Exception while connecting to host {host}: {e}")
+            if attempt == attempts:
+                raise
+            log(host, f"Exception while connecting (attempt {attempt}/{attempts}): {e}")
             time.sleep(5)
 
 
 """
-Check if the given num_nodese is up and running.
+Check if the given node is up and serving requests. Nodes without a port use CACHE_PORT.
 """
 def test_node(node):
-    success = True
+    address = node if ":" in node else f"{node}:{CACHE_PORT}"
     try:
-        requests.get(f"http://{node}:{CACHE_PORT}", timeout=5)
-    except:
-        success = False
-    return success
+        return requests.get(f"http://{address}/v1/hello-world", timeout=5).status_code == 200
+    except requests.RequestException:
+        return False
 
 
 """
-Wait until the given node is up and running.
+Wait until the given node is up and running, or until the timeout in seconds passes.
+Polls with exponential backoff, from 50 ms up to 5 s between attempts. When the node's
+local process is given, fails as soon as it exits.
 """
-def wait_node(node):
-    print(f"Waiting for {node}")
+def wait_node(node, timeout=None, process=None):
+    log(node, "Waiting for cache")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.05
     while not test_node(node):
-        time.sleep(5)
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{node} exited with status {process.returncode}")
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"{node} did not answer within {timeout}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+
+
+"""
+Print a progress line prefixed with the node it belongs to.
+"""
+def log(node, message):
+    with print_lock:
+        print(f"[{node}] {message}", flush=True)
+
+
+"""
+Wraps the connection to one node so that remote command output goes to the node's
+log file instead of the terminal, where concurrent setups would interleave.
+"""
+class NodeSession:
+    def __init__(self, connection, node, log_dir=LOG_DIR):
+        self.connection = connection
+        self.node = node
+        self.step = "connecting"
+        self.start = time.monotonic()
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_path = os.path.join(log_dir, f"{node}.log")
+        self.log_file = open(self.log_path, "w")
+
+    def action(self, step):
+        self.step = step
+        log(self.node, f"ACTION: {step} ({time.monotonic() - self.start:.0f}s)")
+        self.write(f"### {step}\n")
+
+    def run(self, command, **kwargs):
+        self.write(f"$ {command}\n")
+        kwargs.setdefault("hide", True)
+        if kwargs.get("asynchronous"):
+            return self.connection.run(command, **kwargs)
+        try:
+            result = self.connection.run(command, **kwargs)
+        except Exception as e:
+            # Fabric attaches the failed command's output to the exception
+            result = getattr(e, "result", None)
+            if result is not None:
+                self.write(result.stdout + result.stderr)
+            raise
+        self.write(result.stdout + result.stderr)
+        return result
+
+    def put(self, local, remote):
+        self.write(f"put {remote}\n")
+        return self.connection.put(local, remote=remote)
+
+    def write(self, text):
+        self.log_file.write(text)
+        self.log_file.flush()
+
+    def close(self):
+        self.log_file.close()
+        self.connection.close()
 
 
 """
@@ -128,23 +237,55 @@ def create_instances(ec2, num_nodes):
 
 
 """
-Set up the CacheCow services given the node connection.
+Build the cache node jar and the monitor bundle. A node launching more nodes has no
+sources, so it pushes the artifacts it was deployed with instead.
 """
-def setup_services(c, id, node_dns_f, scaleable, new_node):
-    print("ACTION: Cloning Repo")
+def build_artifacts():
+    if not os.path.exists("cache-node/gradlew"):
+        if not (os.path.exists(NODE_JAR) and os.path.exists(MONITOR_BUNDLE)):
+            raise FileNotFoundError(f"No sources to build and no prebuilt artifacts in {ARTIFACT_DIR}")
+        print("Using prebuilt artifacts")
+        return
 
-    c.run("sudo yum update -y")
-    # c.run("sudo yum install git -y")
-    # c.run("sudo amazon-linux-extras install java-openjdk11 -y")
-    c.run("sudo yum install git java-11-amazon-corretto-headless tmux -y")
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        jar = executor.submit(subprocess.run, ["./gradlew", "-q", "fatJar"], cwd="cache-node", check=True)
+        monitor = executor.submit(build_monitor)
+        jar.result()
+        monitor.result()
+    shutil.copy("cache-node/build/libs/cachecow.jar", NODE_JAR)
+    print(f"Built {NODE_JAR} and {MONITOR_BUNDLE}")
 
-    c.run("git clone https://github.com/RiceComp413-Fall2022/CacheCow")
-    # c.run("cd CacheCow/cache-node/ && git switch ec2-support")
-    # c.run("cd CacheCow/cache-node/ && git switch Autoscale-POC")
+
+"""
+Build the static monitor bundle. Each node overwrites its copy of nodes.txt in the
+bundle, so one build serves every cluster.
+"""
+def build_monitor():
+    subprocess.run("npm ci && npm run build", shell=True, cwd="monitor-node", check=True)
+    with tarfile.open(MONITOR_BUNDLE, "w:gz") as tar:
+        tar.add("monitor-node/build", arcname="monitor")
+
+
+"""
+Install Java and copy the artifacts and nodes.txt to a node, given its session.
+"""
+def install_services(c, node_list, scaleable):
+    c.action("Installing Java")
+
+    c.run("sudo yum install java-11-amazon-corretto-headless tmux -y")
+    c.run(f"mkdir -p CacheCow/cache-node CacheCow/{ARTIFACT_DIR}")
+
+    c.action("Copying artifacts")
+    c.put(NODE_JAR, remote=f"CacheCow/{NODE_JAR}")
+    c.put(MONITOR_BUNDLE, remote=f"CacheCow/{MONITOR_BUNDLE}")
+    c.put(io.StringIO(node_list), remote='CacheCow/cache-node/nodes.txt')
 
     if (scaleable):
-        print("ACTION: Setting Up AWS")
+        c.action("Setting Up AWS")
 
+        # The node runs "pasture.py add" from CacheCow/ to launch more nodes
+        c.put(__file__, remote="CacheCow/pasture.py")
         c.put(SSH_CREDS, remote=f"CacheCow/{SSH_CREDS}")
 
         remote_credentials = f"CacheCow/{AWS_CREDS}"
@@ -163,37 +304,146 @@ def setup_services(c, id, node_dns_f, scaleable, new_node):
         c.run("unzip awscliv2.zip")
         c.run("sudo ./aws/install")
 
-        print("ACTION: Configuring AWS")
+        c.action("Configuring AWS")
         c.run("aws configure", pty=True, watchers=aws_watchers)
         c.run("pip3 install --upgrade pip")
         c.run("pip3 install requests boto3 fabric")
 
-    print("ACTION: Starting services")
 
-    c.put(node_dns_f, remote='CacheCow/cache-node/nodes.txt')
+"""
+Start the cache node and the monitor on a node set up by install_services.
+"""
+def start_services(c, id, node_list, scaleable, new_node):
+    c.action("Starting services")
 
     scaleable_str = "-s" if scaleable else ""
     new_str = "-n" if new_node else ""
-    c.run(f"tmux new-session -d \"cd CacheCow/cache-node/ && ./gradlew run --args 'aws {id} {CACHE_PORT} {scaleable_str} {new_str}'\"", asynchronous=True)
+    c.run(f"tmux new-session -d \"cd CacheCow/cache-node/ && java {NODE_JVM_FLAGS} -jar ../{NODE_JAR} aws {id} {CACHE_PORT} {scaleable_str} {new_str}\"", asynchronous=True)
+
+    c.run(f"tar -xzf CacheCow/{MONITOR_BUNDLE} -C CacheCow")
+    monitor_nodes = c.run("ls CacheCow/monitor/static/media/nodes.*.txt").stdout.strip()
+    c.put(io.StringIO(node_list), remote=monitor_nodes)
+    c.run("tmux new-session -d \"python3 -m http.server 3000 --directory CacheCow/monitor\"", asynchronous=True)
+
+
+"""
+Wait for the given instances to start running and return their public dns names.
+"""
+def wait_instances(ec2, instances):
+    ec2.meta.client.get_waiter('instance_running').wait(InstanceIds=[x.id for x in instances])
+    node_dns = []
+    for instance in instances:
+        instance.load()
+        node_dns.append(instance.public_dns_name)
+        log(instance.public_dns_name, "Finished loading")
+    return node_dns
+
+
+"""
+Check if the given node has finished joining the cluster, i.e. it has received the keys
+it owns from every other node.
+"""
+def node_joined(node):
+    try:
+        info = requests.get(f"http://{node}:{CACHE_PORT}/v1/local-cache-info", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return False
+    return not (info.get("migrationInfo") or {}).get("scaleInProgress", True)
+
 
-    c.run("curl -o- https://raw.githubusercontent.com/nvm-sh/nvm/v0.34.0/install.sh | bash")
-    c.run(". ~/.nvm/nvm.sh")
-    c.run("nvm install 16")
+"""
+Connect to one node, set up its services and wait for its cache to answer. A node
+joining a scalable cluster starts only once previous_join, the future of the node
+before it, is done, and completes join once it has joined itself.
+"""
+def provision_node(node, id, node_list, scaleable, new_node, connect, previous_join=None, join=None):
+    session = None
+    try:
+        session = NodeSession(connect(node, SSH_USER, SSH_CREDS), node)
+        install_services(session, node_list, scaleable)
+        if previous_join is not None:
+            session.action("Waiting for the previous node to join")
+            previous_join.result()
+        start_services(session, id, node_list, scaleable, new_node)
+        session.action("Waiting for cache")
+        wait_node(node, READY_TIMEOUT)
+        if join is not None:
+            session.action("Waiting for keys to be copied")
+            deadline = time.monotonic() + READY_TIMEOUT
+            while not node_joined(node):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{node} did not join within {READY_TIMEOUT}s")
+                time.sleep(1)
+            join.set_result(node)
+        log(node, f"Ready after {time.monotonic() - session.start:.0f}s")
+    except Exception as e:
+        if join is not None:
+            join.set_exception(RuntimeError(f"{node} did not join the cluster"))
+        if session is not None:
+            e.step = session.step
+            e.log_path = session.log_path
+        raise
+    finally:
+        if session is not None:
+            session.close()
 
-    c.put(node_dns_f, remote='CacheCow/monitor-node/src/nodes.txt') # TODO: use the same file
-    c.run("tmux new-session -d \"cd CacheCow/monitor-node/ && . ~/.nvm/nvm.sh && npm install && npm start\"", asynchronous=True)
+
+"""
+Provision the given nodes concurrently, numbering them from first_id. A failed node
+does not stop the others; the failures are reported once every node has finished.
+Nodes joining a scalable cluster are set up concurrently but started one at a time in
+id order, since the cluster admits one new node at a time, and a node whose
+predecessor failed to join fails too. Returns the nodes that failed.
+"""
+def provision_nodes(nodes, first_id, node_list, scaleable, new_node, connect=connect_retry):
+    failures = {}
+    joins = [Future() if scaleable and new_node else None for _ in nodes]
+    with ThreadPoolExecutor(max_workers=max(len(nodes), 1)) as executor:
+        futures = {
+            executor.submit(provision_node, node, first_id + i, node_list, scaleable, new_node, connect,
+                            joins[i - 1] if i > 0 else None, joins[i]): node
+            for i, node in enumerate(nodes)
+        }
+        for future in as_completed(futures):
+            node = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                log(node, f"FAILED: {e}")
+                failures[node] = e
+
+    for node, e in failures.items():
+        step = getattr(e, "step", "connecting")
+        log_path = getattr(e, "log_path", None)
+        where = f", see {log_path}" if log_path else ""
+        sys.stderr.write(f"Node {node} failed while {step}: {e}{where}\n")
+    return list(failures)
 
 
 """
-Launch a new ec2 cluster with the given number of nodes.
+Return the contents of nodes.txt for the given nodes.
 """
-def launch_cluster(num_nodes, scaleable):
+def node_list_text(node_dns):
+    return "\n".join(x + f":{CACHE_PORT}" for x in node_dns)
+
+
+"""
+Launch a new ec2 cluster with the given number of nodes. The clients and the ssh
+connect function can be passed in, e.g. a stubbed client and a local stand-in.
+Returns the nodes that failed to provision, including the load balancer if it never
+answered. Raises ValueError if the cluster would exceed MAX_NODES.
+"""
+def launch_cluster(num_nodes, scaleable, ec2=None, elb=None, connect=connect_retry):
 
     if num_nodes > MAX_NODES:
-        sys.stderr.write(f"Attempted to create {num_nodes} nodes, max is {MAX_NODES}\n")
-        return
+        raise ValueError(f"Attempted to create {num_nodes} nodes, max is {MAX_NODES}")
 
-    ec2 = boto3.resource('ec2')
+    ec2 = ec2 or boto3.resource('ec2')
+    elb = elb or boto3.client('elbv2')
+
+    # Building takes about as long as booting the instances, so do both at once
+    build_executor = ThreadPoolExecutor(max_workers=1)
+    artifacts = build_executor.submit(build_artifacts)
 
     vpc_id, subnet_id = get_vpc_and_subnet(ec2, 'us-east-1b')
 
@@ -240,25 +490,32 @@ def launch_cluster(num_nodes, scaleable):
 
 
     instances = create_instances(ec2, num_nodes)
+    node_dns = wait_instances(ec2, instances)
+    artifacts.result()
+    build_executor.shutdown()
+
+    # The load balancer is created while the nodes are set up, since it takes minutes to become available
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        nodes_future = executor.submit(
+            provision_nodes, node_dns, 0, node_list_text(node_dns), scaleable, False, connect)
+        elb_dns = create_load_balancer(elb, vpc_id, subnet_id, instances)
+        failures = nodes_future.result()
+
+    # The load balancer has nothing to forward to if every node failed
+    if len(failures) == len(node_dns):
+        return failures
+    try:
+        wait_node(elb_dns, READY_TIMEOUT)
+    except TimeoutError as e:
+        sys.stderr.write(f"Load balancer {elb_dns} failed: {e}\n")
+        failures.append(elb_dns)
+    return failures
 
-    node_dns = []
-    for instance in instances:
-        instance.wait_until_running()
-        instance.load()
-        node_dns.append(instance.public_dns_name)
-        print(f"Node {instance.public_dns_name} finished loading")
-
-    node_dns_f = io.StringIO("\n".join(x + f":{CACHE_PORT}" for x in node_dns))
-
-    for i, node in enumerate(node_dns):
-        c = connect_retry(node, SSH_USER, SSH_CREDS)
-
-        setup_services(c, i, node_dns_f, scaleable, False)
-
-        c.close()
-
-    elb = boto3.client('elbv2')
 
+"""
+Create the load balancer in front of the given instances and return its dns name.
+"""
+def create_load_balancer(elb, vpc_id, subnet_id, instances):
     target_group = elb.create_target_group(
         Name='cachecow-nodes',
         Protocol='TCP',
@@ -307,24 +564,19 @@ def launch_cluster(num_nodes, scaleable):
 
     elb.get_waiter('load_balancer_available').wait(LoadBalancerArns=[balancer_arn])
 
-    elb_dns = elb.describe_load_balancers(LoadBalancerArns=[balancer_arn])['LoadBalancers'][0]['DNSName']
-
-    for node in node_dns:
-        wait_node(node)
-
-    wait_node(elb_dns)
+    return elb.describe_load_balancers(LoadBalancerArns=[balancer_arn])['LoadBalancers'][0]['DNSName']
 
 
 """
-Scale the existing ec2 cluster by adding the given number of nodes.
+Scale the existing ec2 cluster by adding the given number of nodes. Returns the nodes
+that failed to provision. Raises ValueError if the cluster would exceed MAX_NODES.
 """
-def scale_cluster(num_nodes):
+def scale_cluster(num_nodes, ec2=None, connect=connect_retry):
 
-    ec2 = boto3.resource('ec2')
+    ec2 = ec2 or boto3.resource('ec2')
     vpc_id, subnet_id = get_vpc_and_subnet(ec2, 'us-east-1b')
 
     all_node_dns = []
-    new_node_dns = []
     instance_count = 0
 
     for instance in ec2.instances.all():
@@ -333,29 +585,87 @@ def scale_cluster(num_nodes):
             instance_count += 1
 
     if instance_count + num_nodes > MAX_NODES:
-        sys.stderr.write(f"Attempted to scale cluster to {instance_count + num_nodes} nodes, max is {MAX_NODES}\n")
-        return
+        raise ValueError(f"Attempted to scale cluster to {instance_count + num_nodes} nodes, max is {MAX_NODES}")
 
     print(f"Existing instance count is {instance_count}")
 
-    new_instances = create_instances(ec2, num_nodes)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        artifacts = executor.submit(build_artifacts)
+        new_instances = create_instances(ec2, num_nodes)
+        new_node_dns = wait_instances(ec2, new_instances)
+        artifacts.result()
+    all_node_dns += new_node_dns
 
-    for instance in new_instances:
-        instance.wait_until_running()
-        instance.load()
-        all_node_dns.append(instance.public_dns_name)
-        new_node_dns.append(instance.public_dns_name)
+    return provision_nodes(new_node_dns, instance_count, node_list_text(all_node_dns), True, True, connect)
+
+"""
+Start a node on this machine from the fat jar. The node gets its own process group,
+which also holds any nodes it launches in scalable mode.
+"""
+def start_local_node(id, node_flags):
+    output = open(f"cache-node/out{id}.txt", "w")
+    command = ["java"] + LOCAL_JVM_FLAGS.split() + ["-jar", os.path.abspath(LOCAL_NODE_JAR),
+               "local", str(id), str(CACHE_PORT + id)] + node_flags
+    return subprocess.Popen(command, cwd="cache-node", stdout=output, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+
+"""
+Stop the given local nodes and any nodes they launched.
+"""
+def stop_local_nodes(processes):
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+"""
+Run a cluster of the given number of nodes on this machine. Once every node answers,
+runs the command from the performance-testing directory, or waits for Ctrl-C if there
+is none, then stops the nodes and restores nodes.txt. Returns the command's exit status.
+"""
+def run_local_cluster(num_nodes, node_flags, command):
+    subprocess.run(["./gradlew", "-q", "fatJar"], cwd="cache-node", check=True)
 
-    node_dns_f = io.StringIO("\n".join(x + f":{CACHE_PORT}" for x in all_node_dns))
+    nodes = [f"localhost:{CACHE_PORT + i}" for i in range(num_nodes)]
+    with open(LOCAL_NODE_LIST) as node_file:
+        original_node_list = node_file.read()
 
-    for i, node in enumerate(new_node_dns):
-        c = connect_retry(node, SSH_USER, SSH_CREDS)
-        id = i + instance_count
-        setup_services(c, id, node_dns_f, True, True)
-        c.close()
+    processes = []
+    try:
+        with open(LOCAL_NODE_LIST, "w") as node_file:
+            node_file.write("\n".join(nodes) + "\n")
+
+        for i in range(num_nodes):
+            processes.append(start_local_node(i, node_flags))
+        start = time.monotonic()
+        for node, process in zip(nodes, processes):
+            wait_node(node, LOCAL_READY_TIMEOUT, process)
+        print(f"{num_nodes} nodes ready after {time.monotonic() - start:.1f}s")
+
+        if not command:
+            print("Press Ctrl-C to stop the cluster")
+            try:
+                while all(process.poll() is None for process in processes):
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+            return 0
+
+        return subprocess.run(command, cwd="performance-testing").returncode
+    finally:
+        stop_local_nodes(processes)
+        with open(LOCAL_NODE_LIST, "w") as node_file:
+            node_file.write(original_node_list)
 
-    for node in new_node_dns:
-        wait_node(node)
 
 """
 Tear down the existing ec2 cluster.
@@ -387,18 +697,29 @@ def start():
     
     num_nodes = int(sys.argv[2])
 
-    if mode == "add":
-        scale_cluster(num_nodes)
-        return
-
-    if mode == "create":
-        scaleable = False
-        if len(sys.argv) == 4 and sys.argv[3] == "-s":
-            scaleable = True
-        launch_cluster(num_nodes, scaleable)
-        return
+    if mode == "local":
+        args = sys.argv[3:]
+        split = args.index("--") if "--" in args else len(args)
+        sys.exit(run_local_cluster(num_nodes, args[:split], args[split + 1:]))
 
-    print(f"Launch mode {mode} not recognized, only 'create', 'add', and 'delete' supported")
+    try:
+        if mode == "add":
+            if scale_cluster(num_nodes):
+                sys.exit(1)
+            return
+
+        if mode == "create":
+            scaleable = False
+            if len(sys.argv) == 4 and sys.argv[3] == "-s":
+                scaleable = True
+            if launch_cluster(num_nodes, scaleable):
+                sys.exit(1)
+            return
+    except ValueError as e:
+        sys.stderr.write(f"{e}\n")
+        sys.exit(1)
+
+    print(f"Launch mode {mode} not recognized, only 'create', 'add', 'delete' and 'local' supported")
 
 # Program entry point
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Compares the hit rates of the local cache engines on three cache-aside traces:
+#   long-tailed: the lognormal keys of long-tailed.py, where one-off keys dominate
+#   zipf: keys drawn from a Zipf distribution with exponent --alpha
+#   scan: the Zipf trace with a burst of --scan-length new keys every --scan-every requests
+# Each key is fetched, and stored on a miss. The cache is cleared before each trace. The
+# eviction policy only matters once the cache is full, so start the nodes with a small
+# budget, e.g. "-m 1m", once per engine ("-e heap", "-e multitable", "-e tinylfu").
+# Save the first run with -o and pass it to the next ones with --compare.
+
+import json
+from optparse import OptionParser
+
+import numpy as np
+
+from cachecow import CacheCowClient, CacheCowError, load_node_list
+
+TRACES = ['long-tailed', 'zipf', 'scan']
+
+MU, SIGMA = 3, 5
+
+
+def make_trace(name, num_requests, alpha, scan_every, scan_length, rng):
+    """Returns the keys requested by a trace, in order.
+    """
+    if name == 'long-tailed':
+        return rng.lognormal(MU, SIGMA, num_requests).astype(int)
+    keys = rng.zipf(alpha, num_requests)
+    if name == 'scan':
+        # Scan keys are negative so they never repeat a Zipf key or each other
+        next_scan_key = -1
+        for start in range(scan_every, num_requests, scan_every + scan_length):
+            end = min(start + scan_length, num_requests)
+            keys[start:end] = np.arange(next_scan_key, next_scan_key - (end - start), -1)
+            next_scan_key -= end - start
+    return keys
+
+
+def replay(client, keys, batch_size, value_size):
+    """Replays a trace with cache-aside, returning the hit rate and the number of
+    failed requests.
+    """
+    value = b'x' * value_size
+    hits, errors = 0, 0
+    for start in range(0, len(keys), batch_size):
+        batch = [str(key) for key in keys[start:start + batch_size]]
+        try:
+            values = client.get_many([(key, 1) for key in batch])
+        except CacheCowError:
+            errors += 1
+            values = [None] * len(batch)
+        hits += sum(value is not None for value in values)
+        misses = list(dict.fromkeys(key for key, value in zip(batch, values) if value is None))
+        if misses:
+            try:
+                client.set_many([(key, 1, value) for key in misses])
+            except CacheCowError:
+                errors += 1
+    return hits / len(keys), errors
+
+
+def print_results(results, baseline=None):
+    header = f'{"trace":<12}{"hit rate":>12}'
+    if baseline:
+        header += f'{"before":>12}'
+    print(header)
+    for name, hit_rate in results.items():
+        row = f'{name:<12}{hit_rate:>12.3f}'
+        if baseline and name in baseline:
+            row += f'{baseline[name]:>12.3f}'
+        print(row)
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="admissionPolicies.py --nodes nodes.txt [options]")
+    parser.add_option("--url",
+                type="string",
+                dest="url",
+                help="Node URL for sending HTTP requests.")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt. Sends each key directly to the node that owns it.")
+    parser.add_option("--traces",
+                type="string",
+                default=','.join(TRACES),
+                dest="traces",
+                help="Comma separated traces to replay.")
+    parser.add_option("-n",
+                type="int",
+                default=100000,
+                dest="num_requests",
+                help="Number of requests per trace.")
+    parser.add_option("--size",
+                type="int",
+                default=100,
+                dest="value_size",
+                help="Size of each value in bytes.")
+    parser.add_option("--alpha",
+                type="float",
+                default=1.2,
+                dest="alpha",
+                help="Exponent of the Zipf distribution.")
+    parser.add_option("--scan-every",
+                type="int",
+                default=5000,
+                dest="scan_every",
+                help="Number of Zipf requests between scans.")
+    parser.add_option("--scan-length",
+                type="int",
+                default=5000,
+                dest="scan_length",
+                help="Number of new keys read by each scan.")
+    parser.add_option("--batch",
+                type="int",
+                default=100,
+                dest="batch_size",
+                help="Number of requests per get_many/set_many batch.")
+    parser.add_option("-s",
+                type="int",
+                default=0,
+                dest="seed",
+                help="Seed.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the hit rates as JSON, e.g. to compare two engines.")
+    parser.add_option("--compare",
+                type="string",
+                dest="compare",
+                help="JSON results of an earlier run to print alongside.")
+    (options, args) = parser.parse_args()
+
+    if not options.url and not options.nodes:
+        raise Exception("URL Argument is necessary for performance testing.")
+    traces = options.traces.split(',')
+    for name in traces:
+        if name not in TRACES:
+            raise Exception(f"Unknown trace {name}, expected one of {TRACES}.")
+
+    results = {}
+    nodes = load_node_list(options.nodes) if options.nodes else [options.url]
+    with CacheCowClient(nodes) as client:
+        for name in traces:
+            rng = np.random.default_rng(options.seed)
+            keys = make_trace(name, options.num_requests, options.alpha,
+                              options.scan_every, options.scan_length, rng)
+            client.clear()
+            results[name], errors = replay(client, keys, options.batch_size, options.value_size)
+            if errors:
+                print(f'{name}: {errors} requests failed')
+        client.clear()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
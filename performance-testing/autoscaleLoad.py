@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# Simulated load that outgrows a scalable cluster, to check that the autoscaling
+# controller adds nodes before the hit ratio collapses. Workers read keys uniformly
+# from a working set that grows from --start-keys to --end-keys over the run. A miss
+# is stored, as a read-through cache would, so once the working set no longer fits
+# the hit ratio falls roughly as capacity over working set. The controller from
+# cachecow/autoscale.py runs alongside, after the first --start-keys are stored. Each
+# interval prints the hit ratio the workers saw next to what the controller measured.
+# The run ends with when nodes were launched and when, if ever, the hit ratio fell
+# below --collapse. Run once with --no-autoscale to see the collapse it prevents:
+#
+#   python3 pasture.py local 2 -s -m 16m -- python3 autoscaleLoad.py --nodes ../cache-node/nodes.txt
+
+import json
+from optparse import OptionParser
+import random
+import threading
+import time
+
+from autoscaler import add_policy_options, policy_from_options, print_header, print_sample
+from cachecow import Autoscaler, CacheCowClient, CacheCowError, load_node_list
+
+
+class LoadWorker:
+    """Reads keys from the growing working set, storing every miss.
+    """
+
+    def __init__(self, nodes, scaled_nodes, working_set, value, seed):
+        self.client = CacheCowClient(nodes, scalable=True)
+        self.scaled_nodes = scaled_nodes
+        self.followed = 0
+        self.working_set = working_set
+        self.value = value
+        self.rng = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def run(self, stop):
+        while not stop.is_set():
+            # Follow scale-outs between requests, so routing never changes mid-request
+            while self.followed < len(self.scaled_nodes):
+                self.client.add_node(self.scaled_nodes[self.followed])
+                self.followed += 1
+            key = f'load-{self.rng.randrange(self.working_set())}'
+            try:
+                if self.client.fetch(key, 1) is None:
+                    self.misses += 1
+                    self.client.store(key, 1, self.value)
+                else:
+                    self.hits += 1
+            except CacheCowError:
+                self.errors += 1
+        self.client.close()
+
+
+def run(nodes, options, policy):
+    controller_client = CacheCowClient(nodes, scalable=True)
+    value = b'x' * options.value_size
+    for batch_start in range(0, options.start_keys, 500):
+        controller_client.set_many([(f'load-{i}', 1, value)
+                                    for i in range(batch_start, min(batch_start + 500, options.start_keys))])
+    start = time.monotonic()
+
+    def working_set():
+        progress = min(1.0, (time.monotonic() - start) / options.duration)
+        return int(options.start_keys + progress * (options.end_keys - options.start_keys))
+
+    scaled_nodes = []
+    workers = [LoadWorker(nodes, scaled_nodes, working_set, value, options.seed + i)
+               for i in range(options.concurrency)]
+
+    autoscaler = Autoscaler(controller_client, policy, on_scale=scaled_nodes.extend)
+    last = {'sample': None, 'action': ''}
+
+    def report(sample, action):
+        last['sample'], last['action'] = sample, action
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=worker.run, args=(stop,)) for worker in workers]
+    threads.append(threading.Thread(target=autoscaler.run, args=(options.poll_interval,),
+                                    kwargs={'stop': stop, 'report': report}))
+    for thread in threads:
+        thread.start()
+
+    timeline = []
+    previous_hits = previous_misses = 0
+    print_header(f'{"time":>6}{"keys":>9}{"seen hits":>10}')
+    try:
+        while time.monotonic() - start < options.duration:
+            time.sleep(options.interval)
+            hits, misses = sum(w.hits for w in workers), sum(w.misses for w in workers)
+            fetches = hits - previous_hits + misses - previous_misses
+            hit_ratio = (hits - previous_hits) / fetches if fetches > 0 else 1.0
+            previous_hits, previous_misses = hits, misses
+
+            elapsed = time.monotonic() - start
+            keys = working_set()
+            sample, action = last['sample'], last['action']
+            timeline.append({'time': elapsed, 'keys': keys, 'hitRatio': hit_ratio,
+                             'controller': sample.as_dict() if sample else None, 'action': action})
+            prefix = f'{elapsed:>6.0f}{keys:>9}{hit_ratio:>10.3f}'
+            if sample is None:
+                print(prefix)
+            else:
+                print_sample(sample, action, prefix)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        controller_client.close()
+
+    return timeline, autoscaler.events, start, sum(w.errors for w in workers)
+
+
+def print_summary(timeline, events, start, collapse):
+    for event in events:
+        if event['event'] == 'launch':
+            print(f'Launched node {event["nodes"]} at {event["time"] - start:.0f}s ({", ".join(event["breaches"])})')
+        else:
+            print(f'{event["event"].capitalize()} at {event["time"] - start:.0f}s with {event["nodes"]} nodes')
+    collapsed = next((point for point in timeline if point['hitRatio'] < collapse), None)
+    if collapsed is None:
+        print(f'Hit ratio stayed above {collapse}')
+    else:
+        print(f'Hit ratio fell below {collapse} at {collapsed["time"]:.0f}s with {collapsed["keys"]} keys')
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="autoscaleLoad.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a scalable cluster.")
+    parser.add_option("--start-keys",
+                type="int",
+                default=10000,
+                dest="start_keys",
+                help="Working set size at the start.")
+    parser.add_option("--end-keys",
+                type="int",
+                default=80000,
+                dest="end_keys",
+                help="Working set size at the end.")
+    parser.add_option("--size",
+                type="int",
+                default=1024,
+                dest="value_size",
+                help="Size of each value in bytes.")
+    parser.add_option("-d", "--duration",
+                type="float",
+                default=300.0,
+                dest="duration",
+                help="Seconds over which the working set grows.")
+    parser.add_option("-c", "--concurrency",
+                type="int",
+                default=4,
+                dest="concurrency",
+                help="Number of load threads.")
+    parser.add_option("--interval",
+                type="float",
+                default=5.0,
+                dest="interval",
+                help="Seconds between printed lines.")
+    parser.add_option("--poll-interval",
+                type="float",
+                default=2.0,
+                dest="poll_interval",
+                help="Seconds between controller polls.")
+    parser.add_option("--collapse",
+                type="float",
+                default=0.5,
+                dest="collapse",
+                help="Hit ratio counted as collapsed in the summary.")
+    parser.add_option("--no-autoscale",
+                action="store_false",
+                default=True,
+                dest="autoscale",
+                help="Only watch the cluster, never launch nodes.")
+    parser.add_option("-s",
+                type="int",
+                default=10,
+                dest="seed",
+                help="Seed.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the timeline and scaling events as JSON.")
+    add_policy_options(parser)
+    parser.set_defaults(cooldown=20.0)
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for autoscaling tests.")
+
+    policy = policy_from_options(options)
+    if not options.autoscale:
+        policy.max_nodes = 0
+
+    timeline, events, start, errors = run(load_node_list(options.nodes), options, policy)
+    print(f'{errors} requests failed')
+    print_summary(timeline, events, start, options.collapse)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump({'timeline': timeline,
+                       'events': [dict(event, time=event['time'] - start) for event in events]},
+                      output_file, indent=2)
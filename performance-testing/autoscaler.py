@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# Runs the autoscaling controller against a scalable cluster. Every --interval seconds
+# it polls /v1/global-cache-info, prints the signals over the last interval and
+# launches a node through /v1/launch-node when the policy calls for it. See
+# cachecow/autoscale.py for how the thresholds, streaks and cooldowns interact.
+# Start the cluster with "-s" for this to work.
+
+import json
+from optparse import OptionParser
+
+from cachecow import Autoscaler, CacheCowClient, ScalingPolicy, load_node_list
+
+
+def add_policy_options(parser):
+    """Adds an option for every ScalingPolicy threshold.
+    """
+    defaults = ScalingPolicy()
+    parser.add_option("--memory",
+                type="string",
+                default=f'{defaults.memory_low}:{defaults.memory_high}',
+                dest="memory",
+                help="<clear>:<breach> share of the cluster's byte budget in use.")
+    parser.add_option("--hit-ratio",
+                type="string",
+                default=f'{defaults.hit_ratio_low}:{defaults.hit_ratio_high}',
+                dest="hit_ratio",
+                help="<breach>:<clear> fraction of fetched keys found, only breaches on a full cache.")
+    parser.add_option("--eviction-rate",
+                type="string",
+                default=f'{defaults.eviction_rate_low}:{defaults.eviction_rate_high}',
+                dest="eviction_rate",
+                help="<clear>:<breach> keys evicted per key stored.")
+    parser.add_option("--latency",
+                type="string",
+                default=f'{defaults.latency_low_ms}:{defaults.latency_high_ms}',
+                dest="latency",
+                help="<clear>:<breach> p99 of client fetches in milliseconds.")
+    parser.add_option("--breaches",
+                type="int",
+                default=defaults.breach_intervals,
+                dest="breach_intervals",
+                help="Polls in a row over a threshold before a node is launched.")
+    parser.add_option("--cooldown",
+                type="float",
+                default=defaults.cooldown,
+                dest="cooldown",
+                help="Seconds after a scale-out before the cluster is judged again.")
+    parser.add_option("--launch-timeout",
+                type="float",
+                default=defaults.launch_timeout,
+                dest="launch_timeout",
+                help="Seconds to wait for a launched node to join.")
+    parser.add_option("--max-nodes",
+                type="int",
+                default=defaults.max_nodes,
+                dest="max_nodes",
+                help="Largest cluster size to scale to.")
+
+
+def policy_from_options(options):
+    def pair(value):
+        low, high = value.split(':')
+        return float(low), float(high)
+
+    memory_low, memory_high = pair(options.memory)
+    hit_ratio_low, hit_ratio_high = pair(options.hit_ratio)
+    eviction_rate_low, eviction_rate_high = pair(options.eviction_rate)
+    latency_low_ms, latency_high_ms = pair(options.latency)
+    return ScalingPolicy(memory_high=memory_high, memory_low=memory_low,
+                         hit_ratio_low=hit_ratio_low, hit_ratio_high=hit_ratio_high,
+                         eviction_rate_high=eviction_rate_high, eviction_rate_low=eviction_rate_low,
+                         latency_high_ms=latency_high_ms, latency_low_ms=latency_low_ms,
+                         breach_intervals=options.breach_intervals, cooldown=options.cooldown,
+                         launch_timeout=options.launch_timeout, max_nodes=options.max_nodes)
+
+
+def print_sample(sample, action, prefix=''):
+    print(f'{prefix}{sample.node_count:>6}{sample.memory_utilization:>9.0%}{sample.hit_ratio:>10.3f}'
+          f'{sample.eviction_rate:>11.3f}{sample.fetch_p99_ms:>11.2f}{sample.fetches:>10}  {action}')
+
+
+def print_header(prefix=''):
+    print(f'{prefix}{"nodes":>6}{"memory":>9}{"hit ratio":>10}{"evict/set":>11}{"p99 (ms)":>11}{"fetches":>10}  action')
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="autoscaler.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a scalable cluster.")
+    parser.add_option("--interval",
+                type="float",
+                default=5.0,
+                dest="interval",
+                help="Seconds between polls.")
+    parser.add_option("-d", "--duration",
+                type="float",
+                dest="duration",
+                help="Seconds to run for, runs until Ctrl-C by default.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the launches and scale-outs as JSON.")
+    add_policy_options(parser)
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for autoscaling.")
+
+    with CacheCowClient(load_node_list(options.nodes), scalable=True) as client:
+        autoscaler = Autoscaler(client, policy_from_options(options))
+        print_header()
+        try:
+            autoscaler.run(options.interval, options.duration, report=print_sample)
+        except KeyboardInterrupt:
+            pass
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(autoscaler.events, output_file, indent=2)
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+# Runs reproducible load benchmarks against a cluster and records the results as JSON,
+# along with the git commit, the cluster shape and every setting, so runs can be compared
+# over time. A run preloads the key space, warms up for a few seconds and then measures
+# for a fixed duration, either closed-loop (a fixed number of clients sending requests
+# back to back) or open-loop (requests sent at a fixed rate whether or not earlier ones
+# have finished, timed from when they were due so queueing delay is counted).
+#
+# Workloads set the key popularity, value sizes and read/write mix. Several can run in
+# one go, and --compare with --max-regression fails the run if throughput or a p99 got
+# worse than an earlier run by more than the given percentage.
+
+import asyncio
+from datetime import datetime, timezone
+import json
+from optparse import OptionParser
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from cachecow import CacheCowClient, CacheCowError, load_node_list, parse_latencies
+from cachecow.aio import AsyncCacheCowClient
+from cachecow.latency import merge_by_prefix
+
+PERCENTILES = [50, 99, 99.9]
+
+# Settings of each workload, any of which can be overridden from the command line
+WORKLOADS = {
+    'read-heavy': {'keys': 100000, 'key_dist': 'zipf:0.99', 'value_size': 'fixed:100', 'read_ratio': 0.95},
+    'mixed': {'keys': 100000, 'key_dist': 'zipf:0.99', 'value_size': 'fixed:100', 'read_ratio': 0.5},
+    'write-heavy': {'keys': 100000, 'key_dist': 'uniform', 'value_size': 'fixed:100', 'read_ratio': 0.1},
+    'hotspot': {'keys': 100000, 'key_dist': 'hotspot:0.01:0.9', 'value_size': 'fixed:100', 'read_ratio': 0.95},
+    'scan': {'keys': 100000, 'key_dist': 'sequential', 'value_size': 'fixed:100', 'read_ratio': 1.0},
+    'large-values': {'keys': 10000, 'key_dist': 'uniform', 'value_size': 'lognormal:9:1', 'read_ratio': 0.9},
+}
+
+MAX_VALUE_SIZE = 1 << 20
+
+# Number of operations drawn from the random generator at a time
+CHUNK_SIZE = 1 << 16
+
+
+def parse_spec(spec):
+    """Splits a distribution like "zipf:0.99" into its name and float parameters.
+    """
+    name, *params = spec.split(':')
+    return name, [float(param) for param in params]
+
+
+def key_sampler(spec, num_keys, rng):
+    """Returns a function drawing n key indices from the distribution spec:
+    uniform, zipf:<alpha>, hotspot:<hot fraction>:<hot probability> or sequential.
+    """
+    name, params = parse_spec(spec)
+    if name == 'uniform':
+        return lambda n: rng.integers(0, num_keys, n)
+    if name == 'zipf':
+        alpha = params[0] if params else 0.99
+        cdf = np.cumsum(1.0 / np.arange(1, num_keys + 1) ** alpha)
+        cdf /= cdf[-1]
+        # Hot keys are spread over the key space rather than all numbered first
+        ranks = rng.permutation(num_keys)
+        return lambda n: ranks[np.minimum(np.searchsorted(cdf, rng.random(n)), num_keys - 1)]
+    if name == 'hotspot':
+        hot_fraction, hot_probability = params if len(params) == 2 else (0.01, 0.9)
+        hot_keys = max(1, int(num_keys * hot_fraction))
+        def sample(n):
+            hot = rng.random(n) < hot_probability
+            return np.where(hot, rng.integers(0, hot_keys, n), rng.integers(0, num_keys, n))
+        return sample
+    if name == 'sequential':
+        position = [0]
+        def sample(n):
+            indices = (position[0] + np.arange(n)) % num_keys
+            position[0] = (position[0] + n) % num_keys
+            return indices
+        return sample
+    raise ValueError(f'Unknown key distribution: {spec}')
+
+
+def value_sizes(spec, num_keys, rng):
+    """Draws the value size of every key from the distribution spec: fixed:<bytes>,
+    uniform:<min>:<max> or lognormal:<mu>:<sigma>. Sizes are clamped to [1, 1 MB].
+    """
+    name, params = parse_spec(spec)
+    if name == 'fixed':
+        sizes = np.full(num_keys, params[0])
+    elif name == 'uniform':
+        sizes = rng.integers(int(params[0]), int(params[1]) + 1, num_keys)
+    elif name == 'lognormal':
+        sizes = rng.lognormal(params[0], params[1], num_keys)
+    else:
+        raise ValueError(f'Unknown value size distribution: {spec}')
+    return np.clip(sizes, 1, MAX_VALUE_SIZE).astype(np.int64)
+
+
+class Workload:
+    """An endless stream of (is_read, key index) operations, drawn in chunks.
+    """
+
+    def __init__(self, settings, rng):
+        self.settings = settings
+        self.rng = rng
+        self.num_keys = settings['keys']
+        self.sample_keys = key_sampler(settings['key_dist'], self.num_keys, rng)
+        self.sizes = value_sizes(settings['value_size'], self.num_keys, rng)
+        self.payload = rng.bytes(int(self.sizes.max()))
+        self.chunk = []
+
+    def key(self, index):
+        return f'bench-{index}'
+
+    def value(self, index):
+        return self.payload[:self.sizes[index]]
+
+    def next(self):
+        if not self.chunk:
+            reads = self.rng.random(CHUNK_SIZE) < self.settings['read_ratio']
+            self.chunk = list(zip(reads.tolist(), self.sample_keys(CHUNK_SIZE).tolist()))
+            self.chunk.reverse()
+        return self.chunk.pop()
+
+
+class Recorder:
+    """Latencies, hits and errors of the requests that finished while recording.
+    """
+
+    def __init__(self):
+        self.latencies = {'fetch': [], 'store': []}
+        self.errors = {'fetch': 0, 'store': 0}
+        self.hits = 0
+        self.recording = False
+
+    def record(self, is_read, seconds, hit):
+        if self.recording:
+            self.latencies['fetch' if is_read else 'store'].append(seconds)
+            self.hits += hit
+
+    def error(self, is_read):
+        if self.recording:
+            self.errors['fetch' if is_read else 'store'] += 1
+
+
+async def send(client, workload, recorder, is_read, index, start_time):
+    """Sends one operation and records its latency from start_time.
+    """
+    key = workload.key(index)
+    try:
+        if is_read:
+            hit = await client.fetch(key, 1) is not None
+        else:
+            await client.store(key, 1, workload.value(index))
+            hit = False
+    except (CacheCowError, OSError, asyncio.TimeoutError):
+        recorder.error(is_read)
+        return
+    recorder.record(is_read, time.perf_counter() - start_time, hit)
+
+
+async def closed_loop(client, workload, recorder, concurrency, deadline):
+    """Keeps concurrency requests in flight, each sent as soon as the last finished.
+    """
+    async def worker():
+        while time.perf_counter() < deadline:
+            is_read, index = workload.next()
+            await send(client, workload, recorder, is_read, index, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, workload, recorder, rate, poisson, deadline):
+    """Sends requests at rate per second, constant or Poisson spaced, regardless of
+    how many are still in flight. A request is timed from when it was due.
+    """
+    pending = set()
+    due = time.perf_counter()
+    while due < deadline:
+        now = time.perf_counter()
+        if due > now:
+            await asyncio.sleep(due - now)
+        # Catch up on every request due by now, each timed from its own due time
+        while due <= time.perf_counter() and due < deadline:
+            is_read, index = workload.next()
+            task = asyncio.ensure_future(send(client, workload, recorder, is_read, index, due))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            due += workload.rng.exponential(1.0 / rate) if poisson else 1.0 / rate
+    await asyncio.gather(*pending)
+
+
+async def run_phases(nodes, options, workload, recorder):
+    """Warms up, then records for the measured duration. Returns the measured seconds.
+    """
+    async with AsyncCacheCowClient(nodes, scalable=options.scalable, pool_size=options.concurrency,
+                                   max_in_flight=options.max_in_flight, timeout=options.timeout) as client:
+        async def phase(seconds):
+            deadline = time.perf_counter() + seconds
+            if options.mode == 'closed':
+                await closed_loop(client, workload, recorder, options.concurrency, deadline)
+            else:
+                await open_loop(client, workload, recorder, options.rate, options.arrivals == 'poisson', deadline)
+
+        await phase(options.warmup)
+        recorder.recording = True
+        start_time = time.perf_counter()
+        await phase(options.duration)
+        recorder.recording = False
+        return time.perf_counter() - start_time
+
+
+def summarize(latencies):
+    """Returns the count, mean, percentiles and maximum of latencies in milliseconds.
+    """
+    if not latencies:
+        return {'count': 0}
+    millis = np.array(latencies) * 1000
+    summary = {'count': len(millis), 'mean': float(millis.mean()), 'max': float(millis.max())}
+    summary.update({f'p{p}': float(np.percentile(millis, p)) for p in PERCENTILES})
+    return summary
+
+
+def node_snapshots(client):
+    """Returns the local info of every node, asking each node separately.
+    """
+    return [client.local_cache_info(node_id) for node_id in range(len(client.node_clients))]
+
+
+def server_summary(before, after):
+    """Sums what the nodes counted between two snapshots: keys fetched and found,
+    forwarded requests and evictions, with the p50/p99/p99.9 that the nodes
+    measured for client fetches and stores, in milliseconds.
+    """
+    def delta(path):
+        total = 0
+        for node_before, node_after in zip(before, after):
+            old, new = node_before, node_after
+            for field in path:
+                old, new = old[field], new[field]
+            total += new - old
+        return total
+
+    summary = {
+        'fetched keys': delta(['receiverUsageInfo', 'fetchAttempts']),
+        'hits': delta(['receiverUsageInfo', 'fetchHits']),
+        'forwarded requests': delta(['receiverUsageInfo', 'forwardedRequests']),
+        'evictions': delta(['cacheInfo', 'evictions']),
+    }
+    for op in ('fetch', 'store'):
+        histogram = None
+        for node_before, node_after in zip(before, after):
+            old = merge_by_prefix(parse_latencies(node_before['latencies']), f'{op}.client')
+            new = merge_by_prefix(parse_latencies(node_after['latencies']), f'{op}.client')
+            difference = new.subtract(old)
+            histogram = difference if histogram is None else histogram.merge(difference)
+        summary[op] = {f'p{p}': histogram.percentile(p) / 1e6 for p in PERCENTILES}
+    return summary
+
+
+def run_workload(client, nodes, options, name, settings):
+    """Preloads, warms up and measures one workload, returning its results.
+    """
+    rng = np.random.default_rng(options.seed)
+    workload = Workload(settings, rng)
+    client.clear()
+
+    if options.preload:
+        items = [(workload.key(i), 1, workload.value(i)) for i in range(workload.num_keys)]
+        for start in range(0, len(items), options.preload_batch):
+            client.set_many(items[start:start + options.preload_batch])
+
+    recorder = Recorder()
+    before = node_snapshots(client)
+    seconds = asyncio.run(run_phases(nodes, options, workload, recorder))
+    after = node_snapshots(client)
+
+    fetches, stores = recorder.latencies['fetch'], recorder.latencies['store']
+    results = {
+        'seconds': seconds,
+        'throughput': (len(fetches) + len(stores)) / seconds,
+        'hit ratio': recorder.hits / len(fetches) if fetches else None,
+        'errors': recorder.errors,
+        'fetch': summarize(fetches),
+        'store': summarize(stores),
+        'server': server_summary(before, after),
+    }
+    if options.mode == 'open':
+        results['offered rate'] = options.rate
+    return {'settings': settings, 'results': results}
+
+
+def git_info():
+    """Returns the commit of the checkout this script runs from, and whether it has
+    uncommitted changes.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=directory, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': status != ''}
+
+
+def cluster_info(nodes, options, snapshots):
+    return {
+        'nodes': len(nodes),
+        'urls': nodes,
+        'scalable': options.scalable,
+        'cache max bytes': [info['cacheInfo']['maxBytes'] for info in snapshots],
+        'jvm max bytes': [info['memUsage']['max'] for info in snapshots],
+    }
+
+
+def workload_settings(options):
+    """Returns the settings of every workload to run, with overrides applied.
+    """
+    workloads = {}
+    for name in options.workloads.split(','):
+        if name not in WORKLOADS:
+            raise ValueError(f'Unknown workload {name}, pick from {", ".join(WORKLOADS)}')
+        settings = dict(WORKLOADS[name])
+        for setting in settings:
+            if getattr(options, setting) is not None:
+                settings[setting] = getattr(options, setting)
+        workloads[name] = settings
+    return workloads
+
+
+def print_results(run, baseline=None):
+    columns = ['throughput', 'fetch p50', 'fetch p99', 'fetch p99.9', 'store p50', 'store p99', 'hit ratio']
+
+    def values(results):
+        row = {'throughput': results['throughput'], 'hit ratio': results['hit ratio']}
+        for op in ('fetch', 'store'):
+            for p in PERCENTILES:
+                row[f'{op} p{p}'] = results[op].get(f'p{p}')
+        return row
+
+    print(f'{"":<14}' + ''.join(f'{column:>14}' for column in columns) + '  (latency in ms)')
+    for name, workload in run['workloads'].items():
+        rows = [(name, values(workload['results']))]
+        if baseline and name in baseline['workloads']:
+            rows.append(('  before', values(baseline['workloads'][name]['results'])))
+        for label, row in rows:
+            print(f'{label:<14}' + ''.join(f'{row[column]:>14.3f}' if row[column] is not None else f'{"-":>14}'
+                                           for column in columns))
+
+
+def regressions(run, baseline, max_regression):
+    """Returns a description of every throughput drop or p99 increase larger than
+    max_regression percent compared to the baseline.
+    """
+    found = []
+    for name, workload in run['workloads'].items():
+        if name not in baseline['workloads']:
+            continue
+        new, old = workload['results'], baseline['workloads'][name]['results']
+        if new['throughput'] < old['throughput'] * (1 - max_regression / 100):
+            found.append(f'{name}: throughput fell from {old["throughput"]:.1f} to {new["throughput"]:.1f} req/s')
+        for op in ('fetch', 'store'):
+            new_p99, old_p99 = new[op].get('p99'), old[op].get('p99')
+            if new_p99 is not None and old_p99 and new_p99 > old_p99 * (1 + max_regression / 100):
+                found.append(f'{name}: {op} p99 rose from {old_p99:.3f} to {new_p99:.3f} ms')
+    return found
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="benchmark.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt.")
+    parser.add_option("--scalable",
+                action="store_true",
+                default=False,
+                dest="scalable",
+                help="Cache cluster runs in scalable mode.")
+    parser.add_option("-w", "--workload",
+                type="string",
+                default="read-heavy",
+                dest="workloads",
+                help="Comma separated workloads to run: " + ", ".join(WORKLOADS) + ".")
+    parser.add_option("--mode",
+                type="choice",
+                choices=["closed", "open"],
+                default="closed",
+                dest="mode",
+                help="closed: --concurrency clients send back to back. open: requests are sent at --rate.")
+    parser.add_option("--concurrency",
+                type="int",
+                default=64,
+                dest="concurrency",
+                help="Number of clients in closed-loop mode, and connections per node.")
+    parser.add_option("--rate",
+                type="float",
+                default=1000.0,
+                dest="rate",
+                help="Requests per second in open-loop mode.")
+    parser.add_option("--arrivals",
+                type="choice",
+                choices=["constant", "poisson"],
+                default="constant",
+                dest="arrivals",
+                help="Spacing of open-loop requests.")
+    parser.add_option("--max-in-flight",
+                type="int",
+                default=10000,
+                dest="max_in_flight",
+                help="Maximum number of requests in flight, later open-loop requests wait.")
+    parser.add_option("--warmup",
+                type="float",
+                default=5.0,
+                dest="warmup",
+                help="Seconds of load sent before measuring.")
+    parser.add_option("-d", "--duration",
+                type="float",
+                default=30.0,
+                dest="duration",
+                help="Seconds of load measured.")
+    parser.add_option("--keys",
+                type="int",
+                dest="keys",
+                help="Number of distinct keys, overriding the workload.")
+    parser.add_option("--key-dist",
+                type="string",
+                dest="key_dist",
+                help="Key popularity, overriding the workload: uniform, zipf:<alpha>, "
+                "hotspot:<hot fraction>:<hot probability> or sequential.")
+    parser.add_option("--value-size",
+                type="string",
+                dest="value_size",
+                help="Value sizes in bytes, overriding the workload: fixed:<n>, uniform:<min>:<max> "
+                "or lognormal:<mu>:<sigma>.")
+    parser.add_option("--read-ratio",
+                type="float",
+                dest="read_ratio",
+                help="Share of requests that are fetches, overriding the workload.")
+    parser.add_option("--no-preload",
+                action="store_false",
+                default=True,
+                dest="preload",
+                help="Starts from an empty cache instead of storing every key first.")
+    parser.add_option("--preload-batch",
+                type="int",
+                default=1000,
+                dest="preload_batch",
+                help="Number of keys stored per request while preloading.")
+    parser.add_option("--timeout",
+                type="float",
+                default=5.0,
+                dest="timeout",
+                help="Timeout in seconds of a single request.")
+    parser.add_option("--seed",
+                type="int",
+                default=0,
+                dest="seed",
+                help="Seed of the key, value size and operation draws.")
+    parser.add_option("--tag",
+                type="string",
+                action="append",
+                default=[],
+                dest="tags",
+                help="key=value label saved with the results, e.g. --tag engine=slab. Can be repeated.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the results as JSON.")
+    parser.add_option("--compare",
+                type="string",
+                dest="compare",
+                help="JSON results of an earlier run to print alongside.")
+    parser.add_option("--max-regression",
+                type="float",
+                dest="max_regression",
+                help="With --compare, exits with status 1 if throughput fell or a p99 rose by more "
+                "than this percentage.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for benchmarks.")
+    if options.mode == 'open' and options.rate <= 0:
+        parser.error("--rate must be positive.")
+
+    nodes = load_node_list(options.nodes)
+    workloads = workload_settings(options)
+
+    with CacheCowClient(nodes, scalable=options.scalable) as client:
+        run = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git': git_info(),
+            'cluster': cluster_info(nodes, options, node_snapshots(client)),
+            'client': {'host': platform.node(), 'python': platform.python_version()},
+            'tags': dict(tag.split('=', 1) for tag in options.tags),
+            'options': {name: value for name, value in vars(options).items()
+                        if name not in ('nodes', 'output', 'compare', 'max_regression', 'tags')},
+            'workloads': {},
+        }
+        for name, settings in workloads.items():
+            print(f'Running {name}: {settings}')
+            run['workloads'][name] = run_workload(client, nodes, options, name, settings)
+        client.clear()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['cluster']['nodes'] != run['cluster']['nodes']:
+            print(f'Warning: the baseline ran on {baseline["cluster"]["nodes"]} nodes')
+    print_results(run, baseline)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(run, output_file, indent=2)
+
+    if baseline and options.max_regression is not None:
+        found = regressions(run, baseline, options.max_regression)
+        for regression in found:
+            print(f'Regression: {regression}')
+        if found:
+            sys.exit(1)
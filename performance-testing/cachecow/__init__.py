@@ -0,0 +1,20 @@
+# CacheCow python client library.
+
+from cachecow.autoscale import Autoscaler, ClusterSample, ScalingPolicy
+from cachecow.client import (
+    CacheCowClient,
+    CacheCowError,
+    NodeClient,
+    get_client,
+    load_node_list,
+)
+from cachecow.hashing import (
+    ConsistentKeyDistributor,
+    KeyRouter,
+    NodeHasher,
+    murmurhash3_x86_32,
+)
+from cachecow.latency import LatencyHistogram, parse_latencies
+from cachecow.metrics import metric_total, parse_metrics
+from cachecow.nearcache import NearCache
+from cachecow.trace import Trace, merge_traces, parse_trace, read_trace
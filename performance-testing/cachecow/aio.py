@@ -0,0 +1,330 @@
+# This python script contains the asyncio CacheCow client. It speaks HTTP/1.1
+# directly over asyncio streams with keep-alive connection pools, so a single
+# process can hold thousands of requests in flight without threads, processes
+# or extra dependencies.
+
+import asyncio
+import base64
+import json
+from urllib.parse import quote
+
+from cachecow.client import DEFAULT_BATCH_SIZE, CacheCowError, load_node_list
+from cachecow.hashing import KeyRouter
+
+# Maximum number of connections opened to each node
+DEFAULT_POOL_SIZE = 64
+
+# Maximum number of requests in flight across the whole client
+DEFAULT_MAX_IN_FLIGHT = 1024
+
+# Timeout in seconds for a single request, not counting the wait for a free connection
+DEFAULT_TIMEOUT = 10
+
+
+class HttpResponse:
+    """Status, headers and body of an HTTP response.
+    """
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+class AsyncNodeClient:
+    """Keep-alive HTTP/1.1 connection pool for a single cache node.
+
+    At most pool_size connections are open at once. Idle connections are
+    reused, and a request on a connection the node has already closed is
+    retried once on a fresh connection.
+    """
+
+    def __init__(self, node_url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.node_url = node_url
+        self.host, _, port = node_url.partition(':')
+        self.port = int(port) if port else 80
+        self.timeout = timeout
+        self.connection_slots = asyncio.Semaphore(pool_size)
+        self.idle_connections = []
+
+    async def request(self, method, path, body=b'', timeout=None,
+                      content_type='application/octet-stream'):
+        # Only the request itself is timed, a queue for connections is not a slow node
+        async with self.connection_slots:
+            try:
+                return await asyncio.wait_for(self._request(method, path, body, content_type),
+                                              timeout or self.timeout)
+            except asyncio.TimeoutError as e:
+                raise CacheCowError(f'Request to {self.node_url} timed out') from e
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                raise CacheCowError(f'Request to {self.node_url} failed: {e}') from e
+
+    async def _request(self, method, path, body, content_type):
+        while self.idle_connections:
+            reader, writer = self.idle_connections.pop()
+            try:
+                return await self._send(reader, writer, method, path, body, content_type)
+            except (OSError, asyncio.IncompleteReadError):
+                # The node closed the idle connection, try the next one
+                writer.close()
+            except BaseException:
+                writer.close()
+                raise
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            return await self._send(reader, writer, method, path, body, content_type)
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _send(self, reader, writer, method, path, body, content_type):
+        head = (f'{method} {path} HTTP/1.1\r\n'
+                f'Host: {self.node_url}\r\n'
+                f'Content-Length: {len(body)}\r\n')
+        if body:
+            head += f'Content-Type: {content_type}\r\n'
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        status_code = int(status_line.split(b' ', 2)[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if status_code in (204, 304) or method == 'HEAD':
+            content = b''
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self._read_chunked(reader)
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        if keep_alive:
+            self.idle_connections.append((reader, writer))
+        else:
+            writer.close()
+        return HttpResponse(status_code, headers, content)
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def fetch(self, key, version, timeout=None):
+        """Fetches the value of a key-version pair. Returns None on a cache miss.
+        """
+        response = await self.request('GET', blob_path(key, version), timeout=timeout)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise CacheCowError(f'Fetch of {key} failed: {response.text}', response.status_code)
+        return response.content
+
+    async def store(self, key, version, value, timeout=None):
+        """Stores the value of a key-version pair. Strings are encoded as ASCII.
+        """
+        if isinstance(value, str):
+            value = value.encode('ascii')
+        response = await self.request('POST', blob_path(key, version), value, timeout=timeout)
+        if response.status_code != 201:
+            raise CacheCowError(f'Store of {key} failed: {response.text}', response.status_code)
+
+    async def get_many(self, pairs, timeout=None):
+        """Fetches many key-version pairs in one request. Returns a list of values
+        in the order of pairs, with None for every cache miss.
+        """
+        pairs = list(pairs)
+        body = json.dumps({'pairs': [{'key': str(key), 'version': version} for key, version in pairs]})
+        response = await self.request('POST', '/v1/blobs/_mget', body.encode('utf-8'), timeout=timeout,
+                                      content_type='application/json')
+        if response.status_code != 200:
+            raise CacheCowError(f'Fetch of {len(pairs)} keys failed: {response.text}', response.status_code)
+        found = {(pair['key'], pair['version']): base64.b64decode(pair['value'])
+                 for pair in json.loads(response.content)['values']}
+        return [found.get((str(key), version)) for key, version in pairs]
+
+    async def set_many(self, items, timeout=None):
+        """Stores many (key, version, value) items in one request. Strings are
+        encoded as ASCII.
+        """
+        values = []
+        for key, version, value in items:
+            if isinstance(value, str):
+                value = value.encode('ascii')
+            values.append({'key': str(key), 'version': version,
+                           'value': base64.b64encode(value).decode('ascii')})
+        body = json.dumps({'values': values})
+        response = await self.request('POST', '/v1/blobs/_mset', body.encode('utf-8'), timeout=timeout,
+                                      content_type='application/json')
+        if response.status_code != 204:
+            raise CacheCowError(f'Store of {len(values)} keys failed: {response.text}', response.status_code)
+
+    async def clear(self, timeout=None):
+        response = await self.request('DELETE', '/v1/clear', timeout=timeout)
+        if response.status_code != 204:
+            raise CacheCowError(f'Clear failed: {response.text}', response.status_code)
+
+    async def close(self):
+        while self.idle_connections:
+            _, writer = self.idle_connections.pop()
+            writer.close()
+
+
+class AsyncCacheCowClient:
+    """Asyncio client for a CacheCow cluster.
+
+    Mirrors CacheCowClient: one connection pool per node and, given the full
+    node list, requests are sent straight to the node that owns each key. A
+    client-wide window bounds the number of requests in flight; callers past
+    the window wait for a slot instead of opening more connections.
+    """
+
+    def __init__(self, nodes, scalable=False, routing=True, pool_size=DEFAULT_POOL_SIZE,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=DEFAULT_TIMEOUT,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        """
+        nodes: list of node urls in nodes.txt order
+        scalable: whether the cluster runs in scalable mode (-s)
+        routing: whether to send requests directly to the owning node
+        pool_size: maximum number of connections to each node
+        max_in_flight: maximum number of requests in flight across all nodes
+        timeout: timeout in seconds for a single request
+        batch_size: maximum number of pairs in a single get_many/set_many request
+        """
+        if isinstance(nodes, str):
+            nodes = [nodes]
+        if len(nodes) == 0:
+            raise ValueError('At least one node url is required.')
+        self.nodes = list(nodes)
+        self.node_clients = [AsyncNodeClient(node, pool_size, timeout) for node in self.nodes]
+        self.routing = routing
+        self.router = KeyRouter(len(self.nodes), scalable)
+        self.window = asyncio.Semaphore(max_in_flight)
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_node_file(cls, path, scalable=False, **options):
+        return cls(load_node_list(path), scalable=scalable, **options)
+
+    def node_for(self, key, version):
+        if not self.routing or len(self.node_clients) == 1:
+            return self.node_clients[0]
+        return self.node_clients[self.router.owner(key)]
+
+    async def fetch(self, key, version, timeout=None):
+        async with self.window:
+            return await self.node_for(key, version).fetch(key, version, timeout=timeout)
+
+    async def store(self, key, version, value, timeout=None):
+        async with self.window:
+            await self.node_for(key, version).store(key, version, value, timeout=timeout)
+
+    def batches_for(self, entries):
+        """Splits entries, whose first two fields are the key and version, into
+        (node client, [(index, entry)]) batches of at most batch_size entries.
+        """
+        by_node = {}
+        for index, entry in enumerate(entries):
+            by_node.setdefault(self.node_for(entry[0], entry[1]), []).append((index, entry))
+        return [(node_client, batch[start:start + self.batch_size])
+                for node_client, batch in by_node.items()
+                for start in range(0, len(batch), self.batch_size)]
+
+    async def get_many(self, pairs, timeout=None):
+        """Fetches many (key, version) pairs, querying every owning node
+        concurrently. Returns values in the order of pairs, None on a miss.
+        """
+        pairs = list(pairs)
+        values = [None] * len(pairs)
+
+        async def fetch_batch(node_client, batch):
+            async with self.window:
+                found = await node_client.get_many([pair for _, pair in batch], timeout=timeout)
+            for (index, _), value in zip(batch, found):
+                values[index] = value
+
+        await asyncio.gather(*(fetch_batch(*batch) for batch in self.batches_for(pairs)))
+        return values
+
+    async def set_many(self, items, timeout=None):
+        """Stores many (key, version, value) items, writing to every owning node
+        concurrently.
+        """
+        async def store_batch(node_client, batch):
+            async with self.window:
+                await node_client.set_many([item for _, item in batch], timeout=timeout)
+
+        await asyncio.gather(*(store_batch(*batch) for batch in self.batches_for(list(items))))
+
+    async def clear(self, timeout=None):
+        async with self.window:
+            await self.node_clients[0].clear(timeout=timeout)
+
+    async def close(self):
+        for node_client in self.node_clients:
+            await node_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def blob_path(key, version):
+    return f'/v1/blobs/{quote(str(key), safe="")}/{version}'
+
+
+async def bounded_map(function, items, concurrency):
+    """Awaits function(item) for every item with at most concurrency calls in
+    flight, returning the results in order. An item whose call raises
+    CacheCowError gets the error as its result, so one failed request does not
+    stop the others. Any other error cancels the remaining calls and is raised.
+
+    Only concurrency tasks exist at once, so memory stays flat however many
+    items there are.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < len(items):
+            index = next_index
+            next_index += 1
+            try:
+                results[index] = await function(items[index])
+            except CacheCowError as e:
+                results[index] = e
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+    return results
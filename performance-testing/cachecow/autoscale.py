@@ -0,0 +1,283 @@
+# Autoscaling controller for scalable clusters. The controller polls
+# /v1/global-cache-info and turns the difference between two polls into cluster
+# signals: the share of the cluster's byte budget in use, the hit ratio, evictions per
+# stored key and the p99 latency of client fetches. A full cache that keeps evicting is
+# normal, so memory and evictions only count as pressure while the hit ratio is low.
+# When the signals stay past their thresholds for several polls in a row, it asks a
+# node to launch another through /v1/launch-node, the same path as a manual scale-out.
+# It then waits until the new node shows up and no node is still copying keys before
+# it registers the node with the client. After that it waits out a cooldown before it
+# judges the cluster again.
+
+import time
+
+from cachecow.client import CacheCowError
+from cachecow.latency import LatencyHistogram, merge_by_prefix, parse_latencies
+
+BREACH, HOLD, CLEAR = 'breach', 'hold', 'clear'
+
+
+class ScalingPolicy:
+    """Thresholds that decide when a cluster needs another node.
+
+    Each signal has a threshold that counts as a breach and a second one it must get
+    back past to count as clear. A signal between the two holds the breach streak
+    where it is, so a signal hovering around one threshold neither triggers a
+    scale-out nor resets one that is building up.
+
+    Only the fetch signals decide. A read-through cache fills up and then evicts on
+    every store even when nearly every fetch hits, so memory and evictions never breach
+    on their own. A low hit ratio breaches only while memory or evictions show the
+    cache is full, since more nodes cannot help misses of keys that were never stored.
+    High latency breaches on its own.
+    """
+
+    def __init__(self, memory_high=0.85, memory_low=0.7, hit_ratio_low=0.8, hit_ratio_high=0.9,
+                 eviction_rate_high=0.05, eviction_rate_low=0.01, latency_high_ms=50.0,
+                 latency_low_ms=20.0, breach_intervals=3, cooldown=60.0, launch_timeout=600.0,
+                 max_nodes=5, min_fetches=100):
+        """
+        memory_high, memory_low: share of the cluster's byte budget in use
+        hit_ratio_low, hit_ratio_high: fraction of fetched keys found
+        eviction_rate_high, eviction_rate_low: keys evicted per key stored
+        latency_high_ms, latency_low_ms: p99 of client fetches, in milliseconds
+        breach_intervals: polls in a row that must breach before a launch
+        cooldown: seconds after a scale-out before the cluster is judged again
+        launch_timeout: seconds to wait for a launched node before giving up on it
+        max_nodes: the cluster is never scaled past this many nodes
+        min_fetches: hit ratio and latency are ignored over polls with fewer fetches
+        """
+        self.memory_high = memory_high
+        self.memory_low = memory_low
+        self.hit_ratio_low = hit_ratio_low
+        self.hit_ratio_high = hit_ratio_high
+        self.eviction_rate_high = eviction_rate_high
+        self.eviction_rate_low = eviction_rate_low
+        self.latency_high_ms = latency_high_ms
+        self.latency_low_ms = latency_low_ms
+        self.breach_intervals = breach_intervals
+        self.cooldown = cooldown
+        self.launch_timeout = launch_timeout
+        self.max_nodes = max_nodes
+        self.min_fetches = min_fetches
+
+    def assess(self, sample):
+        """Returns BREACH if the hit ratio is low on a full cache or latency is high,
+        CLEAR if both fetch signals are back past their clear thresholds and HOLD
+        otherwise, along with the names of the breaching signals. Polls with fewer
+        than min_fetches fetches are CLEAR, as an idle cluster needs no more nodes.
+        """
+        if sample.fetches < self.min_fetches:
+            return CLEAR, []
+
+        memory, _ = check(sample.memory_utilization, self.memory_high, self.memory_low)
+        evictions, _ = check(sample.eviction_rate, self.eviction_rate_high, self.eviction_rate_low)
+        hit_ratio, hit_ratio_clear = check(sample.hit_ratio, self.hit_ratio_low, self.hit_ratio_high, falling=True)
+        latency, latency_clear = check(sample.fetch_p99_ms, self.latency_high_ms, self.latency_low_ms)
+
+        breaches = []
+        if hit_ratio and (memory or evictions):
+            breaches.append('hit ratio')
+            breaches += [name for name, breached in (('memory', memory), ('evictions', evictions)) if breached]
+        if latency:
+            breaches.append('latency')
+        if breaches:
+            return BREACH, breaches
+        return (CLEAR if hit_ratio_clear and latency_clear else HOLD), breaches
+
+
+def check(value, trigger, reset, falling=False):
+    """Returns whether a signal is past its trigger threshold and whether it is back
+    past its reset threshold. Falling signals breach below the trigger.
+    """
+    if falling:
+        return value < trigger, value >= reset
+    return value > trigger, value <= reset
+
+
+class ClusterSample:
+    """Cluster signals over the interval between two polls of /v1/global-cache-info.
+    """
+
+    def __init__(self, node_count, seconds, memory_utilization, hit_ratio, eviction_rate,
+                 fetch_p99_ms, fetches, stores, migrating):
+        self.node_count = node_count
+        self.seconds = seconds
+        self.memory_utilization = memory_utilization
+        self.hit_ratio = hit_ratio
+        self.eviction_rate = eviction_rate
+        self.fetch_p99_ms = fetch_p99_ms
+        self.fetches = fetches
+        self.stores = stores
+        self.migrating = migrating
+
+    @classmethod
+    def between(cls, earlier, later, seconds):
+        """Computes the signals from two global infos. Nodes missing from the earlier
+        info, such as a node that just joined, count from zero.
+        """
+        earlier_by_id = {info['nodeId']: info for info in earlier or []}
+        hits = misses = evictions = stores = used_bytes = max_bytes = 0
+        fetch_latency = LatencyHistogram()
+        for info in later:
+            before = earlier_by_id.get(info['nodeId'], {})
+            usage = info.get('receiverUsageInfo', {})
+            usage_before = before.get('receiverUsageInfo', {})
+            hits += usage.get('fetchHits', 0) - usage_before.get('fetchHits', 0)
+            misses += usage.get('fetchMisses', 0) - usage_before.get('fetchMisses', 0)
+            stores += usage.get('storeAttempts', 0) - usage_before.get('storeAttempts', 0)
+
+            cache = info.get('cacheInfo', {})
+            evictions += cache.get('evictions', 0) - before.get('cacheInfo', {}).get('evictions', 0)
+            used_bytes += cache.get('usedBytes', 0)
+            max_bytes += cache.get('maxBytes', 0)
+
+            latency = merge_by_prefix(parse_latencies(info.get('latencies', {})), 'fetch.client')
+            latency_before = merge_by_prefix(parse_latencies(before.get('latencies', {})), 'fetch.client')
+            fetch_latency = fetch_latency.merge(latency.subtract(latency_before))
+
+        fetches = hits + misses
+        return cls(
+            node_count=len(later),
+            seconds=seconds,
+            memory_utilization=used_bytes / max_bytes if max_bytes > 0 else 0.0,
+            hit_ratio=hits / fetches if fetches > 0 else 1.0,
+            eviction_rate=evictions / stores if stores > 0 else 0.0,
+            fetch_p99_ms=fetch_latency.percentile(99) / 1e6,
+            fetches=fetches,
+            stores=stores,
+            migrating=migrating(later)
+        )
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def migrating(infos):
+    """Returns True if any node is sending or receiving keys.
+    """
+    for info in infos:
+        migration = info.get('migrationInfo') or {}
+        if any((migration.get(direction) or {}).get('inProgress') for direction in ('sent', 'received')):
+            return True
+    return False
+
+
+class Autoscaler:
+    """Scales out a scalable cluster when a ScalingPolicy calls for it.
+
+    Call step() once per interval, or run() to loop. The client must be a scalable
+    CacheCowClient. New nodes are added to it once their keys have been copied, and
+    on_scale, if given, is called with their urls so other clients can follow.
+    """
+
+    def __init__(self, client, policy=None, on_scale=None, clock=time.monotonic, log=print):
+        self.client = client
+        self.policy = policy or ScalingPolicy()
+        self.on_scale = on_scale
+        self.clock = clock
+        self.log = log
+        self.previous = None
+        self.previous_time = None
+        self.streak = 0
+        self.cooldown_until = 0.0
+        self.launched_at = None
+        self.launch_node_count = 0
+        self.settled_polls = 0
+        self.events = []
+
+    def global_info(self):
+        """Returns the global cache info from the first node that answers.
+        """
+        error = None
+        for node_client in self.client.node_clients:
+            try:
+                return node_client.global_cache_info()
+            except CacheCowError as e:
+                error = e
+        raise error
+
+    def step(self):
+        """Polls the cluster once and launches a node if the policy calls for it.
+        Returns the sample and the action taken, one of 'watch', 'cooldown', 'launch',
+        'scaling', 'scaled' or 'max-nodes'.
+        """
+        infos = self.global_info()
+        now = self.clock()
+        sample = ClusterSample.between(self.previous, infos, now - self.previous_time if self.previous else 0.0)
+        first_poll = self.previous is None
+        self.previous, self.previous_time = infos, now
+
+        if self.launched_at is not None:
+            return sample, self.check_launch(infos, now)
+        if first_poll or sample.migrating:
+            return sample, 'watch'
+
+        verdict, breaches = self.policy.assess(sample)
+        if now < self.cooldown_until:
+            self.streak = 0
+            return sample, 'cooldown'
+        if verdict == BREACH:
+            self.streak += 1
+        elif verdict == CLEAR:
+            self.streak = 0
+
+        if self.streak < self.policy.breach_intervals:
+            return sample, 'watch'
+        if sample.node_count >= self.policy.max_nodes:
+            return sample, 'max-nodes'
+
+        self.log(f'Launching node {sample.node_count} after {self.streak} polls over threshold: {", ".join(breaches)}')
+        self.client.node_clients[0].launch_node()
+        self.launched_at = now
+        self.launch_node_count = sample.node_count
+        self.settled_polls = 0
+        self.streak = 0
+        self.events.append({'time': now, 'event': 'launch', 'nodes': sample.node_count, 'breaches': breaches})
+        return sample, 'launch'
+
+    def check_launch(self, infos, now):
+        """Finishes a launch once the new node is listed and two polls in a row find no
+        node copying keys, or gives up after the launch timeout.
+        """
+        if len(infos) > self.launch_node_count and not migrating(infos):
+            self.settled_polls += 1
+        else:
+            self.settled_polls = 0
+
+        if self.settled_polls >= 2:
+            new_nodes = [info['hostName'] for info in infos[len(self.client.node_clients):]]
+            for node_url in new_nodes:
+                self.client.add_node(node_url)
+            if self.on_scale is not None:
+                self.on_scale(new_nodes)
+            self.log(f'Scaled to {len(infos)} nodes in {now - self.launched_at:.1f}s')
+            self.events.append({'time': now, 'event': 'scaled', 'nodes': len(infos)})
+            self.launched_at = None
+            self.cooldown_until = now + self.policy.cooldown
+            return 'scaled'
+
+        if now - self.launched_at > self.policy.launch_timeout:
+            self.log(f'No node joined within {self.policy.launch_timeout:.0f}s of the launch')
+            self.events.append({'time': now, 'event': 'timeout', 'nodes': len(infos)})
+            self.launched_at = None
+            self.cooldown_until = now + self.policy.cooldown
+        return 'scaling'
+
+    def run(self, interval, duration=None, stop=None, report=None):
+        """Steps every interval seconds until duration passes or stop (a
+        threading.Event) is set, passing each sample and action to report. Polls
+        that fail, e.g. while a node restarts, are skipped.
+        """
+        start = self.clock()
+        while (duration is None or self.clock() - start < duration) and not (stop and stop.is_set()):
+            try:
+                sample, action = self.step()
+                if report is not None:
+                    report(sample, action)
+            except CacheCowError as e:
+                self.log(f'Poll failed: {e}')
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
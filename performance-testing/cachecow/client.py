@@ -0,0 +1,458 @@
+# This python script contains the CacheCow client library. Every client keeps a
+# pooled, keep-alive requests Session per cache node so that consecutive
+# requests reuse TCP connections instead of paying a new handshake per key.
+
+import base64
+import random
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cachecow.hashing import KeyRouter
+
+# Number of keep-alive connections held open to each node
+DEFAULT_POOL_SIZE = 16
+
+# (connect, read) timeout in seconds applied to every request
+DEFAULT_TIMEOUT = (2, 5)
+
+# Number of retries on connection errors and gateway failures
+DEFAULT_RETRIES = 2
+
+# Exponential backoff factor (in seconds) between retries
+DEFAULT_BACKOFF = 0.05
+
+# Maximum number of key-value pairs sent in a single _mget/_mset request
+DEFAULT_BATCH_SIZE = 1000
+
+
+class CacheCowError(Exception):
+    """Raised when a cache node returns an unexpected response or cannot be reached.
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NodeClient:
+    """Pooled, keep-alive HTTP client for a single cache node.
+
+    All requests to the node share one requests Session whose connection pool
+    holds up to pool_size idle connections. Connection errors and gateway
+    failures are retried according to the retry policy. Stores are safe to
+    retry since a key-version pair always maps to the same value.
+    """
+
+    def __init__(self, node_url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF):
+        """
+        node_url: host and port of the node, e.g. localhost:7070
+        pool_size: maximum number of keep-alive connections to the node
+        timeout: default (connect, read) timeout in seconds
+        retries: number of retries on connection errors and 502/503/504 responses
+        backoff_factor: exponential backoff factor between retries
+        """
+        self.node_url = node_url
+        self.base_url = f'http://{node_url}'
+        self.timeout = timeout
+
+        retry = Retry(total=retries,
+                      connect=retries,
+                      read=retries,
+                      status=retries,
+                      backoff_factor=backoff_factor,
+                      status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'POST', 'DELETE']),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=True)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+
+    def blob_url(self, key, version):
+        return f'{self.base_url}/v1/blobs/{quote(str(key), safe="")}/{version}'
+
+    def request(self, method, path_or_url, timeout=None, **kwargs):
+        """Sends a request to the node, wrapping transport errors in CacheCowError.
+        """
+        url = path_or_url if path_or_url.startswith('http') else self.base_url + path_or_url
+        try:
+            return self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise CacheCowError(f'Request to {self.node_url} failed: {e}') from e
+
+    def fetch(self, key, version, timeout=None):
+        """Fetches the value of a key-version pair. Returns None on a cache miss.
+        """
+        response = self.request('GET', self.blob_url(key, version), timeout=timeout)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise CacheCowError(f'Fetch of {key} failed: {response.text}', response.status_code)
+        return response.content
+
+    def store(self, key, version, value, timeout=None):
+        """Stores the value of a key-version pair. Strings are encoded as ASCII.
+        """
+        if isinstance(value, str):
+            value = value.encode('ascii')
+        response = self.request('POST', self.blob_url(key, version), timeout=timeout, data=value)
+        if response.status_code != 201:
+            raise CacheCowError(f'Store of {key} failed: {response.text}', response.status_code)
+
+    def get_many(self, pairs, timeout=None):
+        """Fetches many key-version pairs in one request. Returns a list of values
+        in the order of pairs, with None for every cache miss.
+        """
+        pairs = list(pairs)
+        body = {'pairs': [{'key': str(key), 'version': version} for key, version in pairs]}
+        response = self.request('POST', '/v1/blobs/_mget', timeout=timeout, json=body)
+        if response.status_code != 200:
+            raise CacheCowError(f'Fetch of {len(pairs)} keys failed: {response.text}', response.status_code)
+        found = {(pair['key'], pair['version']): base64.b64decode(pair['value'])
+                 for pair in response.json()['values']}
+        return [found.get((str(key), version)) for key, version in pairs]
+
+    def set_many(self, items, timeout=None):
+        """Stores many (key, version, value) items in one request. Strings are
+        encoded as ASCII.
+        """
+        items = list(items)
+        values = []
+        for key, version, value in items:
+            if isinstance(value, str):
+                value = value.encode('ascii')
+            values.append({'key': str(key), 'version': version,
+                           'value': base64.b64encode(value).decode('ascii')})
+        response = self.request('POST', '/v1/blobs/_mset', timeout=timeout, json={'values': values})
+        if response.status_code != 204:
+            raise CacheCowError(f'Store of {len(items)} keys failed: {response.text}', response.status_code)
+
+    def clear(self, timeout=None):
+        """Clears every node in the cluster.
+        """
+        response = self.request('DELETE', '/v1/clear', timeout=timeout)
+        if response.status_code != 204:
+            raise CacheCowError(f'Clear failed: {response.text}', response.status_code)
+
+    def hello_world(self, timeout=None):
+        """Returns True if the node is up and serving requests.
+        """
+        try:
+            return self.request('GET', '/v1/hello-world', timeout=timeout).status_code == 200
+        except CacheCowError:
+            return False
+
+    def local_cache_info(self, timeout=None):
+        """Returns the system info of this node.
+        """
+        return self.get_json('/v1/local-cache-info', timeout)
+
+    def global_cache_info(self, timeout=None):
+        """Returns the system info of every node in the cluster.
+        """
+        return self.get_json('/v1/global-cache-info', timeout)
+
+    def global_latency_info(self, timeout=None):
+        """Returns the latency histograms of every node, merged by name.
+        """
+        return self.get_json('/v1/global-latency-info', timeout)
+
+    def metrics(self, timeout=None):
+        """Returns the metrics of this node in the Prometheus text format, see
+        cachecow.metrics.
+        """
+        response = self.request('GET', '/metrics', timeout=timeout)
+        if response.status_code != 200:
+            raise CacheCowError(f'GET /metrics failed: {response.text}', response.status_code)
+        return response.text
+
+    def launch_node(self, timeout=None):
+        """Asks the node to launch a new node (scalable mode only).
+        """
+        response = self.request('POST', '/v1/launch-node', timeout=timeout)
+        if response.status_code != 200:
+            raise CacheCowError(f'Launch failed: {response.text}', response.status_code)
+
+    def get_logging(self, timeout=None):
+        """Returns the logging settings of this node.
+        """
+        return self.get_json('/v1/admin/logging', timeout)
+
+    def set_logging(self, level=None, category=None, sample_rate=None, timeout=None):
+        """Changes the log level and sample rate of one category, or of every
+        category if none is given. Returns the new logging settings.
+        """
+        params = {'level': level, 'category': category, 'sampleRate': sample_rate}
+        params = {name: value for name, value in params.items() if value is not None}
+        response = self.request('POST', '/v1/admin/logging', timeout=timeout, params=params)
+        if response.status_code != 200:
+            raise CacheCowError(f'Logging change failed: {response.text}', response.status_code)
+        return response.json()
+
+    def get_trace_info(self, timeout=None):
+        """Returns the trace recorder settings of this node.
+        """
+        return self.get_json('/v1/admin/trace', timeout)
+
+    def set_tracing(self, enabled, capacity=None, timeout=None):
+        """Starts recording key accesses into a ring buffer of capacity entries,
+        discarding the previous trace, or stops recording. Returns the new settings.
+        """
+        params = {'enabled': 'true' if enabled else 'false'}
+        if capacity is not None:
+            params['capacity'] = capacity
+        response = self.request('POST', '/v1/admin/trace', timeout=timeout, params=params)
+        if response.status_code != 200:
+            raise CacheCowError(f'Trace change failed: {response.text}', response.status_code)
+        return response.json()
+
+    def download_trace(self, timeout=None):
+        """Returns the recorded trace in its binary format, see cachecow.trace.
+        """
+        response = self.request('GET', '/v1/admin/trace/download', timeout=timeout)
+        if response.status_code != 200:
+            raise CacheCowError(f'Trace download failed: {response.text}', response.status_code)
+        return response.content
+
+    def get_json(self, path, timeout=None):
+        response = self.request('GET', path, timeout=timeout)
+        if response.status_code != 200:
+            raise CacheCowError(f'GET {path} failed: {response.text}', response.status_code)
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class CacheCowClient:
+    """Client for a CacheCow cluster.
+
+    Holds one pooled NodeClient per node. When the full node list is known
+    (in nodes.txt order), each key is sent straight to the node that owns it,
+    using the same hashing as the cache nodes, which saves the extra hop of
+    being forwarded. With routing disabled or a single url, every request goes
+    to the first node, which forwards it to the owner. When the cluster stores
+    each key on several nodes (-r), reads are spread over a key's replicas.
+    An optional NearCache keeps recently read and written values in process,
+    so repeated reads of a key skip the network until its entry expires.
+    """
+
+    def __init__(self, nodes, scalable=False, routing=True, batch_size=DEFAULT_BATCH_SIZE,
+                 replicas=1, near_cache=None, **node_options):
+        """
+        nodes: list of node urls in nodes.txt order, e.g. ['localhost:7070', 'localhost:7071']
+        scalable: whether the cluster runs in scalable mode (-s), which places
+                  keys on a consistent hash ring instead of by hash modulo
+        routing: whether to send requests directly to the owning node
+        batch_size: maximum number of pairs in a single get_many/set_many request
+        replicas: replication factor the nodes were started with (-r), reads
+                  go to a random replica of each key when routing
+        near_cache: NearCache consulted before the cluster, None to disable
+        node_options: pool_size, timeout, retries and backoff_factor passed to
+                      every NodeClient
+        """
+        if isinstance(nodes, str):
+            nodes = [nodes]
+        if len(nodes) == 0:
+            raise ValueError('At least one node url is required.')
+        self.nodes = list(nodes)
+        self.node_options = node_options
+        self.node_clients = [NodeClient(node, **node_options) for node in self.nodes]
+        self.routing = routing
+        self.router = KeyRouter(len(self.nodes), scalable)
+        self.batch_size = batch_size
+        self.replicas = replicas
+        self.near_cache = near_cache
+        self.executor = None
+
+    @classmethod
+    def from_node_file(cls, path, scalable=False, **options):
+        """Creates a client for every node listed in a nodes.txt file.
+        """
+        return cls(load_node_list(path), scalable=scalable, **options)
+
+    def owner(self, key):
+        """Returns the id of the node that owns a key.
+        """
+        return self.router.owner(key)
+
+    def node_for(self, key, version):
+        """Returns the NodeClient that a key-version request is sent to.
+        """
+        if not self.routing or len(self.node_clients) == 1:
+            return self.node_clients[0]
+        return self.node_clients[self.router.owner(key)]
+
+    def node_for_read(self, key, version):
+        """Returns the NodeClient that a read is sent to, a random replica of the
+        key. A replica missing the key asks the owner before answering.
+        """
+        if not self.routing or len(self.node_clients) == 1 or self.replicas == 1:
+            return self.node_for(key, version)
+        return self.node_clients[random.choice(self.router.replicas(key, self.replicas))]
+
+    def add_node(self, node_url):
+        """Registers a node added by scaling (scalable mode only). Call once the
+        scale has completed, as keys are only moved to the new node by then.
+        """
+        self.router.add_node()
+        self.nodes.append(node_url)
+        self.node_clients.append(NodeClient(node_url, **self.node_options))
+
+    def fetch(self, key, version, timeout=None):
+        if self.near_cache is not None:
+            value = self.near_cache.get(key, version)
+            if value is not None:
+                return value
+        value = self.node_for_read(key, version).fetch(key, version, timeout=timeout)
+        if value is not None and self.near_cache is not None:
+            self.near_cache.put(key, version, value)
+        return value
+
+    def store(self, key, version, value, timeout=None):
+        self.node_for(key, version).store(key, version, value, timeout=timeout)
+        if self.near_cache is not None:
+            self.near_cache.put(key, version, value)
+
+    def invalidate(self, key):
+        """Drops a key from the near cache, e.g. after another client changed it
+        without bumping its version.
+        """
+        if self.near_cache is not None:
+            self.near_cache.invalidate(key)
+
+    def batches_for(self, entries, read=False, indexed=False):
+        """Splits entries, whose first two fields are the key and version, into
+        (node client, [(index, entry)]) batches of at most batch_size entries.
+        Reads are split by the replica chosen for each key. With indexed, entries
+        are already (index, entry) pairs.
+        """
+        node_for = self.node_for_read if read else self.node_for
+        by_node = {}
+        for index, entry in (entries if indexed else enumerate(entries)):
+            node_client = node_for(entry[0], entry[1])
+            by_node.setdefault(node_client, []).append((index, entry))
+        return [(node_client, batch[start:start + self.batch_size])
+                for node_client, batch in by_node.items()
+                for start in range(0, len(batch), self.batch_size)]
+
+    def run_batches(self, function, batches):
+        """Runs function(node_client, batch) for every batch, in parallel when
+        there is more than one.
+        """
+        if len(batches) <= 1:
+            return [function(*batch) for batch in batches]
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.node_clients))
+        return list(self.executor.map(lambda batch: function(*batch), batches))
+
+    def get_many(self, pairs, timeout=None):
+        """Fetches many (key, version) pairs. With routing, each node is sent
+        only the keys it owns, and the nodes are queried in parallel. Returns a
+        list of values in the order of pairs, with None for every cache miss.
+        Pairs found in the near cache are not sent.
+        """
+        pairs = list(pairs)
+        values = [None] * len(pairs)
+        if self.near_cache is not None:
+            values = [self.near_cache.get(key, version) for key, version in pairs]
+
+        def fetch_batch(node_client, batch):
+            found = node_client.get_many([pair for _, pair in batch], timeout=timeout)
+            for (index, (key, version)), value in zip(batch, found):
+                values[index] = value
+                if value is not None and self.near_cache is not None:
+                    self.near_cache.put(key, version, value)
+
+        misses = [(index, pair) for index, pair in enumerate(pairs) if values[index] is None]
+        self.run_batches(fetch_batch, self.batches_for(misses, read=True, indexed=True))
+        return values
+
+    def set_many(self, items, timeout=None):
+        """Stores many (key, version, value) items. With routing, each node is
+        sent only the keys it owns, and the nodes are written in parallel.
+        """
+        def store_batch(node_client, batch):
+            node_client.set_many([item for _, item in batch], timeout=timeout)
+            if self.near_cache is not None:
+                for _, (key, version, value) in batch:
+                    self.near_cache.put(key, version, value)
+
+        self.run_batches(store_batch, self.batches_for(list(items)))
+
+    def clear(self, timeout=None):
+        self.node_clients[0].clear(timeout=timeout)
+        if self.near_cache is not None:
+            self.near_cache.clear()
+
+    def local_cache_info(self, node_id=0, timeout=None):
+        return self.node_clients[node_id].local_cache_info(timeout=timeout)
+
+    def global_cache_info(self, timeout=None):
+        return self.node_clients[0].global_cache_info(timeout=timeout)
+
+    def global_latency_info(self, timeout=None):
+        return self.node_clients[0].global_latency_info(timeout=timeout)
+
+    def metrics(self, timeout=None):
+        """Returns the metrics text of each node, in node order. Every node is asked
+        separately, so no node queries the others.
+        """
+        return [node_client.metrics(timeout=timeout) for node_client in self.node_clients]
+
+    def set_logging(self, level=None, category=None, sample_rate=None, timeout=None):
+        """Changes the logging settings of every node in the cluster.
+        """
+        return [node_client.set_logging(level, category, sample_rate, timeout=timeout)
+                for node_client in self.node_clients]
+
+    def set_tracing(self, enabled, capacity=None, timeout=None):
+        """Starts or stops recording key accesses on every node in the cluster.
+        """
+        return [node_client.set_tracing(enabled, capacity, timeout=timeout)
+                for node_client in self.node_clients]
+
+    def download_traces(self, timeout=None):
+        """Returns the binary trace recorded by each node, in node order.
+        """
+        return [node_client.download_trace(timeout=timeout) for node_client in self.node_clients]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        for node_client in self.node_clients:
+            node_client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_node_list(path):
+    """Reads node urls from a nodes.txt file, one per line.
+    """
+    with open(path) as node_file:
+        return [line.strip() for line in node_file if line.strip()]
+
+
+# Clients shared by all callers in this process, keyed by node url(s)
+_clients = {}
+
+def get_client(nodes, **options):
+    """Returns a client for the given node(s) that is shared within the process.
+
+    Useful for multiprocessing workers, which should reuse one pooled client
+    per process rather than opening a connection per request.
+    """
+    cache_key = nodes if isinstance(nodes, str) else tuple(nodes)
+    if cache_key not in _clients:
+        _clients[cache_key] = CacheCowClient(nodes, **options)
+    return _clients[cache_key]
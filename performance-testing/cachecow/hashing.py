@@ -0,0 +1,172 @@
+# This python script reproduces the key placement of the cache nodes so that
+# clients can send each key straight to the node that owns it. It mirrors
+# NodeHasher and ConsistentKeyDistributor in cache-node bit for bit.
+
+from bisect import bisect_left
+
+# Default MurmurHash3 seed used by NodeHasher
+DEFAULT_SEED = 0
+
+# Default number of ring points per node used by ConsistentKeyDistributor
+DEFAULT_POINTS_PER_NODE = 25
+
+_C1 = 0xcc9e2d51
+_C2 = 0x1b873593
+_MASK = 0xffffffff
+
+
+def _rotl32(x, r):
+    return ((x << r) | (x >> (32 - r))) & _MASK
+
+
+def _to_signed(x):
+    return x - 0x100000000 if x & 0x80000000 else x
+
+
+def murmurhash3_x86_32(data, seed=DEFAULT_SEED):
+    """MurmurHash3 x86 32-bit hash, returned as a signed 32-bit integer.
+
+    Matches org.apache.commons.codec.digest.MurmurHash3.hash32x86.
+    """
+    length = len(data)
+    h1 = seed & _MASK
+    num_blocks = length // 4
+
+    for block in range(num_blocks):
+        k1 = int.from_bytes(data[4 * block:4 * block + 4], 'little')
+        k1 = (k1 * _C1) & _MASK
+        k1 = _rotl32(k1, 15)
+        k1 = (k1 * _C2) & _MASK
+        h1 ^= k1
+        h1 = _rotl32(h1, 13)
+        h1 = (h1 * 5 + 0xe6546b64) & _MASK
+
+    tail = data[4 * num_blocks:]
+    k1 = 0
+    if len(tail) >= 3:
+        k1 ^= tail[2] << 16
+    if len(tail) >= 2:
+        k1 ^= tail[1] << 8
+    if len(tail) >= 1:
+        k1 ^= tail[0]
+        k1 = (k1 * _C1) & _MASK
+        k1 = _rotl32(k1, 15)
+        k1 = (k1 * _C2) & _MASK
+        h1 ^= k1
+
+    h1 ^= length
+    h1 ^= h1 >> 16
+    h1 = (h1 * 0x85ebca6b) & _MASK
+    h1 ^= h1 >> 13
+    h1 = (h1 * 0xc2b2ae35) & _MASK
+    h1 ^= h1 >> 16
+    return _to_signed(h1)
+
+
+class NodeHasher:
+    """Maps keys to nodes using MurmurHash3, mirroring NodeHasher.kt.
+    """
+
+    def __init__(self, node_count, seed=DEFAULT_SEED):
+        self.node_count = node_count
+        self.seed = seed
+
+    def primary_hash_value(self, key):
+        return murmurhash3_x86_32(str(key).encode('utf-8'), self.seed)
+
+    def node_hash_value(self, node_id):
+        return murmurhash3_x86_32(bytes([node_id & 0xff]), self.seed)
+
+    def extended_node_hash_value(self, node_id, index):
+        # Kotlin encodes both integers with Int.toByte(), keeping the low byte
+        return murmurhash3_x86_32(bytes([node_id & 0xff, index & 0xff]), self.seed)
+
+    def primary_hash_node(self, key):
+        # Python's modulo is already non-negative, matching ((h % n) + n) % n
+        return self.primary_hash_value(key) % self.node_count
+
+    def replica_hash_nodes(self, key, count):
+        """The designated node followed by the next node ids, wrapping around.
+        """
+        primary_node = self.primary_hash_node(key)
+        return [(primary_node + i) % self.node_count for i in range(min(count, self.node_count))]
+
+
+class ConsistentKeyDistributor:
+    """Consistent hash ring, mirroring ConsistentKeyDistributor.kt.
+
+    Each node places points_per_node points on the ring. A key belongs to the
+    node owning the first point at or after the key's hash, wrapping around to
+    the smallest point. Later nodes overwrite colliding points, as in the
+    TreeMap used by the cache nodes.
+    """
+
+    def __init__(self, node_count, points_per_node=DEFAULT_POINTS_PER_NODE, seed=DEFAULT_SEED):
+        self.node_count = 0
+        self.points_per_node = points_per_node
+        self.node_hasher = NodeHasher(node_count, seed)
+        self.ring = {}
+        for _ in range(node_count):
+            self.add_node()
+
+    def add_node(self):
+        """Adds the points of the next node id to the ring.
+        """
+        for index in range(self.points_per_node):
+            self.ring[self.node_hasher.extended_node_hash_value(self.node_count, index)] = self.node_count
+        self.node_count += 1
+        self.sorted_points = sorted(self.ring)
+
+    def get_primary_node(self, key):
+        hash_value = self.node_hasher.primary_hash_value(key)
+        position = bisect_left(self.sorted_points, hash_value)
+        if position == len(self.sorted_points):
+            position = 0
+        return self.ring[self.sorted_points[position]]
+
+    def get_replica_nodes(self, key, count):
+        """The first count distinct nodes found walking the ring from the key's
+        primary node.
+        """
+        hash_value = self.node_hasher.primary_hash_value(key)
+        start = bisect_left(self.sorted_points, hash_value)
+        replicas = []
+        for offset in range(len(self.sorted_points)):
+            if len(replicas) == count:
+                break
+            node_id = self.ring[self.sorted_points[(start + offset) % len(self.sorted_points)]]
+            if node_id not in replicas:
+                replicas.append(node_id)
+        return replicas
+
+
+class KeyRouter:
+    """Finds the node that owns a key, using the scheme of the cluster mode.
+
+    Non-scalable clusters place keys by hash modulo node count, scalable
+    clusters (started with -s) use the consistent hash ring.
+    """
+
+    def __init__(self, node_count, scalable=False):
+        self.scalable = scalable
+        if scalable:
+            self.distributor = ConsistentKeyDistributor(node_count)
+        else:
+            self.node_hasher = NodeHasher(node_count)
+
+    def owner(self, key):
+        if self.scalable:
+            return self.distributor.get_primary_node(key)
+        return self.node_hasher.primary_hash_node(key)
+
+    def replicas(self, key, count):
+        """The nodes holding copies of a key, starting with its owner.
+        """
+        if self.scalable:
+            return self.distributor.get_replica_nodes(key, count)
+        return self.node_hasher.replica_hash_nodes(key, count)
+
+    def add_node(self):
+        if not self.scalable:
+            raise ValueError('Only scalable clusters support adding nodes.')
+        self.distributor.add_node()
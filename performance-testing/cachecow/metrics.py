@@ -0,0 +1,39 @@
+# Parser for the metrics each cache node serves at /metrics in the Prometheus text
+# format. Every node reports only its own counters, cache size and latency histograms,
+# so a cluster is monitored by scraping each node, e.g. with CacheCowClient.metrics().
+# Samples are keyed by metric name and then by their labels, as a sorted tuple of
+# (label, value) pairs, e.g. samples['cachecow_requests_total'][(('op', 'fetch'),)].
+
+import re
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text):
+    """Parses metrics text into {name: {labels: value}}, skipping comments.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            raise ValueError(f'Invalid metrics line: {line}')
+        name, labels, value = match.groups()
+        labels = tuple(sorted((label, unescape(label_value))
+                              for label, label_value in LABEL.findall(labels or '')))
+        samples.setdefault(name, {})[labels] = float(value)
+    return samples
+
+
+def unescape(label_value):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), label_value)
+
+
+def metric_total(samples, name, **labels):
+    """Sums the samples of a metric whose labels include the given ones.
+    """
+    wanted = set(labels.items())
+    return sum(value for sample_labels, value in samples.get(name, {}).items()
+               if wanted <= set(sample_labels))
@@ -0,0 +1,178 @@
+# In-process near cache for the CacheCow client. Values read from or written to
+# the cluster are kept in a bounded map so that repeated reads of the same key
+# skip the network. Entries expire after a TTL, and the version in the
+# /v1/blobs/{key}/{version} address doubles as a staleness check: the near cache
+# holds one version per key, and asking for a newer version drops the old one.
+
+from collections import OrderedDict
+import threading
+import time
+
+# Maximum number of entries held by default
+DEFAULT_MAX_ENTRIES = 10000
+
+# Seconds an entry is served before it must be read from the cluster again
+DEFAULT_TTL = 30.0
+
+
+class CountMinSketch:
+    """Approximate access counts for TinyLFU admission.
+
+    Counts are kept in depth rows of 4-bit counters. Once sample_size
+    increments have been recorded every counter is halved, so the sketch
+    tracks recent popularity rather than all-time counts.
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, width, depth=4, sample_size=None):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.depth = depth
+        self.rows = [bytearray(self.width) for _ in range(depth)]
+        self.sample_size = sample_size or 10 * width
+        self.additions = 0
+
+    def _indexes(self, item):
+        h = hash(item)
+        for row in range(self.depth):
+            h = (h * 0x9E3779B1 + row) & 0xffffffffffffffff
+            yield row, (h ^ (h >> 29)) & (self.width - 1)
+
+    def increment(self, item):
+        for row, index in self._indexes(item):
+            if self.rows[row][index] < self.MAX_COUNT:
+                self.rows[row][index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def estimate(self, item):
+        return min(self.rows[row][index] for row, index in self._indexes(item))
+
+    def reset(self):
+        for row in self.rows:
+            for index in range(self.width):
+                row[index] >>= 1
+        self.additions //= 2
+
+
+class NearCache:
+    """Size-bounded in-process cache of key-version pairs with per-entry TTL.
+
+    The "lru" policy evicts the least recently used entry. The "tinylfu"
+    policy also evicts from the LRU end, but only admits a new key if a
+    count-min sketch of recent accesses says it is read more often than the
+    entry it would evict, which keeps one-off reads from flushing hot keys.
+    All methods are thread safe.
+    """
+
+    POLICIES = ('lru', 'tinylfu')
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, policy='lru', clock=time.monotonic):
+        """
+        max_entries: maximum number of keys held
+        ttl: seconds an entry is served after it was stored, None to never expire
+        policy: "lru" or "tinylfu"
+        clock: function returning the current time in seconds
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f'Unknown near cache policy {policy}, expected one of {self.POLICIES}.')
+        if max_entries < 1:
+            raise ValueError('A near cache must hold at least one entry.')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.policy = policy
+        self.clock = clock
+        self.sketch = CountMinSketch(max_entries) if policy == 'tinylfu' else None
+        self.entries = OrderedDict() # key -> (version, value, expiry)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def get(self, key, version):
+        """Returns the cached value of a key-version pair, or None on a miss.
+        A cached older version of the key is dropped as stale.
+        """
+        key = str(key)
+        with self.lock:
+            if self.sketch is not None:
+                self.sketch.increment(key)
+            entry = self.entries.get(key)
+            if entry is not None:
+                cached_version, value, expiry = entry
+                if cached_version == version and (expiry is None or expiry > self.clock()):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if cached_version == version:
+                    self.expired += 1
+                    del self.entries[key]
+                elif cached_version < version:
+                    self.stale += 1
+                    del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value):
+        """Caches the value of a key-version pair. Older versions than the one
+        cached are ignored.
+        """
+        key = str(key)
+        if isinstance(value, str):
+            value = value.encode('ascii')
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > version:
+                return
+            if entry is None and len(self.entries) >= self.max_entries:
+                if not self._evict_for(key):
+                    self.rejections += 1
+                    return
+            expiry = None if self.ttl is None else self.clock() + self.ttl
+            self.entries[key] = (version, value, expiry)
+            self.entries.move_to_end(key)
+
+    def _evict_for(self, key):
+        """Evicts the least recently used entry to make room for key, returning
+        False if TinyLFU rejects the key instead.
+        """
+        victim = next(iter(self.entries))
+        if self.sketch is not None and self.sketch.estimate(key) <= self.sketch.estimate(victim):
+            return False
+        del self.entries[victim]
+        self.evictions += 1
+        return True
+
+    def invalidate(self, key):
+        """Drops every cached version of a key.
+        """
+        with self.lock:
+            self.entries.pop(str(key), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        """Returns the near cache counters and hit ratio.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'policy': self.policy,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'rejections': self.rejections,
+                'hitRatio': self.hits / lookups if lookups > 0 else 0.0,
+            }
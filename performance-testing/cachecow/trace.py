@@ -0,0 +1,102 @@
+# Reader for the key access traces recorded by cache nodes. Tracing is started with
+# POST /v1/admin/trace?enabled=true&capacity=N and the ring buffer is downloaded from
+# /v1/admin/trace/download in the little-endian format written by TraceRecorder.kt:
+#
+#   header: magic "CCTR", format version (int32), start time in epoch ms (int64),
+#           number of records (int32)
+#   record: ns since the start (int64), MurmurHash3 of the key (int32), version (int32),
+#           value size (int32), flags (uint8)
+#
+# Flags hold the operation in the low two bits (0 fetch, 1 store), then a hit bit and a
+# bit set for requests forwarded by another node rather than sent by a client.
+
+import numpy as np
+
+MAGIC = b'CCTR'
+FORMAT_VERSION = 1
+
+FETCH = 0
+STORE = 1
+HIT = 1 << 2
+FORWARDED = 1 << 3
+
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('format', '<i4'), ('start_ms', '<i8'), ('count', '<i4')])
+RECORD_DTYPE = np.dtype([('time_ns', '<i8'), ('key_hash', '<i4'), ('version', '<i4'),
+                         ('value_size', '<i4'), ('flags', 'u1')])
+
+
+class Trace:
+    """A key access trace of one or more nodes, as NumPy arrays in time order.
+
+    time_ns: int64 nanoseconds since the epoch
+    key_hash: int32 MurmurHash3 of the key, as computed by cachecow.murmurhash3_x86_32
+    version: int32 version of the key
+    value_size: int32 bytes read or written, 0 on a miss
+    op: uint8 FETCH or STORE
+    hit: bool, whether a fetch found the key (always True for stores)
+    forwarded: bool, whether another node sent the request
+    node: int16 index of the node that recorded the access
+    """
+
+    def __init__(self, records, node=0):
+        self.time_ns = records['time_ns']
+        self.key_hash = records['key_hash']
+        self.version = records['version']
+        self.value_size = records['value_size']
+        flags = records['flags']
+        self.op = flags & 3
+        self.hit = (flags & HIT) != 0
+        self.forwarded = (flags & FORWARDED) != 0
+        self.node = np.full(len(records), node, dtype=np.int16)
+
+    def __len__(self):
+        return len(self.time_ns)
+
+    def keys(self):
+        """Returns one int64 per access identifying its key-version pair, which
+        simulateCache.py and the benchmarks accept as a key trace.
+        """
+        return (self.key_hash.astype(np.int64) << 32) | (self.version.astype(np.int64) & 0xffffffff)
+
+    def select(self, mask):
+        """Returns the accesses where mask is True, e.g. trace.select(~trace.forwarded).
+        """
+        selected = object.__new__(Trace)
+        for name, values in vars(self).items():
+            setattr(selected, name, values[mask])
+        return selected
+
+    def hit_ratio(self):
+        fetches = self.op == FETCH
+        return float(self.hit[fetches].mean()) if fetches.any() else 0.0
+
+
+def parse_trace(data, node=0):
+    """Parses a downloaded trace into a Trace with absolute timestamps.
+    """
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+    if header['magic'] != MAGIC:
+        raise ValueError('Not a CacheCow trace')
+    if header['format'] != FORMAT_VERSION:
+        raise ValueError(f'Unsupported trace format {header["format"]}')
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=int(header['count']), offset=HEADER_DTYPE.itemsize)
+    records = records.copy()
+    records['time_ns'] += int(header['start_ms']) * 1000000
+    return Trace(records, node)
+
+
+def read_trace(path, node=0):
+    """Reads a trace saved by captureTrace.py.
+    """
+    with open(path, 'rb') as trace_file:
+        return parse_trace(trace_file.read(), node)
+
+
+def merge_traces(traces):
+    """Merges the traces of several nodes into one, ordered by time.
+    """
+    merged = object.__new__(Trace)
+    order = np.argsort(np.concatenate([trace.time_ns for trace in traces]), kind='stable')
+    for name in vars(traces[0]):
+        setattr(merged, name, np.concatenate([getattr(trace, name) for trace in traces])[order])
+    return merged
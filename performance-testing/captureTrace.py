@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# Records the key accesses of a live cluster. Start recording on every node with --start,
+# run a workload, then --download to stop recording and save one binary trace per node
+# (<prefix>0.trace, <prefix>1.trace, ...). Each node keeps its last --capacity accesses.
+# The traces load as NumPy arrays with cachecow.read_trace, and simulateCache.py replays
+# them with --file.
+
+from optparse import OptionParser
+
+import numpy as np
+
+from cachecow import CacheCowClient, load_node_list, merge_traces, parse_trace
+
+
+def print_summary(trace):
+    fetches = trace.op == 0
+    seconds = (trace.time_ns[-1] - trace.time_ns[0]) / 1e9 if len(trace) > 1 else 0.0
+    print(f'{len(trace)} accesses over {seconds:.1f} s, {fetches.sum()} fetches, '
+          f'{len(np.unique(trace.keys()))} distinct keys')
+    print(f'Hit ratio: {trace.hit_ratio():.3f}, forwarded: {trace.forwarded.mean():.3f}')
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="captureTrace.py --nodes nodes.txt (--start | --download prefix) [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt.")
+    parser.add_option("--start",
+                action="store_true",
+                default=False,
+                dest="start",
+                help="Starts recording on every node, discarding earlier traces.")
+    parser.add_option("--capacity",
+                type="int",
+                default=1000000,
+                dest="capacity",
+                help="Number of accesses each node keeps.")
+    parser.add_option("--download",
+                type="string",
+                dest="prefix",
+                help="Stops recording and saves the traces to <prefix><node>.trace.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for capturing traces.")
+
+    with CacheCowClient(load_node_list(options.nodes)) as client:
+        if options.start:
+            client.set_tracing(True, options.capacity)
+            print(f'Recording the last {options.capacity} accesses on {len(client.node_clients)} nodes')
+        elif options.prefix:
+            client.set_tracing(False)
+            traces = []
+            for node, data in enumerate(client.download_traces()):
+                with open(f'{options.prefix}{node}.trace', 'wb') as trace_file:
+                    trace_file.write(data)
+                traces.append(parse_trace(data, node))
+            print_summary(merge_traces(traces))
+        else:
+            parser.error("Pass --start or --download.")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# Measures how long a cache node takes from process start until it serves its first
+# request, starting it either from the prebuilt jar (./gradlew fatJar, as pasture.py
+# deploys it) or with ./gradlew run, as nodes were started before. Each run reports
+# when /v1/hello-world first answers and when the first store and fetch of a key
+# owned by the node complete.
+
+import json
+from optparse import OptionParser
+import os
+import shlex
+import signal
+import subprocess
+import time
+
+import numpy as np
+
+from cachecow import CacheCowClient, CacheCowError, NodeClient, load_node_list
+
+CACHE_NODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache-node')
+
+NODE_JAR = os.path.join(CACHE_NODE_DIR, 'build', 'libs', 'cachecow.jar')
+
+# Same flags as NODE_JVM_FLAGS in pasture.py, with a smaller heap
+DEFAULT_JVM_FLAGS = '-Xms512m -Xmx512m -XX:+UseG1GC -XX:MaxGCPauseMillis=50 -XX:+ExitOnOutOfMemoryError'
+
+POLL_INTERVAL = 0.01
+
+
+def node_command(mode, port, jvm_flags):
+    """Returns the command that starts node 0 of cache-node/nodes.txt on the port.
+    """
+    if mode == 'jar':
+        return ['java'] + shlex.split(jvm_flags) + ['-jar', NODE_JAR, 'local', '0', str(port)]
+    return ['./gradlew', '-q', 'run', '--args', f'local 0 {port}']
+
+
+def owned_key(nodes):
+    """Returns a key that node 0 owns, so the first request is not forwarded to a node
+    that isn't running.
+    """
+    client = CacheCowClient(nodes)
+    key = next(f'cold-start-{i}' for i in range(10000) if client.owner(f'cold-start-{i}') == 0)
+    client.close()
+    return key
+
+
+def cold_start(mode, port, key, jvm_flags, timeout):
+    """Starts a node and returns the seconds until it answered /v1/hello-world and
+    until it served a store and a fetch.
+    """
+    node = NodeClient(f'localhost:{port}', retries=0, timeout=(1, 5))
+    start_time = time.perf_counter()
+    process = subprocess.Popen(node_command(mode, port, jvm_flags), cwd=CACHE_NODE_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    try:
+        while not node.hello_world(timeout=(0.2, 1)):
+            if process.poll() is not None:
+                raise RuntimeError(f'Node exited with status {process.returncode}')
+            if time.perf_counter() - start_time > timeout:
+                raise RuntimeError(f'Node did not answer within {timeout}s')
+            time.sleep(POLL_INTERVAL)
+        ready = time.perf_counter() - start_time
+
+        node.store(key, 1, 'cold')
+        if node.fetch(key, 1) != b'cold':
+            raise CacheCowError(f'Fetch of {key} returned the wrong value')
+        served = time.perf_counter() - start_time
+        return ready, served
+    finally:
+        # Gradle starts the node in a child process, so stop the whole group
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+        node.close()
+
+
+def print_results(results):
+    print(f'{"mode":<8}{"runs":>6}{"ready p50 (s)":>16}{"served p50 (s)":>16}{"served max (s)":>16}')
+    for mode, runs in results.items():
+        ready = [run['ready'] for run in runs]
+        served = [run['served'] for run in runs]
+        print(f'{mode:<8}{len(runs):>6}{np.median(ready):>16.2f}{np.median(served):>16.2f}{max(served):>16.2f}')
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="coldStart.py [options]")
+    parser.add_option("--mode",
+                type="choice",
+                choices=["jar", "gradle", "both"],
+                default="both",
+                dest="mode",
+                help="Start the node from the fat jar, with ./gradlew run, or both.")
+    parser.add_option("-n", "--runs",
+                type="int",
+                default=5,
+                dest="runs",
+                help="Number of cold starts per mode.")
+    parser.add_option("--jvm-flags",
+                type="string",
+                default=DEFAULT_JVM_FLAGS,
+                dest="jvm_flags",
+                help="JVM flags used in jar mode.")
+    parser.add_option("--timeout",
+                type="float",
+                default=600,
+                dest="timeout",
+                help="Seconds to wait for a node to start.")
+    parser.add_option("--no-build",
+                action="store_false",
+                default=True,
+                dest="build",
+                help="Use the existing jar instead of running ./gradlew fatJar first.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the timings of every run as JSON.")
+    (options, args) = parser.parse_args()
+
+    modes = ['jar', 'gradle'] if options.mode == 'both' else [options.mode]
+    nodes = load_node_list(os.path.join(CACHE_NODE_DIR, 'nodes.txt'))
+    port = int(nodes[0].rpartition(':')[2])
+    key = owned_key(nodes)
+
+    if 'jar' in modes and options.build:
+        subprocess.run(['./gradlew', '-q', 'fatJar'], cwd=CACHE_NODE_DIR, check=True)
+
+    results = {}
+    for mode in modes:
+        results[mode] = []
+        for i in range(options.runs):
+            ready, served = cold_start(mode, port, key, options.jvm_flags, options.timeout)
+            print(f'{mode} run {i + 1}: ready after {ready:.2f}s, served after {served:.2f}s')
+            results[mode].append({'ready': ready, 'served': served})
+
+    print_results(results)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
@@ -4,14 +4,75 @@
 # the graph takes "query_time" seconds, and our distributed memory cache takes
 # however long it takes. The "query_time" should be slower than our distributed
 # memory cache for max speedup.
+#
+# With --tile B the distance matrix is stored as BxB tiles of raw little-endian
+# float64, one cache value per tile, and relaxed with blocked Floyd Warshall: for
+# each diagonal tile, every tile is fetched in one batch, updated with NumPy min-plus
+# products and the changed tiles are stored back in one batch.
+
+import threading
 
 import numpy as np
 from optparse import OptionParser
 import random
-import requests
 import time
 from tqdm import tqdm
 
+from cachecow import CacheCowClient, NearCache, load_node_list
+
+# Byte order and type of tile values
+TILE_DTYPE = np.dtype('<f8')
+
+# Upper bound on the body of one _mset request, below the nodes' 1 MB request limit
+MAX_REQUEST_BYTES = 512 << 10
+
+# Largest tile side whose base64 encoded tile fits in one request
+MAX_TILE_SIZE = int((MAX_REQUEST_BYTES * 3 // 4 // TILE_DTYPE.itemsize) ** 0.5)
+
+
+class RequestCounter:
+    """Counts the HTTP requests a client sends and the body bytes it moves.
+    """
+
+    def __init__(self, client):
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        for node_client in client.node_clients:
+            node_client.request = self.wrap(node_client.request)
+
+    def wrap(self, request):
+        def counted_request(*args, **kwargs):
+            response = request(*args, **kwargs)
+            body = response.request.body if response.request is not None else None
+            with self.lock:
+                self.round_trips += 1
+                self.bytes_sent += len(body or b'')
+                self.bytes_received += len(response.content)
+            return response
+        return counted_request
+
+
+def min_plus(target, left, right):
+    """Returns target relaxed with every path through left then right, the min-plus
+    product of left and right, one intermediate node at a time.
+    """
+    result = np.array(target)
+    for m in range(result.shape[0]):
+        np.minimum(result, left[:, m, None] + right[None, m, :], out=result)
+    return result
+
+
+def closure(tile):
+    """Returns the shortest distances within a square tile, i.e. Floyd Warshall on it.
+    """
+    result = np.array(tile)
+    for m in range(result.shape[0]):
+        np.minimum(result, result[:, m, None] + result[None, m, :], out=result)
+    return result
+
+
 class FloydWarshall:
     """This class generates a graph and runs the Floyd Warshall algorithm.
 
@@ -19,10 +80,16 @@ class FloydWarshall:
     and handles cache misses. It implements algorithm timing as well.
     """
 
-    def __init__(self, num_nodes, cache_url, query_time, prob_edge=0.3, max_weight=10, seed=50):
+    def __init__(self, num_nodes, cache_url, query_time, prob_edge=0.3, max_weight=10, seed=50,
+                 cache_nodes=None, scalable=False, batch=False, near_cache=None, tile_size=None):
         """
         num_nodes: the number of nodes in the graph
         cache_url: url for the cache
+        cache_nodes: all cache node urls, enables routing keys to their owner
+        scalable: whether the cache runs in scalable mode
+        batch: fetch and store whole rows with one get_many/set_many call
+        near_cache: NearCache in front of the cluster, None to disable
+        tile_size: store the matrix as tile_size x tile_size tiles, None for single entries
         query_time: latency (in seconds) to query the graph.
         prob_edge: probability of an edge between two nodes
         max_weight: maximum edge weight
@@ -34,7 +101,15 @@ class FloydWarshall:
         self.prob_edge = prob_edge
         self.max_weight = max_weight
         self.seed = seed
+        self.batch = batch
+        self.tile_size = tile_size
         self.graph = None
+        self.initial_graph = None
+        # Keys name the graph, so values left by runs on other graphs are never read
+        self.key_prefix = f'fw-{seed}-{num_nodes}-{prob_edge}-{max_weight}'
+        self.client = CacheCowClient(cache_nodes or [cache_url], scalable=scalable, near_cache=near_cache,
+                                     **self.tile_batch_options())
+        self.requests = RequestCounter(self.client)
 
         self.query_hit, self.query_miss = 0, 0
         self.update_success, self.update_failure = 0, 0
@@ -58,6 +133,7 @@ class FloydWarshall:
                 else:
                     graph[i, j] = np.inf # No edge
         self.graph = graph
+        self.initial_graph = graph.copy()
 
     def run(self):
         """Floyd Warshall Algorithm.
@@ -69,6 +145,23 @@ class FloydWarshall:
         # Start time
         self.start_clock()
 
+        if self.tile_size:
+            self.run_tiles()
+        elif self.batch:
+            self.run_rows()
+        else:
+            self.run_keys()
+
+        # End time
+        self.stop_clock()
+
+        self.print_statistics()
+
+        return self.get_runtime()
+
+    def run_keys(self):
+        """Runs the algorithm with one cache request per matrix entry.
+        """
         for k in tqdm(range(self.num_nodes)):
             for i in range(self.num_nodes):
                 dist_i_k = self.query_graph(i, k)
@@ -82,35 +175,151 @@ class FloydWarshall:
                     self.update_graph(i, j, dist_i_j)
                     #self.update_graph(k, j, dist_k_j)
 
-        # End time
-        self.stop_clock()
+    def run_rows(self):
+        """Runs the algorithm with one get_many/set_many request per matrix row.
+        """
+        for k in tqdm(range(self.num_nodes)):
+            row_k = self.query_row(k)
+            for i in range(self.num_nodes):
+                row_i = row_k if i == k else self.query_row(i)
+                self.update_row(i, np.minimum(row_i, row_i[k] + row_k))
 
-        self.print_statistics()
+    def tile_batch_options(self):
+        # Keeps each batch of tiles within MAX_REQUEST_BYTES once base64 encoded
+        if not self.tile_size:
+            return {}
+        tile_bytes = self.tile_size * self.tile_size * TILE_DTYPE.itemsize * 4 // 3
+        return {'batch_size': MAX_REQUEST_BYTES // tile_bytes}
 
-        return self.get_runtime()
+    def run_tiles(self):
+        """Runs blocked Floyd Warshall with one batched fetch and store of the tiles per
+        diagonal tile. The diagonal tile is closed first, then the tiles in its row and
+        column through it, then every other tile through those. Only tiles that changed
+        or were read from the database are stored.
+        """
+        size = self.tile_size
+        num_tiles = -(-self.num_nodes // size)
+
+        # Padding nodes have no edges, so they don't change any distance
+        padded_size = num_tiles * size
+        self.padded_graph = np.full((padded_size, padded_size), np.inf)
+        np.fill_diagonal(self.padded_graph, 0)
+        self.padded_graph[:self.num_nodes, :self.num_nodes] = self.graph
+
+        positions = [(i, j) for i in range(num_tiles) for j in range(num_tiles)]
+        for k in tqdm(range(num_tiles)):
+            fetched, missed = self.query_tiles(positions)
+            tiles = dict(zip(positions, fetched))
+            updated = {}
+
+            updated[k, k] = closure(tiles[k, k])
+            for j in range(num_tiles):
+                if j != k:
+                    updated[k, j] = min_plus(tiles[k, j], updated[k, k], tiles[k, j])
+                    updated[j, k] = min_plus(tiles[j, k], tiles[j, k], updated[k, k])
+            for i in range(num_tiles):
+                for j in range(num_tiles):
+                    if i != k and j != k:
+                        updated[i, j] = min_plus(tiles[i, j], updated[i, k], updated[k, j])
+
+            self.update_tiles({position: tile for position, tile in updated.items()
+                               if position in missed or not np.array_equal(tile, tiles[position])})
+
+        # The last diagonal tile's pass leaves every tile final, stored or not
+        distances = np.empty((padded_size, padded_size))
+        for (i, j), tile in updated.items():
+            distances[i * size:(i + 1) * size, j * size:(j + 1) * size] = tile
+        self.graph = distances[:self.num_nodes, :self.num_nodes]
+
+    def tile_key(self, i, j):
+        return f'{self.key_prefix}-{self.tile_size}:{i},{j}'
+
+    def query_tiles(self, positions):
+        # Query cache for tiles, decoding them without copying. Also returns the
+        # positions of the tiles read from the database.
+        version = 1 # Unused version
+        size = self.tile_size
+        try:
+            values = self.client.get_many([(self.tile_key(i, j), version) for i, j in positions])
+        except:
+            values = [None] * len(positions)
+        tiles, missed = [], set()
+        for (i, j), value in zip(positions, values):
+            if value is None:
+                missed.add((i, j))
+                self.query_miss += 1
+                self.database_time += self.query_time
+                tiles.append(self.padded_graph[i * size:(i + 1) * size, j * size:(j + 1) * size])
+            else:
+                self.query_hit += 1
+                tiles.append(np.frombuffer(value, dtype=TILE_DTYPE).reshape(size, size))
+        return tiles, missed
+
+    def update_tiles(self, tiles):
+        # Store tiles into cache as raw float64
+        version = 1 # Unused version
+        size = self.tile_size
+        try:
+            self.client.set_many([(self.tile_key(i, j), version, tile.astype(TILE_DTYPE, copy=False).tobytes())
+                                  for (i, j), tile in tiles.items()])
+            self.update_success += len(tiles)
+        except:
+            self.update_failure += len(tiles)
+
+        # Store data into storage
+        for (i, j), tile in tiles.items():
+            self.database_time += self.query_time
+            self.padded_graph[i * size:(i + 1) * size, j * size:(j + 1) * size] = tile
 
     def query_graph(self, i, j):
         # Query cache
-        key = f'{i}->{j}'
+        key = f'{self.key_prefix}:{i}->{j}'
         version = 1 # Unused version
-        fetched_data = requests.get(url=f'http://{self.cache_url}/v1/blobs/{key}/{version}')
         try:
-            value = float(fetched_data.content.decode('ascii'))
+            value = float(self.client.fetch(key, version).decode('ascii'))
             self.query_hit += 1
             return value
         except:
-            print(fetched_data.status_code, fetched_data.content)
             self.query_miss += 1
             self.database_time += self.query_time
             return self.graph[i, j]
 
+    def query_row(self, i):
+        # Query cache for a whole row
+        version = 1 # Unused version
+        try:
+            values = self.client.get_many([(f'{self.key_prefix}:{i}->{j}', version) for j in range(self.num_nodes)])
+        except:
+            values = [None] * self.num_nodes
+        row = self.graph[i].copy()
+        for j, value in enumerate(values):
+            if value is None:
+                self.query_miss += 1
+                self.database_time += self.query_time
+            else:
+                self.query_hit += 1
+                row[j] = float(value.decode('ascii'))
+        return row
+
+    def update_row(self, i, values):
+        # Store a whole row into cache
+        version = 1 # Unused version
+        try:
+            self.client.set_many([(f'{self.key_prefix}:{i}->{j}', version, str(value)) for j, value in enumerate(values)])
+            self.update_success += len(values)
+        except:
+            self.update_failure += len(values)
+
+        # Store data into storage
+        self.database_time += self.query_time * len(values)
+        self.graph[i] = values
+
     def update_graph(self, i, j, value):
         # Store data into cache
-        key = f'{i}->{j}'
+        key = f'{self.key_prefix}:{i}->{j}'
         version = 1 # Unused version
         try:
-            requests.post(url=f'http://{self.cache_url}/v1/blobs/{key}/{version}',
-                      data = str(value).encode('ascii'))
+            self.client.store(key, version, str(value))
             self.update_success += 1
         except:
             self.update_failure += 1
@@ -132,18 +341,61 @@ class FloydWarshall:
         return self.elapsed_time + self.database_time
 
     def validate(self):
-        raise Exception("Not yet implemented.")
+        """Checks the computed distances against Floyd Warshall run locally on the
+        generated graph.
+        """
+        expected = closure(self.initial_graph)
+        mismatches = np.argwhere(self.graph != expected)
+        if len(mismatches) > 0:
+            i, j = mismatches[0]
+            raise AssertionError(f'{len(mismatches)} distances differ from the reference, '
+                                 f'e.g. {i}->{j} is {self.graph[i, j]} instead of {expected[i, j]}')
+        print('Validation passed: all distances match the local reference')
 
     def print_statistics(self):
         print(f'Query Hit Rate: {self.query_hit / (self.query_miss + self.query_hit)} ' +
               f'(Hits: {self.query_hit}, Misses: {self.query_miss})')
-        print(f'Update Success Rate: {self.update_success / (self.update_failure + self.update_success)} ' +
-              f'(Number of Updates: {self.update_failure + self.update_success})')
+        self.print_hit_ratios()
+        updates = self.update_failure + self.update_success
+        # A tiled run on distances already in the cache may not store anything
+        print(f'Update Success Rate: {self.update_success / updates if updates else 1.0} ' +
+              f'(Number of Updates: {updates})')
         print(f'Total Time: {self.elapsed_time + self.database_time} sec '+
               f'(Database Time: {self.database_time} sec, ' +
               f'Non-Database Time: {self.elapsed_time} sec)')
+        print(f'Cache Round Trips: {self.requests.round_trips} ' +
+              f'(Bytes Sent: {self.requests.bytes_sent}, Bytes Received: {self.requests.bytes_received})')
         print(self.graph)
 
+    def print_hit_ratios(self):
+        """Splits the queries into those served by the near cache, the cluster and
+        the database.
+        """
+        near_cache = self.client.near_cache
+        if near_cache is None:
+            return
+        stats = near_cache.stats()
+        queries = self.query_hit + self.query_miss
+        cluster_queries = queries - stats['hits']
+        print(f'Near Cache Hit Ratio: {stats["hits"] / queries if queries else 0.0} ' +
+              f'(Hits: {stats["hits"]}, Stale: {stats["stale"]}, Expired: {stats["expired"]}, ' +
+              f'Evictions: {stats["evictions"]}, Rejections: {stats["rejections"]})')
+        print(f'Cluster Hit Ratio: {(self.query_hit - stats["hits"]) / cluster_queries if cluster_queries else 0.0} ' +
+              f'(Hits: {self.query_hit - stats["hits"]}, Requests: {cluster_queries})')
+        print(f'Database Ratio: {self.query_miss / queries if queries else 0.0} ' +
+              f'(Queries: {self.query_miss})')
+
+
+def print_comparison(runs):
+    """Prints the cache traffic and non-database time of each run, with its speedup
+    over the first.
+    """
+    baseline = runs[0][1].elapsed_time
+    print(f'{"mode":<8}{"time (s)":>12}{"round trips":>14}{"bytes moved":>14}{"speedup":>10}')
+    for mode, run in runs:
+        moved = run.requests.bytes_sent + run.requests.bytes_received
+        print(f'{mode:<8}{run.elapsed_time:>12.3f}{run.requests.round_trips:>14}{moved:>14}'
+              f'{baseline / run.elapsed_time:>10.1f}')
 
 
 if __name__ == "__main__":
@@ -153,6 +405,50 @@ if __name__ == "__main__":
                 type="string",
                 dest="url",
                 help="Node URL for sending HTTP requests.")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt. Sends each key directly to the node that owns it.")
+    parser.add_option("--scalable",
+                action="store_true",
+                default=False,
+                dest="scalable",
+                help="Cache cluster runs in scalable mode.")
+    parser.add_option("--batch",
+                action="store_true",
+                default=False,
+                dest="batch",
+                help="Fetch and store whole rows with batch requests.")
+    parser.add_option("--tile",
+                type="int",
+                dest="tile_size",
+                help="Store the matrix as tiles of this many rows and columns of raw float64.")
+    parser.add_option("--validate",
+                action="store_true",
+                default=False,
+                dest="validate",
+                help="Check the distances against Floyd Warshall run locally.")
+    parser.add_option("--compare-scalar",
+                action="store_true",
+                default=False,
+                dest="compare_scalar",
+                help="Also run with one request per entry and print the speedup over it.")
+    parser.add_option("--near",
+                type="int",
+                default=0,
+                dest="near_entries",
+                help="Keeps up to this many values in an in-process near cache.")
+    parser.add_option("--near-ttl",
+                type="float",
+                default=30.0,
+                dest="near_ttl",
+                help="Seconds a near cache entry is served.")
+    parser.add_option("--near-policy",
+                type="choice",
+                choices=list(NearCache.POLICIES),
+                default="lru",
+                dest="near_policy",
+                help="Near cache eviction policy, lru or tinylfu.")
     parser.add_option("-d",
                 type="float",
                 default=0.3,
@@ -180,14 +476,35 @@ if __name__ == "__main__":
                 help="Seed.")
     (options, args) = parser.parse_args()
 
-    if not options.url:
+    if not options.url and not options.nodes:
         raise Exception("URL Argument is necessary for performance testing.")
+    if options.tile_size is not None and not 0 < options.tile_size <= MAX_TILE_SIZE:
+        parser.error(f"--tile must be between 1 and {MAX_TILE_SIZE} so one tile fits in a request.")
+
+
+    def make_run(batch, tile_size):
+        return FloydWarshall(num_nodes=options.num_nodes,
+                             cache_url=options.url,
+                             query_time=options.query_time,
+                             prob_edge=options.prob_edge,
+                             max_weight=options.max_weight,
+                             seed=options.seed,
+                             cache_nodes=load_node_list(options.nodes) if options.nodes else None,
+                             scalable=options.scalable,
+                             batch=batch,
+                             near_cache=NearCache(options.near_entries, options.near_ttl, options.near_policy)
+                                 if options.near_entries > 0 else None,
+                             tile_size=tile_size)
+
+    mode = 'tiles' if options.tile_size else 'rows' if options.batch else 'keys'
+    runs = [(mode, make_run(options.batch, options.tile_size))]
+    if options.compare_scalar and mode != 'keys':
+        runs.insert(0, ('keys', make_run(False, None)))
 
+    for _, floydWarshall in runs:
+        floydWarshall.run()
+        if options.validate:
+            floydWarshall.validate()
 
-    floydWarshall = FloydWarshall(num_nodes=options.num_nodes,
-                                  cache_url=options.url,
-                                  query_time=options.query_time,
-                                  prob_edge=options.prob_edge,
-                                  max_weight=options.max_weight,
-                                  seed=options.seed)
-    floydWarshall.run()
+    if len(runs) > 1:
+        print_comparison(runs)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# Measures the latency that node-to-node forwarding adds to a request. Every
+# request is sent to one entry node; keys it owns are served locally while the
+# rest are forwarded to their owner, so comparing the two shows the cost of a
+# hop. Results can be saved and compared to measure a change to the Sender.
+
+import json
+from optparse import OptionParser
+import time
+
+import numpy as np
+
+from cachecow import CacheCowClient, load_node_list
+
+PERCENTILES = [50, 99]
+
+
+def pick_keys(client, entry_node, num_keys):
+    """Returns num_keys keys owned by the entry node and num_keys owned by others.
+    """
+    local_keys, forwarded_keys = [], []
+    i = 0
+    while len(local_keys) < num_keys or len(forwarded_keys) < num_keys:
+        key = f'forward-{i}'
+        if client.owner(key) == entry_node:
+            if len(local_keys) < num_keys:
+                local_keys.append(key)
+        elif len(forwarded_keys) < num_keys:
+            forwarded_keys.append(key)
+        i += 1
+    return local_keys, forwarded_keys
+
+
+def time_requests(request, keys):
+    """Returns the latency in milliseconds of request(key) for every key.
+    """
+    latencies = []
+    for key in keys:
+        start_time = time.perf_counter()
+        request(key)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    return {f'p{p}': float(np.percentile(latencies, p)) for p in PERCENTILES}
+
+
+def run(client, entry_node, num_keys, value_size, warmup):
+    """Stores then fetches local and forwarded keys through the entry node and
+    returns the latency percentiles of each.
+    """
+    node_client = client.node_clients[entry_node]
+    value = b'x' * value_size
+    local_keys, forwarded_keys = pick_keys(client, entry_node, num_keys + warmup)
+
+    results = {}
+    for name, keys in (('local', local_keys), ('forwarded', forwarded_keys)):
+        # Warm up connections on both the client and the node-to-node path
+        for key in keys[:warmup]:
+            node_client.store(key, 1, value)
+            node_client.fetch(key, 1)
+        keys = keys[warmup:]
+        results[f'{name} store'] = summarize(time_requests(lambda key: node_client.store(key, 1, value), keys))
+        results[f'{name} fetch'] = summarize(time_requests(lambda key: node_client.fetch(key, 1), keys))
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f'{"":<18}' + ''.join(f'{f"p{p} (ms)":>12}' for p in PERCENTILES)
+    if baseline:
+        header += ''.join(f'{f"before p{p}":>12}' for p in PERCENTILES)
+    print(header)
+    for name, percentiles in results.items():
+        row = f'{name:<18}' + ''.join(f'{percentiles[f"p{p}"]:>12.3f}' for p in PERCENTILES)
+        if baseline and name in baseline:
+            row += ''.join(f'{baseline[name][f"p{p}"]:>12.3f}' for p in PERCENTILES)
+        print(row)
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="forwardingLatency.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a cluster with at least two nodes.")
+    parser.add_option("--scalable",
+                action="store_true",
+                default=False,
+                dest="scalable",
+                help="Cache cluster runs in scalable mode.")
+    parser.add_option("--entry",
+                type="int",
+                default=0,
+                dest="entry_node",
+                help="Id of the node that every request is sent to.")
+    parser.add_option("-n",
+                type="int",
+                default=1000,
+                dest="num_keys",
+                help="Number of local and of forwarded keys to time.")
+    parser.add_option("--value-size",
+                type="int",
+                default=100,
+                dest="value_size",
+                help="Size of each value in bytes.")
+    parser.add_option("--warmup",
+                type="int",
+                default=50,
+                dest="warmup",
+                help="Number of untimed requests of each kind sent first.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the results as JSON, e.g. to compare before and after a change.")
+    parser.add_option("--compare",
+                type="string",
+                dest="compare",
+                help="JSON results of an earlier run to print alongside.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for forwarding tests.")
+
+    nodes = load_node_list(options.nodes)
+    if len(nodes) < 2:
+        raise Exception("Forwarding needs a cluster with at least two nodes.")
+
+    with CacheCowClient(nodes, scalable=options.scalable) as client:
+        results = run(client, options.entry_node, options.num_keys, options.value_size, options.warmup)
+        client.clear()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# Generates the key placement fixtures used by cache-node's KeyPlacementTest.
+# The fixtures record where the python client (cachecow.hashing) places keys,
+# so the Kotlin test proves that clients and cache nodes agree on the owner of
+# every key. Rerun this script whenever the hashing code changes.
+
+from optparse import OptionParser
+import os
+import random
+import string
+
+from cachecow.hashing import ConsistentKeyDistributor, NodeHasher
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', 'cache-node', 'src', 'test', 'resources')
+
+# Largest cluster size covered by the fixture
+MAX_NODES = 5
+
+# Replication factor recorded for the replica columns
+REPLICAS = 3
+
+# Ring points per node to record (includes indexes past 25 to cover byte wrap)
+MAX_POINT_INDEX = 300
+
+
+def generate_keys(num_keys, seed):
+    """Keys shaped like the benchmark keys plus random and non-ASCII keys.
+    """
+    rng = random.Random(seed)
+    keys = ['', 'a', 'b', 'c', 'key', 'clé', '键', 'ключ-1', '0->0']
+    keys += [f'{i}->{j}' for i in range(10) for j in range(10)]
+    keys += [str(i) for i in range(200)]
+    alphabet = string.ascii_letters + string.digits + '-_.>~!*'
+    while len(keys) < num_keys:
+        keys.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 40))))
+    return keys
+
+
+def write_node_points(path):
+    node_hasher = NodeHasher(1)
+    with open(path, 'w', encoding='utf-8') as fixture:
+        fixture.write('nodeId\tindex\thash\n')
+        for node_id in range(MAX_NODES + 1):
+            fixture.write(f'{node_id}\t-1\t{node_hasher.node_hash_value(node_id)}\n')
+            for index in range(MAX_POINT_INDEX):
+                fixture.write(f'{node_id}\t{index}\t{node_hasher.extended_node_hash_value(node_id, index)}\n')
+
+
+def write_key_placement(path, keys):
+    hashers = [NodeHasher(n) for n in range(1, MAX_NODES + 1)]
+    distributors = [ConsistentKeyDistributor(n) for n in range(1, MAX_NODES + 1)]
+    with open(path, 'w', encoding='utf-8') as fixture:
+        header = ['key', 'hash']
+        header += [f'modulo{n}' for n in range(1, MAX_NODES + 1)]
+        header += [f'ring{n}' for n in range(1, MAX_NODES + 1)]
+        header += [f'moduloReplicas{n}' for n in range(1, MAX_NODES + 1)]
+        header += [f'ringReplicas{n}' for n in range(1, MAX_NODES + 1)]
+        fixture.write('\t'.join(header) + '\n')
+        for key in keys:
+            row = [key, str(hashers[0].primary_hash_value(key))]
+            row += [str(hasher.primary_hash_node(key)) for hasher in hashers]
+            row += [str(distributor.get_primary_node(key)) for distributor in distributors]
+            row += [','.join(map(str, hasher.replica_hash_nodes(key, REPLICAS))) for hasher in hashers]
+            row += [','.join(map(str, distributor.get_replica_nodes(key, REPLICAS))) for distributor in distributors]
+            fixture.write('\t'.join(row) + '\n')
+
+
+if __name__ == "__main__":
+    parser = OptionParser(usage="generatePlacementFixture.py [options]")
+    parser.add_option("-n",
+                type="int",
+                default=2000,
+                dest="num_keys",
+                help="Number of keys in the fixture.")
+    parser.add_option("-s",
+                type="int",
+                default=0,
+                dest="seed",
+                help="Seed.")
+    (options, args) = parser.parse_args()
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    write_node_points(os.path.join(FIXTURE_DIR, 'node-points.tsv'))
+    write_key_placement(os.path.join(FIXTURE_DIR, 'key-placement.tsv'),
+                        generate_keys(options.num_keys, options.seed))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# Measures the overhead of request logging on the cache nodes. The forwarding
+# latency test is run once per logging setting, switching every node's log level
+# and sample rate at runtime, so the cluster does not need to be restarted.
+
+from optparse import OptionParser
+
+from cachecow import CacheCowClient, load_node_list
+from forwardingLatency import PERCENTILES, run
+
+# (name, level, sample rate) of each logging setting that is timed
+SETTINGS = [
+    ('off', 'OFF', 1.0),
+    ('info', 'INFO', 1.0),
+    ('debug sampled', 'DEBUG', 0.01),
+    ('debug', 'DEBUG', 1.0),
+]
+
+
+def measure(client, entry_node, num_keys, value_size, warmup):
+    """Returns the forwarding latency results under every logging setting,
+    restoring the default INFO level afterwards.
+    """
+    results = {}
+    try:
+        for name, level, sample_rate in SETTINGS:
+            client.set_logging(level=level, sample_rate=sample_rate)
+            results[name] = run(client, entry_node, num_keys, value_size, warmup)
+            client.clear()
+    finally:
+        client.set_logging(level='INFO', sample_rate=1.0)
+    return results
+
+
+def print_results(results):
+    requests = list(next(iter(results.values())))
+    print(f'{"":<18}' + ''.join(f'{request:>24}' for request in requests))
+    for name, result in results.items():
+        row = f'{name:<18}'
+        for request in requests:
+            cell = ' / '.join(f'{result[request][f"p{p}"]:.3f}' for p in PERCENTILES)
+            row += f'{cell:>24}'
+        print(row)
+    print('(latency in ms, ' + ' / '.join(f'p{p}' for p in PERCENTILES) + ')')
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="loggingOverhead.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a cluster with at least two nodes.")
+    parser.add_option("--scalable",
+                action="store_true",
+                default=False,
+                dest="scalable",
+                help="Cache cluster runs in scalable mode.")
+    parser.add_option("--entry",
+                type="int",
+                default=0,
+                dest="entry_node",
+                help="Id of the node that every request is sent to.")
+    parser.add_option("-n",
+                type="int",
+                default=1000,
+                dest="num_keys",
+                help="Number of local and of forwarded keys to time per setting.")
+    parser.add_option("--value-size",
+                type="int",
+                default=100,
+                dest="value_size",
+                help="Size of each value in bytes.")
+    parser.add_option("--warmup",
+                type="int",
+                default=50,
+                dest="warmup",
+                help="Number of untimed requests of each kind sent first.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for logging tests.")
+
+    nodes = load_node_list(options.nodes)
+    if len(nodes) < 2:
+        raise Exception("Forwarding needs a cluster with at least two nodes.")
+
+    with CacheCowClient(nodes, scalable=options.scalable) as client:
+        results = measure(client, options.entry_node, options.num_keys, options.value_size, options.warmup)
+    print_results(results)
@@ -5,14 +5,22 @@
 # however long it takes. The "query_time" should be slower than our distributed
 # memory cache for max speedup.
 
-# Implements cache-aside.
+# Implements cache-aside. Use -n to scale the run up to millions of requests, with
+# --batch to send them in get_many/set_many batches. Throughput is reported every
+# --report requests, so a slowdown as the cache fills up shows in the output.
+
+# The fetches served by each node are read from /v1/global-cache-info before and after
+# the run, and the skew (busiest node over the mean) is printed. Hot keys make a single
+# owner the bottleneck; start the nodes with "-r 3" and pass --replicas 3 to spread their
+# reads over three nodes, and compare against a run with -r 1.
 
 from optparse import OptionParser
 import numpy as np
 import matplotlib.pyplot as plt
-import requests
 import time
 
+from cachecow import CacheCowClient, CacheCowError, load_node_list
+
 # Constants
 NUM_INITIAL_STORE = 5 # Should be larger than the max cache size to test cache effectiveness, and speed.
 FETCH_PROPORTION = 1
@@ -23,6 +31,22 @@ FETCH_TIMEOUT = 2
 
 MU, SIGMA = 3, 5
 
+
+def fetch_counts(client):
+    """Returns the number of fetches each node has served.
+    """
+    return [info['receiverUsageInfo']['fetchAttempts'] for info in client.global_cache_info()]
+
+
+def print_skew(before, after):
+    """Prints the fetches each node served during the run and how far the busiest
+    node is above the mean.
+    """
+    served = [end - start for start, end in zip(before, after)]
+    mean = sum(served) / len(served)
+    print("Fetches Per Node: ", served)
+    print("Fetch Skew (max/mean): ", max(served) / mean if mean > 0 else 1.0)
+
 if __name__ == "__main__":
 
     """Argument Parsing"""
@@ -31,14 +55,53 @@ if __name__ == "__main__":
                 type="string",
                 dest="url",
                 help="Node URL for sending HTTP requests.")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt. Sends each key directly to the node that owns it.")
+    parser.add_option("--scalable",
+                action="store_true",
+                default=False,
+                dest="scalable",
+                help="Cache cluster runs in scalable mode.")
+    parser.add_option("-n",
+                type="int",
+                default=NUM_REQUESTS,
+                dest="num_requests",
+                help="Number of requests after the initial stores.")
+    parser.add_option("--initial",
+                type="int",
+                default=NUM_INITIAL_STORE,
+                dest="num_initial_store",
+                help="Number of values stored before the requests.")
+    parser.add_option("--batch",
+                type="int",
+                default=0,
+                dest="batch",
+                help="Sends requests in get_many/set_many batches of this size.")
+    parser.add_option("--report",
+                type="int",
+                default=0,
+                dest="report",
+                help="Prints the throughput of every this many requests.")
+    parser.add_option("--replicas",
+                type="int",
+                default=1,
+                dest="replicas",
+                help="Replication factor the nodes were started with (-r), spreads reads over replicas.")
     (options, args) = parser.parse_args()
 
+    NUM_INITIAL_STORE, NUM_REQUESTS = options.num_initial_store, options.num_requests
+
+    client = CacheCowClient(load_node_list(options.nodes) if options.nodes else [options.url],
+                            scalable=options.scalable, replicas=options.replicas)
+
     """Fetch and Store"""
     def fetch(data):
         key, version = str(data), 1 # Unused version
         try:
-            fetched_data = requests.get(url=f'http://{options.url}/v1/blobs/{key}/{version}', timeout=FETCH_TIMEOUT)
-            value = float(fetched_data.content.decode('ascii'))
+            fetched_data = client.fetch(key, version, timeout=FETCH_TIMEOUT)
+            value = float(fetched_data.decode('ascii'))
             return value == f(key)
         except:
             return False
@@ -47,13 +110,41 @@ if __name__ == "__main__":
         key, version = str(data), 1 # Unused version
         value = f(key)
         try:
-            requests.post(url=f'http://{options.url}/v1/blobs/{key}/{version}',
-                      data = str(value).encode('ascii'), timeout=STORE_TIMEOUT)
+            client.store(key, version, str(value), timeout=STORE_TIMEOUT)
             return True
-        except:
+        except CacheCowError:
             print("Store Timed Out: ", data)
             return False
 
+    def fetch_batch(batch):
+        """Fetches a batch of keys, returning whether each was a hit.
+        """
+        try:
+            values = client.get_many([(str(data), 1) for data in batch], timeout=FETCH_TIMEOUT)
+        except CacheCowError:
+            return [False] * len(batch)
+        return [value is not None and float(value.decode('ascii')) == f(str(data))
+                for data, value in zip(batch, values)]
+
+    def store_batch(batch):
+        """Stores a batch of keys, returning the number stored.
+        """
+        if len(batch) == 0:
+            return 0
+        try:
+            client.set_many([(str(data), 1, str(f(str(data)))) for data in batch], timeout=STORE_TIMEOUT)
+            return len(batch)
+        except CacheCowError:
+            print("Batch Store Timed Out: ", len(batch))
+            return 0
+
+    def report(done, interval_start):
+        """Prints the throughput since the last report.
+        """
+        elapsed = time.perf_counter() - interval_start
+        print(f"Requests: {done}, Throughput: {options.report / elapsed:.1f} req/s")
+        return time.perf_counter()
+
 
     """Initialize Test"""
     np.random.seed(seed=0)
@@ -86,28 +177,52 @@ if __name__ == "__main__":
     # print("Domain: ", len(set(request_data)), ". Total Data: ", NUM_REQUESTS)
 
     """Run Tests"""
+    counts_before = fetch_counts(client)
+
     # Start time
     start_time = time.perf_counter()
 
-    # Store NUM_INITIAL_STORE values
-    for data in initial_store_data:
-        store_success += store(data)
-
-    # Fetch and store NUM_REQUESTS values. Number is dependent on FETCH_PROPORTION.
-    for request_type, data in zip(request_types, request_data):
-        if request_type == 0:
+    interval_start = start_time
+    if options.batch > 0:
+        # Store NUM_INITIAL_STORE values
+        for i in range(0, NUM_INITIAL_STORE, options.batch):
+            store_success += store_batch(initial_store_data[i:i + options.batch])
+
+        # Within a batch, fetches are sent before the stores and cache-aside refills
+        for i in range(0, NUM_REQUESTS, options.batch):
+            batch_types = request_types[i:i + options.batch]
+            batch_data = request_data[i:i + options.batch]
+            fetch_data = batch_data[batch_types == 1]
+            hits = fetch_batch(fetch_data)
+            fetch_hits += sum(hits)
+            misses = [data for data, hit in zip(fetch_data, hits) if not hit]
+            store_total += len(misses)
+            store_success += store_batch(list(batch_data[batch_types == 0]) + misses)
+            if options.report > 0 and (i + options.batch) // options.report > i // options.report:
+                interval_start = report(min(i + options.batch, NUM_REQUESTS), interval_start)
+    else:
+        # Store NUM_INITIAL_STORE values
+        for data in initial_store_data:
             store_success += store(data)
-        else:
-            if fetch(data):
-                fetch_hits += 1
+
+        # Fetch and store NUM_REQUESTS values. Number is dependent on FETCH_PROPORTION.
+        for i, (request_type, data) in enumerate(zip(request_types, request_data)):
+            if request_type == 0:
+                store_success += store(data)
             else:
-                store_success += store(data) # Cache-aside
-                store_total += 1
+                if fetch(data):
+                    fetch_hits += 1
+                else:
+                    store_success += store(data) # Cache-aside
+                    store_total += 1
+            if options.report > 0 and (i + 1) % options.report == 0:
+                interval_start = report(i + 1, interval_start)
 
     # End time
     print("Time: ", time.perf_counter() - start_time)
-    print("Fetch Hit Rate: ", fetch_hits / fetch_total)
+    print("Fetch Hit Rate: ", fetch_hits / fetch_total if fetch_total > 0 else 0.0)
     print("Store Success Rate: ", store_success / store_total if store_total > 0 else 1.0)
+    print_skew(counts_before, fetch_counts(client))
 
     # stored_data = list(initial_store_data) + [data for index, data in enumerate(request_data) if request_types[index] == 0]
     # fetched_data = [data for index, data in enumerate(request_data) if request_types[index] == 1]
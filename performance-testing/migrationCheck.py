@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Checks that scaling out does not lose keys. The cluster is filled with --keys keys,
+# a node is added, and once the migration has finished every key whose owner changed is
+# fetched from the new node. Keys that stayed put are spot checked on their old owners.
+# Loading millions of keys makes 32-bit hash collisions likely, and the number of keys
+# that share a hash value is printed so a run can confirm it covered them. Start the
+# cluster with "-s" and a byte budget (-m) large enough that no key is evicted.
+
+from collections import Counter
+from optparse import OptionParser
+import random
+
+from cachecow import CacheCowClient, CacheCowError, ConsistentKeyDistributor, load_node_list
+from cachecow.hashing import murmurhash3_x86_32
+from scaleOut import wait_for_migration
+
+
+def key_name(i):
+    return f'migrate-{i}'
+
+
+def value_for(i, value_size):
+    """Returns a value that identifies its key, padded to value_size bytes.
+    """
+    return str(i).encode().ljust(value_size, b'.')
+
+
+def fill(client, num_keys, value_size, batch_size):
+    for start in range(0, num_keys, batch_size):
+        end = min(start + batch_size, num_keys)
+        client.set_many([(key_name(i), 1, value_for(i, value_size)) for i in range(start, end)])
+
+
+def count_colliding_keys(num_keys):
+    """Returns the number of keys whose hash value is shared with another key.
+    """
+    counts = Counter(murmurhash3_x86_32(key_name(i).encode('utf-8')) for i in range(num_keys))
+    return sum(count for count in counts.values() if count > 1)
+
+
+def moved_keys(num_keys, node_count):
+    """Returns the ids of the keys that the new node takes over.
+    """
+    ring = ConsistentKeyDistributor(node_count)
+    before = [ring.get_primary_node(key_name(i)) for i in range(num_keys)]
+    ring.add_node()
+    return [i for i in range(num_keys) if ring.get_primary_node(key_name(i)) != before[i]]
+
+
+def find_missing(client, ids, value_size):
+    """Fetches the keys in batches, returning the ids of keys that are missing or
+    have the wrong value.
+    """
+    missing = []
+    for start in range(0, len(ids), client.batch_size):
+        batch = ids[start:start + client.batch_size]
+        values = client.get_many([(key_name(i), 1) for i in batch])
+        missing.extend(i for i, value in zip(batch, values) if value != value_for(i, value_size))
+    return missing
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="migrationCheck.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a scalable cluster.")
+    parser.add_option("--keys",
+                type="int",
+                default=2000000,
+                dest="num_keys",
+                help="Number of keys stored before scaling.")
+    parser.add_option("--size",
+                type="int",
+                default=16,
+                dest="value_size",
+                help="Size of each value in bytes.")
+    parser.add_option("--batch",
+                type="int",
+                default=1000,
+                dest="batch_size",
+                help="Number of values per set_many request while filling.")
+    parser.add_option("--sample",
+                type="int",
+                default=10000,
+                dest="sample",
+                help="Number of keys that did not move to spot check.")
+    parser.add_option("--timeout",
+                type="float",
+                default=1800.0,
+                dest="timeout",
+                help="Seconds to wait for the migration to finish.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for scaling tests.")
+
+    nodes = load_node_list(options.nodes)
+    moved = moved_keys(options.num_keys, len(nodes))
+    moved_set = set(moved)
+    stayed = [i for i in range(options.num_keys) if i not in moved_set]
+    stayed = random.Random(0).sample(stayed, min(options.sample, len(stayed)))
+    print(f'{count_colliding_keys(options.num_keys)} of {options.num_keys} keys share a hash value, '
+          f'{len(moved)} keys move to the new node')
+
+    with CacheCowClient(nodes, scalable=True, batch_size=options.batch_size) as client:
+        fill(client, options.num_keys, options.value_size, options.batch_size)
+        client.node_clients[0].launch_node()
+        wait_for_migration(client.node_clients[0], len(nodes), 5.0, options.timeout)
+
+        new_node = client.node_clients[0].global_cache_info()[-1]['hostName']
+        client.add_node(new_node)
+        missing_moved = find_missing(client, moved, options.value_size)
+        missing_stayed = find_missing(client, stayed, options.value_size)
+
+    print(f'{len(missing_moved)} of {len(moved)} moved keys missing from {new_node}')
+    print(f'{len(missing_stayed)} of {len(stayed)} sampled keys missing from their old owner')
+    if missing_moved or missing_stayed:
+        examples = [key_name(i) for i in (missing_moved + missing_stayed)[:10]]
+        raise CacheCowError(f'Keys lost during scaling, e.g. {examples}')
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Measures how forwarded traffic affects local hits. Background workers keep
+# a growing number of forwarded fetches in flight against one entry node while
+# a prober times fetches of keys that node owns. If forwarding never holds a
+# server thread, local-hit latency stays flat as the remote load grows.
+
+import asyncio
+from optparse import OptionParser
+import time
+
+from cachecow import CacheCowClient, load_node_list
+from cachecow.aio import AsyncNodeClient
+from forwardingLatency import pick_keys, summarize, PERCENTILES
+
+
+async def probe_local_hits(node_client, keys):
+    """Fetches each local key in turn and returns the latencies in milliseconds.
+    """
+    latencies = []
+    for key in keys:
+        start_time = time.perf_counter()
+        await node_client.fetch(key, 1)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies
+
+
+async def remote_load(node_client, keys, stop, counter):
+    """Fetches forwarded keys back to back until stop is set.
+    """
+    i = 0
+    while not stop.is_set():
+        await node_client.fetch(keys[i % len(keys)], 1)
+        counter[0] += 1
+        i += 1
+
+
+async def run_stage(entry_url, local_keys, remote_keys, remote_concurrency):
+    """Times local hits while remote_concurrency forwarded fetches are in flight.
+    Returns the local-hit percentiles and the forwarded requests per second.
+    """
+    prober = AsyncNodeClient(entry_url, pool_size=1)
+    loader = AsyncNodeClient(entry_url, pool_size=max(1, remote_concurrency))
+    stop = asyncio.Event()
+    counter = [0]
+    workers = [asyncio.create_task(remote_load(loader, remote_keys, stop, counter))
+               for _ in range(remote_concurrency)]
+    try:
+        # Let the remote load ramp up before probing
+        await asyncio.sleep(0.5 if remote_concurrency else 0)
+        start_time = time.perf_counter()
+        start_count = counter[0]
+        latencies = await probe_local_hits(prober, local_keys)
+        elapsed = time.perf_counter() - start_time
+        # Only count forwarded requests that completed while probing
+        forwarded = counter[0] - start_count
+    finally:
+        stop.set()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await prober.close()
+        await loader.close()
+    return summarize(latencies), forwarded / elapsed
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="mixedLoad.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a cluster with at least two nodes.")
+    parser.add_option("--scalable",
+                action="store_true",
+                default=False,
+                dest="scalable",
+                help="Cache cluster runs in scalable mode.")
+    parser.add_option("--entry",
+                type="int",
+                default=0,
+                dest="entry_node",
+                help="Id of the node that every request is sent to.")
+    parser.add_option("-n",
+                type="int",
+                default=500,
+                dest="num_keys",
+                help="Number of local hits timed per stage.")
+    parser.add_option("--levels",
+                type="string",
+                default="0,16,64,256",
+                dest="levels",
+                help="Comma separated numbers of forwarded requests in flight.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for mixed load tests.")
+
+    nodes = load_node_list(options.nodes)
+    if len(nodes) < 2:
+        raise Exception("Forwarding needs a cluster with at least two nodes.")
+
+    with CacheCowClient(nodes, scalable=options.scalable) as client:
+        local_keys, remote_keys = pick_keys(client, options.entry_node, options.num_keys)
+
+        # Store every key on its owner so all fetches are hits
+        client.set_many([(key, 1, b'x' * 100) for key in local_keys + remote_keys])
+
+        print(f'{"remote in flight":<18}' + ''.join(f'{f"local p{p} (ms)":>16}' for p in PERCENTILES)
+              + f'{"remote req/s":>14}')
+        for level in [int(level) for level in options.levels.split(',')]:
+            percentiles, remote_rate = asyncio.run(
+                run_stage(nodes[options.entry_node], local_keys, remote_keys, level))
+            print(f'{level:<18}' + ''.join(f'{percentiles[f"p{p}"]:>16.3f}' for p in PERCENTILES)
+                  + f'{remote_rate:>14.1f}')
+
+        client.clear()
@@ -2,11 +2,14 @@
 # performance tests are metrics to analyze the performance of different
 # distributed memory cache implementations.
 
-import requests
 import time
 
+from cachecow import CacheCowError, get_client
 from perfDatasets import *
 
+# Default cache capacity in bytes assumed by the eviction tests, see --cap
+DEFAULT_CAPACITY = 10000000
+
 class PerfTest:
     """Provides static performance test functions.
 
@@ -16,12 +19,15 @@ class PerfTest:
     run core functions in parallel to speed up execution.
     """
 
-    def load_test(test_name):
+    def find_test(test_name):
         """Loads test function from test name.
         """
         test_name_to_test = {
             "store_and_fetch_test" : PerfTest.store_and_fetch_test,
-
+            "load_test" : PerfTest.load_test,
+            "store_duplicate_key_test" : PerfTest.store_duplicate_key_test,
+            "eviction_test" : PerfTest.eviction_test,
+            "memory_overflow_test" : PerfTest.memory_overflow_test,
         }
         if test_name in test_name_to_test:
             return test_name_to_test[test_name]
@@ -36,8 +42,7 @@ class PerfTest:
         start_time = time.perf_counter()
 
         # Store Data
-        requests.post(url=f'http://{node_url}/v1/blobs/{key}/{version}',
-                  data = str(value).encode('ascii'))
+        get_client(node_url).store(key, version, str(value))
 
         # End time
         end_time = time.perf_counter()
@@ -54,20 +59,87 @@ class PerfTest:
         start_time = time.perf_counter()
 
         # Fetch Data
-        fetched_data = requests.get(url=f'http://{node_url}/v1/blobs/{key}/{version}', timeout=1).content
+        fetched_data = get_client(node_url).fetch(key, version, timeout=1)
 
         # End time
         end_time = time.perf_counter()
         total_time = end_time - start_time
 
         # Validate fetch
-        assert fetched_data.decode('ascii') == None, "Unexpected Key: " + fetched_data.decode('ascii')
-        #assert fetched_data.decode('ascii') == str(value)
+        assert fetched_data is not None, "Missing Key: " + str(key)
+        assert fetched_data.decode('ascii') == str(value), "Unexpected Value: " + fetched_data.decode('ascii')
 
         return total_time
 
         # return [start_time, end_time, total_time]
 
+    def fetch_cached_key_test(data):
+        """Fetches a key that may have been evicted, so misses are not errors.
+        """
+        node_url, key, version, value = data.unpack()
+
+        start_time = time.perf_counter()
+        get_client(node_url).fetch(key, version, timeout=1)
+        return time.perf_counter() - start_time
+
+    def store_until_full_test(data):
+        """Stores a key to a cache that may be full. A node that does not evict
+        refuses the store with 409, which is not an error here.
+        """
+        node_url, key, version, value = data.unpack()
+
+        start_time = time.perf_counter()
+        try:
+            get_client(node_url).store(key, version, str(value))
+        except CacheCowError as e:
+            if e.status_code != 409:
+                raise
+        return time.perf_counter() - start_time
+
+    # The following provide asyncio versions of the core test functions. They
+    # are used by the async perfTestFunc and share one AsyncCacheCowClient.
+    async def async_store_key_test(client, data):
+        node_url, key, version, value = data.unpack()
+
+        start_time = time.perf_counter()
+        await client.store(key, version, str(value))
+        return time.perf_counter() - start_time
+
+    async def async_fetch_key_test(client, data):
+        node_url, key, version, value = data.unpack()
+
+        start_time = time.perf_counter()
+        await client.fetch(key, version, timeout=1)
+        return time.perf_counter() - start_time
+
+    async def async_fetch_cached_key_test(client, data):
+        node_url, key, version, value = data.unpack()
+
+        start_time = time.perf_counter()
+        await client.fetch(key, version, timeout=1)
+        return time.perf_counter() - start_time
+
+    async def async_store_until_full_test(client, data):
+        node_url, key, version, value = data.unpack()
+
+        start_time = time.perf_counter()
+        try:
+            await client.store(key, version, str(value))
+        except CacheCowError as e:
+            if e.status_code != 409:
+                raise
+        return time.perf_counter() - start_time
+
+    def async_variant(function):
+        """Returns the asyncio version of a core test function.
+        """
+        return {
+            PerfTest.store_key_test: PerfTest.async_store_key_test,
+            PerfTest.fetch_key_test: PerfTest.async_fetch_key_test,
+            PerfTest.fetch_cached_key_test: PerfTest.async_fetch_cached_key_test,
+            PerfTest.store_until_full_test: PerfTest.async_store_until_full_test,
+        }[function]
+
 
     # The following provide full-scale tests based on our core test functions.
     # The parameter perfTestFunc determines whether the full-scale test should
@@ -80,14 +152,61 @@ class PerfTest:
         total_time = perfTestFunc(PerfTest.store_key_test, store_data)
         return total_time + perfTestFunc(PerfTest.fetch_key_test, store_data)
 
-    def store_duplicate_key_test(url, perfTestFunc):
-        raise Exception("Unimplemened.")
+    def load_test(url, perfTestFunc, num_keys=10000):
+        """Stores then fetches num_keys distinct keys. Large enough to keep
+        thousands of requests in flight with the async perfTestFunc.
+        """
+        store_data = TestDatasets.generate_store_data(url,
+                                                keys=range(num_keys),
+                                                versions=[1] * num_keys,
+                                                values=range(num_keys))
+        total_time = perfTestFunc(PerfTest.store_key_test, store_data)
+        return total_time + perfTestFunc(PerfTest.fetch_key_test, store_data)
 
-    def eviction_test(url, perfTestFunc):
-        raise Exception("Unimplemened.")
+    def store_duplicate_key_test(url, perfTestFunc, num_keys=100, repeats=10):
+        """Stores the same key-version pairs repeatedly, then fetches them. A
+        pair stored again with the same value is accepted, so every round must
+        succeed.
+        """
+        store_data = TestDatasets.generate_store_data(url,
+                                                keys=list(range(num_keys)) * repeats,
+                                                versions=[1] * (num_keys * repeats),
+                                                values=list(range(num_keys)) * repeats)
+        total_time = perfTestFunc(PerfTest.store_key_test, store_data)
+        return total_time + perfTestFunc(PerfTest.fetch_key_test, store_data[:num_keys])
 
-    def memory_overflow_test(url, perfTestFunc, max_capacity):
-        raise Exception("Unimplemened.")
+    def eviction_test(url, perfTestFunc, max_capacity=DEFAULT_CAPACITY, value_size=1000):
+        """Stores twice max_capacity bytes of values, then fetches every key. An
+        evicting node drops the earliest keys to make room, while a node that does
+        not evict refuses the stores that do not fit. Prints how many keys are left.
+        """
+        num_keys = 2 * max_capacity // value_size
+        store_data = TestDatasets.generate_store_data(url,
+                                                keys=range(num_keys),
+                                                versions=[1] * num_keys,
+                                                values=['x' * value_size] * num_keys)
+        total_time = perfTestFunc(PerfTest.store_until_full_test, store_data)
+        total_time += perfTestFunc(PerfTest.fetch_cached_key_test, store_data)
+
+        cached = sum(value is not None for value in
+                     get_client(url).get_many([(key, 1) for key in range(num_keys)]))
+        print(f"Eviction test: {cached} of {num_keys} keys still cached")
+        return total_time
+
+    def memory_overflow_test(url, perfTestFunc, max_capacity=DEFAULT_CAPACITY, value_size=100000):
+        """Keeps storing large values until four times max_capacity bytes were
+        sent. The node must evict or refuse them rather than run out of memory, and
+        still answer afterwards.
+        """
+        num_keys = 4 * max_capacity // value_size
+        store_data = TestDatasets.generate_store_data(url,
+                                                keys=range(num_keys),
+                                                versions=[1] * num_keys,
+                                                values=['x' * value_size] * num_keys)
+        total_time = perfTestFunc(PerfTest.store_until_full_test, store_data)
+
+        assert get_client(url).node_clients[0].hello_world(), "Node stopped answering after overflowing its memory"
+        return total_time
 
     def sorting_test(url, perfTestFunc):
         raise Exception("Unimplemened.")
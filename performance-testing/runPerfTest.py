@@ -3,18 +3,21 @@
 # memory cache. It provides a standardized way to measure the performance of
 # different implementations.
 
-from functools import reduce
-import json
+import asyncio
+from functools import partial, reduce
+import inspect
 import matplotlib.pyplot as plt
 from matplotlib import collections
 from multiprocessing import Pool
 from optparse import OptionParser
 import pandas as pd
 import pylab as pl
-import requests
 import seaborn as sns
 from statistics import mean
 
+from cachecow import CacheCowError, get_client, parse_latencies
+from cachecow.latency import PERCENTILES, merge_by_prefix
+from cachecow.aio import AsyncCacheCowClient, bounded_map
 from floydWarshall import *
 from perfTests import *
 
@@ -49,6 +52,30 @@ def parallelPerfTest(function, data, reduction=lambda a, b: a + b):
     #
     # return total_time
 
+def asyncPerfTest(function, data, reduction=lambda a, b: a + b, concurrency=1000):
+    """Runs the asyncio version of function over data from a single process,
+    keeping up to concurrency requests in flight.
+    """
+    async_function = PerfTest.async_variant(function)
+
+    async def run():
+        clients = {}
+        for node_url in {d.node_url for d in data}:
+            clients[node_url] = AsyncCacheCowClient([node_url], max_in_flight=concurrency,
+                                                    pool_size=concurrency)
+        try:
+            return await bounded_map(lambda d: async_function(clients[d.node_url], d),
+                                     data, concurrency)
+        finally:
+            for client in clients.values():
+                await client.close()
+
+    results = asyncio.run(run())
+    times = [result for result in results if not isinstance(result, CacheCowError)]
+    if len(times) < len(results):
+        print(f"{len(results) - len(times)} of {len(results)} requests failed")
+    return reduce(reduction, times) if times else 0
+
 def plot_time_intervals(times, isParallel):
     """Plots time intervals
     """
@@ -77,19 +104,32 @@ def overlap(times):
 
 
 def get_backend_timing(node_url):
-    """Fetches request timing data from the backend.
+    """Fetches the latency histograms of the client requests served by the whole
+    cluster, single key and bulk requests together, as (store, fetch) histograms.
+    """
+    latencies = parse_latencies(get_client(node_url).global_latency_info())
+    store_histogram = merge_by_prefix(latencies, 'store.client').merge(merge_by_prefix(latencies, 'mset.client'))
+    fetch_histogram = merge_by_prefix(latencies, 'fetch.client').merge(merge_by_prefix(latencies, 'mget.client'))
+    return store_histogram, fetch_histogram
+
+def plot_backend_percentiles(percentile_data):
+    """Plots the backend p50/p99/p99.9 latency of stores and fetches per trial.
     """
-    fetched_data = json.loads(requests.get(url=f'http://{node_url}/v1/node-info').content)
-    request_timing = fetched_data['clientRequestTiming']
-    store_timing = request_timing['storeTiming']
-    fetch_timing = request_timing['fetchTiming']
-    return store_timing, fetch_timing
+    fig, ax = pl.subplots()
+    for name, values in percentile_data.items():
+        plt.plot(range(len(values)), values, marker='o', label=name)
+    plt.yscale('log')
+    plt.xlabel("Trials")
+    plt.ylabel("Backend Latency (in ms)")
+    plt.title("Backend Latency Percentiles per Trial")
+    plt.legend()
 
 def runPerfTest(options):
     # Initialize timing for multiple trials
     timing_data = {}
     if options.time_backend:
         timing_data["Backend Times"] = []
+        percentile_data = {f"{op} p{p}": [] for op in ("store", "fetch") for p in PERCENTILES}
     if options.time_client:
         timing_data["Client Times"] = []
     if options.time_script:
@@ -107,18 +147,23 @@ def runPerfTest(options):
         perfTestFunc = serialPerfTest
         if options.parallel:
             perfTestFunc = parallelPerfTest
+        if options.use_async:
+            perfTestFunc = partial(asyncPerfTest, concurrency=options.concurrency)
         client_time = options.test(options.url, perfTestFunc=perfTestFunc)
 
         # Clear cache
-        requests.delete(url=f'http://{options.url}/v1/clear')
+        get_client(options.url).clear()
 
         # Print Performance Time Metrics
         if options.time_backend:
             store_end_timing, fetch_end_timing = get_backend_timing(options.url)
-            store_timing = store_end_timing - store_start_timing
-            fetch_timing = fetch_end_timing - fetch_start_timing
-            total_request_time = store_timing + fetch_timing
+            store_timing = store_end_timing.subtract(store_start_timing)
+            fetch_timing = fetch_end_timing.subtract(fetch_start_timing)
+            total_request_time = (store_timing.total_nanos + fetch_timing.total_nanos) / 1e9
             timing_data["Backend Times"].append(total_request_time)
+            for op, histogram in (("store", store_timing), ("fetch", fetch_timing)):
+                for p in PERCENTILES:
+                    percentile_data[f"{op} p{p}"].append(histogram.percentile(p) / 1e6)
         if options.time_client:
             timing_data["Client Times"].append(client_time)
         if options.time_script:
@@ -129,12 +174,15 @@ def runPerfTest(options):
     # Print average timing
     if options.time_backend:
         print("Average Backend Timing: ", mean(timing_data["Backend Times"]))
+        for name, values in percentile_data.items():
+            print(f"Backend {name} (ms): ", values[-1])
     if options.time_client:
         print("Average Client Timing: ", mean(timing_data["Client Times"]))
     if options.time_script:
         print("Average Performance Script Timing: ", mean(timing_data["Script Times"]))
 
-    timing_df["HTTP Times"] = timing_df["Client Times"] - timing_df["Backend Times"]
+    if options.time_backend and options.time_client:
+        timing_df["HTTP Times"] = timing_df["Client Times"] - timing_df["Backend Times"]
 
     # Graph
     if options.graph:
@@ -142,11 +190,15 @@ def runPerfTest(options):
         sns.lineplot(data=timing_df, markers=True)
         plt.xlabel("Trials")
         plt.ylabel("Time (in seconds)")
-        if options.parallel:
+        if options.use_async:
+            plt.title("Timing per Trial (Async)")
+        elif options.parallel:
             plt.title("Timing per Trial (in Parallel)")
         else:
             plt.title("Timing per Trial (in Serial)")
         # ax.xaxis.get_major_locator().set_params(integer=True)
+        if options.time_backend:
+            plot_backend_percentiles(percentile_data)
         plt.show()
 
 
@@ -184,10 +236,21 @@ if __name__ == "__main__":
                 dest="parallel",
                 help="Run Performance Tests in Parallel. " +
                 "By default, performance tests run in serial.")
+    parser.add_option("-a", "--async",
+                action = "store_true",
+                default=False,
+                dest="use_async",
+                help="Run Performance Tests with the asyncio client from a " +
+                "single process. Takes precedence over --parallel.")
+    parser.add_option("--concurrency",
+                type="int",
+                default=1000,
+                dest="concurrency",
+                help="Maximum number of requests in flight in async mode.")
     parser.add_option("--cap",
                 type="int",
                 dest="max_capacity",
-                help="Maximum cache capacity.")
+                help="Cache capacity in bytes assumed by eviction_test and memory_overflow_test.")
     parser.add_option("--trials",
                 type="int",
                 default=3,
@@ -207,6 +270,8 @@ if __name__ == "__main__":
     if not options.time_backend and not options.time_script:
         options.time_client = True
     print("Performing Test: ", options.test_name)
-    options.test = PerfTest.load_test(options.test_name)
+    options.test = PerfTest.find_test(options.test_name)
+    if options.max_capacity and "max_capacity" in inspect.signature(options.test).parameters:
+        options.test = partial(options.test, max_capacity=options.max_capacity)
 
     runPerfTest(options)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# Measures how fast a scalable cluster moves keys to a new node. The cluster is first
+# filled with --keys values of --size bytes, then node 0 is asked to launch a node and
+# the migrationInfo reported by /v1/global-cache-info is polled until every node has
+# finished copying. Each poll prints the MB/s sent by every node and received by the
+# new one. Start the cluster with "-s" for this to work.
+
+import json
+from optparse import OptionParser
+import time
+
+from cachecow import CacheCowClient, CacheCowError, load_node_list
+
+
+def fill(client, num_keys, value_size, batch_size):
+    """Stores num_keys values of value_size bytes in batches.
+    """
+    value = b'x' * value_size
+    for start in range(0, num_keys, batch_size):
+        client.set_many([(f'scale-{i}', 1, value) for i in range(start, min(start + batch_size, num_keys))])
+
+
+def migration_summary(node_info):
+    """Returns the migration totals of one node, with sizes in MB.
+    """
+    migration = node_info.get('migrationInfo') or {}
+    summary = {'nodeId': node_info['nodeId']}
+    for direction in ('sent', 'received'):
+        transfer = migration.get(direction) or {}
+        summary[direction] = {
+            'inProgress': transfer.get('inProgress', False),
+            'mb': transfer.get('bytes', 0) / (1 << 20),
+            'pairs': transfer.get('pairs', 0),
+            'seconds': transfer.get('seconds', 0.0),
+            'throughputMBps': transfer.get('throughputMBps', 0.0),
+        }
+    summary['batchKB'] = migration.get('batchBytes', 0) / 1024
+    return summary
+
+
+def print_summaries(elapsed, summaries):
+    print(f'After {elapsed:.1f}s')
+    print(f'{"node":>6}{"sent MB":>10}{"sent MB/s":>12}{"recv MB":>10}{"recv MB/s":>12}{"batch KB":>10}')
+    for summary in summaries:
+        sent, received = summary['sent'], summary['received']
+        print(f'{summary["nodeId"]:>6}{sent["mb"]:>10.1f}{sent["throughputMBps"]:>12.2f}'
+              f'{received["mb"]:>10.1f}{received["throughputMBps"]:>12.2f}{summary["batchKB"]:>10.0f}')
+
+
+def wait_for_migration(entry_node, node_count, interval, timeout):
+    """Polls the cluster until a node has been added and no node is copying, returning
+    the final migration totals of every node.
+    """
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < timeout:
+        time.sleep(interval)
+        try:
+            infos = entry_node.global_cache_info()
+        except CacheCowError:
+            # Nodes can be briefly unreachable while the new node boots
+            continue
+        summaries = [migration_summary(info) for info in infos]
+        print_summaries(time.perf_counter() - start_time, summaries)
+        new_node = summaries[-1]
+        if len(summaries) > node_count and new_node['received']['pairs'] > 0 \
+                and not any(s['sent']['inProgress'] or s['received']['inProgress'] for s in summaries):
+            return summaries
+    raise CacheCowError(f'Migration did not finish within {timeout}s')
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="scaleOut.py --nodes nodes.txt [options]")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt of a scalable cluster.")
+    parser.add_option("--keys",
+                type="int",
+                default=100000,
+                dest="num_keys",
+                help="Number of keys stored before scaling.")
+    parser.add_option("--size",
+                type="int",
+                default=10 << 10,
+                dest="value_size",
+                help="Size of each value in bytes.")
+    parser.add_option("--batch",
+                type="int",
+                default=200,
+                dest="batch_size",
+                help="Number of values per set_many request while filling.")
+    parser.add_option("--interval",
+                type="float",
+                default=1.0,
+                dest="interval",
+                help="Seconds between polls of the migration progress.")
+    parser.add_option("--timeout",
+                type="float",
+                default=600.0,
+                dest="timeout",
+                help="Seconds to wait for the migration to finish.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the final migration totals as JSON.")
+    (options, args) = parser.parse_args()
+
+    if not options.nodes:
+        raise Exception("Path to nodes.txt is necessary for scaling tests.")
+
+    nodes = load_node_list(options.nodes)
+    with CacheCowClient(nodes, scalable=True) as client:
+        fill(client, options.num_keys, options.value_size, options.batch_size)
+        print(f'Stored {options.num_keys * options.value_size / (1 << 20):.1f} MB on {len(nodes)} nodes')
+
+        client.node_clients[0].launch_node()
+        summaries = wait_for_migration(client.node_clients[0], len(nodes), options.interval, options.timeout)
+
+    received = summaries[-1]['received']
+    print(f'Moved {received["mb"]:.1f} MB ({received["pairs"]} pairs) in {received["seconds"]:.1f}s, '
+          f'{received["throughputMBps"]:.2f} MB/s')
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(summaries, output_file, indent=2)
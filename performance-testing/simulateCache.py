@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# Offline cache simulator. Replays a key trace through models of the local cache
+# engines and prints their miss ratio at several capacities, without a cluster. Every
+# request is a cache-aside fetch: a miss stores the key. Capacities count entries, so
+# divide a node's byte budget (-m) by the accounted size of an entry (key and value
+# bytes plus 96) to compare against a live run.
+#
+# Policies:
+#   lru: least recently used, computed for every capacity at once from stack distances
+#   multitable: MultiTableCacheMonitor, tables that are cleared in turn when full
+#   tinylfu: WTinyLfuCache, a window LRU in front of a frequency filtered segmented LRU
+#   belady: the optimal policy, evicting the key that is next used furthest in the future
+#
+# Traces are generated like admissionPolicies.py (long-tailed, zipf or scan) or loaded
+# from a file with --file: a .npy array of keys, a text file with one key per line, or
+# comma separated .trace files saved by captureTrace.py, whose client fetches are
+# replayed.
+
+import json
+from collections import OrderedDict
+from heapq import heappop, heappush
+from optparse import OptionParser
+import time
+
+import numpy as np
+
+from admissionPolicies import TRACES, make_trace
+from cachecow import merge_traces, read_trace
+
+POLICIES = ['lru', 'multitable', 'tinylfu', 'belady']
+
+
+def key_ids(keys):
+    """Maps the keys of a trace to ids in [0, number of distinct keys).
+    """
+    _, ids = np.unique(keys, return_inverse=True)
+    return ids.astype(np.int64)
+
+
+def previous_and_next_use(ids):
+    """Returns, for every request, the index of the previous request for the same key
+    (-1 if none) and of the next one (len(ids) if none).
+    """
+    n = len(ids)
+    order = np.argsort(ids, kind='stable')
+    same = ids[order[1:]] == ids[order[:-1]]
+    previous = np.full(n, -1, dtype=np.int64)
+    previous[order[1:][same]] = order[:-1][same]
+    following = np.full(n, n, dtype=np.int64)
+    following[order[:-1][same]] = order[1:][same]
+    return previous, following
+
+
+def lru_miss_ratios(ids, capacities):
+    """Returns the LRU miss ratio at each capacity. A request hits in an LRU cache of
+    capacity C iff fewer than C distinct keys were requested since the previous request
+    for its key, so one pass computing these stack distances serves every capacity.
+    """
+    previous, _ = previous_and_next_use(ids)
+    n = len(ids)
+    # Fenwick tree marking the latest request of each key seen so far
+    tree = [0] * (n + 1)
+    distances = np.full(n, n, dtype=np.int64)
+    distinct = 0
+    for i, p in enumerate(previous.tolist()):
+        if p >= 0:
+            # Marks at or before p belong to keys not requested since
+            before, j = 0, p + 1
+            while j > 0:
+                before += tree[j]
+                j -= j & -j
+            distances[i] = distinct - before
+            j = p + 1
+            while j <= n:
+                tree[j] -= 1
+                j += j & -j
+        else:
+            distinct += 1
+        j = i + 1
+        while j <= n:
+            tree[j] += 1
+            j += j & -j
+    distances.sort()
+    hits = np.searchsorted(distances, np.asarray(capacities), side='left')
+    return 1.0 - hits / n
+
+
+def multitable_misses(ids, capacity, num_tables=3):
+    """Counts the misses of MultiTableCacheMonitor, whose byte budget is split evenly
+    between its tables. A fetch searches from the hottest table and copies a hit into
+    the next hotter table with room. A store goes to the coldest table, and a full table
+    is cleared and becomes the hottest.
+    """
+    table_capacity = max(1, capacity // num_tables)
+    tables = [set() for _ in range(num_tables)]
+    base = 0
+    misses = 0
+    for key in ids.tolist():
+        found = False
+        for query_offset in range(num_tables):
+            if key not in tables[(base + num_tables - query_offset - 1) % num_tables]:
+                continue
+            found = True
+            for promote_offset in range(query_offset - 1, -1, -1):
+                table = tables[(base + num_tables - promote_offset - 1) % num_tables]
+                if key in table:
+                    break
+                if len(table) < table_capacity:
+                    table.add(key)
+                    break
+            break
+        if found:
+            continue
+
+        misses += 1
+        store_base = base
+        for offset in range(num_tables):
+            table = tables[(store_base + offset) % num_tables]
+            if key in table:
+                break
+            if len(table) < table_capacity:
+                table.add(key)
+                break
+            tables[base].clear()
+            base = (base + 1) % num_tables
+    return misses
+
+
+def tinylfu_misses(ids, capacity, window_percent=1):
+    """Counts the misses of WTinyLfuCache. Keys leaving the window replace the least
+    recently used probation key only if the sketch estimates they were requested more
+    often. Like the engine, the sketch is incremented by both the fetch and the store
+    of a miss.
+    """
+    window_capacity = max(1, capacity * window_percent // 100)
+    main_capacity = capacity - window_capacity
+    protected_capacity = main_capacity * 4 // 5
+
+    # Four rows of 4-bit counters, indexed by multiplicative hashes of the key ids
+    width = 1 << max(4, (capacity - 1).bit_length())
+    sample_size = 10 * width
+    unique = np.arange(int(ids.max()) + 1, dtype=np.uint64)
+    indexes = []
+    for seed in (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93):
+        hashed = (unique + np.uint64(1)) * np.uint64(seed)
+        indexes.append(((hashed >> np.uint64(40)) & np.uint64(width - 1)).astype(np.int64).tolist())
+    rows = [bytearray(width) for _ in indexes]
+    additions = 0
+
+    def increment(key):
+        nonlocal additions
+        added = False
+        for row, index in zip(rows, indexes):
+            if row[index[key]] < 15:
+                row[index[key]] += 1
+                added = True
+        if added:
+            additions += 1
+            if additions >= sample_size:
+                for row in rows:
+                    row[:] = (np.frombuffer(row, dtype=np.uint8) >> 1).tobytes()
+                additions //= 2
+
+    def frequency(key):
+        return min(row[index[key]] for row, index in zip(rows, indexes))
+
+    window, probation, protected = OrderedDict(), OrderedDict(), OrderedDict()
+
+    def evict_from_main(candidate):
+        while len(probation) + len(protected) > main_capacity:
+            victim = next(iter(probation), None)
+            if victim == candidate:
+                victim = next(iter(protected), None)
+            if victim is None or (candidate is not None and frequency(candidate) <= frequency(victim)):
+                if candidate is None:
+                    return
+                del probation[candidate]
+                candidate = None
+            elif victim in probation:
+                del probation[victim]
+            else:
+                del protected[victim]
+
+    misses = 0
+    for key in ids.tolist():
+        increment(key)
+        if key in window:
+            window.move_to_end(key)
+            continue
+        if key in protected:
+            protected.move_to_end(key)
+            continue
+        if key in probation:
+            del probation[key]
+            protected[key] = None
+            if len(protected) > protected_capacity:
+                probation[protected.popitem(last=False)[0]] = None
+            continue
+
+        misses += 1
+        increment(key)
+        window[key] = None
+        while len(window) > window_capacity:
+            candidate = window.popitem(last=False)[0]
+            probation[candidate] = None
+            evict_from_main(candidate)
+    return misses
+
+
+def belady_misses(ids, capacity):
+    """Counts the misses of Belady's optimal policy, which evicts the cached key whose
+    next request is furthest away and does not cache a key requested later than that.
+    """
+    _, following = previous_and_next_use(ids)
+    never = len(ids)
+    cached = {} # key -> index of its next request
+    heap = [] # (-index of next request, key), with stale entries skipped lazily
+    misses = 0
+    for key, next_use in zip(ids.tolist(), following.tolist()):
+        if key in cached:
+            cached[key] = next_use
+            heappush(heap, (-next_use, key))
+            continue
+        misses += 1
+        if next_use == never:
+            continue
+        if len(cached) >= capacity:
+            while cached.get(heap[0][1]) != -heap[0][0]:
+                heappop(heap)
+            if -heap[0][0] <= next_use:
+                continue
+            del cached[heappop(heap)[1]]
+        cached[key] = next_use
+        heappush(heap, (-next_use, key))
+    return misses
+
+
+def miss_ratio_curves(ids, capacities, policies, num_tables=3, window_percent=1):
+    """Returns the miss ratio of each policy at each capacity, along with the seconds
+    each policy took to simulate.
+    """
+    curves, seconds = {}, {}
+    for policy in policies:
+        start_time = time.perf_counter()
+        if policy == 'lru':
+            curves[policy] = lru_miss_ratios(ids, capacities).tolist()
+        elif policy == 'multitable':
+            curves[policy] = [multitable_misses(ids, c, num_tables) / len(ids) for c in capacities]
+        elif policy == 'tinylfu':
+            curves[policy] = [tinylfu_misses(ids, c, window_percent) / len(ids) for c in capacities]
+        elif policy == 'belady':
+            curves[policy] = [belady_misses(ids, c) / len(ids) for c in capacities]
+        seconds[policy] = time.perf_counter() - start_time
+    return curves, seconds
+
+
+def load_trace(path):
+    """Loads the keys of a trace from a .npy file, a text file with one key per line,
+    or the client fetches of comma separated node traces.
+    """
+    if path.endswith('.trace'):
+        trace = merge_traces([read_trace(node_path, node) for node, node_path in enumerate(path.split(','))])
+        # A forwarded fetch is recorded by both the entry node and the owner, keep one
+        return trace.select((trace.op == 0) & ~trace.forwarded).keys()
+    if path.endswith('.npy'):
+        return np.load(path)
+    with open(path) as trace_file:
+        return np.array(trace_file.read().split())
+
+
+def print_curves(capacities, curves):
+    print(f'{"capacity":>10}' + ''.join(f'{policy:>12}' for policy in curves))
+    for i, capacity in enumerate(capacities):
+        print(f'{capacity:>10}' + ''.join(f'{curve[i]:>12.4f}' for curve in curves.values()))
+
+
+def plot_curves(capacities, curves, path):
+    import matplotlib.pyplot as plt
+
+    for policy, curve in curves.items():
+        plt.plot(capacities, curve, marker='o', label=policy)
+    plt.xscale('log')
+    plt.xlabel('Capacity (entries)')
+    plt.ylabel('Miss Ratio')
+    plt.title('Miss Ratio Curves')
+    plt.legend()
+    plt.savefig(path)
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="simulateCache.py [options]")
+    parser.add_option("--trace",
+                type="string",
+                default='long-tailed',
+                dest="trace",
+                help=f"Generated trace, one of {TRACES}.")
+    parser.add_option("--file",
+                type="string",
+                dest="file",
+                help="Loads the trace from a .npy, text or .trace file instead.")
+    parser.add_option("-n",
+                type="int",
+                default=100000,
+                dest="num_requests",
+                help="Number of requests of a generated trace.")
+    parser.add_option("--alpha",
+                type="float",
+                default=1.2,
+                dest="alpha",
+                help="Exponent of the Zipf distribution.")
+    parser.add_option("--scan-every",
+                type="int",
+                default=5000,
+                dest="scan_every",
+                help="Number of Zipf requests between scans.")
+    parser.add_option("--scan-length",
+                type="int",
+                default=5000,
+                dest="scan_length",
+                help="Number of new keys read by each scan.")
+    parser.add_option("--capacities",
+                type="string",
+                dest="capacities",
+                help="Comma separated capacities in entries, 10 log-spaced sizes by default.")
+    parser.add_option("--policies",
+                type="string",
+                default=','.join(POLICIES),
+                dest="policies",
+                help="Comma separated policies to simulate.")
+    parser.add_option("--tables",
+                type="int",
+                default=3,
+                dest="num_tables",
+                help="Number of tables of the multi-table cache.")
+    parser.add_option("--window",
+                type="int",
+                default=1,
+                dest="window_percent",
+                help="Percent of the TinyLFU capacity given to the window.")
+    parser.add_option("-s",
+                type="int",
+                default=0,
+                dest="seed",
+                help="Seed.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the curves as JSON.")
+    parser.add_option("--plot",
+                type="string",
+                dest="plot",
+                help="Saves a plot of the curves to this image file.")
+    (options, args) = parser.parse_args()
+
+    policies = options.policies.split(',')
+    for policy in policies:
+        if policy not in POLICIES:
+            raise Exception(f"Unknown policy {policy}, expected one of {POLICIES}.")
+
+    if options.file:
+        keys = load_trace(options.file)
+    elif options.trace in TRACES:
+        keys = make_trace(options.trace, options.num_requests, options.alpha,
+                          options.scan_every, options.scan_length, np.random.default_rng(options.seed))
+    else:
+        raise Exception(f"Unknown trace {options.trace}, expected one of {TRACES}.")
+    ids = key_ids(keys)
+    num_keys = int(ids.max()) + 1
+
+    if options.capacities:
+        capacities = [int(c) for c in options.capacities.split(',')]
+    else:
+        capacities = np.unique(np.geomspace(10, max(num_keys, 11), 10).astype(int)).tolist()
+
+    print(f'{len(ids)} requests for {num_keys} keys')
+    curves, seconds = miss_ratio_curves(ids, capacities, policies, options.num_tables, options.window_percent)
+    print_curves(capacities, curves)
+    print('Seconds: ' + ', '.join(f'{policy} {s:.2f}' for policy, s in seconds.items()))
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump({'capacities': capacities, 'curves': curves}, output_file, indent=2)
+    if options.plot:
+        plot_curves(capacities, curves, options.plot)
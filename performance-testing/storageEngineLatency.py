@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Compares the tail latency of the local storage engines. The cache is first filled
+# with values whose sizes are spread log-uniformly between --min-size and --max-size,
+# then fetches and overwrites of random keys are timed. Run it once against nodes
+# started with "-e heap" and once with "-e slab", saving the first run with -o and
+# passing it to the second with --compare.
+
+import json
+from optparse import OptionParser
+import random
+import time
+
+import numpy as np
+
+from cachecow import CacheCowClient, CacheCowError, load_node_list
+
+PERCENTILES = [50, 99, 99.9]
+
+
+def random_size(rng, min_size, max_size):
+    """Returns a value size drawn log-uniformly from [min_size, max_size].
+    """
+    return int(round(np.exp(rng.uniform(np.log(min_size), np.log(max_size)))))
+
+
+def fill(client, fill_bytes, min_size, max_size, batch_size, rng):
+    """Stores values until fill_bytes of them have been sent, returning their keys.
+    """
+    keys, batch, batch_bytes, total = [], [], 0, 0
+    while total < fill_bytes:
+        key = f'engine-{len(keys)}'
+        size = random_size(rng, min_size, max_size)
+        keys.append(key)
+        batch.append((key, 1, b'x' * size))
+        batch_bytes += size
+        total += size
+        if len(batch) >= batch_size or batch_bytes >= 8 << 20:
+            client.set_many(batch)
+            batch, batch_bytes = [], 0
+    if batch:
+        client.set_many(batch)
+    return keys
+
+
+def run(client, keys, num_requests, fetch_ratio, min_size, max_size, rng):
+    """Times fetches and overwrites of random keys, returning the latency percentiles
+    of each along with the number of failed requests.
+    """
+    latencies = {'fetch': [], 'store': []}
+    errors = 0
+    for _ in range(num_requests):
+        key = rng.choice(keys)
+        is_fetch = rng.random() < fetch_ratio
+        value = None if is_fetch else b'x' * random_size(rng, min_size, max_size)
+        start_time = time.perf_counter()
+        try:
+            if is_fetch:
+                client.fetch(key, 1)
+            else:
+                client.store(key, 1, value)
+        except CacheCowError:
+            errors += 1
+            continue
+        latencies['fetch' if is_fetch else 'store'].append((time.perf_counter() - start_time) * 1000)
+
+    results = {name: {f'p{p}': float(np.percentile(values, p)) for p in PERCENTILES}
+               for name, values in latencies.items() if values}
+    return results, errors
+
+
+def print_results(results, baseline=None):
+    header = f'{"":<8}' + ''.join(f'{f"p{p} (ms)":>14}' for p in PERCENTILES)
+    if baseline:
+        header += ''.join(f'{f"before p{p}":>14}' for p in PERCENTILES)
+    print(header)
+    for name, percentiles in results.items():
+        row = f'{name:<8}' + ''.join(f'{percentiles[f"p{p}"]:>14.3f}' for p in PERCENTILES)
+        if baseline and name in baseline:
+            row += ''.join(f'{baseline[name][f"p{p}"]:>14.3f}' for p in PERCENTILES)
+        print(row)
+
+
+if __name__ == "__main__":
+    # Argument Parsing
+    parser = OptionParser(usage="storageEngineLatency.py --nodes nodes.txt [options]")
+    parser.add_option("--url",
+                type="string",
+                dest="url",
+                help="Node URL for sending HTTP requests.")
+    parser.add_option("--nodes",
+                type="string",
+                dest="nodes",
+                help="Path to nodes.txt. Sends each key directly to the node that owns it.")
+    parser.add_option("--fill",
+                type="int",
+                default=512,
+                dest="fill_mb",
+                help="Megabytes of values stored before timing.")
+    parser.add_option("--min-size",
+                type="int",
+                default=10,
+                dest="min_size",
+                help="Smallest value size in bytes.")
+    parser.add_option("--max-size",
+                type="int",
+                default=1 << 20,
+                dest="max_size",
+                help="Largest value size in bytes.")
+    parser.add_option("-n",
+                type="int",
+                default=20000,
+                dest="num_requests",
+                help="Number of timed requests.")
+    parser.add_option("--fetch-ratio",
+                type="float",
+                default=0.9,
+                dest="fetch_ratio",
+                help="Fraction of timed requests that are fetches.")
+    parser.add_option("--batch",
+                type="int",
+                default=500,
+                dest="batch_size",
+                help="Number of values per set_many request while filling.")
+    parser.add_option("-s",
+                type="int",
+                default=10,
+                dest="seed",
+                help="Seed.")
+    parser.add_option("-o", "--output",
+                type="string",
+                dest="output",
+                help="Saves the results as JSON, e.g. to compare two engines.")
+    parser.add_option("--compare",
+                type="string",
+                dest="compare",
+                help="JSON results of an earlier run to print alongside.")
+    (options, args) = parser.parse_args()
+
+    if not options.url and not options.nodes:
+        raise Exception("URL Argument is necessary for performance testing.")
+
+    rng = random.Random(options.seed)
+    nodes = load_node_list(options.nodes) if options.nodes else [options.url]
+    with CacheCowClient(nodes) as client:
+        keys = fill(client, options.fill_mb << 20, options.min_size, options.max_size, options.batch_size, rng)
+        results, errors = run(client, keys, options.num_requests, options.fetch_ratio,
+                              options.min_size, options.max_size, rng)
+        client.clear()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print(f'Stored {len(keys)} keys, {errors} requests failed')
+    print_results(results, baseline)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
@@ -0,0 +1,114 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cachecow.autoscale import BREACH, CLEAR, HOLD, Autoscaler, ClusterSample, ScalingPolicy
+
+
+class FakeCluster:
+    """Serves global cache infos of nodes whose counters grow by a fixed amount per poll.
+    """
+
+    def __init__(self, node_count, hits, misses, stores, evictions, utilization):
+        self.node_count = node_count
+        self.hits = hits
+        self.misses = misses
+        self.stores = stores
+        self.evictions = evictions
+        self.utilization = utilization
+        self.polls = 0
+        self.launches = 0
+
+    def global_cache_info(self):
+        self.polls += 1
+        return [{
+            'nodeId': node_id,
+            'hostName': f'localhost:{7070 + node_id}',
+            'receiverUsageInfo': {'fetchHits': self.hits * self.polls, 'fetchMisses': self.misses * self.polls,
+                                  'storeAttempts': self.stores * self.polls},
+            'cacheInfo': {'evictions': self.evictions * self.polls,
+                          'usedBytes': int(self.utilization * 1000), 'maxBytes': 1000},
+            'latencies': {},
+            'migrationInfo': None
+        } for node_id in range(self.node_count)]
+
+    def launch_node(self):
+        self.launches += 1
+        self.node_count += 1
+
+
+class FakeClient:
+    def __init__(self, cluster):
+        self.node_clients = [cluster]
+
+    def add_node(self, node_url):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_polls(cluster, polls, interval=5.0):
+    clock = FakeClock()
+    policy = ScalingPolicy(cooldown=20.0, max_nodes=8)
+    autoscaler = Autoscaler(FakeClient(cluster), policy, clock=clock, log=lambda message: None)
+    actions = []
+    for _ in range(polls):
+        actions.append(autoscaler.step()[1])
+        clock.now += interval
+    return actions
+
+
+class ScalingPolicyTest(unittest.TestCase):
+
+    def sample(self, hit_ratio, memory_utilization=1.0, eviction_rate=1.0, fetch_p99_ms=1.0, fetches=1000):
+        return ClusterSample(node_count=2, seconds=5.0, memory_utilization=memory_utilization,
+                             hit_ratio=hit_ratio, eviction_rate=eviction_rate, fetch_p99_ms=fetch_p99_ms,
+                             fetches=fetches, stores=fetches // 100, migrating=False)
+
+    def test_full_cache_with_high_hit_ratio_is_clear(self):
+        self.assertEqual(ScalingPolicy().assess(self.sample(0.99)), (CLEAR, []))
+
+    def test_low_hit_ratio_breaches_only_on_full_cache(self):
+        self.assertEqual(ScalingPolicy().assess(self.sample(0.5)), (BREACH, ['hit ratio', 'memory', 'evictions']))
+        self.assertEqual(ScalingPolicy().assess(self.sample(0.5, memory_utilization=0.3, eviction_rate=0.0)),
+                         (HOLD, []))
+
+    def test_latency_breaches_alone(self):
+        self.assertEqual(ScalingPolicy().assess(self.sample(0.99, memory_utilization=0.1, fetch_p99_ms=80.0)),
+                         (BREACH, ['latency']))
+
+    def test_idle_cluster_is_clear(self):
+        self.assertEqual(ScalingPolicy().assess(self.sample(0.0, fetches=10)), (CLEAR, []))
+
+    def test_memory_is_cluster_wide(self):
+        infos = [{'nodeId': 0, 'cacheInfo': {'usedBytes': 1000, 'maxBytes': 1000}},
+                 {'nodeId': 1, 'cacheInfo': {'usedBytes': 0, 'maxBytes': 1000}}]
+        self.assertEqual(ClusterSample.between(None, infos, 0.0).memory_utilization, 0.5)
+
+
+class AutoscalerTest(unittest.TestCase):
+
+    def test_full_but_healthy_cluster_never_launches(self):
+        # Every store evicts, but 99% of fetches hit
+        cluster = FakeCluster(2, hits=990, misses=10, stores=10, evictions=10, utilization=0.9)
+        actions = run_polls(cluster, 50)
+        self.assertEqual(cluster.launches, 0)
+        self.assertNotIn('launch', actions)
+
+    def test_full_cluster_missing_fetches_launches(self):
+        cluster = FakeCluster(2, hits=500, misses=500, stores=500, evictions=500, utilization=1.0)
+        actions = run_polls(cluster, 5)
+        self.assertEqual(actions[:5], ['watch', 'watch', 'watch', 'launch', 'scaling'])
+        self.assertEqual(cluster.launches, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
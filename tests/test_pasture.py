@@ -0,0 +1,186 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pasture
+
+try:
+    import boto3
+    from botocore.stub import Stubber
+except ImportError:
+    boto3 = None
+
+
+class FakeResult:
+    def __init__(self, stdout=''):
+        self.stdout = stdout
+        self.stderr = ''
+
+
+class FakeConnection:
+    """Stands in for a fabric connection, recording the commands run and files put.
+    """
+
+    def __init__(self, host, events):
+        self.host = host
+        self.events = events
+        self.files = {}
+
+    def run(self, command, **kwargs):
+        if ' -jar ' in command:
+            self.events.append(('start', self.host, command))
+        return FakeResult()
+
+    def put(self, local, remote):
+        self.files[remote] = local.getvalue() if hasattr(local, 'getvalue') else local
+
+    def close(self):
+        pass
+
+
+class FakeConnector:
+    def __init__(self, failing=(), delays=None):
+        self.failing = set(failing)
+        self.delays = delays or {}
+        self.events = []
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, host, user, key):
+        time.sleep(self.delays.get(host, 0))
+        if host in self.failing:
+            raise ConnectionError(f'{host} refused the connection')
+        connection = FakeConnection(host, self.events)
+        with self.lock:
+            self.connections[host] = connection
+        return connection
+
+
+class PastureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Node logs are written to pasture_logs in the working directory
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.answered = []
+        patches = [
+            mock.patch.object(pasture, 'test_node', side_effect=self.answer),
+            mock.patch.object(pasture, 'node_joined', return_value=True),
+            mock.patch.object(pasture, 'build_artifacts'),
+            mock.patch.object(pasture, 'Responder', lambda pattern, response: None),
+            mock.patch.object(pasture, 'log'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def answer(self, node):
+        self.answered.append(node)
+        return True
+
+
+class ProvisionNodesTest(PastureTestCase):
+
+    def test_failed_node_does_not_stop_others(self):
+        connect = FakeConnector(failing=['node-1'])
+        failures = pasture.provision_nodes(['node-0', 'node-1', 'node-2'], 0, 'nodes', False, False, connect)
+        self.assertEqual(failures, ['node-1'])
+        self.assertEqual(sorted(host for _, host, _ in connect.events), ['node-0', 'node-2'])
+
+    def test_joining_nodes_start_in_id_order(self):
+        connect = FakeConnector(delays={'node-2': 0.2, 'node-3': 0.1})
+        failures = pasture.provision_nodes(['node-2', 'node-3', 'node-4'], 2, 'nodes', True, True, connect)
+        self.assertEqual(failures, [])
+        self.assertEqual([host for _, host, _ in connect.events], ['node-2', 'node-3', 'node-4'])
+        self.assertIn(' aws 3 ', connect.events[1][2])
+
+    def test_failed_join_stops_later_nodes(self):
+        connect = FakeConnector(failing=['node-2'])
+        failures = pasture.provision_nodes(['node-2', 'node-3', 'node-4'], 2, 'nodes', True, True, connect)
+        self.assertEqual(sorted(failures), ['node-2', 'node-3', 'node-4'])
+        self.assertEqual(connect.events, [])
+
+
+@unittest.skipIf(boto3 is None, 'boto3 is not installed')
+class LaunchClusterTest(PastureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        credentials = {'region_name': 'us-east-1', 'aws_access_key_id': 'test', 'aws_secret_access_key': 'test'}
+        self.ec2 = boto3.resource('ec2', **credentials)
+        self.elb = boto3.client('elbv2', **credentials)
+        self.ec2_stub = Stubber(self.ec2.meta.client)
+        self.elb_stub = Stubber(self.elb)
+
+    def stub_instances(self, num_nodes):
+        ids = [f'i-{i}' for i in range(num_nodes)]
+        self.ec2_stub.add_response('describe_vpcs', {'Vpcs': [{'VpcId': 'vpc-1', 'IsDefault': True}]})
+        self.ec2_stub.add_response('describe_subnets', {'Subnets': [
+            {'SubnetId': 'subnet-1', 'AvailabilityZone': 'us-east-1b', 'VpcId': 'vpc-1'}]})
+        self.ec2_stub.add_response('create_security_group', {'GroupId': 'sg-1'})
+        self.ec2_stub.add_response('authorize_security_group_ingress', {})
+        self.ec2_stub.add_response('run_instances', {'Instances': [{'InstanceId': i} for i in ids]},
+                                   {'ImageId': mock.ANY, 'InstanceType': 't3.medium', 'KeyName': 'CacheCow',
+                                    'MaxCount': num_nodes, 'MinCount': num_nodes, 'Placement': mock.ANY,
+                                    'SecurityGroups': mock.ANY, 'TagSpecifications': mock.ANY,
+                                    'BlockDeviceMappings': mock.ANY})
+        self.ec2_stub.add_response('describe_instances', {'Reservations': [{'Instances': [
+            {'InstanceId': i, 'State': {'Name': 'running'}} for i in ids]}]})
+        for i in ids:
+            self.ec2_stub.add_response('describe_instances', {'Reservations': [{'Instances': [
+                {'InstanceId': i, 'PublicDnsName': f'node-{i}'}]}]}, {'InstanceIds': [i]})
+
+    def stub_load_balancer(self):
+        balancer = {'LoadBalancerArn': 'arn:balancer', 'DNSName': 'balancer', 'State': {'Code': 'active'}}
+        self.elb_stub.add_response('create_target_group', {'TargetGroups': [{'TargetGroupArn': 'arn:nodes'}]})
+        self.elb_stub.add_response('register_targets', {})
+        self.elb_stub.add_response('create_load_balancer', {'LoadBalancers': [{'LoadBalancerArn': 'arn:balancer'}]})
+        self.elb_stub.add_response('create_listener', {})
+        self.elb_stub.add_response('describe_load_balancers', {'LoadBalancers': [balancer]})
+        self.elb_stub.add_response('describe_load_balancers', {'LoadBalancers': [balancer]})
+
+    def launch(self, num_nodes, connect):
+        with self.ec2_stub, self.elb_stub:
+            failures = pasture.launch_cluster(num_nodes, False, self.ec2, self.elb, connect)
+            self.ec2_stub.assert_no_pending_responses()
+            self.elb_stub.assert_no_pending_responses()
+        return failures
+
+    def test_launches_and_provisions_every_node(self):
+        self.stub_instances(2)
+        self.stub_load_balancer()
+        connect = FakeConnector()
+
+        self.assertEqual(self.launch(2, connect), [])
+        for connection in connect.connections.values():
+            self.assertEqual(connection.files['CacheCow/cache-node/nodes.txt'], 'node-i-0:7070\nnode-i-1:7070')
+        self.assertEqual(sorted(command.split(' aws ')[1].split()[0] for _, _, command in connect.events), ['0', '1'])
+        self.assertIn('balancer', self.answered)
+
+    def test_skips_load_balancer_wait_when_every_node_fails(self):
+        self.stub_instances(2)
+        self.stub_load_balancer()
+        connect = FakeConnector(failing=['node-i-0', 'node-i-1'])
+
+        self.assertEqual(sorted(self.launch(2, connect)), ['node-i-0', 'node-i-1'])
+        self.assertNotIn('balancer', self.answered)
+
+    def test_rejects_clusters_past_max_nodes(self):
+        with self.ec2_stub, self.elb_stub:
+            with self.assertRaises(ValueError):
+                pasture.launch_cluster(pasture.MAX_NODES + 1, False, self.ec2, self.elb, FakeConnector())
+
+
+if __name__ == '__main__':
+    unittest.main()